@@ -1,63 +1,269 @@
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import and_, select, update, exists
 from datetime import datetime
+from typing import Iterable, Set
 from app.database import get_db
-from app.models.prestamos import Prestamo, DetallePrestamo
+from app.models.prestamos import Prestamo, DetallePrestamo, EstadoPrestamo
 from app.models.ejemplar import Ejemplar
-from app.schemas.devolucion import DevolucionRequest, DevolucionResponse
+from app.schemas.devolucion import (
+    DevolucionRequest,
+    DevolucionResponse,
+    DevolucionLoteRequest,
+    DevolucionLoteItem,
+    DevolucionLoteResponse
+)
 from app.utils.dates import calcular_fecha_devolucion
+from app.services.cache_ejemplares import buscar_por_codigo, registrar_codigo
+from app.services.transiciones_service import programar_reubicacion
+from app.services.sanciones_service import aplicar_sanciones
+from app.services.cola_reservas import asignar_ejemplares
+from app.services.pronostico_disponibilidad import pronostico
 
 router = APIRouter(prefix="/devoluciones", tags=["Devoluciones"])
 
+# Préstamos que todavía tienen ejemplares por devolver
+ESTADOS_PRESTAMO_ABIERTOS = [EstadoPrestamo.activo, EstadoPrestamo.vencido]
+
+# ============================================
+# FUNCIONES AUXILIARES INTERNAS
+# ============================================
+
+def _estado_str(estado) -> str:
+    return estado.value if isinstance(estado, EstadoPrestamo) else estado
+
+
+def _aplicar_devolucion(ejemplar: Ejemplar, detalle: DetallePrestamo, prestamo: Prestamo, ahora: datetime) -> int:
+    '''
+    Marca el ejemplar como devuelto y retorna los días de atraso del préstamo.
+    '''
+
+    prestamo.fecha_devolucion_real = ahora
+    prestamo.hora_devolucion_real = ahora.time()
+    detalle.fecha_devolucion = ahora
+
+    ejemplar.estado = "devuelto"
+
+    dias_atraso = 0
+    if prestamo.fecha_devolucion_estimada and ahora.date() > prestamo.fecha_devolucion_estimada.date():
+        dias_atraso = (ahora.date() - prestamo.fecha_devolucion_estimada.date()).days
+
+    return dias_atraso
+
+
+def _cerrar_prestamos_completos(db: Session, prestamo_ids: Iterable[int]) -> Set[int]:
+    '''
+    Cierra (estado "devuelto") los préstamos que ya no tienen ejemplares
+    pendientes, con un solo UPDATE. Retorna los ids de los préstamos cerrados.
+    '''
+
+    prestamo_ids = list(set(prestamo_ids))
+    if not prestamo_ids:
+        return set()
+
+    # Los cambios de los detalles deben estar en la BD antes del NOT EXISTS
+    db.flush()
+
+    pendientes = exists().where(
+        DetallePrestamo.prestamo_id == Prestamo.id,
+        DetallePrestamo.fecha_devolucion.is_(None)
+    )
+
+    cerrados = db.execute(
+        update(Prestamo)
+        .where(Prestamo.id.in_(prestamo_ids), ~pendientes)
+        .values(estado=EstadoPrestamo.devuelto)
+        .returning(Prestamo.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+    # Reflejar el cambio en los objetos cargados sin generar otro UPDATE
+    cerrados = set(cerrados)
+    for obj in db.identity_map.values():
+        if isinstance(obj, Prestamo) and obj.id in cerrados:
+            set_committed_value(obj, "estado", EstadoPrestamo.devuelto)
+
+    return cerrados
+
+
+def _detalle_abierto_condicion():
+    '''
+    Condición de join para el detalle aún no devuelto de un préstamo abierto.
+    '''
+
+    return and_(
+        DetallePrestamo.ejemplar_id == Ejemplar.id,
+        DetallePrestamo.fecha_devolucion.is_(None),
+        DetallePrestamo.prestamo_id.in_(
+            select(Prestamo.id).where(Prestamo.estado.in_(ESTADOS_PRESTAMO_ABIERTOS))
+        )
+    )
+
+# ============================================
+# ENDPOINTS
+# ============================================
+
 @router.post("/", response_model=DevolucionResponse)
 def registrar_devolucion(data: DevolucionRequest, db: Session = Depends(get_db)):
-    
+
     '''
     Registra la devolución de un ejemplar prestado.
+    El ejemplar, su detalle abierto y el préstamo se obtienen en una sola consulta.
+    Si hay reservas esperando el documento, el ejemplar pasa directo a la primera.
     '''
 
-    ejemplar = db.query(Ejemplar).filter(Ejemplar.codigo == data.ejemplar_codigo).first()
-    if not ejemplar:
+    query = db.query(Ejemplar, DetallePrestamo, Prestamo).select_from(Ejemplar).outerjoin(
+        DetallePrestamo, _detalle_abierto_condicion()
+    ).outerjoin(
+        Prestamo, Prestamo.id == DetallePrestamo.prestamo_id
+    )
+
+    fila = buscar_por_codigo(query, data.ejemplar_codigo)
+
+    if not fila:
         raise HTTPException(status_code=404, detail="Ejemplar no encontrado")
-    
-    detalle = db.query(DetallePrestamo).join(Prestamo).filter(
-        DetallePrestamo.ejemplar_id == ejemplar.id,
-        Prestamo.estado == 'activo'
-    ).first()
+
+    ejemplar, detalle, prestamo = fila
 
     if not detalle:
         raise HTTPException(status_code=404, detail="No hay un préstamo activo para este ejemplar")
-    
-    prestamo = db.query(Prestamo).filter(Prestamo.id == detalle.prestamo_id).first()
 
     ahora = datetime.now()
-    prestamo.fecha_devolucion_real = ahora
-    prestamo.hora_devolucion_real = ahora.time()
+    dias_atraso = _aplicar_devolucion(ejemplar, detalle, prestamo, ahora)
 
-    ejemplar.estado = "devuelto"
+    _cerrar_prestamos_completos(db, [prestamo.id])
 
-    dias_atraso = 0
-    if prestamo.fecha_devolucion_estimada and ahora.date() > prestamo.fecha_devolucion_estimada.date():
-        dias_atraso = (ahora.date() - prestamo.fecha_devolucion_estimada.date()).days
+    asignaciones = asignar_ejemplares(db, [ejemplar], ahora)
+    if ejemplar.id not in asignaciones:
+        programar_reubicacion(db, [ejemplar.id], ahora)
 
     if dias_atraso > 0:
-        dias_sancion = min(max(dias_atraso * 2, 3), 30)
-        print(f"Sancion: {dias_sancion} dias por {dias_atraso} dias de atraso.")
-
-    detalles_restantes = db.query(DetallePrestamo).join(Ejemplar).filter(
-        DetallePrestamo.prestamo_id == prestamo.id,
-        Ejemplar.estado != "devuelto"
-    ).count()
+        aplicar_sanciones(db, [{
+            "usuario_id": prestamo.usuario_id,
+            "prestamo_id": prestamo.id,
+            "dias_atraso": dias_atraso
+        }], origen="devolucion")
 
-    if detalles_restantes == 0:
-        prestamo.estado = "devuelto"
+    # Datos para el pronóstico, leídos antes de que el commit expire los objetos
+    asignacion = asignaciones.get(ejemplar.id)
+    retorno = (ejemplar.documento_id, prestamo.fecha_devolucion_estimada)
 
-    db.commit()
-    db.refresh(prestamo)
-
-    return DevolucionResponse(
+    respuesta = DevolucionResponse(
         mensaje = "Devolución registrada exitosamente",
         ejemplar_codigo = ejemplar.codigo,
         dias_atraso = dias_atraso,
-        estado_prestamo = prestamo.estado
-    )
\ No newline at end of file
+        estado_prestamo = _estado_str(prestamo.estado),
+        reserva_asignada = asignacion.reserva_id if asignacion else None
+    )
+
+    db.commit()
+
+    pronostico.registrar_retorno(*retorno, asignacion.fecha_reserva if asignacion else None)
+
+    return respuesta
+
+@router.post("/lote", response_model=DevolucionLoteResponse)
+def registrar_devoluciones_lote(data: DevolucionLoteRequest, db: Session = Depends(get_db)):
+
+    '''
+    Registra la devolución de muchos ejemplares a la vez (ej: buzón nocturno).
+    Usa dos consultas en total (ejemplares y detalles abiertos), cierra los
+    préstamos completos y aplica las sanciones por atraso con UPDATEs masivos,
+    entrega ejemplares a las reservas en espera y confirma todo en un solo commit.
+    Retorna el resultado de cada código por separado.
+    '''
+
+    codigos = list(dict.fromkeys(data.ejemplares_codigos))
+
+    ejemplares = db.query(Ejemplar).filter(Ejemplar.codigo.in_(codigos)).all()
+    por_codigo = {e.codigo: e for e in ejemplares}
+
+    abiertos = {}
+    if ejemplares:
+        filas = db.query(DetallePrestamo, Prestamo).join(
+            Prestamo, Prestamo.id == DetallePrestamo.prestamo_id
+        ).filter(
+            DetallePrestamo.ejemplar_id.in_([e.id for e in ejemplares]),
+            DetallePrestamo.fecha_devolucion.is_(None),
+            Prestamo.estado.in_(ESTADOS_PRESTAMO_ABIERTOS)
+        ).all()
+        abiertos = {detalle.ejemplar_id: (detalle, prestamo) for detalle, prestamo in filas}
+
+    ahora = datetime.now()
+    resultados = {}
+    prestamos_afectados = {}
+    atrasos = {}
+
+    for codigo in codigos:
+        ejemplar = por_codigo.get(codigo)
+
+        if not ejemplar:
+            resultados[codigo] = DevolucionLoteItem(
+                ejemplar_codigo=codigo, exitoso=False, mensaje="Ejemplar no encontrado"
+            )
+            continue
+
+        registrar_codigo(ejemplar)
+
+        if ejemplar.id not in abiertos:
+            resultados[codigo] = DevolucionLoteItem(
+                ejemplar_codigo=codigo, exitoso=False, mensaje="No hay un préstamo activo para este ejemplar"
+            )
+            continue
+
+        detalle, prestamo = abiertos[ejemplar.id]
+        dias_atraso = _aplicar_devolucion(ejemplar, detalle, prestamo, ahora)
+        prestamos_afectados[prestamo.id] = prestamo
+
+        # Una sanción por préstamo, aunque se devuelvan varios de sus ejemplares
+        if dias_atraso > 0:
+            atrasos[prestamo.id] = {
+                "usuario_id": prestamo.usuario_id,
+                "prestamo_id": prestamo.id,
+                "dias_atraso": dias_atraso
+            }
+
+        resultados[codigo] = DevolucionLoteItem(
+            ejemplar_codigo=codigo,
+            exitoso=True,
+            mensaje="Devolución registrada exitosamente",
+            dias_atraso=dias_atraso
+        )
+
+    _cerrar_prestamos_completos(db, prestamos_afectados.keys())
+
+    devueltos = [por_codigo[c] for c, item in resultados.items() if item.exitoso]
+    asignaciones = asignar_ejemplares(db, devueltos, ahora)
+    programar_reubicacion(db, [e.id for e in devueltos if e.id not in asignaciones], ahora)
+    aplicar_sanciones(db, list(atrasos.values()), origen="devolucion")
+
+    retornos = []
+    for codigo, item in resultados.items():
+        if item.exitoso:
+            ejemplar = por_codigo[codigo]
+            _, prestamo = abiertos[ejemplar.id]
+            asignacion = asignaciones.get(ejemplar.id)
+            item.estado_prestamo = _estado_str(prestamo.estado)
+            item.reserva_asignada = asignacion.reserva_id if asignacion else None
+            retornos.append((
+                ejemplar.documento_id,
+                prestamo.fecha_devolucion_estimada,
+                asignacion.fecha_reserva if asignacion else None
+            ))
+
+    db.commit()
+
+    for documento_id, fecha_estimada, fecha_reserva in retornos:
+        pronostico.registrar_retorno(documento_id, fecha_estimada, fecha_reserva)
+
+    # Códigos repetidos en el request se informan con el mismo resultado
+    lista = [resultados[codigo] for codigo in data.ejemplares_codigos]
+    exitosas = sum(1 for item in resultados.values() if item.exitoso)
+
+    return DevolucionLoteResponse(
+        total=len(codigos),
+        exitosas=exitosas,
+        fallidas=len(codigos) - exitosas,
+        resultados=lista
+    )
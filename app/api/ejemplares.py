@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
-from app.database import get_db
+from app.database import get_db, SessionLocal
 from app.models.ejemplar import Ejemplar
 from app.models.historial_ejemplar import HistorialEjemplar
 from app.models.usuario import Usuario
@@ -10,19 +11,32 @@ from app.schemas.ejemplar_schema import (
     EjemplarResponse, 
     EjemplarEstadoUpdate,
     DisponibilidadResponse,
-    HistorialEjemplarResponse
+    HistorialEjemplarResponse,
+    HistorialPaginaResponse
 )
 from app.utils.auth import get_current_user, require_role
+from app.utils.cursores import codificar_cursor, decodificar_cursor
+from app.utils.serializacion import respuesta_filas
+from app.utils.etag import etag_por_version
+from app.services.cache_ejemplares import obtener_ejemplar_por_codigo, registrar_codigo
+from app.services.transiciones_service import programar_reubicacion
+from app.services.pronostico_disponibilidad import pronostico
+from app.services.versiones_recurso import RECURSO_EJEMPLARES
 import random
 import string
-from sqlalchemy import func
+import csv
+import io
+import json
+from sqlalchemy import case, func, select, tuple_
 from datetime import timedelta, datetime
 from pydantic import BaseModel
 
 
 router = APIRouter(prefix="/ejemplares", tags=["Ejemplares"])
 
-ESTADOS_VALIDOS = ["disponible", "prestado", "en_sala", "devuelto", "mantenimiento", "perdido"]
+ESTADOS_VALIDOS = ["disponible", "prestado", "en_sala", "devuelto", "reservado", "mantenimiento", "perdido"]
+
+CAMPOS_HISTORIAL = ["id", "ejemplar_id", "estado_anterior", "estado_nuevo", "usuario_id", "motivo", "created_at"]
 
 # ============================================
 # CLASES INTERNAS
@@ -55,13 +69,68 @@ def generar_codigo_ejemplar(documento_id: int, db: Session) -> str:
     
     return codigo_base
 
+
+def filtrar_historial(
+    query,
+    ejemplar_id: Optional[int] = None,
+    usuario_id: Optional[int] = None,
+    estado: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cursor: Optional[str] = None
+):
+    """
+    Aplicar filtros y posición keyset a una consulta de historial.
+    El orden es siempre (created_at, id) descendente, que coincide con
+    los índices compuestos de HistorialEjemplar.
+    """
+    if ejemplar_id:
+        query = query.filter(HistorialEjemplar.ejemplar_id == ejemplar_id)
+    
+    if usuario_id:
+        query = query.filter(HistorialEjemplar.usuario_id == usuario_id)
+    
+    if estado:
+        query = query.filter(HistorialEjemplar.estado_nuevo == estado)
+    
+    if desde:
+        query = query.filter(HistorialEjemplar.created_at >= desde)
+    
+    if hasta:
+        query = query.filter(HistorialEjemplar.created_at < hasta)
+    
+    if cursor:
+        cursor_fecha, cursor_id = decodificar_cursor(cursor)
+        query = query.filter(
+            tuple_(HistorialEjemplar.created_at, HistorialEjemplar.id) < tuple_(cursor_fecha, cursor_id)
+        )
+    
+    return query.order_by(HistorialEjemplar.created_at.desc(), HistorialEjemplar.id.desc())
+
+
+def paginar_historial(query, limit: int) -> tuple:
+    """
+    Obtener una página de historial y el cursor de la siguiente.
+    Se pide un registro extra para saber si quedan más sin contar el total.
+    """
+    filas = query.limit(limit + 1).all()
+    
+    siguiente_cursor = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        ultimo = filas[-1]
+        siguiente_cursor = codificar_cursor(ultimo.created_at, ultimo.id)
+    
+    return filas, siguiente_cursor
+
 # ============================================
 # ENDPOINT 7: Estadísticas de ejemplares (NUEVO)
 # ============================================
 @router.get("/estadisticas", response_model=dict)
-async def obtener_estadisticas(
+def obtener_estadisticas(
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(require_role(["admin", "bibliotecario"]))
+    current_user: Usuario = Depends(require_role(["admin", "bibliotecario"])),
+    _etag: None = Depends(etag_por_version(RECURSO_EJEMPLARES))
 ):
     """
     Obtener estadísticas generales de ejemplares.
@@ -88,9 +157,10 @@ async def obtener_estadisticas(
 # ENDPOINT 16: Ejemplares con problemas (MEDIANA)
 # ============================================
 @router.get("/reportes/con-problemas", response_model=dict)
-async def obtener_ejemplares_con_problemas(
+def obtener_ejemplares_con_problemas(
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(require_role(["admin", "bibliotecario"]))
+    current_user: Usuario = Depends(require_role(["admin", "bibliotecario"])),
+    _etag: None = Depends(etag_por_version(RECURSO_EJEMPLARES))
 ):
     """
     Reporte de ejemplares que requieren atención:
@@ -159,21 +229,22 @@ async def obtener_ejemplares_con_problemas(
 # ENDPOINT 17: Reporte de uso por ubicación (MEDIANA)
 # ============================================
 @router.get("/reportes/por-ubicacion", response_model=dict)
-async def obtener_reporte_ubicaciones(
+def obtener_reporte_ubicaciones(
     db: Session = Depends(get_db),
-    current_user: Usuario = Depends(require_role(["admin", "bibliotecario"]))
+    current_user: Usuario = Depends(require_role(["admin", "bibliotecario"])),
+    _etag: None = Depends(etag_por_version(RECURSO_EJEMPLARES))
 ):
     """
     Reporte de ejemplares agrupados por ubicación.
     Útil para organización física de la biblioteca.
     """
-    from sqlalchemy import func
+    from sqlalchemy import case, func
     
     ubicaciones = db.query(
         Ejemplar.ubicacion,
         func.count(Ejemplar.id).label("total"),
-        func.sum(func.case((Ejemplar.estado == "disponible", 1), else_=0)).label("disponibles"),
-        func.sum(func.case((Ejemplar.estado == "prestado", 1), else_=0)).label("prestados")
+        func.sum(case((Ejemplar.estado == "disponible", 1), else_=0)).label("disponibles"),
+        func.sum(case((Ejemplar.estado == "prestado", 1), else_=0)).label("prestados")
     ).group_by(Ejemplar.ubicacion).all()
     
     return {
@@ -194,7 +265,7 @@ async def obtener_reporte_ubicaciones(
 # ENDPOINT 18: Sistema de alertas (MEDIANA)
 # ============================================
 @router.get("/alertas", response_model=dict)
-async def obtener_alertas(
+def obtener_alertas(
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(require_role(["admin", "bibliotecario"]))
 ):
@@ -240,16 +311,15 @@ async def obtener_alertas(
     # (menos del 20% disponible y más de 5 ejemplares totales)
     documentos_baja_disponibilidad = []
     
-    docs_query = db.query(Ejemplar.documento_id).group_by(Ejemplar.documento_id).all()
+    # Totales por documento en una sola consulta (no dos por documento)
+    docs_query = db.query(
+        Ejemplar.documento_id,
+        func.count(Ejemplar.id),
+        func.sum(case((Ejemplar.estado == "disponible", 1), else_=0))
+    ).group_by(Ejemplar.documento_id).having(func.count(Ejemplar.id) >= 5).all()
     
-    for (doc_id,) in docs_query:
-        total = db.query(Ejemplar).filter(Ejemplar.documento_id == doc_id).count()
-        disponibles = db.query(Ejemplar).filter(
-            Ejemplar.documento_id == doc_id,
-            Ejemplar.estado == "disponible"
-        ).count()
-        
-        if total >= 5 and disponibles / total < 0.2:
+    for doc_id, total, disponibles in docs_query:
+        if disponibles / total < 0.2:
             documentos_baja_disponibilidad.append({
                 "documento_id": doc_id,
                 "total": total,
@@ -407,7 +477,7 @@ def buscar_por_codigo(codigo: str, db: Session = Depends(get_db)):
     Buscar un ejemplar específico por su código único.
     Usado al momento de devoluciones (ROL 4).
     """
-    ejemplar = db.query(Ejemplar).filter(Ejemplar.codigo == codigo).first()
+    ejemplar = obtener_ejemplar_por_codigo(codigo, db)
     
     if not ejemplar:
         raise HTTPException(
@@ -484,6 +554,8 @@ async def crear_ejemplar(
     db.add(nuevo_ejemplar)
     db.commit()
     db.refresh(nuevo_ejemplar)
+    registrar_codigo(nuevo_ejemplar)
+    pronostico.invalidar(nuevo_ejemplar.documento_id)
     
     return nuevo_ejemplar
 
@@ -542,6 +614,141 @@ async def validar_disponibilidad_prestamo(
     }
 
 
+# ============================================
+# ENDPOINT 19: Consulta global de historial (auditoría)
+# ============================================
+@router.get("/historial", response_model=HistorialPaginaResponse)
+def consultar_historial(
+    ejemplar_id: Optional[int] = Query(None, description="Filtrar por ejemplar"),
+    usuario_id: Optional[int] = Query(None, description="Filtrar por usuario que hizo el cambio"),
+    estado: Optional[str] = Query(None, description="Filtrar por estado nuevo"),
+    desde: Optional[datetime] = Query(None, description="Desde esta fecha (inclusive)"),
+    hasta: Optional[datetime] = Query(None, description="Hasta esta fecha (exclusiva)"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto por la página anterior"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role(["admin", "bibliotecario"]))
+):
+    """
+    Consultar cambios de estado de todos los ejemplares.
+    Permite filtrar por usuario, estado y rango de fechas.
+    
+    Usa paginación keyset: para la siguiente página se envía el
+    'siguiente_cursor' de la respuesta. Si es null no hay más resultados.
+    
+    Ejemplos:
+    - GET /ejemplares/historial?usuario_id=3
+    - GET /ejemplares/historial?desde=2025-01-01T00:00:00&hasta=2025-02-01T00:00:00
+    """
+    query = filtrar_historial(
+        db.query(HistorialEjemplar),
+        ejemplar_id=ejemplar_id,
+        usuario_id=usuario_id,
+        estado=estado,
+        desde=desde,
+        hasta=hasta,
+        cursor=cursor
+    )
+    
+    items, siguiente_cursor = paginar_historial(query, limit)
+    
+    return HistorialPaginaResponse(
+        items=items,
+        siguiente_cursor=siguiente_cursor,
+        limite=limit
+    )
+
+# ============================================
+# ENDPOINT 20: Exportar historial (CSV / NDJSON)
+# ============================================
+@router.get("/historial/exportar")
+async def exportar_historial(
+    formato: str = Query("csv", pattern="^(csv|ndjson)$", description="csv o ndjson"),
+    ejemplar_id: Optional[int] = Query(None),
+    usuario_id: Optional[int] = Query(None),
+    estado: Optional[str] = Query(None),
+    desde: Optional[datetime] = Query(None),
+    hasta: Optional[datetime] = Query(None),
+    lote: int = Query(5000, ge=100, le=50000, description="Filas por consulta interna"),
+    current_user: Usuario = Depends(require_role(["admin", "bibliotecario"]))
+):
+    """
+    Exportar el historial filtrado como archivo descargable.
+    La respuesta se genera por partes (streaming), leyendo la BD en lotes
+    keyset, así no se carga todo el historial en memoria.
+    """
+    filtros = {
+        "ejemplar_id": ejemplar_id,
+        "usuario_id": usuario_id,
+        "estado": estado,
+        "desde": desde,
+        "hasta": hasta
+    }
+    columnas = [getattr(HistorialEjemplar, campo) for campo in CAMPOS_HISTORIAL]
+    
+    def generar_lotes():
+        # Sesión propia: el generador se consume después de que el
+        # endpoint retorna, y cada lote es una consulta corta.
+        db = SessionLocal()
+        try:
+            cursor = None
+            while True:
+                query = filtrar_historial(db.query(*columnas), cursor=cursor, **filtros)
+                filas = query.limit(lote).all()
+                if not filas:
+                    break
+                yield filas
+                if len(filas) < lote:
+                    break
+                ultimo = filas[-1]
+                cursor = codificar_cursor(ultimo.created_at, ultimo.id)
+        finally:
+            db.close()
+    
+    def generar_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CAMPOS_HISTORIAL)
+        for filas in generar_lotes():
+            writer.writerows(
+                [f.id, f.ejemplar_id, f.estado_anterior, f.estado_nuevo, f.usuario_id, f.motivo, f.created_at.isoformat()]
+                for f in filas
+            )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue()
+    
+    def generar_ndjson():
+        for filas in generar_lotes():
+            yield "".join(
+                json.dumps({
+                    "id": f.id,
+                    "ejemplar_id": f.ejemplar_id,
+                    "estado_anterior": f.estado_anterior,
+                    "estado_nuevo": f.estado_nuevo,
+                    "usuario_id": f.usuario_id,
+                    "motivo": f.motivo,
+                    "created_at": f.created_at.isoformat()
+                }, ensure_ascii=False) + "\n"
+                for f in filas
+            )
+    
+    if formato == "csv":
+        return StreamingResponse(
+            generar_csv(),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=historial_ejemplares.csv"}
+        )
+    
+    return StreamingResponse(
+        generar_ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=historial_ejemplares.ndjson"}
+    )
+
+
 # Parte 4
 
 # ============================================
@@ -550,7 +757,9 @@ async def validar_disponibilidad_prestamo(
 @router.get("/{ejemplar_id}/historial", response_model=List[HistorialEjemplarResponse])
 async def obtener_historial_ejemplar(
     ejemplar_id: int,
+    response: Response,
     limit: int = Query(50, le=200),
+    cursor: Optional[str] = Query(None, description="Cursor de la página anterior (header X-Siguiente-Cursor)"),
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(require_role(["admin", "bibliotecario"]))
 ):
@@ -559,6 +768,8 @@ async def obtener_historial_ejemplar(
     Útil para auditoría y trazabilidad.
     
     Muestra quién cambió el estado, cuándo y por qué.
+    Si hay más registros, el header X-Siguiente-Cursor trae el cursor
+    para pedir la página siguiente.
     """
     ejemplar = db.query(Ejemplar).filter(Ejemplar.id == ejemplar_id).first()
     
@@ -568,9 +779,11 @@ async def obtener_historial_ejemplar(
             detail=f"Ejemplar con id {ejemplar_id} no encontrado"
         )
     
-    historial = db.query(HistorialEjemplar).filter(
-        HistorialEjemplar.ejemplar_id == ejemplar_id
-    ).order_by(HistorialEjemplar.created_at.desc()).limit(limit).all()
+    query = filtrar_historial(db.query(HistorialEjemplar), ejemplar_id=ejemplar_id, cursor=cursor)
+    historial, siguiente_cursor = paginar_historial(query, limit)
+    
+    if siguiente_cursor:
+        response.headers["X-Siguiente-Cursor"] = siguiente_cursor
     
     return historial
 
@@ -626,6 +839,7 @@ async def actualizar_estado_ejemplar(
     
     db.commit()
     db.refresh(ejemplar)
+    pronostico.invalidar(ejemplar.documento_id)
     
     return ejemplar
 
@@ -681,6 +895,7 @@ async def marcar_como_perdido(
     ejemplar.estado = "perdido"
     db.commit()
     db.refresh(ejemplar)
+    pronostico.invalidar(ejemplar.documento_id)
     
     return ejemplar
 
@@ -713,6 +928,7 @@ async def recuperar_ejemplar(
     ejemplar.estado = "disponible"
     db.commit()
     db.refresh(ejemplar)
+    pronostico.invalidar(ejemplar.documento_id)
     
     return ejemplar
 
@@ -737,37 +953,54 @@ async def listar_ejemplares_con_filtros(
     - GET /ejemplares?ubicacion=A3
     - GET /ejemplares?limit=10&offset=0
     """
-    query = db.query(Ejemplar)
+    # Solo las columnas de EjemplarResponse, escritas directo a JSON
+    query = select(
+        Ejemplar.id,
+        Ejemplar.documento_id,
+        Ejemplar.codigo,
+        Ejemplar.estado,
+        Ejemplar.ubicacion,
+        Ejemplar.created_at
+    )
     
     # Filtro por documento
     if documento_id:
-        query = query.filter(Ejemplar.documento_id == documento_id)
+        query = query.where(Ejemplar.documento_id == documento_id)
     
     # Filtro por estados (múltiples)
     if estados:
         lista_estados = [e.strip() for e in estados.split(",")]
-        query = query.filter(Ejemplar.estado.in_(lista_estados))
+        query = query.where(Ejemplar.estado.in_(lista_estados))
     
     # Filtro por ubicación (búsqueda parcial)
     if ubicacion:
-        query = query.filter(Ejemplar.ubicacion.ilike(f"%{ubicacion}%"))
+        query = query.where(Ejemplar.ubicacion.ilike(f"%{ubicacion}%"))
     
     # Paginación
     query = query.offset(offset).limit(limit)
     
-    ejemplares = query.all()
-    return ejemplares
+    return respuesta_filas(db.execute(query))
 
 # ============================================
 # FUNCIONES AUXILIARES para otros roles
 # ============================================
 
-def marcar_prestado(ejemplar_id: int, db: Session) -> bool:
+def _obtener_ejemplar(ejemplar_id: Optional[int], db: Session, codigo: Optional[str] = None) -> Optional[Ejemplar]:
+    """
+    Obtener un ejemplar por id, o por código si se entrega (vía caché de códigos).
+    """
+    if codigo is not None:
+        return obtener_ejemplar_por_codigo(codigo, db)
+    return db.get(Ejemplar, ejemplar_id)
+
+
+def marcar_prestado(ejemplar_id: Optional[int], db: Session, codigo: Optional[str] = None) -> bool:
     """
     Función para ROL 4: Marcar ejemplar como prestado.
+    Acepta el id o el código escaneado del ejemplar.
     Retorna True si fue exitoso, False si no estaba disponible.
     """
-    ejemplar = db.query(Ejemplar).filter(Ejemplar.id == ejemplar_id).first()
+    ejemplar = _obtener_ejemplar(ejemplar_id, db, codigo)
     
     if not ejemplar:
         return False
@@ -780,12 +1013,14 @@ def marcar_prestado(ejemplar_id: int, db: Session) -> bool:
     return True
 
 
-def marcar_devuelto(ejemplar_id: int, db: Session) -> bool:
+def marcar_devuelto(ejemplar_id: Optional[int], db: Session, codigo: Optional[str] = None) -> bool:
     """
     Función para ROL 4: Marcar ejemplar como devuelto.
-    Después de 30 min debería cambiar a disponible (simplificado: directo a disponible).
+    Acepta el id o el código escaneado del ejemplar.
+    Queda en 'devuelto' y el planificador lo pasa a disponible después del
+    tiempo de reubicación (REUBICACION_MINUTOS, 30 min por defecto).
     """
-    ejemplar = db.query(Ejemplar).filter(Ejemplar.id == ejemplar_id).first()
+    ejemplar = _obtener_ejemplar(ejemplar_id, db, codigo)
     
     if not ejemplar:
         return False
@@ -793,8 +1028,8 @@ def marcar_devuelto(ejemplar_id: int, db: Session) -> bool:
     if ejemplar.estado not in ["prestado", "en_sala"]:
         return False
     
-    # Simplificado: cambiar directo a disponible
-    ejemplar.estado = "disponible"
+    ejemplar.estado = "devuelto"
+    programar_reubicacion(db, [ejemplar.id])
     db.commit()
     return True
 
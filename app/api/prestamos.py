@@ -3,9 +3,13 @@ from sqlalchemy.orm import Session
 from datetime import datetime
 from app.models.prestamos import Prestamo, DetallePrestamo
 from app.models.ejemplar import Ejemplar
+from app.models.biblioteca import Biblioteca
+from app.models.documento import Documento
 from app.utils.dates import calcular_fecha_devolucion
 from app.schemas.prestamo import PrestamoCreate, PrestamoResponse, PrestamoStats
 from app.database import get_db
+from app.services.pronostico_disponibilidad import pronostico
+from app.services.recordatorios_service import marcar_prestamos_vencidos
 from typing import List, Optional
 
 router = APIRouter(prefix="/prestamos", tags=["Prestamos"])
@@ -33,40 +37,50 @@ def registrar_prestamo(data: PrestamoCreate, db: Session = Depends(get_db)):
     if tiene_vencidos > 0:
         raise HTTPException(status_code=400, detail="El usuario tiene préstamos vencidos y no puede realizar nuevos préstamos.")
     
-    ejemplares = db.query(Ejemplar).filter(Ejemplar.id.in_(data.ejemplar_ids)).all()
-    if len(ejemplares) != len(data.ejemplar_ids):
+    ejemplares = db.query(Ejemplar).filter(Ejemplar.id.in_(data.ejemplares_ids)).all()
+    if len(ejemplares) != len(set(data.ejemplares_ids)):
         raise HTTPException(status_code=404, detail="Uno o más ejemplares no existen.")
     for ejemplar in ejemplares:
         if ejemplar.estado != 'disponible':
             raise HTTPException(status_code=400, detail=f"El ejemplar {ejemplar.id} no está disponible para préstamo.")
-        
+
+    # Sin biblioteca indicada, la principal (la activa más antigua)
+    biblioteca_id = data.biblioteca_id or db.query(Biblioteca.id).filter(
+        Biblioteca.activo == True
+    ).order_by(Biblioteca.id).limit(1).scalar()
+    if biblioteca_id is None:
+        raise HTTPException(status_code=400, detail="No hay una biblioteca activa para registrar el préstamo.")
+
+    tipos_documento = dict(db.query(Documento.id, Documento.tipo).filter(
+        Documento.id.in_({ejemplar.documento_id for ejemplar in ejemplares})
+    ).all())
+
+    ahora = datetime.now()
     prestamo = Prestamo(
         tipo_prestamo=data.tipo_prestamo,
         usuario_id=data.usuario_id,
         bibliotecario_id=data.bibliotecario_id,
-        fecha_prestamo=datetime.now(),
-        hora_prestamo=datetime.now().time(),
+        biblioteca_id=biblioteca_id,
+        fecha_prestamo=ahora,
+        hora_prestamo=ahora.time(),
         estado="activo"
     )
     db.add(prestamo)
-    db.commit()
-    db.refresh(prestamo)
 
     for ejemplar in ejemplares:
-        detalle = DetallePrestamo(
-            prestamo_id = prestamo.id,
-            ejemplar_id = ejemplar.id
-        )
-        db.add(detalle)
+        prestamo.detalles.append(DetallePrestamo(ejemplar_id=ejemplar.id))
         ejemplar.estado = 'prestado'
 
-        fecha_estimada = calcular_fecha_devolucion(data.tipo_prestamo, ejemplar.tipo_documento)
+        fecha_estimada = calcular_fecha_devolucion(data.tipo_prestamo, tipos_documento[ejemplar.documento_id], ahora)
         prestamo.fecha_devolucion_estimada = fecha_estimada
         prestamo.hora_devolucion_estimada = fecha_estimada.time()
     
     db.commit()
     db.refresh(prestamo)
 
+    for ejemplar in ejemplares:
+        pronostico.registrar_salida(ejemplar.documento_id, prestamo.fecha_devolucion_estimada)
+
     return prestamo
 
 @router.get("/activos", response_model=PrestamoResponse)
@@ -149,6 +163,8 @@ def marcar_notificado(prestamo_id: int, db: Session = Depends(get_db)):
 
     '''
     Marca un préstamo vencido como notificado.
+    Para avisar a todos los atrasados usar la tarea "recordatorios_vencidos",
+    que envía un email por usuario y marca sus préstamos en bloque.
     '''
 
     prestamo = db.query(Prestamo).filter(Prestamo.id == prestamo_id).first()
@@ -170,18 +186,10 @@ def verificacion_actualizacion_vencimientos(db: Session = Depends(get_db)):
     Verifica y actualiza el estado de los préstamos vencidos a "vencido".
     '''
 
-    hoy = datetime.now()
-    vencidos = db.query(Prestamo).filter(
-        Prestamo.estado == "activo",
-        Prestamo.fecha_devolucion_estimada < hoy
-    ).all()
-
-    for prestamo in vencidos:
-        prestamo.estado = "vencido"
-    
+    actualizados = marcar_prestamos_vencidos(db)
     db.commit()
 
-    return {"mensaje": f"Se actualizaron {len(vencidos)} préstamos a vencido."}
+    return {"mensaje": f"Se actualizaron {actualizados} préstamos a vencido."}
 
 @router.get("/usuarios/{usuario_id}/historial", response_model=List[PrestamoResponse])
 def historial_prestamos_usuario(
@@ -232,6 +240,6 @@ def estadisticas_prestamos(db: Session = Depends(get_db)):
         total_activos=total_activos,
         total_vencidos=total_vencidos,
         total_devueltos=total_devueltos,
-        total_sala=total_sala,
+        total_salas=total_sala,
         total_domicilio=total_domicilio
     )
\ No newline at end of file
@@ -1,18 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 from typing import Optional, List
 from datetime import date, datetime
 from app.database import get_db
 from app.models.reserva import Reserva
 from app.models.usuario import Usuario
 from app.models.documento import Documento
+from app.models.ejemplar import Ejemplar
 from app.schemas.reserva_schema import (
     ReservaCreate, 
     ReservaResponse, 
     ReservaCancelar,
-    ReservaConDocumento
+    ReservaConDocumento,
+    ReservaPrioridad
 )
 from app.utils.auth import get_current_user, require_role
+from app.services.cola_reservas import cola_reservas, liberar_ejemplar, quitar_al_confirmar
+from app.services.pronostico_disponibilidad import pronostico
+from app.utils.dates import calcular_fecha_limite_retiro
+from app.utils.serializacion import respuesta_json
 
 router = APIRouter(prefix="/reservas", tags=["Reservas"])
 
@@ -21,7 +29,7 @@ router = APIRouter(prefix="/reservas", tags=["Reservas"])
 # ============================================
 
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
-async def crear_reserva(
+def crear_reserva(
     reserva_data: ReservaCreate,
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(get_current_user)
@@ -29,6 +37,8 @@ async def crear_reserva(
     """
     Crear una nueva reserva de documento.
     La fecha de reserva debe ser al menos para mañana.
+    La reserva entra a la cola de espera del documento; al devolverse un
+    ejemplar se asigna a la primera reserva de la cola cuya fecha ya llegó.
     """
     # Verificar que el documento existe
     documento = db.query(Documento).filter(
@@ -47,34 +57,37 @@ async def crear_reserva(
             detail="El documento no está disponible para reservas"
         )
     
-    # Verificar que el usuario no tenga ya una reserva activa del mismo documento
-    reserva_existente = db.query(Reserva).filter(
-        Reserva.usuario_id == current_user.id,
-        Reserva.documento_id == reserva_data.documento_id,
-        Reserva.estado.in_(["pendiente", "activa"])
-    ).first()
-    
-    if reserva_existente:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Ya tienes una reserva activa de este documento"
-        )
-    
-    # TODO: Verificar disponibilidad estimada para esa fecha (consulta ROL 3)
-    # Por ahora asumimos que está disponible
+    # Disponibilidad estimada para esa fecha: se informa, no bloquea
+    # (si no hay ejemplares libres la reserva espera en la cola)
+    disponibles_estimados = pronostico.disponibles(db, reserva_data.documento_id, reserva_data.fecha_reserva)
     
-    # Crear reserva
+    # Crear reserva (con prioridad normal: el personal la cambia con PATCH /prioridad)
     nueva_reserva = Reserva(
         usuario_id=current_user.id,
         documento_id=reserva_data.documento_id,
         fecha_reserva=reserva_data.fecha_reserva,
-        estado="pendiente"
+        estado="pendiente",
+        prioridad=0
     )
     
     db.add(nueva_reserva)
-    db.commit()
+    
+    # El índice único parcial impide dos reservas vigentes del mismo documento,
+    # también con solicitudes simultáneas
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Ya tienes una reserva activa de este documento"
+        )
+    
     db.refresh(nueva_reserva)
     
+    cola_reservas.agregar(nueva_reserva)
+    pronostico.registrar_reserva(nueva_reserva.documento_id, nueva_reserva.fecha_reserva)
+    
     return {
         "success": True,
         "message": "Reserva creada exitosamente",
@@ -84,7 +97,11 @@ async def crear_reserva(
             "documento_titulo": documento.titulo,
             "fecha_reserva": nueva_reserva.fecha_reserva,
             "estado": nueva_reserva.estado,
-            "fecha_creacion": nueva_reserva.fecha_creacion
+            "prioridad": nueva_reserva.prioridad,
+            "fecha_creacion": nueva_reserva.fecha_creacion,
+            "posicion_cola": cola_reservas.posicion(db, nueva_reserva),
+            "en_espera": cola_reservas.largo(db, nueva_reserva.documento_id),
+            "disponibles_estimados": disponibles_estimados
         }
     }
 
@@ -182,6 +199,13 @@ async def cancelar_reserva(
             detail=f"No se puede cancelar una reserva en estado '{reserva.estado}'"
         )
     
+    # Sacar de la cola o soltar el ejemplar que tenía retenido
+    estaba_pendiente = reserva.estado == "pendiente"
+    if estaba_pendiente:
+        quitar_al_confirmar(db, reserva.documento_id, reserva.id)
+    else:
+        liberar_ejemplar(db, reserva)
+    
     # Cancelar
     reserva.estado = "cancelada"
     if cancelacion and cancelacion.motivo:
@@ -193,6 +217,11 @@ async def cancelar_reserva(
     
     db.commit()
     
+    if estaba_pendiente:
+        pronostico.quitar_reserva(reserva.documento_id, reserva.fecha_reserva)
+    else:
+        pronostico.invalidar(reserva.documento_id)
+    
     return {
         "success": True,
         "message": "Reserva cancelada exitosamente",
@@ -204,7 +233,7 @@ async def cancelar_reserva(
     }
 
 @router.get("/", response_model=List[dict])
-async def listar_todas_reservas(
+def listar_todas_reservas(
     estado: Optional[str] = Query(None),
     fecha_desde: Optional[date] = Query(None),
     fecha_hasta: Optional[date] = Query(None),
@@ -217,37 +246,48 @@ async def listar_todas_reservas(
     Listar todas las reservas del sistema (solo admin/bibliotecario).
     Con filtros de estado y fecha.
     """
-    query = db.query(Reserva)
+    # Una sola consulta con usuario y documento (antes eran 2 consultas por reserva)
+    query = select(
+        Reserva.id,
+        Usuario.rut.label("usuario_rut"),
+        Usuario.nombres,
+        Usuario.apellidos,
+        Reserva.documento_id,
+        Documento.titulo.label("documento_titulo"),
+        Reserva.fecha_reserva,
+        Reserva.estado,
+        Reserva.fecha_creacion
+    ).outerjoin(
+        Usuario, Usuario.id == Reserva.usuario_id
+    ).outerjoin(
+        Documento, Documento.id == Reserva.documento_id
+    )
     
     if estado:
-        query = query.filter(Reserva.estado == estado)
+        query = query.where(Reserva.estado == estado)
     
     if fecha_desde:
-        query = query.filter(Reserva.fecha_reserva >= fecha_desde)
+        query = query.where(Reserva.fecha_reserva >= fecha_desde)
     
     if fecha_hasta:
-        query = query.filter(Reserva.fecha_reserva <= fecha_hasta)
+        query = query.where(Reserva.fecha_reserva <= fecha_hasta)
     
-    reservas = query.order_by(Reserva.fecha_reserva.asc()).offset(skip).limit(limit).all()
+    query = query.order_by(Reserva.fecha_reserva.asc()).offset(skip).limit(limit)
     
-    # Enriquecer con datos
     resultado = []
-    for reserva in reservas:
-        usuario = db.query(Usuario).filter(Usuario.id == reserva.usuario_id).first()
-        documento = db.query(Documento).filter(Documento.id == reserva.documento_id).first()
-        
+    for r in db.execute(query):
         resultado.append({
-            "id": reserva.id,
-            "usuario_rut": usuario.rut if usuario else "N/A",
-            "usuario_nombre": f"{usuario.nombres} {usuario.apellidos}" if usuario else "N/A",
-            "documento_id": reserva.documento_id,
-            "documento_titulo": documento.titulo if documento else "N/A",
-            "fecha_reserva": reserva.fecha_reserva,
-            "estado": reserva.estado,
-            "fecha_creacion": reserva.fecha_creacion
+            "id": r.id,
+            "usuario_rut": r.usuario_rut or "N/A",
+            "usuario_nombre": f"{r.nombres} {r.apellidos}" if r.usuario_rut else "N/A",
+            "documento_id": r.documento_id,
+            "documento_titulo": r.documento_titulo or "N/A",
+            "fecha_reserva": r.fecha_reserva,
+            "estado": r.estado,
+            "fecha_creacion": r.fecha_creacion
         })
     
-    return resultado
+    return respuesta_json(resultado)
 
 @router.patch("/{reserva_id}/completar", response_model=dict)
 async def marcar_reserva_completada(
@@ -273,11 +313,19 @@ async def marcar_reserva_completada(
             detail=f"Solo se pueden completar reservas activas (estado actual: {reserva.estado})"
         )
     
+    # El ejemplar retenido queda disponible para registrar el préstamo
+    if reserva.ejemplar_id:
+        ejemplar = db.get(Ejemplar, reserva.ejemplar_id)
+        if ejemplar and ejemplar.estado == "reservado":
+            ejemplar.estado = "disponible"
+    
     reserva.estado = "completada"
     reserva.fecha_actualizacion = datetime.utcnow()
     
     db.commit()
     
+    pronostico.invalidar(reserva.documento_id)
+    
     return {
         "success": True,
         "message": "Reserva marcada como completada",
@@ -295,7 +343,8 @@ async def activar_reserva(
 ):
     """
     Activar una reserva pendiente.
-    Se usa cuando llega la fecha de la reserva.
+    Se usa cuando llega la fecha de la reserva; el proceso diario
+    (tarea 'activacion_reservas') hace lo mismo en bloque.
     """
     reserva = db.query(Reserva).filter(Reserva.id == reserva_id).first()
     
@@ -312,7 +361,9 @@ async def activar_reserva(
         )
     
     reserva.estado = "activa"
+    reserva.fecha_limite_retiro = calcular_fecha_limite_retiro(date.today())
     reserva.fecha_actualizacion = datetime.utcnow()
+    quitar_al_confirmar(db, reserva.documento_id, reserva.id)
     
     db.commit()
     
@@ -325,8 +376,120 @@ async def activar_reserva(
         }
     }
 
+@router.patch("/{reserva_id}/prioridad", response_model=dict)
+def cambiar_prioridad_reserva(
+    reserva_id: int,
+    datos: ReservaPrioridad,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role(["admin", "bibliotecario"]))
+):
+    """
+    Cambiar la prioridad de una reserva en espera (solo admin/bibliotecario).
+    Mayor prioridad = antes en la cola del documento; a igual prioridad
+    se mantiene el orden de llegada.
+    """
+    reserva = db.query(Reserva).filter(Reserva.id == reserva_id).first()
+    
+    if not reserva:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reserva no encontrada"
+        )
+    
+    if reserva.estado != "pendiente":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Solo se puede cambiar la prioridad de reservas en espera (estado actual: {reserva.estado})"
+        )
+    
+    reserva.prioridad = datos.prioridad
+    reserva.fecha_actualizacion = datetime.utcnow()
+    
+    db.commit()
+    
+    cola_reservas.reubicar(reserva)
+    
+    return {
+        "success": True,
+        "message": "Prioridad de la reserva actualizada",
+        "data": {
+            "id": reserva.id,
+            "prioridad": reserva.prioridad,
+            "posicion_cola": cola_reservas.posicion(db, reserva),
+            "en_espera": cola_reservas.largo(db, reserva.documento_id)
+        }
+    }
+
+@router.get("/documento/{documento_id}/cola", response_model=dict)
+def ver_cola_documento(
+    documento_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Cantidad de reservas esperando un documento.
+    """
+    return {
+        "documento_id": documento_id,
+        "en_espera": cola_reservas.largo(db, documento_id)
+    }
+
+@router.get("/documento/{documento_id}/pronostico", response_model=dict)
+def pronosticar_disponibilidad(
+    documento_id: int,
+    fecha: date = Query(..., description="Fecha a consultar (formato: YYYY-MM-DD)"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Cantidad estimada de ejemplares libres de un documento en una fecha,
+    según las devoluciones esperadas y las reservas ya tomadas.
+    """
+    return {
+        "documento_id": documento_id,
+        "fecha": fecha,
+        "disponibles_estimados": pronostico.disponibles(db, documento_id, fecha)
+    }
+
+@router.get("/{reserva_id}/posicion", response_model=dict)
+def ver_posicion_reserva(
+    reserva_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(get_current_user)
+):
+    """
+    Posición de una reserva pendiente en la cola de su documento.
+    Solo el usuario dueño o admin/bibliotecario pueden consultarla.
+    """
+    reserva = db.query(Reserva).filter(Reserva.id == reserva_id).first()
+    
+    if not reserva:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reserva no encontrada"
+        )
+    
+    if reserva.usuario_id != current_user.id and current_user.rol not in ["admin", "bibliotecario"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="No tienes permiso para ver esta reserva"
+        )
+    
+    if reserva.estado != "pendiente":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"La reserva no está en espera (estado actual: {reserva.estado})"
+        )
+    
+    return {
+        "id": reserva.id,
+        "documento_id": reserva.documento_id,
+        "posicion": cola_reservas.posicion(db, reserva),
+        "en_espera": cola_reservas.largo(db, reserva.documento_id)
+    }
+
 @router.get("/estadisticas", response_model=dict)
-async def obtener_estadisticas_reservas(
+def obtener_estadisticas_reservas(
     db: Session = Depends(get_db),
     current_user: Usuario = Depends(require_role(["admin", "bibliotecario"]))
 ):
@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, status, Query, UploadFile
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from datetime import datetime
 from app.database import get_db
 from app.models.usuario import Usuario
 from app.models.token_validacion import TokenValidacion
+from app.models.importacion_usuarios import ImportacionUsuarios
 from app.schemas.usuario import UsuarioCreate, UsuarioResponse, UsuarioUpdate
 from app.utils.auth import get_current_user, require_role
 from app.utils.validations import validar_rut, formatear_rut
+from app.utils.serializacion import filas_a_dicts, respuesta_json
 from app.services.email_service import email_service
+from app.services.cache_usuarios import invalidar_usuario
+from app.services.hashing_service import hashing_service
+from app.services.importacion_usuarios import encolar_importacion, ejecutar_importacion, resumen_importacion
+from app.services.bandeja_salida import encolar_correo
 
 router = APIRouter(prefix="/usuarios", tags=["Usuarios"])
 
@@ -17,7 +24,7 @@ router = APIRouter(prefix="/usuarios", tags=["Usuarios"])
 # ============================================
 
 @router.post("/registrar", response_model=dict, status_code=status.HTTP_201_CREATED)
-async def registrar_usuario_completo(
+def registrar_usuario_completo(
     usuario_data: UsuarioCreate,
     db: Session = Depends(get_db)
 ):
@@ -57,28 +64,30 @@ async def registrar_usuario_completo(
         rol=usuario_data.rol or "usuario",
         activo=False  # Pendiente de activación
     )
-    nuevo_usuario.set_password(usuario_data.password)
+    
+    # Liberar la conexión mientras se hashea (no hay nada pendiente en la sesión)
+    db.rollback()
+    nuevo_usuario.password_hash = hashing_service.hash(usuario_data.password)
     
     db.add(nuevo_usuario)
-    db.commit()
-    db.refresh(nuevo_usuario)
+    db.flush()
     
     # Generar token de validación
     token = TokenValidacion.crear_token(nuevo_usuario.id)
     db.add(token)
-    db.commit()
     
-    # Enviar email de validación
-    email_enviado = email_service.send_validation_email(
-        to=nuevo_usuario.email,
-        nombre=nuevo_usuario.nombres,
-        token=token.token
+    # El email sale por la bandeja de salida, en la misma transacción
+    encolar_correo(
+        db, nuevo_usuario.id, "validacion", nuevo_usuario.email,
+        *email_service.plantilla_validacion(nuevo_usuario.nombres, token.token)
     )
+    db.commit()
+    db.refresh(nuevo_usuario)
     
     return {
         "success": True,
         "message": "Usuario registrado exitosamente. Revisa tu correo para activar la cuenta.",
-        "email_enviado": email_enviado,
+        "email_en_cola": True,
         "data": {
             "id": nuevo_usuario.id,
             "rut": nuevo_usuario.rut,
@@ -90,6 +99,64 @@ async def registrar_usuario_completo(
         }
     }
 
+@router.post("/importar", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
+def importar_usuarios(
+    background_tasks: BackgroundTasks,
+    archivo: UploadFile = File(..., description="CSV o NDJSON con rut, nombres, apellidos, email, password y rol opcional"),
+    formato: Optional[str] = Query(None, description="csv | ndjson (por defecto según la extensión)"),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """
+    Importación masiva de usuarios (solo admin), p. ej. la matrícula de un año.
+    Revisa el formato del archivo, lo deja en cola y responde de inmediato con
+    el id de la importación; el avance y los errores por fila se consultan en
+    GET /usuarios/importaciones/{id}.
+    Crea las cuentas válidas en estado pendiente; las filas con error no
+    impiden crear las demás. Los emails de activación quedan en la bandeja de
+    salida. Una sola importación en curso a la vez (409).
+    """
+    if formato is None:
+        nombre = (archivo.filename or "").lower()
+        formato = "ndjson" if nombre.endswith((".ndjson", ".jsonl")) else "csv"
+    
+    importacion = encolar_importacion(db, archivo.file.read(), formato, current_user.id)
+    background_tasks.add_task(ejecutar_importacion, importacion.id)
+    
+    return {
+        "success": True,
+        "message": f"Importación encolada ({importacion.total_filas} filas)",
+        "data": {
+            "id": importacion.id,
+            "estado": importacion.estado,
+            "total_filas": importacion.total_filas
+        }
+    }
+
+@router.get("/importaciones/{importacion_id}", response_model=dict)
+def ver_importacion(
+    importacion_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """
+    Estado de una importación masiva (solo admin): pendiente, procesando,
+    completada o fallida, contraseñas hasheadas hasta ahora y, al terminar,
+    usuarios creados y errores por fila.
+    """
+    importacion = db.query(ImportacionUsuarios).filter(ImportacionUsuarios.id == importacion_id).first()
+    
+    if not importacion:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Importación no encontrada"
+        )
+    
+    return {
+        "success": True,
+        "data": resumen_importacion(importacion)
+    }
+
 @router.get("/", response_model=List[UsuarioResponse])
 async def listar_usuarios(
     activo: Optional[bool] = Query(None, description="Filtrar por estado activo/inactivo"),
@@ -103,35 +170,33 @@ async def listar_usuarios(
     Listar todos los usuarios (solo admin).
     Permite filtrar por estado y rol.
     """
-    query = db.query(Usuario)
+    query = select(
+        Usuario.id,
+        Usuario.rut,
+        Usuario.nombres,
+        Usuario.apellidos,
+        Usuario.email,
+        Usuario.rol,
+        Usuario.activo,
+        Usuario.foto_url,
+        Usuario.fecha_sancion_hasta,
+        Usuario.created_at
+    )
     
     if activo is not None:
-        query = query.filter(Usuario.activo == activo)
+        query = query.where(Usuario.activo == activo)
     
     if rol:
-        query = query.filter(Usuario.rol == rol)
+        query = query.where(Usuario.rol == rol)
     
-    usuarios = query.offset(skip).limit(limit).all()
+    usuarios = filas_a_dicts(db.execute(query.offset(skip).limit(limit)))
     
-    # Agregar campo sancionado a la respuesta
-    resultado = []
+    # Agregar campo sancionado a la respuesta (misma regla que Usuario.esta_sancionado)
+    ahora = datetime.utcnow()
     for u in usuarios:
-        usuario_dict = {
-            "id": u.id,
-            "rut": u.rut,
-            "nombres": u.nombres,
-            "apellidos": u.apellidos,
-            "email": u.email,
-            "rol": u.rol,
-            "activo": u.activo,
-            "foto_url": u.foto_url,
-            "sancionado": u.esta_sancionado(),
-            "fecha_sancion_hasta": u.fecha_sancion_hasta,
-            "created_at": u.created_at
-        }
-        resultado.append(UsuarioResponse(**usuario_dict))
+        u["sancionado"] = u["fecha_sancion_hasta"] is not None and ahora < u["fecha_sancion_hasta"]
     
-    return resultado
+    return respuesta_json(usuarios)
 
 @router.get("/{usuario_id}", response_model=dict)
 async def ver_detalle_usuario(
@@ -224,6 +289,7 @@ async def actualizar_usuario(
         if hasattr(usuario, field):
             setattr(usuario, field, value)
     
+    invalidar_usuario(db, usuario.id)
     db.commit()
     db.refresh(usuario)
     
@@ -260,6 +326,7 @@ async def cambiar_estado_usuario(
         )
     
     usuario.activo = activo
+    invalidar_usuario(db, usuario.id)
     db.commit()
     
     return {
@@ -320,6 +387,7 @@ async def activar_cuenta(
     
     usuario.activo = True
     token_obj.usado = True
+    invalidar_usuario(db, usuario.id)
     
     db.commit()
     
@@ -368,19 +436,17 @@ async def reenviar_email_activacion(
     # Generar nuevo token
     nuevo_token = TokenValidacion.crear_token(usuario_id)
     db.add(nuevo_token)
-    db.commit()
     
-    # Enviar email
-    email_enviado = email_service.send_validation_email(
-        to=usuario.email,
-        nombre=usuario.nombres,
-        token=nuevo_token.token
+    encolar_correo(
+        db, usuario.id, "validacion", usuario.email,
+        *email_service.plantilla_validacion(usuario.nombres, nuevo_token.token)
     )
+    db.commit()
     
     return {
         "success": True,
         "message": "Email de activación reenviado",
-        "email_enviado": email_enviado
+        "email_en_cola": True
     }
 
 # ============================================
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from datetime import timedelta
+from typing import Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Sistema de Autenticación"
@@ -18,6 +19,94 @@ class Settings(BaseSettings):
         "http://localhost:4200"
     ]
     
+    # Caché código → (id, documento_id) de ejemplares
+    CACHE_CODIGOS_MAX: int = 50000
+    CACHE_CODIGOS_TTL: Optional[float] = None  # segundos; None = sin expiración
+    
+    # Caché de usuarios autenticados (id → rol, activo, sanción)
+    CACHE_USUARIOS_MAX: int = 10000
+    CACHE_USUARIOS_TTL: float = 60
+    # Con varios workers: avisar las invalidaciones a los demás a través de la BD
+    CACHE_USUARIOS_INVALIDACION_BD: bool = False
+    CACHE_USUARIOS_SONDEO_SEGUNDOS: float = 5
+    
+    # Pool de hashing de contraseñas (bcrypt)
+    HASH_TRABAJADORES: int = 4
+    HASH_MODO: str = "hilos"  # hilos | procesos
+    HASH_MAX_EN_COLA: int = 100  # sobre esto se responde 503
+    HASH_TRABAJADORES_MASIVO: int = 2  # procesos del pool aparte de las importaciones
+    
+    # Tareas en segundo plano (activar en un solo worker si hay varios)
+    PLANIFICADOR_ACTIVO: bool = True
+    
+    # Reubicación: minutos entre la devolución y que el ejemplar quede disponible
+    REUBICACION_MINUTOS: int = 30
+    REUBICACION_INTERVALO_SEGUNDOS: int = 60
+    REUBICACION_LOTE: int = 500
+    
+    # Sanciones por atraso: hora del proceso nocturno
+    SANCIONES_HORA: str = "02:00"
+    
+    # Cola de espera de reservas: segundos antes de recargar el espejo en memoria
+    COLA_RESERVAS_TTL: float = 60
+    
+    # Pronóstico de disponibilidad: segundos antes de reconstruir el índice de un documento
+    # (también el atraso máximo con que un worker ve los cambios de los demás)
+    PRONOSTICO_TTL: float = 300
+    
+    # Recordatorios de préstamos vencidos: hora de la campaña y horas mínimas entre avisos a un usuario
+    RECORDATORIOS_VENCIDOS_HORA: str = "09:00"
+    RECORDATORIOS_VENCIDOS_INTERVALO_HORAS: int = 24
+    
+    # Recordatorios previos al vencimiento: frecuencia, horas de anticipación y filas por tanda de lectura
+    RECORDATORIOS_PROXIMOS_INTERVALO_SEGUNDOS: int = 3600
+    RECORDATORIOS_PROXIMOS_HORAS: int = 48
+    RECORDATORIOS_PROXIMOS_TANDA: int = 1000
+    
+    # Reservas: hora de la activación diaria y días para retirar antes de expirar
+    RESERVAS_HORA: str = "00:05"
+    RESERVA_DIAS_GRACIA: int = 3
+    
+    # Logs JSON a stdout: nivel general y por módulo, p. ej. {"app.services.bandeja_salida": "DEBUG"}
+    LOG_NIVEL: str = "INFO"
+    LOG_NIVELES: dict = {}
+    
+    # Métricas Prometheus en GET /metrics (latencia, estados y consultas SQL por ruta)
+    METRICAS_ACTIVAS: bool = True
+    # Bearer que debe enviar Prometheus; sin token, /metrics solo responde a localhost
+    METRICAS_TOKEN: Optional[str] = None
+    
+    # Perfilado de solicitudes: header X-Perfilar de un admin, o 1 de cada N en segundo plano (0 = apagado)
+    PERFILADO_DIRECTORIO: str = "perfiles"
+    PERFILADO_INTERVALO_MS: float = 5
+    PERFILADO_MUESTREO_CADA: int = 0
+    PERFILADO_MAX_ARCHIVOS: int = 200  # por tipo (solicitados / muestreo), se borran los más antiguos
+    
+    # Compresión de respuestas (brotli si está instalado brotli-asgi, si no gzip)
+    COMPRESION_MINIMO_BYTES: int = 1000
+    COMPRESION_NIVEL_GZIP: int = 6
+    COMPRESION_NIVEL_BROTLI: int = 4
+    
+    # Emails enviados por conexión SMTP en los procesos masivos
+    CORREOS_LOTE: int = 200
+    
+    # Pool de conexiones SMTP persistentes usado por el despachador de correos
+    SMTP_POOL_ACTIVO: bool = True
+    SMTP_CONEXIONES: int = 4
+    
+    # Bandeja de salida: frecuencia del despachador y reintentos
+    CORREOS_DESPACHO_SEGUNDOS: int = 10
+    CORREOS_MAX_INTENTOS: int = 6
+    CORREOS_ESPERA_BASE_SEGUNDOS: int = 60  # se duplica en cada fallo
+    CORREOS_ESPERA_MAX_SEGUNDOS: int = 6 * 3600
+    CORREOS_BLOQUEO_SEGUNDOS: int = 300  # correos tomados por un despachador que no terminó
+    
+    # Importación masiva de usuarios: filas por INSERT y máximo por archivo
+    IMPORTACION_LOTE: int = 1000
+    IMPORTACION_MAX_FILAS: int = 20000
+    IMPORTACION_SONDEO_SEGUNDOS: int = 30  # retomar las que quedaron pendientes
+    IMPORTACION_ABANDONO_MINUTOS: int = 10  # procesando sin avances: su worker se detuvo
+    
     class Config:
         env_file = ".env"
 
@@ -1,19 +1,49 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
 from app.config import settings
-from app.database import engine, Base
+from app.database import engine, Base, SessionLocal, crear_indices_faltantes
+from app.migraciones import aplicar_migraciones
 from app.routes import auth, admin, documentos, catalogo
-from app.api import ejemplares, devoluciones, reservas, prestamos
+from app.api import ejemplares, devoluciones, reservas, prestamos, usuarios
+from app.services.planificador import planificador, planificador_local
+from app.services.transiciones_service import procesar_transiciones_vencidas
+from app.services.sanciones_service import procesar_sanciones_atrasos
+from app.services.reservas_service import procesar_reservas_diarias
+from app.services.bandeja_salida import despachar_correos
+from app.services.recordatorios_service import enviar_recordatorios_proximos, enviar_recordatorios_vencidos
+from app.services.cache_usuarios import procesar_invalidaciones
+from app.services.importacion_usuarios import procesar_importaciones
+from app.services.hashing_service import hashing_service
+from app.services.smtp_pool import smtp_pool
+from app.services.versiones_recurso import inicializar_versiones
+from app.services.metricas import MiddlewareMetricas, autorizar_metricas, exportar_metricas
+from app.services.perfilado import MiddlewarePerfilado
+from app.utils.logs import MiddlewareIdSolicitud, configurar_logs
+from app.utils.etag import NoModificado, respuesta_no_modificado
+from app.utils.serializacion import RespuestaJSON
 
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
 
-# Crear tablas
+
+# Logs JSON escritos desde un hilo aparte (antes de todo lo que pueda registrar)
+configurar_logs(settings.LOG_NIVEL, settings.LOG_NIVELES)
+
+# Crear tablas, agregar columnas nuevas a las existentes y después los índices
 Base.metadata.create_all(bind=engine)
+aplicar_migraciones()
+crear_indices_faltantes()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=RespuestaJSON
 )
 
 # CORS
@@ -25,6 +55,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compresión de respuestas sobre COMPRESION_MINIMO_BYTES
+if BrotliMiddleware:
+    app.add_middleware(
+        BrotliMiddleware,
+        quality=settings.COMPRESION_NIVEL_BROTLI,
+        minimum_size=settings.COMPRESION_MINIMO_BYTES,
+        gzip_fallback=True
+    )
+else:
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=settings.COMPRESION_MINIMO_BYTES,
+        compresslevel=settings.COMPRESION_NIVEL_GZIP
+    )
+
+# Perfilado bajo demanda (X-Perfilar de un admin) y muestreo de 1 de cada N
+app.add_middleware(MiddlewarePerfilado)
+
+# Métricas por ruta (el último middleware agregado es el más externo: mide todo)
+if settings.METRICAS_ACTIVAS:
+    app.add_middleware(MiddlewareMetricas)
+
+# request_id para los logs (el más externo: cubre también métricas y perfilado)
+app.add_middleware(MiddlewareIdSolicitud)
+
+# GET condicional: 304 cuando el ETag del cliente sigue vigente
+app.add_exception_handler(NoModificado, respuesta_no_modificado)
+
 # Registrar routers
 app.include_router(auth.router, prefix=settings.API_V1_STR)
 app.include_router(admin.router, prefix=settings.API_V1_STR)
@@ -32,6 +90,7 @@ app.include_router(ejemplares.router, prefix=settings.API_V1_STR, tags=["Ejempla
 app.include_router(devoluciones.router, prefix=settings.API_V1_STR)
 app.include_router(reservas.router, prefix=settings.API_V1_STR)
 app.include_router(prestamos.router, prefix=settings.API_V1_STR)
+app.include_router(usuarios.router, prefix=settings.API_V1_STR)
 
 
 #Routes ROL 2
@@ -39,10 +98,81 @@ app.include_router(documentos.router, prefix="/documentos", tags=["Documentos"])
 app.include_router(catalogo.router, prefix="/catalogo", tags=["Catálogo"])
 app.include_router(catalogo.router_categorias, prefix="/categorias", tags=["Categorías"])
 
+# Tareas en segundo plano
+planificador.registrar(
+    "reubicacion_devueltos",
+    procesar_transiciones_vencidas,
+    intervalo_segundos=settings.REUBICACION_INTERVALO_SEGUNDOS
+)
+planificador.registrar(
+    "sanciones_atrasos",
+    procesar_sanciones_atrasos,
+    hora=settings.SANCIONES_HORA
+)
+planificador.registrar(
+    "activacion_reservas",
+    procesar_reservas_diarias,
+    hora=settings.RESERVAS_HORA
+)
+planificador.registrar(
+    "recordatorios_vencidos",
+    enviar_recordatorios_vencidos,
+    hora=settings.RECORDATORIOS_VENCIDOS_HORA
+)
+planificador.registrar(
+    "recordatorios_proximos",
+    enviar_recordatorios_proximos,
+    intervalo_segundos=settings.RECORDATORIOS_PROXIMOS_INTERVALO_SEGUNDOS
+)
+planificador.registrar(
+    "despacho_correos",
+    despachar_correos,
+    intervalo_segundos=settings.CORREOS_DESPACHO_SEGUNDOS
+)
+planificador.registrar(
+    "importaciones_usuarios",
+    procesar_importaciones,
+    intervalo_segundos=settings.IMPORTACION_SONDEO_SEGUNDOS
+)
+
+# Tareas de cada worker
+if settings.CACHE_USUARIOS_INVALIDACION_BD:
+    planificador_local.registrar(
+        "invalidaciones_usuarios",
+        procesar_invalidaciones,
+        intervalo_segundos=settings.CACHE_USUARIOS_SONDEO_SEGUNDOS
+    )
+
+@app.on_event("startup")
+def crear_versiones_recurso():
+    db = SessionLocal()
+    try:
+        inicializar_versiones(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def iniciar_planificador():
+    if settings.PLANIFICADOR_ACTIVO:
+        planificador.iniciar()
+    planificador_local.iniciar()
+
+@app.on_event("shutdown")
+async def detener_planificador():
+    await planificador.detener()
+    await planificador_local.detener()
+    hashing_service.cerrar()
+    smtp_pool.cerrar()
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
+if settings.METRICAS_ACTIVAS:
+    @app.get("/metrics", include_in_schema=False, dependencies=[Depends(autorizar_metricas)])
+    def metricas():
+        return PlainTextResponse(exportar_metricas(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def root():
     return {"message": "API Sistema de Autenticación", "version": settings.VERSION}
@@ -0,0 +1,125 @@
+import logging
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import Base, engine
+from app.utils.dates import calcular_fecha_limite_retiro
+
+logger = logging.getLogger(__name__)
+
+# --- MIGRACIONES DE ESQUEMA ---
+# create_all crea las tablas que faltan pero no toca las existentes, así que
+# una columna agregada a un modelo no llega sola a una base ya creada. Cada
+# migración agrega una columna con ALTER TABLE (tipo, NOT NULL y clave foránea
+# se toman del modelo) y rellena las filas que ya existían, en la misma
+# transacción. Solo corre si la columna falta: en una base nueva create_all ya
+# la creó y no hay filas antiguas que rellenar.
+#
+# Al arrancar: create_all, aplicar_migraciones y después
+# crear_indices_faltantes (hay índices sobre las columnas nuevas).
+
+
+@dataclass
+class Migracion:
+    tabla: str
+    columna: str
+    predeterminado: Optional[str] = None  # DEFAULT de la columna (obligatorio si es NOT NULL)
+    relleno: List[str] = field(default_factory=list)  # SQL para las filas existentes
+    parametros: Optional[Callable[[], Dict]] = None  # Valores del relleno, calculados al aplicar
+
+
+# Fecha de devolución de un detalle según su préstamo (la última registrada)
+_FECHA_DEVOLUCION_PRESTAMO = (
+    "(SELECT COALESCE(p.fecha_devolucion_real, p.fecha_prestamo) FROM prestamos p "
+    "WHERE p.id = detalles_prestamo.prestamo_id)"
+)
+
+MIGRACIONES: List[Migracion] = [
+    Migracion(
+        "detalles_prestamo", "fecha_devolucion",
+        relleno=[
+            # Préstamos cerrados: todos sus ejemplares volvieron
+            f"UPDATE detalles_prestamo SET fecha_devolucion = {_FECHA_DEVOLUCION_PRESTAMO} "
+            "WHERE fecha_devolucion IS NULL "
+            "AND prestamo_id IN (SELECT id FROM prestamos WHERE estado = 'devuelto')",
+            # Préstamos abiertos devueltos en parte: antes un ejemplar se daba por
+            # devuelto si ya no estaba prestado, o si salió después en otro préstamo
+            f"UPDATE detalles_prestamo SET fecha_devolucion = {_FECHA_DEVOLUCION_PRESTAMO} "
+            "WHERE fecha_devolucion IS NULL "
+            "AND prestamo_id IN (SELECT id FROM prestamos WHERE estado IN ('activo', 'vencido')) "
+            "AND (ejemplar_id IN (SELECT id FROM ejemplares WHERE estado <> 'prestado') "
+            "OR EXISTS (SELECT 1 FROM detalles_prestamo posterior "
+            "WHERE posterior.ejemplar_id = detalles_prestamo.ejemplar_id "
+            "AND posterior.prestamo_id > detalles_prestamo.prestamo_id))",
+        ]
+    ),
+    # Sin relleno: los préstamos existentes todavía no recibieron el aviso previo
+    Migracion("prestamos", "recordatorio_enviado_en"),
+    # Sin relleno: antes no se guardaba quién registró el préstamo
+    Migracion("prestamos", "bibliotecario_id"),
+    # Las reservas existentes quedan en la cola con la prioridad normal
+    Migracion("reservas", "prioridad", predeterminado="0"),
+    Migracion("reservas", "ejemplar_id"),
+    Migracion(
+        "reservas", "fecha_limite_retiro",
+        relleno=[
+            # Las activas de antes no tenían plazo y nunca expirarían: el plazo corre desde hoy
+            "UPDATE reservas SET fecha_limite_retiro = :limite "
+            "WHERE estado = 'activa' AND fecha_limite_retiro IS NULL",
+        ],
+        parametros=lambda: {"limite": calcular_fecha_limite_retiro(date.today())}
+    ),
+]
+
+
+def _falta(bind: Engine, migracion: Migracion) -> bool:
+    inspector = inspect(bind)
+    if not inspector.has_table(migracion.tabla):
+        return False
+    return migracion.columna not in {c["name"] for c in inspector.get_columns(migracion.tabla)}
+
+
+def _ddl_columna(migracion: Migracion, bind: Engine) -> str:
+    columna = Base.metadata.tables[migracion.tabla].c[migracion.columna]
+    ddl = f"ALTER TABLE {migracion.tabla} ADD COLUMN {columna.name} {columna.type.compile(dialect=bind.dialect)}"
+    if migracion.predeterminado is not None:
+        ddl += f" DEFAULT {migracion.predeterminado}"
+    if not columna.nullable:
+        ddl += " NOT NULL"
+    for clave in columna.foreign_keys:
+        ddl += f" REFERENCES {clave.column.table.name} ({clave.column.name})"
+    return ddl
+
+
+def aplicar_migraciones(bind: Optional[Engine] = None) -> List[str]:
+    """
+    Agregar a la BD las columnas de MIGRACIONES que falten y rellenar sus
+    filas existentes. Retorna las columnas agregadas ("tabla.columna"). Si
+    una falla (p. ej. otro worker la agregó al mismo tiempo), se registra el
+    error y se sigue con las demás.
+    """
+    import app.models  # noqa: F401 (registra todas las tablas en Base.metadata)
+
+    bind = bind or engine
+    agregadas = []
+    for migracion in MIGRACIONES:
+        if not _falta(bind, migracion):
+            continue
+        nombre = f"{migracion.tabla}.{migracion.columna}"
+        try:
+            with bind.begin() as conexion:
+                conexion.execute(text(_ddl_columna(migracion, bind)))
+                parametros = migracion.parametros() if migracion.parametros else {}
+                for sentencia in migracion.relleno:
+                    conexion.execute(text(sentencia), parametros)
+        except SQLAlchemyError as e:
+            logger.error("No se pudo agregar la columna %s: %s", nombre, e)
+            continue
+        logger.info("Columna %s agregada a la BD", nombre)
+        agregadas.append(nombre)
+    return agregadas
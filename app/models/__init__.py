@@ -7,6 +7,11 @@ from app.models.usuario import Usuario
 from app.models.ejemplar import Ejemplar
 from app.models.historial_ejemplar import HistorialEjemplar
 from app.models.documento import Documento
+from app.models.transicion_programada import TransicionProgramada
+from app.models.evento_invalidacion import EventoInvalidacion
+from app.models.correo_saliente import CorreoSaliente
+from app.models.version_recurso import VersionRecurso
+from app.models.importacion_usuarios import ImportacionUsuarios
 
 # ROL 5
 try:
@@ -18,7 +23,9 @@ except ImportError:
 
 # ROL 4
 try:
+    from app.models.biblioteca import Biblioteca
     from app.models.prestamos import Prestamo
+    from app.models.sancion import Sancion
 except ImportError:
     pass
 
@@ -27,8 +34,15 @@ __all__ = [
     "Ejemplar", 
     "HistorialEjemplar",
     "Reserva",
-    "Documento"
+    "Documento",
     "TokenValidacion",
     "LogNotificacion",
-    "Prestamo"
+    "Prestamo",
+    "Biblioteca",
+    "Sancion",
+    "TransicionProgramada",
+    "EventoInvalidacion",
+    "CorreoSaliente",
+    "VersionRecurso",
+    "ImportacionUsuarios"
 ]
\ No newline at end of file
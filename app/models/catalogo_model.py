@@ -1,9 +1,12 @@
+import logging
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from fastapi import HTTPException
 from typing import List, Tuple
 from app.models.documento import Documento
 
+logger = logging.getLogger(__name__)
+
 # --- LÓGICA DE BD PARA 'Catalogo' y 'Categorias' (Búsquedas y Listados) ---
 # Refactorizado para usar SQLAlchemy ORM en lugar de psycopg2
 
@@ -35,7 +38,7 @@ def listar_documentos(db: Session, page: int, size: int) -> Tuple[List[Documento
         return documentos, total_items
     
     except Exception as e:
-        print(f"Error en DB (listar_documentos): {e}")
+        logger.error("Error en DB (listar_documentos): %s", e)
         raise HTTPException(
             status_code=500, 
             detail="Error interno al listar documentos"
@@ -77,7 +80,7 @@ def busqueda_basica(db: Session, busqueda: str, page: int, size: int) -> Tuple[L
         return documentos, total_items
     
     except Exception as e:
-        print(f"Error en DB (busqueda_basica): {e}")
+        logger.error("Error en DB (busqueda_basica): %s", e)
         raise HTTPException(
             status_code=500, 
             detail="Error interno en búsqueda básica"
@@ -117,7 +120,7 @@ def lista_categorias(db: Session) -> List[dict]:
         return categorias
     
     except Exception as e:
-        print(f"Error en DB (lista_categorias): {e}")
+        logger.error("Error en DB (lista_categorias): %s", e)
         raise HTTPException(
             status_code=500, 
             detail="Error interno al listar categorías"
@@ -157,7 +160,7 @@ def documento_por_categoria(db: Session, categoria: str, page: int, size: int) -
         return documentos, total_items
     
     except Exception as e:
-        print(f"Error en DB (documento_por_categoria): {e}")
+        logger.error("Error en DB (documento_por_categoria): %s", e)
         raise HTTPException(
             status_code=500, 
             detail="Error interno al listar por categoría"
@@ -225,7 +228,7 @@ def busqueda_avanzada(
         return documentos, total_items
     
     except Exception as e:
-        print(f"Error en DB (busqueda_avanzada): {e}")
+        logger.error("Error en DB (busqueda_avanzada): %s", e)
         raise HTTPException(
             status_code=500, 
             detail="Error interno en búsqueda avanzada"
@@ -273,7 +276,7 @@ def obtener_estadisticas(db: Session) -> dict:
         return estadisticas
     
     except Exception as e:
-        print(f"Error en DB (obtener_estadisticas): {e}")
+        logger.error("Error en DB (obtener_estadisticas): %s", e)
         raise HTTPException(
             status_code=500, 
             detail="Error interno al obtener estadísticas"
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
+from datetime import datetime
+from app.database import Base
+
+class CorreoSaliente(Base):
+    """
+    Bandeja de salida de emails (outbox).
+    Se escribe en la misma transacción que el cambio que origina el email y un
+    despachador en segundo plano la vacía. Estados:
+    pendiente -> enviado | fallido (se reintenta con espera creciente) -> muerto
+    """
+    __tablename__ = "correos_salientes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False, index=True)
+    tipo = Column(String(50), nullable=False)  # validacion, reserva_disponible, etc.
+    destinatario = Column(String(120), nullable=False)
+    asunto = Column(String(255), nullable=False)
+    html = Column(Text, nullable=False)
+    
+    estado = Column(String(20), default="pendiente", nullable=False)  # pendiente, enviado, fallido, muerto
+    intentos = Column(Integer, default=0, nullable=False)
+    proximo_intento = Column(DateTime, default=datetime.utcnow, nullable=False)
+    ultimo_error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    enviado_en = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        # El despachador busca por estado y vencimiento del próximo intento
+        Index("ix_correos_salientes_estado_proximo", "estado", "proximo_intento"),
+    )
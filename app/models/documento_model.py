@@ -1,8 +1,11 @@
+import logging
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from typing import Optional
 from app.models.documento import Documento
 
+logger = logging.getLogger(__name__)
+
 # --- LÓGICA DE BD PARA EL RECURSO 'Documentos' (CRUD) ---
 # Refactorizado para usar SQLAlchemy ORM en lugar de psycopg2
 
@@ -33,11 +36,11 @@ def ingresar_documento(db: Session, data: dict) -> Documento:
         db.commit()
         db.refresh(nuevo_documento)
         
-        print(f"Ingreso a la bd correcto, nuevo ID: {nuevo_documento.id}")
+        logger.info("Documento creado con ID %s", nuevo_documento.id)
         return nuevo_documento
     
     except Exception as e:
-        print(f"Error en DB (ingresar_documento): {e}")
+        logger.error("Error en DB (ingresar_documento): %s", e)
         db.rollback()
         raise HTTPException(
             status_code=500, 
@@ -65,7 +68,7 @@ def busqueda_por_id(db: Session, documento_id: int) -> Optional[Documento]:
         return documento
     
     except Exception as e:
-        print(f"Error en DB (busqueda_por_id): {e}")
+        logger.error("Error en DB (busqueda_por_id): %s", e)
         raise HTTPException(
             status_code=500, 
             detail="Error interno al buscar documento por ID"
@@ -101,11 +104,11 @@ def actualizar_documento(db: Session, id: int, data: dict) -> Optional[Documento
         db.commit()
         db.refresh(documento)
         
-        print(f"Documento {id} actualizado exitosamente")
+        logger.info("Documento %s actualizado", id)
         return documento
     
     except Exception as e:
-        print(f"Error en DB (actualizar_documento): {e}")
+        logger.error("Error en DB (actualizar_documento): %s", e)
         db.rollback()
         raise HTTPException(
             status_code=500, 
@@ -134,11 +137,11 @@ def eliminar_documento(db: Session, id: int) -> bool:
         documento.activo = False
         db.commit()
         
-        print(f"Documento {id} marcado como inactivo")
+        logger.info("Documento %s marcado como inactivo", id)
         return True
     
     except Exception as e:
-        print(f"Error en DB (eliminar_documento): {e}")
+        logger.error("Error en DB (eliminar_documento): %s", e)
         db.rollback()
         raise HTTPException(
             status_code=500, 
@@ -180,7 +183,7 @@ def listar_documentos(
         return documentos
     
     except Exception as e:
-        print(f"Error en DB (listar_documentos): {e}")
+        logger.error("Error en DB (listar_documentos): %s", e)
         raise HTTPException(
             status_code=500, 
             detail="Error interno al listar documentos"
@@ -217,7 +220,7 @@ def buscar_documentos(
         return documentos
     
     except Exception as e:
-        print(f"Error en DB (buscar_documentos): {e}")
+        logger.error("Error en DB (buscar_documentos): %s", e)
         raise HTTPException(
             status_code=500, 
             detail="Error interno al buscar documentos"
@@ -9,7 +9,7 @@ class Ejemplar(Base):
     id = Column(Integer, primary_key=True, index=True)
     documento_id = Column(Integer, ForeignKey("documentos.id"), nullable=False)
     codigo = Column(String(50), unique=True, nullable=False, index=True)
-    estado = Column(String(20), default="disponible")  # disponible, prestado, en_sala, devuelto, mantenimiento
+    estado = Column(String(20), default="disponible")  # disponible, prestado, en_sala, devuelto, reservado, mantenimiento
     ubicacion = Column(String(50))
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+from app.database import Base
+
+class EventoInvalidacion(Base):
+    """
+    Avisos para que los demás workers descarten entradas de sus cachés en memoria.
+    Cada worker lee los eventos nuevos (id mayor al último visto) periódicamente.
+    """
+    __tablename__ = "eventos_invalidacion"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    recurso = Column(String(50), nullable=False)  # usuario, ...
+    clave = Column(String(100), nullable=False)  # id del recurso o "*" para todo
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
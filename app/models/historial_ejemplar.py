@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -11,13 +11,21 @@ class HistorialEjemplar(Base):
     __tablename__ = "historial_ejemplares"
     
     id = Column(Integer, primary_key=True, index=True)
-    ejemplar_id = Column(Integer, ForeignKey("ejemplares.id"), nullable=False, index=True)
+    ejemplar_id = Column(Integer, ForeignKey("ejemplares.id"), nullable=False)
     estado_anterior = Column(String(20), nullable=True)
     estado_nuevo = Column(String(20), nullable=False)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=True)  # Quién hizo el cambio
     motivo = Column(Text, nullable=True)  # Razón del cambio (opcional)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
+    # Índices compuestos para paginación keyset sobre (created_at, id).
+    # El de ejemplar_id también cubre las búsquedas simples por ejemplar.
+    __table_args__ = (
+        Index("ix_historial_created_id", "created_at", "id"),
+        Index("ix_historial_ejemplar_created_id", "ejemplar_id", "created_at", "id"),
+        Index("ix_historial_usuario_created_id", "usuario_id", "created_at", "id"),
+    )
+    
     # Relaciones
     # ejemplar = relationship("Ejemplar", back_populates="historial")
-    # usuario = relationship("Usuario")
\ No newline at end of file
+    # usuario = relationship("Usuario")
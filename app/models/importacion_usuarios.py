@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text, LargeBinary, Index
+from datetime import datetime
+from app.database import Base
+
+class ImportacionUsuarios(Base):
+    """
+    Importación masiva de usuarios, procesada en segundo plano.
+    Estados: pendiente -> procesando -> completada | fallida
+    El archivo queda en la fila hasta que termina (trae contraseñas en claro).
+    """
+    __tablename__ = "importaciones_usuarios"
+
+    id = Column(Integer, primary_key=True, index=True)
+    creada_por = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    formato = Column(String(10), nullable=False)  # csv, ndjson
+    archivo = Column(LargeBinary, nullable=True)
+
+    estado = Column(String(20), default="pendiente", nullable=False)
+    # True mientras está pendiente o procesando, NULL al terminar (ver índice)
+    en_curso = Column(Boolean, default=True, nullable=True)
+
+    # Progreso y resultado
+    total_filas = Column(Integer, default=0, nullable=False)
+    hasheadas = Column(Integer, default=0, nullable=False)
+    creados = Column(Integer, default=0, nullable=False)
+    rechazados = Column(Integer, default=0, nullable=False)
+    errores = Column(Text, nullable=True)  # Errores por fila (JSON como texto)
+    ultimo_error = Column(Text, nullable=True)  # Por qué falló la importación
+
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    iniciada_en = Column(DateTime, nullable=True)
+    actualizada_en = Column(DateTime, nullable=True)  # Último avance del worker que la procesa
+    terminada_en = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Una sola importación en curso en toda la BD, con cualquier número de
+        # workers (los NULL de las terminadas no chocan entre sí)
+        Index("uq_importaciones_usuarios_en_curso", "en_curso", unique=True),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Time, Enum, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Time, Enum, Boolean, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 import enum
@@ -18,6 +18,7 @@ class Prestamo(Base):
     id = Column(Integer, primary_key=True, index=True)
     tipo_prestamo = Column(Enum(TipoPrestamo), nullable=False)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    bibliotecario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=True)  # Quién registró el préstamo
     biblioteca_id = Column(Integer, ForeignKey("bibliotecas.id"), nullable=False)
     fecha_prestamo = Column(DateTime, nullable=False)
     hora_prestamo = Column(Time, nullable=False)
@@ -27,14 +28,23 @@ class Prestamo(Base):
     hora_devolucion_real = Column(Time, nullable=True)
     estado = Column(Enum(EstadoPrestamo), default=EstadoPrestamo.activo)
     notificado = Column(Boolean, default=False)
+    recordatorio_enviado_en = Column(DateTime, nullable=True)  # Aviso previo al vencimiento
 
     detalles = relationship("DetallePrestamo", back_populates="prestamo")
 
+    __table_args__ = (
+        # Campaña de recordatorios: vencidos aún no notificados
+        Index("ix_prestamos_estado_notificado", "estado", "notificado"),
+        # Recordatorios previos: rango de fechas de devolución de los activos
+        Index("ix_prestamos_estado_fecha_estimada", "estado", "fecha_devolucion_estimada"),
+    )
+
 class DetallePrestamo(Base):
     __tablename__ = "detalles_prestamo"
 
     id = Column(Integer, primary_key=True, index=True)
-    prestamo_id = Column(Integer, ForeignKey("prestamos.id"), nullable=False)
-    ejemplar_id = Column(Integer, ForeignKey("ejemplares.id"), nullable=False)
+    prestamo_id = Column(Integer, ForeignKey("prestamos.id"), nullable=False, index=True)
+    ejemplar_id = Column(Integer, ForeignKey("ejemplares.id"), nullable=False, index=True)
+    fecha_devolucion = Column(DateTime, nullable=True)  # Cuándo se devolvió este ejemplar
 
     prestamo = relationship("Prestamo", back_populates="detalles")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Date
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Date, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -7,6 +7,7 @@ class Reserva(Base):
     """
     Reservas de documentos por parte de usuarios.
     Permite reservar un documento para una fecha futura.
+    Las reservas pendientes de un documento forman su cola de espera.
     """
     __tablename__ = "reservas"
     
@@ -15,10 +16,27 @@ class Reserva(Base):
     documento_id = Column(Integer, ForeignKey("documentos.id"), nullable=False, index=True)
     fecha_reserva = Column(Date, nullable=False)  # Fecha para la que se reserva
     estado = Column(String(20), default="pendiente", nullable=False)  # pendiente, activa, cancelada, completada
+    prioridad = Column(Integer, default=0, nullable=False)  # Mayor prioridad = antes en la cola de espera
+    ejemplar_id = Column(Integer, ForeignKey("ejemplares.id"), nullable=True)  # Ejemplar retenido al activarse
+    fecha_limite_retiro = Column(Date, nullable=True)  # Tras esta fecha una reserva activa expira
     fecha_creacion = Column(DateTime, default=datetime.utcnow, nullable=False)
     fecha_actualizacion = Column(DateTime, onupdate=datetime.utcnow)
     motivo_cancelacion = Column(String(255), nullable=True)
     
+    __table_args__ = (
+        # Índices para los procesos diarios de activación y expiración
+        Index("ix_reservas_estado_fecha", "estado", "fecha_reserva"),
+        Index("ix_reservas_estado_limite", "estado", "fecha_limite_retiro"),
+        # Un usuario no puede tener dos reservas vigentes del mismo documento
+        Index(
+            "uq_reservas_usuario_documento_vigente",
+            "usuario_id", "documento_id",
+            unique=True,
+            postgresql_where=text("estado IN ('pendiente', 'activa')"),
+            sqlite_where=text("estado IN ('pendiente', 'activa')")
+        ),
+    )
+    
     # Relaciones
     # usuario = relationship("Usuario", back_populates="reservas")
     # documento = relationship("Documento", back_populates="reservas")
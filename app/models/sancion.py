@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from datetime import datetime
+from app.database import Base
+
+class Sancion(Base):
+    """
+    Registro de auditoría de sanciones aplicadas a usuarios.
+    La sanción vigente se sigue leyendo de Usuario.fecha_sancion_hasta.
+    """
+    __tablename__ = "sanciones"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False, index=True)
+    prestamo_id = Column(Integer, ForeignKey("prestamos.id"), nullable=True)
+    dias_atraso = Column(Integer, nullable=True)
+    dias_sancion = Column(Integer, nullable=False)
+    fecha_hasta = Column(DateTime, nullable=False)
+    origen = Column(String(20), nullable=False)  # devolucion, automatica, manual
+    aplicada_por = Column(Integer, ForeignKey("usuarios.id"), nullable=True)  # Admin (solo manuales)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Index
+from datetime import datetime
+from app.database import Base
+
+class TransicionProgramada(Base):
+    """
+    Cola persistente de cambios de estado diferidos de ejemplares.
+    Ej: un ejemplar devuelto pasa a 'disponible' después del tiempo de reubicación.
+    Cada fila se borra en la misma transacción en que se aplica o descarta.
+    """
+    __tablename__ = "transiciones_programadas"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    ejemplar_id = Column(Integer, ForeignKey("ejemplares.id"), nullable=False)
+    estado_origen = Column(String(20), nullable=False)  # Solo se aplica si el ejemplar sigue en este estado
+    estado_destino = Column(String(20), nullable=False)
+    ejecutar_en = Column(DateTime, nullable=False)
+    procesada = Column(Boolean, default=False, nullable=False)  # Solo en filas de versiones anteriores (se purgan)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Índice para tomar las transiciones vencidas en orden
+    __table_args__ = (
+        Index("ix_transiciones_pendientes", "procesada", "ejecutar_en"),
+    )
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+from app.database import Base
+
+class VersionRecurso(Base):
+    """
+    Contador de escrituras por recurso (catálogo, ejemplares, ...).
+    Sube en la misma transacción que modifica sus tablas; las respuestas
+    GET lo usan como ETag para contestar 304 sin repetir la consulta.
+    """
+    __tablename__ = "versiones_recurso"
+    
+    recurso = Column(String(50), primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
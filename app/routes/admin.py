@@ -1,9 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from app.database import get_db
 from app.models.usuario import Usuario
 from app.utils.auth import get_current_user, require_role
+from app.services.cache_ejemplares import cache_codigos
+from app.services.planificador import planificador
+from app.services.sanciones_service import registrar_sancion_manual
+from app.services.cache_usuarios import cache_usuarios, invalidar_usuario
+from app.services.hashing_service import hashing_service
+from app.services.bandeja_salida import resumen_bandeja
+from app.services.smtp_pool import smtp_pool
+from app.services.perfilado import archivo_perfil, listar_perfiles
+from app.models.correo_saliente import CorreoSaliente
+from app.models.sancion import Sancion
 from typing import Optional
 
 router = APIRouter(prefix="/admin", tags=["Administración"])
@@ -56,6 +67,7 @@ async def activar_usuario(
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
     usuario.activo = True
+    invalidar_usuario(db, usuario.id)
     db.commit()
     
     return {
@@ -78,6 +90,8 @@ async def sancionar_usuario(
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
     usuario.fecha_sancion_hasta = datetime.utcnow() + timedelta(days=dias)
+    registrar_sancion_manual(db, usuario, dias, admin_id=current_user.id)
+    invalidar_usuario(db, usuario.id)
     db.commit()
     
     return {
@@ -85,3 +99,200 @@ async def sancionar_usuario(
         "message": f"Usuario sancionado hasta {usuario.fecha_sancion_hasta}",
         "data": {"id": usuario.id, "fecha_sancion_hasta": usuario.fecha_sancion_hasta}
     }
+
+@router.get("/usuarios/{usuario_id}/sanciones", response_model=dict)
+def historial_sanciones(
+    usuario_id: int,
+    limit: int = Query(50, le=200),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """Auditoría de sanciones de un usuario (más recientes primero)"""
+    sanciones = db.query(Sancion).filter(
+        Sancion.usuario_id == usuario_id
+    ).order_by(Sancion.created_at.desc()).limit(limit).all()
+    
+    return {
+        "success": True,
+        "data": [
+            {
+                "id": s.id,
+                "prestamo_id": s.prestamo_id,
+                "dias_atraso": s.dias_atraso,
+                "dias_sancion": s.dias_sancion,
+                "fecha_hasta": s.fecha_hasta,
+                "origen": s.origen,
+                "aplicada_por": s.aplicada_por,
+                "created_at": s.created_at
+            }
+            for s in sanciones
+        ]
+    }
+
+@router.get("/metricas/cache-codigos", response_model=dict)
+async def metricas_cache_codigos(
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """Métricas de la caché código → ejemplar (por proceso)"""
+    return {
+        "success": True,
+        "data": cache_codigos.estadisticas()
+    }
+
+@router.get("/metricas/cache-usuarios", response_model=dict)
+async def metricas_cache_usuarios(
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """Métricas de la caché de usuarios autenticados"""
+    return {
+        "success": True,
+        "data": cache_usuarios.estadisticas()
+    }
+
+@router.get("/metricas/hashing", response_model=dict)
+async def metricas_hashing(
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """Estado del pool de hashing de contraseñas (profundidad de cola, rechazos)"""
+    return {
+        "success": True,
+        "data": hashing_service.estadisticas()
+    }
+
+@router.get("/metricas/smtp", response_model=dict)
+async def metricas_smtp(
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """Estado del pool de conexiones SMTP (conexiones abiertas, envíos, reconexiones)"""
+    return {
+        "success": True,
+        "data": smtp_pool.estadisticas()
+    }
+
+@router.get("/tareas", response_model=dict)
+async def listar_tareas(
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """Estado de las tareas en segundo plano de este proceso"""
+    return {
+        "success": True,
+        "data": planificador.estado()
+    }
+
+@router.post("/tareas/{nombre}/ejecutar", response_model=dict)
+def ejecutar_tarea(
+    nombre: str,
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """Ejecutar una tarea en segundo plano de inmediato"""
+    if nombre not in planificador.tareas:
+        raise HTTPException(status_code=404, detail="Tarea no encontrada")
+    
+    resultado = planificador.ejecutar(nombre)
+    
+    return {
+        "success": True,
+        "message": f"Tarea {nombre} ejecutada",
+        "data": resultado
+    }
+
+@router.get("/perfiles", response_model=dict)
+def listar_perfiles_solicitudes(
+    tipo: Optional[str] = Query(None, description="solicitados | muestreo"),
+    limit: int = Query(50, le=500),
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """Perfiles de solicitudes guardados (X-Perfilar o muestreo), del más reciente al más antiguo"""
+    return {
+        "success": True,
+        "data": listar_perfiles(tipo, limit)
+    }
+
+@router.get("/perfiles/{perfil_id}/pilas")
+def descargar_pilas_perfil(
+    perfil_id: str,
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """Pilas colapsadas del perfil, para flamegraph.pl, speedscope o inferno"""
+    archivo = archivo_perfil(perfil_id, "folded")
+    if archivo is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    
+    return FileResponse(archivo, media_type="text/plain", filename=archivo.name)
+
+@router.get("/perfiles/{perfil_id}/sql")
+def descargar_sql_perfil(
+    perfil_id: str,
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """Datos de la solicitud perfilada y línea de tiempo de sus consultas SQL"""
+    archivo = archivo_perfil(perfil_id, "json")
+    if archivo is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    
+    return FileResponse(archivo, media_type="application/json", filename=archivo.name)
+
+@router.get("/correos", response_model=dict)
+def listar_correos(
+    estado: Optional[str] = Query(None, description="pendiente | enviado | fallido | muerto"),
+    limit: int = Query(50, le=500),
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """Bandeja de salida de emails: cantidad por estado y los últimos correos"""
+    query = db.query(CorreoSaliente)
+    if estado:
+        query = query.filter(CorreoSaliente.estado == estado)
+    
+    correos = query.order_by(CorreoSaliente.id.desc()).limit(limit).all()
+    
+    return {
+        "success": True,
+        "data": {
+            "por_estado": resumen_bandeja(db),
+            "correos": [
+                {
+                    "id": c.id,
+                    "usuario_id": c.usuario_id,
+                    "tipo": c.tipo,
+                    "destinatario": c.destinatario,
+                    "asunto": c.asunto,
+                    "estado": c.estado,
+                    "intentos": c.intentos,
+                    "proximo_intento": c.proximo_intento,
+                    "ultimo_error": c.ultimo_error,
+                    "created_at": c.created_at,
+                    "enviado_en": c.enviado_en
+                }
+                for c in correos
+            ]
+        }
+    }
+
+@router.post("/correos/{correo_id}/reintentar", response_model=dict)
+def reintentar_correo(
+    correo_id: int,
+    db: Session = Depends(get_db),
+    current_user: Usuario = Depends(require_role(["admin"]))
+):
+    """Devolver a la cola un email fallido o muerto (reinicia los intentos)"""
+    correo = db.query(CorreoSaliente).filter(CorreoSaliente.id == correo_id).first()
+    
+    if not correo:
+        raise HTTPException(status_code=404, detail="Correo no encontrado")
+    
+    if correo.estado not in ("fallido", "muerto"):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Solo se reintentan correos fallidos o muertos (estado: {correo.estado})"
+        )
+    
+    correo.estado = "pendiente"
+    correo.intentos = 0
+    correo.proximo_intento = datetime.utcnow()
+    db.commit()
+    
+    return {
+        "success": True,
+        "message": "Correo devuelto a la cola de envío"
+    }
@@ -5,6 +5,8 @@ from app.models.usuario import Usuario
 from app.schemas.usuario import UsuarioCreate, UsuarioResponse, LoginRequest, LoginResponse
 from app.utils.validations import validar_rut, formatear_rut
 from app.utils.auth import create_access_token, get_current_user
+from app.services.cache_usuarios import UsuarioPrincipal, cache_usuarios
+from app.services.hashing_service import hashing_service
 
 router = APIRouter(prefix="/auth", tags=["Autenticación"])
 
@@ -44,7 +46,10 @@ def register(usuario_data: UsuarioCreate, db: Session = Depends(get_db)):
         rol=usuario_data.rol,
         activo=False
     )
-    nuevo_usuario.set_password(usuario_data.password)
+    
+    # Liberar la conexión mientras se hashea (no hay nada pendiente en la sesión)
+    db.rollback()
+    nuevo_usuario.password_hash = hashing_service.hash(usuario_data.password)
     
     db.add(nuevo_usuario)
     db.commit()
@@ -70,7 +75,10 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     
     usuario = db.query(Usuario).filter(Usuario.email == login_data.email.lower()).first()
     
-    if not usuario or not usuario.verify_password(login_data.password):
+    # Liberar la conexión mientras se verifica; el usuario queda cargado
+    db.close()
+    
+    if not usuario or not hashing_service.verify(login_data.password, usuario.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciales inválidas"
@@ -112,8 +120,22 @@ def login(login_data: LoginRequest, db: Session = Depends(get_db)):
     )
 
 @router.get("/me", response_model=dict)
-async def get_me(current_user: Usuario = Depends(get_current_user)):
+def get_me(
+    principal: UsuarioPrincipal = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
     """Obtener usuario actual"""
+    current_user = db.get(Usuario, principal.id)
+    
+    # El principal puede venir de la caché aunque la fila ya no exista
+    if current_user is None:
+        cache_usuarios.invalidar(principal.id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="No se pudo validar las credenciales",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
     return {
         "success": True,
         "data": {
@@ -1,11 +1,18 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
 from typing import Optional, List
+from app.database import get_db
 from app.schemas.documento_schema import (
     DocumentoCrear, DocumentoOutput, DocumentoActualizar, ListaDocumentos
 )
 # Importamos las funciones de los 'models' (que ahora son 'services')
 from app.models import documento_model, catalogo_model 
 from app.utils.dependencies import verificacion, validacion_categoria
+from app.services.versiones_recurso import RECURSO_CATALOGO
+from app.utils.etag import etag_por_version
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -15,7 +22,7 @@ async def api_creacion_documentos(
     es_admin: bool = Depends(verificacion)
 ):
     """Crea un nuevo documento."""
-    print(f"los datos recibidos fueron los siguientes:{documento_data.model_dump()}")
+    logger.debug("Datos recibidos para crear documento: %s", documento_data.model_dump())
     
     # La validación ahora lanza una excepción si falla
     validacion_categoria(documento_data.categoria) 
@@ -30,14 +37,15 @@ async def api_creacion_documentos(
         if isinstance(e, HTTPException): raise e
         raise HTTPException(status_code=500, detail=f"Error interno al crear el documento: {str(e)}")
 
-@router.get("/", response_model=ListaDocumentos)
-async def api_listar_documentos(
+@router.get("/", response_model=ListaDocumentos, dependencies=[Depends(etag_por_version(RECURSO_CATALOGO))])
+def api_listar_documentos(
     page: int = Query(1, ge=1), 
-    size: int = Query(10, ge=1, le=100)
+    size: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
 ):
     """Lista todos los documentos (paginado)."""
     try:
-        documentos_list, total = catalogo_model.listar_documentos(page=page, size=size)
+        documentos_list, total = catalogo_model.listar_documentos(db, page=page, size=size)
         return ListaDocumentos(
             total_items=total,
             items=documentos_list
@@ -46,11 +54,11 @@ async def api_listar_documentos(
         if isinstance(e, HTTPException): raise e
         raise HTTPException(status_code=500, detail=f"Error interno al listar documentos: {str(e)}")
 
-@router.get("/{documento_id}", response_model=DocumentoOutput)
-async def api_get_documento(documento_id: int):
+@router.get("/{documento_id}", response_model=DocumentoOutput, dependencies=[Depends(etag_por_version(RECURSO_CATALOGO))])
+def api_get_documento(documento_id: int, db: Session = Depends(get_db)):
     """Obtiene un documento por su ID."""
     try:
-        documento = documento_model.busqueda_por_id(documento_id)
+        documento = documento_model.busqueda_por_id(db, documento_id)
         if documento is None:
             raise HTTPException(status_code=404, detail="Documento no encontrado")
         # CORRECCIÓN: Faltaba retornar el documento
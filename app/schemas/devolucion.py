@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Optional, List
 
 class DevolucionRequest(BaseModel):
     ejemplar_codigo : str
@@ -8,4 +8,22 @@ class DevolucionResponse(BaseModel):
     mensaje: str
     ejemplar_codigo: str
     dias_atraso: Optional[int] = 0
-    estado_prestamo: str
\ No newline at end of file
+    estado_prestamo: str
+    reserva_asignada: Optional[int] = None
+
+class DevolucionLoteRequest(BaseModel):
+    ejemplares_codigos: List[str] = Field(..., min_length=1, max_length=1000)
+
+class DevolucionLoteItem(BaseModel):
+    ejemplar_codigo: str
+    exitoso: bool
+    mensaje: str
+    dias_atraso: Optional[int] = 0
+    estado_prestamo: Optional[str] = None
+    reserva_asignada: Optional[int] = None
+
+class DevolucionLoteResponse(BaseModel):
+    total: int
+    exitosas: int
+    fallidas: int
+    resultados: List[DevolucionLoteItem]
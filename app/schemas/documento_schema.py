@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import AliasChoices, BaseModel, Field
 from typing import Optional, List
 
 # ----------ESQUEMAS----------#
@@ -18,6 +18,12 @@ class DocumentoCrear(BaseModel):
 #Esquema de salida (documento).
 class DocumentoOutput(DocumentoCrear):
     id:int
+    # El modelo ORM guarda el año como 'año'
+    anio:Optional[int] = Field(None, validation_alias=AliasChoices("anio", "año"))
+    tipo_medio:Optional[str] = None
+
+    class Config:
+        from_attributes = True
 
 #Esquema de salida (listar documentos)
 class ListaDocumentos(BaseModel):
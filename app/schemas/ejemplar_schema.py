@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 from datetime import datetime
 
 # Schema para crear ejemplar
@@ -73,4 +73,11 @@ class HistorialEjemplarResponse(BaseModel):
     created_at: datetime
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# Schema para consulta paginada de historial (keyset)
+class HistorialPaginaResponse(BaseModel):
+    items: List[HistorialEjemplarResponse]
+    siguiente_cursor: Optional[str] = None
+    limite: int
@@ -7,6 +7,7 @@ class PrestamoCreate(BaseModel):
     usuario_id: int
     bibliotecario_id: int
     ejemplares_ids: List[int]
+    biblioteca_id: Optional[int] = None  # Por defecto la biblioteca principal
 
 class DetallePrestamoResponse(BaseModel):
     ejemplar_id: int
@@ -15,7 +16,7 @@ class PrestamoResponse(BaseModel):
     id: int 
     tipo_prestamo: str
     usuario_id: int
-    bibliotecario_id: int
+    bibliotecario_id: Optional[int] = None  # Nulo en los préstamos anteriores a la columna
     fecha_prestamo: datetime
     fecha_devolucion_estimada: Optional[datetime]
     estado: str
@@ -30,6 +30,9 @@ class ReservaResponse(BaseModel):
     documento_id: int
     fecha_reserva: date
     estado: str
+    prioridad: int = 0
+    ejemplar_id: Optional[int] = None
+    fecha_limite_retiro: Optional[date] = None
     fecha_creacion: datetime
     fecha_actualizacion: Optional[datetime]
     motivo_cancelacion: Optional[str]
@@ -37,6 +40,17 @@ class ReservaResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ReservaPrioridad(BaseModel):
+    """Schema para cambiar la prioridad de una reserva en espera"""
+    prioridad: int = Field(..., ge=0, le=10, description="Mayor prioridad = antes en la cola de espera")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "prioridad": 5
+            }
+        }
+
 class ReservaCancelar(BaseModel):
     """Schema para cancelar una reserva"""
     motivo: Optional[str] = Field(None, max_length=255, description="Motivo de cancelación (opcional)")
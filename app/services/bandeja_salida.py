@@ -0,0 +1,167 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.correo_saliente import CorreoSaliente
+from app.models.log_notificaciones import LogNotificacion
+from app.services.email_service import email_service
+from app.services.smtp_pool import smtp_pool
+
+logger = logging.getLogger(__name__)
+
+# --- BANDEJA DE SALIDA DE EMAILS (OUTBOX) ---
+# Los endpoints y procesos no hablan con el servidor SMTP: dejan el email en
+# correos_salientes dentro de su propia transacción (si hacen rollback, el
+# email tampoco existe). La tarea "despacho_correos" toma los vencidos en
+# lotes, los envía por el pool de conexiones SMTP y registra cada intento en
+# log_notificaciones. Un fallo reprograma el email con espera exponencial;
+# tras CORREOS_MAX_INTENTOS queda 'muerto' hasta que un admin lo reintente.
+
+ESTADOS_POR_ENVIAR = ("pendiente", "fallido")
+
+
+def encolar_correo(db: Session, usuario_id: int, tipo: str, destinatario: str, asunto: str, html: str) -> CorreoSaliente:
+    """Dejar un email en la bandeja de salida. No hace commit."""
+    correo = CorreoSaliente(
+        usuario_id=usuario_id,
+        tipo=tipo,
+        destinatario=destinatario,
+        asunto=asunto,
+        html=html
+    )
+    db.add(correo)
+    return correo
+
+
+def encolar_correos(db: Session, correos: List[dict]) -> int:
+    """
+    Dejar muchos emails en la bandeja con un INSERT masivo. No hace commit.
+    Cada dict lleva usuario_id, tipo, destinatario, asunto y html.
+    """
+    if not correos:
+        return 0
+
+    ahora = datetime.utcnow()
+    db.execute(insert(CorreoSaliente), [
+        {**correo, "estado": "pendiente", "intentos": 0, "proximo_intento": ahora, "created_at": ahora}
+        for correo in correos
+    ])
+    return len(correos)
+
+
+def calcular_espera(intentos: int) -> timedelta:
+    """Espera antes del siguiente intento: base * 2^(intentos-1), con tope"""
+    segundos = settings.CORREOS_ESPERA_BASE_SEGUNDOS * 2 ** max(intentos - 1, 0)
+    return timedelta(seconds=min(segundos, settings.CORREOS_ESPERA_MAX_SEGUNDOS))
+
+
+def _tomar_lote(db: Session, ahora: datetime) -> list:
+    """
+    Reservar un lote de emails vencidos corriendo su próximo intento
+    CORREOS_BLOQUEO_SEGUNDOS: otro despachador no los toma, y si este
+    proceso muere antes de terminar se reintentan pasado ese plazo.
+    """
+    vencidos = select(CorreoSaliente.id).where(
+        CorreoSaliente.estado.in_(ESTADOS_POR_ENVIAR),
+        CorreoSaliente.proximo_intento <= ahora
+    ).order_by(CorreoSaliente.proximo_intento).limit(settings.CORREOS_LOTE)
+
+    tomados = db.execute(
+        update(CorreoSaliente)
+        .where(
+            CorreoSaliente.id.in_(vencidos.scalar_subquery()),
+            CorreoSaliente.estado.in_(ESTADOS_POR_ENVIAR),
+            CorreoSaliente.proximo_intento <= ahora
+        )
+        .values(proximo_intento=ahora + timedelta(seconds=settings.CORREOS_BLOQUEO_SEGUNDOS))
+        .returning(
+            CorreoSaliente.id,
+            CorreoSaliente.usuario_id,
+            CorreoSaliente.tipo,
+            CorreoSaliente.destinatario,
+            CorreoSaliente.asunto,
+            CorreoSaliente.html,
+            CorreoSaliente.intentos
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    # Confirmar la reserva libera la conexión mientras se habla con el SMTP
+    db.commit()
+    return tomados
+
+
+def despachar_correos(db: Session, ahora: Optional[datetime] = None) -> dict:
+    """
+    Tarea periódica: enviar los emails vencidos de la bandeja, en lotes de
+    CORREOS_LOTE, y registrar el resultado de cada uno.
+    """
+    ahora = ahora or datetime.utcnow()
+    enviados = 0
+    fallidos = 0
+    muertos = 0
+
+    while True:
+        lote = _tomar_lote(db, ahora)
+        if not lote:
+            break
+
+        mensajes = [(c.destinatario, c.asunto, c.html) for c in lote]
+        if settings.SMTP_POOL_ACTIVO:
+            resultados = smtp_pool.enviar_lote(mensajes)
+        else:
+            resultados = email_service.send_bulk(mensajes)
+        fin = datetime.utcnow()
+
+        cambios = []
+        logs = []
+        for correo, (exitoso, error) in zip(lote, resultados):
+            intentos = correo.intentos + 1
+            if exitoso:
+                estado = "enviado"
+                enviados += 1
+            elif intentos >= settings.CORREOS_MAX_INTENTOS:
+                estado = "muerto"
+                muertos += 1
+            else:
+                estado = "fallido"
+                fallidos += 1
+
+            cambios.append({
+                "id": correo.id,
+                "estado": estado,
+                "intentos": intentos,
+                "proximo_intento": fin + calcular_espera(intentos) if estado == "fallido" else fin,
+                "ultimo_error": error,
+                "enviado_en": fin if exitoso else None
+            })
+            logs.append({
+                "usuario_id": correo.usuario_id,
+                "tipo": correo.tipo,
+                "asunto": correo.asunto,
+                "destinatario": correo.destinatario,
+                "enviado_exitosamente": exitoso,
+                "error_mensaje": error,
+                "fecha_envio": fin
+            })
+
+        # UPDATE masivo por clave primaria
+        db.execute(update(CorreoSaliente), cambios)
+        db.execute(insert(LogNotificacion), logs)
+        db.commit()
+
+        if len(lote) < settings.CORREOS_LOTE:
+            break
+
+    if enviados or fallidos or muertos:
+        logger.info("Despacho de correos: %d enviados, %d fallidos, %d muertos", enviados, fallidos, muertos)
+
+    return {"enviados": enviados, "fallidos": fallidos, "muertos": muertos}
+
+
+def resumen_bandeja(db: Session) -> Dict[str, int]:
+    """Cantidad de emails por estado"""
+    filas = db.query(CorreoSaliente.estado, func.count(CorreoSaliente.id)).group_by(CorreoSaliente.estado).all()
+    return {estado: cantidad for estado, cantidad in filas}
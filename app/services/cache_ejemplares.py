@@ -0,0 +1,49 @@
+from sqlalchemy.orm import Query, Session
+from typing import Optional
+from app.config import settings
+from app.models.ejemplar import Ejemplar
+from app.utils.cache import LRUCache
+
+# --- RESOLUCIÓN DE CÓDIGOS DE EJEMPLAR ---
+# El código de barras de un ejemplar no cambia una vez creado, así que la
+# identidad (id, documento_id) se puede cachear. El estado NO se cachea:
+# siempre se lee fresco desde la BD por clave primaria.
+
+cache_codigos = LRUCache(
+    maxsize=settings.CACHE_CODIGOS_MAX,
+    ttl=settings.CACHE_CODIGOS_TTL
+)
+
+
+def registrar_codigo(ejemplar: Ejemplar):
+    """Guardar la identidad de un ejemplar recién leído o creado"""
+    cache_codigos.set(ejemplar.codigo, (ejemplar.id, ejemplar.documento_id))
+
+
+def buscar_por_codigo(query: Query, codigo: str):
+    """
+    Ejecutar una consulta cuya primera entidad es Ejemplar, filtrada por código.
+    Con acierto en caché se filtra por clave primaria; con fallo se busca por
+    código y se guarda la identidad para la próxima vez. Retorna la primera
+    fila (o el Ejemplar, si la consulta es solo de ejemplares) o None.
+    """
+    identidad = cache_codigos.get(codigo)
+    
+    if identidad is not None:
+        fila = query.filter(Ejemplar.id == identidad[0]).first()
+        if fila is None:
+            # El ejemplar ya no existe: descartar la entrada
+            cache_codigos.invalidar(codigo)
+        return fila
+    
+    fila = query.filter(Ejemplar.codigo == codigo).first()
+    
+    if fila is not None:
+        registrar_codigo(fila if isinstance(fila, Ejemplar) else fila[0])
+    
+    return fila
+
+
+def obtener_ejemplar_por_codigo(codigo: str, db: Session) -> Optional[Ejemplar]:
+    """Obtener el ejemplar completo (con su estado actual) por código"""
+    return buscar_por_codigo(db.query(Ejemplar), codigo)
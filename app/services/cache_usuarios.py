@@ -0,0 +1,155 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+from sqlalchemy import delete, event, func, insert
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.evento_invalidacion import EventoInvalidacion
+from app.models.usuario import Usuario
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# --- CACHÉ DE USUARIOS AUTENTICADOS ---
+# get_current_user solo necesita saber si el usuario existe, su rol, si está
+# activo y si está sancionado. Eso se guarda por id con TTL, así autorizar una
+# petición no consulta la BD. Los cambios a esos datos invalidan la entrada al
+# confirmarse la transacción; con CACHE_USUARIOS_INVALIDACION_BD además se
+# avisa a los demás workers mediante la tabla eventos_invalidacion.
+
+RECURSO_USUARIO = "usuario"
+TODOS = "*"
+
+# Sobre este número de usuarios se invalida la caché completa
+MAX_INVALIDACIONES_INDIVIDUALES = 1000
+
+
+class UsuarioPrincipal:
+    """Datos del usuario autenticado necesarios para autorizar"""
+
+    __slots__ = ("id", "rut", "rol", "activo", "fecha_sancion_hasta")
+
+    def __init__(self, id: int, rut: str, rol: str, activo: bool, fecha_sancion_hasta: Optional[datetime]):
+        self.id = id
+        self.rut = rut
+        self.rol = rol
+        self.activo = activo
+        self.fecha_sancion_hasta = fecha_sancion_hasta
+
+    def esta_sancionado(self) -> bool:
+        """Verificar si está sancionado (misma regla que Usuario)"""
+        if self.fecha_sancion_hasta:
+            return datetime.utcnow() < self.fecha_sancion_hasta
+        return False
+
+
+cache_usuarios = LRUCache(
+    maxsize=settings.CACHE_USUARIOS_MAX,
+    ttl=settings.CACHE_USUARIOS_TTL
+)
+
+
+def obtener_principal(usuario_id: int, db: Session) -> Optional[UsuarioPrincipal]:
+    """
+    Obtener los datos de autorización de un usuario.
+    Retorna None si el usuario no existe.
+    """
+    principal = cache_usuarios.get(usuario_id)
+    if principal is not None:
+        return principal
+
+    fila = db.query(
+        Usuario.id, Usuario.rut, Usuario.rol, Usuario.activo, Usuario.fecha_sancion_hasta
+    ).filter(Usuario.id == usuario_id).first()
+
+    if not fila:
+        return None
+
+    principal = UsuarioPrincipal(*fila)
+    cache_usuarios.set(usuario_id, principal)
+    return principal
+
+
+# ============================================
+# INVALIDACIÓN
+# ============================================
+
+def invalidar_usuarios(db: Session, usuario_ids: Iterable[int]):
+    """
+    Marcar usuarios cuyo rol, estado o sanción cambió en esta transacción.
+    Se descartan de la caché cuando la sesión hace commit (si se descartaran
+    antes, una petición concurrente podría volver a cachear el valor viejo).
+    """
+    ids = set(usuario_ids)
+    if not ids:
+        return
+
+    claves = [str(i) for i in ids] if len(ids) <= MAX_INVALIDACIONES_INDIVIDUALES else [TODOS]
+    db.info.setdefault("usuarios_invalidados", set()).update(claves)
+
+    if settings.CACHE_USUARIOS_INVALIDACION_BD:
+        db.execute(insert(EventoInvalidacion), [
+            {"recurso": RECURSO_USUARIO, "clave": clave, "created_at": datetime.utcnow()}
+            for clave in claves
+        ])
+
+
+def invalidar_usuario(db: Session, usuario_id: int):
+    invalidar_usuarios(db, [usuario_id])
+
+
+def _descartar(claves: Iterable[str]):
+    for clave in claves:
+        if clave == TODOS:
+            cache_usuarios.limpiar()
+            return
+        cache_usuarios.invalidar(int(clave))
+
+
+@event.listens_for(Session, "after_commit")
+def _al_confirmar(session: Session):
+    claves = session.info.pop("usuarios_invalidados", None)
+    if claves:
+        _descartar(claves)
+
+
+@event.listens_for(Session, "after_rollback")
+def _al_deshacer(session: Session):
+    session.info.pop("usuarios_invalidados", None)
+
+
+# --- Invalidación entre workers ---
+
+_ultimo_evento: Optional[int] = None
+
+
+def procesar_invalidaciones(db: Session) -> dict:
+    """
+    Aplicar los eventos de invalidación escritos por cualquier worker desde
+    la última revisión y borrar los que ya superaron el TTL de la caché
+    (para entonces las entradas afectadas ya expiraron solas).
+    Un evento de una transacción lenta puede confirmarse con un id menor al
+    último visto y no aplicarse; en ese caso la entrada dura a lo más la TTL.
+    """
+    global _ultimo_evento
+
+    if _ultimo_evento is None:
+        # Primera revisión: fijar desde dónde seguir y descartar lo cacheado antes
+        _ultimo_evento = db.query(func.max(EventoInvalidacion.id)).scalar() or 0
+        cache_usuarios.limpiar()
+        return {"aplicados": 0}
+
+    eventos = db.query(EventoInvalidacion.id, EventoInvalidacion.clave).filter(
+        EventoInvalidacion.id > _ultimo_evento,
+        EventoInvalidacion.recurso == RECURSO_USUARIO
+    ).order_by(EventoInvalidacion.id).all()
+
+    if eventos:
+        _descartar(clave for _, clave in eventos)
+        _ultimo_evento = eventos[-1].id
+
+    limite = datetime.utcnow() - timedelta(seconds=max(settings.CACHE_USUARIOS_TTL, 60) * 10)
+    db.execute(delete(EventoInvalidacion).where(EventoInvalidacion.created_at < limite))
+    db.commit()
+
+    return {"aplicados": len(eventos)}
@@ -0,0 +1,333 @@
+import bisect
+import logging
+import threading
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.documento import Documento
+from app.models.reserva import Reserva
+from app.models.ejemplar import Ejemplar
+from app.models.historial_ejemplar import HistorialEjemplar
+from app.models.usuario import Usuario
+from app.services.bandeja_salida import encolar_correos
+from app.services.email_service import email_service
+from app.utils.dates import calcular_fecha_limite_retiro
+
+logger = logging.getLogger(__name__)
+
+# --- COLA DE ESPERA DE RESERVAS ---
+# La cola persistida son las reservas 'pendiente' de cada documento, ordenadas
+# por (prioridad desc, fecha_creacion, id). En memoria se mantiene un espejo
+# por documento como lista ordenada: la posición y el largo se resuelven con
+# búsqueda binaria. La BD sigue siendo la fuente de verdad: la asignación de un
+# ejemplar se hace con un UPDATE condicionado a que la reserva siga pendiente.
+# Las salidas de la cola se aplican al espejo recién al confirmar la
+# transacción (si hay rollback, la reserva sigue en la cola).
+
+
+MOTIVO_ASIGNACION = "Asignado a la siguiente reserva de la cola"
+MOTIVO_LIBERACION = "Reserva cancelada, sin reservas en espera"
+
+
+class Asignacion(NamedTuple):
+    reserva_id: int
+    fecha_reserva: date
+
+
+def _clave(prioridad: int, fecha_creacion: datetime, reserva_id: int) -> tuple:
+    return (-(prioridad or 0), fecha_creacion, reserva_id)
+
+
+class _Cola:
+    """Espejo de la cola de un documento"""
+
+    def __init__(self, entradas: List[tuple]):
+        # Cada entrada: (-prioridad, fecha_creacion, id, fecha_reserva)
+        self.entradas = sorted(entradas)
+        self.claves = {e[2]: e[:3] for e in self.entradas}
+        self.cargada_en = time.monotonic()
+
+    def agregar(self, entrada: tuple):
+        if entrada[2] in self.claves:
+            return
+        bisect.insort(self.entradas, entrada)
+        self.claves[entrada[2]] = entrada[:3]
+
+    def quitar(self, reserva_id: int):
+        clave = self.claves.pop(reserva_id, None)
+        if clave is None:
+            return
+        i = bisect.bisect_left(self.entradas, clave)
+        if i < len(self.entradas) and self.entradas[i][2] == reserva_id:
+            del self.entradas[i]
+
+    def posicion(self, reserva_id: int) -> Optional[int]:
+        clave = self.claves.get(reserva_id)
+        if clave is None:
+            return None
+        return bisect.bisect_left(self.entradas, clave) + 1
+
+
+class ColaReservas:
+    """
+    Colas de espera por documento (por proceso).
+    Se cargan desde la BD la primera vez que se consultan y se recargan
+    pasado COLA_RESERVAS_TTL segundos, para recoger lo que hayan encolado
+    otros procesos. La consulta corre sin el lock: solo se toma para leer o
+    reemplazar el espejo, y los cambios que llegan mientras una carga está en
+    curso se repiten sobre el resultado antes de reemplazarlo.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self._colas: Dict[int, _Cola] = {}
+        self._cargas: Dict[int, List[list]] = {}  # Cambios pendientes de cada carga en curso
+        self._lock = threading.Lock()
+
+    def _vigente(self, documento_id: int) -> Optional[_Cola]:
+        cola = self._colas.get(documento_id)
+        if cola is not None and (not self.ttl or time.monotonic() - cola.cargada_en < self.ttl):
+            return cola
+        return None
+
+    def _cola(self, db: Session, documento_id: int) -> _Cola:
+        with self._lock:
+            cola = self._vigente(documento_id)
+            if cola is not None:
+                return cola
+            cambios = []
+            self._cargas.setdefault(documento_id, []).append(cambios)
+
+        try:
+            filas = db.query(
+                Reserva.id, Reserva.prioridad, Reserva.fecha_creacion, Reserva.fecha_reserva
+            ).filter(
+                Reserva.documento_id == documento_id,
+                Reserva.estado == "pendiente"
+            ).all()
+        except BaseException:
+            with self._lock:
+                self._terminar_carga(documento_id, cambios)
+            raise
+
+        cola = _Cola([_clave(p, fc, rid) + (fr,) for rid, p, fc, fr in filas])
+        with self._lock:
+            self._terminar_carga(documento_id, cambios)
+            # La consulta pudo no ver lo confirmado mientras corría
+            for cambio in cambios:
+                cambio(cola)
+            self._colas[documento_id] = cola
+        return cola
+
+    def _terminar_carga(self, documento_id: int, cambios: list):
+        cargas = [c for c in self._cargas[documento_id] if c is not cambios]
+        if cargas:
+            self._cargas[documento_id] = cargas
+        else:
+            del self._cargas[documento_id]
+
+    def _aplicar(self, documento_id: int, cambio: Callable[[_Cola], None]):
+        """Aplicar un cambio al espejo y a las cargas en curso del documento"""
+        with self._lock:
+            cola = self._colas.get(documento_id)
+            if cola is not None:
+                cambio(cola)
+            for cambios in self._cargas.get(documento_id, ()):
+                cambios.append(cambio)
+
+    def agregar(self, reserva: Reserva):
+        """Encolar una reserva pendiente recién creada (ya confirmada)"""
+        entrada = _clave(reserva.prioridad, reserva.fecha_creacion, reserva.id) + (reserva.fecha_reserva,)
+        self._aplicar(reserva.documento_id, lambda cola: cola.agregar(entrada))
+
+    def reubicar(self, reserva: Reserva):
+        """Mover en la cola una reserva pendiente cuya prioridad cambió (ya confirmada)"""
+        entrada = _clave(reserva.prioridad, reserva.fecha_creacion, reserva.id) + (reserva.fecha_reserva,)
+
+        def cambio(cola: _Cola):
+            cola.quitar(reserva.id)
+            cola.agregar(entrada)
+
+        self._aplicar(reserva.documento_id, cambio)
+
+    def quitar(self, documento_id: int, reserva_id: int):
+        """Sacar una reserva de la cola (cancelada, activada o completada)"""
+        self._aplicar(documento_id, lambda cola: cola.quitar(reserva_id))
+
+    def posicion(self, db: Session, reserva: Reserva) -> Optional[int]:
+        """Posición (desde 1) de una reserva en la cola de su documento"""
+        cola = self._cola(db, reserva.documento_id)
+        with self._lock:
+            return cola.posicion(reserva.id)
+
+    def largo(self, db: Session, documento_id: int) -> int:
+        """Cantidad de reservas esperando un documento"""
+        cola = self._cola(db, documento_id)
+        with self._lock:
+            return len(cola.entradas)
+
+    def candidatos(self, db: Session, documento_id: int, hoy: date) -> List[Asignacion]:
+        """Reservas en orden de cola cuya fecha ya llegó"""
+        cola = self._cola(db, documento_id)
+        with self._lock:
+            return [Asignacion(e[2], e[3]) for e in cola.entradas if e[3] <= hoy]
+
+    def invalidar(self, documento_id: Optional[int] = None):
+        """Olvidar el espejo de un documento (o de todos)"""
+        with self._lock:
+            if documento_id is None:
+                self._colas.clear()
+            else:
+                self._colas.pop(documento_id, None)
+
+
+# Instancia global de las colas
+cola_reservas = ColaReservas(ttl=settings.COLA_RESERVAS_TTL)
+
+
+def quitar_al_confirmar(db: Session, documento_id: int, reserva_id: int):
+    """Sacar una reserva de la cola cuando la transacción de 'db' se confirme"""
+    db.info.setdefault("reservas_fuera_de_cola", set()).add((documento_id, reserva_id))
+
+
+@event.listens_for(Session, "after_commit")
+def _al_confirmar(session: Session):
+    for documento_id, reserva_id in session.info.pop("reservas_fuera_de_cola", ()):
+        cola_reservas.quitar(documento_id, reserva_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _al_deshacer(session: Session):
+    session.info.pop("reservas_fuera_de_cola", None)
+
+
+def registrar_historial(db: Session, cambios: List[tuple], motivo: str):
+    """
+    Insertar en el historial los cambios de estado hechos con UPDATEs
+    masivos. Cada cambio es (ejemplar_id, estado_anterior, estado_nuevo).
+    No hace commit.
+    """
+    if not cambios:
+        return
+    ahora = datetime.utcnow()
+    db.execute(insert(HistorialEjemplar), [
+        {
+            "ejemplar_id": ejemplar_id,
+            "estado_anterior": anterior,
+            "estado_nuevo": nuevo,
+            "usuario_id": None,
+            "motivo": motivo,
+            "created_at": ahora
+        }
+        for ejemplar_id, anterior, nuevo in cambios
+    ])
+
+
+def encolar_avisos_reservas(db: Session, reserva_ids: List[int]) -> int:
+    """
+    Dejar en la bandeja de salida el aviso a cada usuario de las reservas
+    indicadas. Consulta los datos en lotes de CORREOS_LOTE. No hace commit.
+    """
+    encolados = 0
+
+    for i in range(0, len(reserva_ids), settings.CORREOS_LOTE):
+        lote = reserva_ids[i:i + settings.CORREOS_LOTE]
+
+        filas = db.query(
+            Reserva.usuario_id,
+            Usuario.email,
+            Usuario.nombres,
+            Documento.titulo,
+            Reserva.fecha_limite_retiro
+        ).join(
+            Usuario, Usuario.id == Reserva.usuario_id
+        ).join(
+            Documento, Documento.id == Reserva.documento_id
+        ).filter(Reserva.id.in_(lote)).all()
+
+        correos = []
+        for usuario_id, email, nombres, titulo, limite in filas:
+            asunto, html = email_service.plantilla_reserva_disponible(nombres, titulo, limite)
+            correos.append({
+                "usuario_id": usuario_id,
+                "tipo": "reserva_disponible",
+                "destinatario": email,
+                "asunto": asunto,
+                "html": html
+            })
+        encolados += encolar_correos(db, correos)
+
+    return encolados
+
+
+def asignar_ejemplares(db: Session, ejemplares: Iterable[Ejemplar], ahora: Optional[datetime] = None) -> Dict[int, Asignacion]:
+    """
+    Entregar cada ejemplar liberado a la siguiente reserva de su documento.
+    La reserva pasa a 'activa' con el ejemplar asignado y el ejemplar queda
+    'reservado', con su fila de historial y el aviso al usuario en la bandeja
+    de salida. No hace commit: queda en la misma transacción que la devolución.
+
+    Retorna {ejemplar_id: Asignacion} con las asignaciones hechas.
+    """
+    ahora = ahora or datetime.now()
+    asignaciones = {}
+    cambios = []
+    fuera_de_cola = db.info.setdefault("reservas_fuera_de_cola", set())
+
+    for ejemplar in ejemplares:
+        for candidato in cola_reservas.candidatos(db, ejemplar.documento_id, ahora.date()):
+            reserva_id = candidato.reserva_id
+            if (ejemplar.documento_id, reserva_id) in fuera_de_cola:
+                # Ya salió de la cola en esta transacción (aún sin confirmar)
+                continue
+            # Condicionado: otro proceso pudo haberla activado o cancelado
+            asignada = db.execute(
+                update(Reserva)
+                .where(Reserva.id == reserva_id, Reserva.estado == "pendiente")
+                .values(
+                    estado="activa",
+                    ejemplar_id=ejemplar.id,
+                    fecha_limite_retiro=calcular_fecha_limite_retiro(ahora.date()),
+                    fecha_actualizacion=datetime.utcnow()
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+
+            quitar_al_confirmar(db, ejemplar.documento_id, reserva_id)
+
+            if asignada:
+                cambios.append((ejemplar.id, ejemplar.estado, "reservado"))
+                ejemplar.estado = "reservado"
+                asignaciones[ejemplar.id] = candidato
+                break
+
+    if asignaciones:
+        registrar_historial(db, cambios, MOTIVO_ASIGNACION)
+        encolar_avisos_reservas(db, [a.reserva_id for a in asignaciones.values()])
+        logger.info("Ejemplares asignados a reservas en espera: %d", len(asignaciones))
+
+    return asignaciones
+
+
+def liberar_ejemplar(db: Session, reserva: Reserva) -> Optional[Asignacion]:
+    """
+    Soltar el ejemplar retenido por una reserva activa que se cancela:
+    pasa a la siguiente reserva de la cola o vuelve a 'disponible'.
+    No hace commit. Retorna la asignación a la reserva que lo recibió, si hubo.
+    """
+    if not reserva.ejemplar_id:
+        return None
+
+    ejemplar = db.get(Ejemplar, reserva.ejemplar_id)
+    if ejemplar is None or ejemplar.estado != "reservado":
+        return None
+
+    asignaciones = asignar_ejemplares(db, [ejemplar])
+    if ejemplar.id not in asignaciones:
+        registrar_historial(db, [(ejemplar.id, ejemplar.estado, "disponible")], MOTIVO_LIBERACION)
+        ejemplar.estado = "disponible"
+
+    return asignaciones.get(ejemplar.id)
@@ -1,13 +1,17 @@
+import logging
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
 from dotenv import load_dotenv
-from typing import Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
+from app.services.plantillas_email import FILA_DOCUMENTO_PRESTADO, FILA_PRESTAMO_PROXIMO, FILA_PRESTAMO_VENCIDO, renderizar
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class EmailService:
     """
     Servicio para envío de correos electrónicos.
@@ -19,8 +23,36 @@ class EmailService:
         self.smtp_port = int(os.getenv("SMTP_PORT", "587"))
         self.smtp_user = os.getenv("SMTP_USER", "")
         self.smtp_password = os.getenv("SMTP_PASSWORD", "")
+        self.smtp_starttls = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "si", "yes")
         self.from_email = os.getenv("FROM_EMAIL", self.smtp_user)
         self.from_name = os.getenv("FROM_NAME", "Biblioteca Estación Central")
+        self.base_url = os.getenv("BASE_URL", "http://localhost:8000")
+        self._remitente = f"{self.from_name} <{self.from_email}>"
+    
+    def _conectar(self) -> smtplib.SMTP:
+        """Abrir una sesión SMTP (STARTTLS y login solo si están configurados)"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        try:
+            if self.smtp_starttls:
+                server.starttls()
+            if self.smtp_user:
+                server.login(self.smtp_user, self.smtp_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+    
+    def crear_mensaje(self, to: str, subject: str, html_content: str) -> MIMEMultipart:
+        """Armar el mensaje MIME con el contenido HTML"""
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = self._remitente
+        msg['To'] = to
+        
+        # Adjuntar contenido HTML
+        html_part = MIMEText(html_content, 'html')
+        msg.attach(html_part)
+        return msg
     
     def send_email(self, to: str, subject: str, html_content: str) -> bool:
         """
@@ -29,233 +61,123 @@ class EmailService:
         """
         try:
             # Crear mensaje
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = f"{self.from_name} <{self.from_email}>"
-            msg['To'] = to
-            
-            # Adjuntar contenido HTML
-            html_part = MIMEText(html_content, 'html')
-            msg.attach(html_part)
+            msg = self.crear_mensaje(to, subject, html_content)
             
             # Conectar y enviar
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_user, self.smtp_password)
+            with self._conectar() as server:
                 server.send_message(msg)
             
-            print(f"✅ Email enviado a {to}: {subject}")
+            logger.info("Email enviado a %s: %s", to, subject)
             return True
             
         except Exception as e:
-            print(f"❌ Error enviando email a {to}: {str(e)}")
+            logger.error("Error enviando email a %s: %s", to, e)
             return False
     
-    def send_validation_email(self, to: str, nombre: str, token: str) -> bool:
+    def send_bulk(self, mensajes: List[Tuple[str, str, str]]) -> List[Tuple[bool, Optional[str]]]:
         """
-        Enviar email de validación de cuenta.
+        Enviar muchos emails usando una sola conexión SMTP.
+        Recibe tuplas (to, subject, html_content) y retorna, en el mismo orden,
+        tuplas (exitoso, error). Un destinatario rechazado no corta el lote.
         """
-        # URL base (ajustar según tu configuración)
-        base_url = os.getenv("BASE_URL", "http://localhost:8000")
-        activation_link = f"{base_url}/api/v1/usuarios/activar/{token}"
+        if not mensajes:
+            return []
         
-        subject = "Activa tu cuenta - Biblioteca Estación Central"
+        try:
+            server = self._conectar()
+        except Exception as e:
+            logger.error("Error conectando al servidor SMTP: %s", e)
+            return [(False, str(e))] * len(mensajes)
         
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background-color: #2c3e50; color: white; padding: 20px; text-align: center; }}
-                .content {{ padding: 20px; background-color: #f4f4f4; }}
-                .button {{ 
-                    display: inline-block; 
-                    padding: 12px 24px; 
-                    background-color: #3498db; 
-                    color: white; 
-                    text-decoration: none; 
-                    border-radius: 5px; 
-                    margin: 20px 0;
-                }}
-                .footer {{ text-align: center; padding: 20px; font-size: 12px; color: #777; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>📚 Biblioteca Estación Central</h1>
-                </div>
-                <div class="content">
-                    <h2>¡Bienvenido, {nombre}!</h2>
-                    <p>Gracias por registrarte en nuestro sistema de préstamos.</p>
-                    <p>Para activar tu cuenta, haz clic en el siguiente botón:</p>
-                    <p style="text-align: center;">
-                        <a href="{activation_link}" class="button">Activar mi cuenta</a>
-                    </p>
-                    <p>O copia y pega este enlace en tu navegador:</p>
-                    <p style="word-break: break-all; color: #3498db;">{activation_link}</p>
-                    <p><strong>Este enlace expirará en 24 horas.</strong></p>
-                </div>
-                <div class="footer">
-                    <p>Si no solicitaste esta cuenta, ignora este mensaje.</p>
-                    <p>&copy; 2025 Biblioteca Estación Central</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+        resultados = []
+        with server:
+            for to, subject, html_content in mensajes:
+                try:
+                    server.send_message(self.crear_mensaje(to, subject, html_content))
+                    resultados.append((True, None))
+                except smtplib.SMTPServerDisconnected as e:
+                    # Sin conexión no tiene sentido seguir intentando
+                    resultados.extend([(False, str(e))] * (len(mensajes) - len(resultados)))
+                    break
+                except Exception as e:
+                    resultados.append((False, str(e)))
         
+        exitosos = sum(1 for ok, _ in resultados if ok)
+        logger.info("Lote de emails enviado: %d/%d", exitosos, len(mensajes))
+        return resultados
+    
+    def send_validation_email(self, to: str, nombre: str, token: str) -> bool:
+        """
+        Enviar email de validación de cuenta.
+        """
+        subject, html_content = self.plantilla_validacion(nombre, token)
         return self.send_email(to, subject, html_content)
     
+    def plantilla_validacion(self, nombre: str, token: str) -> Tuple[str, str]:
+        """
+        Asunto y HTML del email de activación de cuenta.
+        Separado del envío para poder mandarlo en lotes con send_bulk.
+        """
+        enlace = f"{self.base_url}/api/v1/usuarios/activar/{token}"
+        return renderizar("validacion", nombre=nombre, enlace=enlace)
+    
     def send_recordatorio_vencido(self, to: str, nombre: str, prestamos_vencidos: list) -> bool:
         """
         Enviar recordatorio de préstamos vencidos.
         """
-        subject = "⚠️ Recordatorio: Tienes préstamos vencidos"
-        
-        # Generar tabla de préstamos
-        tabla_prestamos = ""
-        for prestamo in prestamos_vencidos:
-            tabla_prestamos += f"""
-            <tr>
-                <td style="padding: 10px; border: 1px solid #ddd;">{prestamo['documento']}</td>
-                <td style="padding: 10px; border: 1px solid #ddd;">{prestamo['fecha_devolucion']}</td>
-                <td style="padding: 10px; border: 1px solid #ddd; color: red; font-weight: bold;">
-                    {prestamo['dias_atraso']} días
-                </td>
-            </tr>
-            """
-        
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background-color: #e74c3c; color: white; padding: 20px; text-align: center; }}
-                .content {{ padding: 20px; background-color: #f4f4f4; }}
-                .warning {{ background-color: #fff3cd; border-left: 4px solid #ffc107; padding: 15px; margin: 20px 0; }}
-                table {{ width: 100%; border-collapse: collapse; margin: 20px 0; background: white; }}
-                th {{ background-color: #2c3e50; color: white; padding: 12px; text-align: left; }}
-                .footer {{ text-align: center; padding: 20px; font-size: 12px; color: #777; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>⚠️ Préstamos Vencidos</h1>
-                </div>
-                <div class="content">
-                    <h2>Hola, {nombre}</h2>
-                    <p>Este es un recordatorio de que tienes los siguientes préstamos vencidos:</p>
-                    
-                    <table>
-                        <thead>
-                            <tr>
-                                <th>Documento</th>
-                                <th>Fecha de devolución</th>
-                                <th>Días de atraso</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-                            {tabla_prestamos}
-                        </tbody>
-                    </table>
-                    
-                    <div class="warning">
-                        <strong>⚠️ Importante:</strong>
-                        <p>Por cada día de atraso se aplicarán 2 días de sanción (mínimo 3 días, máximo 30 días).</p>
-                        <p>Durante el período de sanción no podrás solicitar nuevos préstamos.</p>
-                    </div>
-                    
-                    <p>Por favor, devuelve los documentos lo antes posible en el mesón de atención.</p>
-                </div>
-                <div class="footer">
-                    <p>Biblioteca Estación Central</p>
-                    <p>&copy; 2025 Todos los derechos reservados</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
+        subject, html_content = self.plantilla_recordatorio_vencido(nombre, prestamos_vencidos)
         return self.send_email(to, subject, html_content)
     
+    def plantilla_recordatorio_vencido(self, nombre: str, prestamos_vencidos: list) -> Tuple[str, str]:
+        """
+        Asunto y HTML del recordatorio de préstamos vencidos.
+        Cada préstamo es un dict con documento, fecha_devolucion y dias_atraso.
+        """
+        filas = FILA_PRESTAMO_VENCIDO.renderizar_muchos(prestamos_vencidos)
+        return renderizar("recordatorio_vencido", nombre=nombre, filas=filas)
+    
+    def plantilla_recordatorio_proximo(self, nombre: str, prestamos: list) -> Tuple[str, str]:
+        """
+        Asunto y HTML del aviso de préstamos que vencen pronto.
+        Cada préstamo es un dict con documento y fecha_devolucion.
+        """
+        filas = FILA_PRESTAMO_PROXIMO.renderizar_muchos(prestamos)
+        return renderizar("recordatorio_proximo", nombre=nombre, filas=filas)
+    
     def send_confirmacion_prestamo(self, to: str, nombre: str, prestamo_info: dict) -> bool:
         """
         Enviar confirmación de préstamo realizado.
         """
-        subject = "✅ Confirmación de préstamo - Biblioteca EC"
-        
-        # Generar lista de documentos
-        lista_docs = ""
-        for doc in prestamo_info['documentos']:
-            lista_docs += f"""
-            <tr>
-                <td style="padding: 10px; border: 1px solid #ddd;">{doc['titulo']}</td>
-                <td style="padding: 10px; border: 1px solid #ddd;">{doc['autor']}</td>
-                <td style="padding: 10px; border: 1px solid #ddd;">{doc['fecha_devolucion']}</td>
-            </tr>
-            """
-        
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background-color: #27ae60; color: white; padding: 20px; text-align: center; }}
-                .content {{ padding: 20px; background-color: #f4f4f4; }}
-                .info-box {{ background-color: #e8f5e9; border-left: 4px solid #27ae60; padding: 15px; margin: 20px 0; }}
-                table {{ width: 100%; border-collapse: collapse; margin: 20px 0; background: white; }}
-                th {{ background-color: #2c3e50; color: white; padding: 12px; text-align: left; }}
-                .footer {{ text-align: center; padding: 20px; font-size: 12px; color: #777; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>✅ Préstamo Confirmado</h1>
-                </div>
-                <div class="content">
-                    <h2>Hola, {nombre}</h2>
-                    <p>Tu préstamo ha sido registrado exitosamente.</p>
-                    
-                    <div class="info-box">
-                        <strong>Tipo de préstamo:</strong> {prestamo_info['tipo']}<br>
-                        <strong>Fecha de préstamo:</strong> {prestamo_info['fecha_prestamo']}<br>
-                        <strong>Código de préstamo:</strong> #{prestamo_info['id']}
-                    </div>
-                    
-                    <h3>Documentos prestados:</h3>
-                    <table>
-                        <thead>
-                            <tr>
-                                <th>Título</th>
-                                <th>Autor</th>
-                                <th>Fecha de devolución</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-                            {lista_docs}
-                        </tbody>
-                    </table>
-                    
-                    <p><strong>Recuerda devolver los documentos en la fecha indicada para evitar sanciones.</strong></p>
-                </div>
-                <div class="footer">
-                    <p>Biblioteca Estación Central</p>
-                    <p>&copy; 2025 Todos los derechos reservados</p>
-                </div>
-            </div>
-        </body>
-        </html>
+        subject, html_content = self.plantilla_confirmacion_prestamo(nombre, prestamo_info)
+        return self.send_email(to, subject, html_content)
+    
+    def plantilla_confirmacion_prestamo(self, nombre: str, prestamo_info: dict) -> Tuple[str, str]:
         """
-        
+        Asunto y HTML de la confirmación de préstamo.
+        prestamo_info lleva id, tipo, fecha_prestamo y documentos (titulo, autor, fecha_devolucion).
+        """
+        filas = FILA_DOCUMENTO_PRESTADO.renderizar_muchos(prestamo_info['documentos'])
+        return renderizar(
+            "confirmacion_prestamo",
+            nombre=nombre,
+            tipo=prestamo_info['tipo'],
+            fecha_prestamo=prestamo_info['fecha_prestamo'],
+            id=prestamo_info['id'],
+            filas=filas
+        )
+
+    def plantilla_reserva_disponible(self, nombre: str, documento: str, fecha_limite) -> Tuple[str, str]:
+        """
+        Asunto y HTML del aviso de reserva lista para retirar.
+        Separado del envío para poder mandarlo en lotes con send_bulk.
+        """
+        return renderizar("reserva_disponible", nombre=nombre, documento=documento, fecha_limite=fecha_limite)
+    
+    def send_reserva_disponible(self, to: str, nombre: str, documento: str, fecha_limite) -> bool:
+        """
+        Avisar que una reserva está lista para retirar.
+        """
+        subject, html_content = self.plantilla_reserva_disponible(nombre, documento, fecha_limite)
         return self.send_email(to, subject, html_content)
 
 # Instancia global del servicio
@@ -0,0 +1,180 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional
+from fastapi import HTTPException, status
+from app.config import settings
+from app.models.usuario import pwd_context
+
+# --- HASHING DE CONTRASEÑAS FUERA DEL EVENT LOOP ---
+# bcrypt consume ~250 ms de CPU por operación. Hacerlo dentro de un endpoint
+# async bloquea todas las demás peticiones del worker, y hacerlo en el pool
+# genérico de FastAPI lo satura en un pico de logins. Este servicio usa su
+# propio pool acotado (hilos: bcrypt libera el GIL; o procesos) y rechaza con
+# 503 cuando la cola supera HASH_MAX_EN_COLA, en vez de acumular esperas.
+# Quienes lo usan son endpoints def: esperan el resultado en el threadpool de
+# FastAPI, junto con sus consultas a la BD, y el event loop queda libre.
+# Los procesos masivos (importación de usuarios) usan otro pool, de procesos:
+# miles de hashes no pasan por la cola de los logins ni compiten por el GIL.
+
+
+def _hashear(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verificar(password: str, password_hash: str) -> bool:
+    return pwd_context.verify(password, password_hash)
+
+
+def _hashear_tanda(passwords: List[str]) -> List[str]:
+    return [pwd_context.hash(password) for password in passwords]
+
+
+class HashingService:
+    """
+    Pool dedicado para hashear y verificar contraseñas.
+    Lleva contadores para exponer la profundidad de la cola.
+    """
+
+    def __init__(
+        self, trabajadores: int = 4, modo: str = "hilos", max_en_cola: int = 100, trabajadores_masivo: int = 2
+    ):
+        if modo not in ("hilos", "procesos"):
+            raise ValueError("modo debe ser 'hilos' o 'procesos'")
+
+        self.trabajadores = trabajadores
+        self.modo = modo
+        self.max_en_cola = max_en_cola
+        self.trabajadores_masivo = max(trabajadores_masivo, 1)
+        self._executor: Optional[Executor] = None
+        self._executor_masivo: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        self.pendientes = 0  # Enviadas al pool y aún sin terminar
+        self.completadas = 0
+        self.rechazadas = 0
+        self.max_pendientes = 0
+        self._segundos_total = 0.0
+        self.hasheadas_masivo = 0
+
+    def _pool(self) -> Executor:
+        # Se crea al primer uso: los procesos no deben lanzarse al importar
+        if self._executor is None:
+            if self.modo == "procesos":
+                self._executor = ProcessPoolExecutor(max_workers=self.trabajadores)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.trabajadores, thread_name_prefix="hashing"
+                )
+        return self._executor
+
+    def _pool_masivo(self) -> ProcessPoolExecutor:
+        # spawn y no fork: el worker tiene hilos (event loop, pools) y un
+        # fork copia sus locks en el estado en que estén
+        with self._lock:
+            if self._executor_masivo is None:
+                self._executor_masivo = ProcessPoolExecutor(
+                    max_workers=self.trabajadores_masivo, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor_masivo
+
+    @property
+    def en_cola(self) -> int:
+        """Operaciones esperando un trabajador libre"""
+        return max(self.pendientes - self.trabajadores, 0)
+
+    def _enviar(self, funcion: Callable, *args, limitar: bool = True) -> Future:
+        with self._lock:
+            if limitar and self.en_cola >= self.max_en_cola:
+                self.rechazadas += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Servidor ocupado, intenta nuevamente en unos segundos",
+                    headers={"Retry-After": "2"}
+                )
+            self.pendientes += 1
+            self.max_pendientes = max(self.max_pendientes, self.pendientes)
+            futuro = self._pool().submit(funcion, *args)
+
+        inicio = time.perf_counter()
+
+        def _terminar(_):
+            with self._lock:
+                self.pendientes -= 1
+                self.completadas += 1
+                self._segundos_total += time.perf_counter() - inicio
+
+        futuro.add_done_callback(_terminar)
+        return futuro
+
+    def hash(self, password: str) -> str:
+        """
+        Hashear una contraseña en el pool. Bloquea al llamador: usar desde
+        endpoints def, que corren en el threadpool y no en el event loop.
+        """
+        return self._enviar(_hashear, password).result()
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        """Verificar una contraseña en el pool (bloquea al llamador, ver hash)"""
+        return self._enviar(_verificar, password, password_hash).result()
+
+    def hash_many(
+        self, passwords: List[str], tanda: int = 100, al_avanzar: Optional[Callable[[int], None]] = None
+    ) -> List[str]:
+        """
+        Hashear muchas contraseñas para un proceso masivo (síncrono, en el
+        orden recibido). Van en tandas al pool de procesos masivo, no al de
+        los logins, y sin límite de cola. Si se indica, al_avanzar recibe
+        el total hasheado cada vez que termina una tanda.
+        """
+        pool = self._pool_masivo()
+        futuros = {
+            pool.submit(_hashear_tanda, passwords[i:i + tanda]): i
+            for i in range(0, len(passwords), tanda)
+        }
+
+        hashes: List[Optional[str]] = [None] * len(passwords)
+        hechas = 0
+        for futuro in as_completed(futuros):
+            inicio = futuros[futuro]
+            resultado = futuro.result()
+            hashes[inicio:inicio + len(resultado)] = resultado
+            hechas += len(resultado)
+            with self._lock:
+                self.hasheadas_masivo += len(resultado)
+            if al_avanzar:
+                al_avanzar(hechas)
+        return hashes
+
+    def cerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._executor_masivo is not None:
+            self._executor_masivo.shutdown(wait=False, cancel_futures=True)
+            self._executor_masivo = None
+
+    def estadisticas(self) -> dict:
+        return {
+            "modo": self.modo,
+            "trabajadores": self.trabajadores,
+            "max_en_cola": self.max_en_cola,
+            "trabajadores_masivo": self.trabajadores_masivo,
+            "hasheadas_masivo": self.hasheadas_masivo,
+            "en_cola": self.en_cola,
+            "en_proceso": min(self.pendientes, self.trabajadores),
+            "max_pendientes": self.max_pendientes,
+            "completadas": self.completadas,
+            "rechazadas": self.rechazadas,
+            "ms_promedio": round(self._segundos_total / self.completadas * 1000, 2) if self.completadas else 0
+        }
+
+
+# Instancia global del servicio
+hashing_service = HashingService(
+    trabajadores=settings.HASH_TRABAJADORES,
+    modo=settings.HASH_MODO,
+    max_en_cola=settings.HASH_MAX_EN_COLA,
+    trabajadores_masivo=settings.HASH_TRABAJADORES_MASIVO
+)
@@ -0,0 +1,420 @@
+import csv
+import io
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Set, Tuple
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import SessionLocal
+from app.models.importacion_usuarios import ImportacionUsuarios
+from app.models.token_validacion import TokenValidacion
+from app.models.usuario import Usuario
+from app.schemas.usuario import UsuarioCreate
+from app.services.bandeja_salida import encolar_correos
+from app.services.email_service import email_service
+from app.services.hashing_service import hashing_service
+from app.utils.validations import validar_rut, formatear_rut
+
+logger = logging.getLogger(__name__)
+
+# --- IMPORTACIÓN MASIVA DE USUARIOS ---
+# Para matricular un año completo de alumnos desde un CSV o NDJSON. El
+# endpoint revisa el formato, guarda el archivo en importaciones_usuarios y
+# responde 202; la importación corre en segundo plano:
+# 1. Valida todas las filas en una pasada (esquema, RUT y repetidos en el archivo).
+# 2. Descarta los RUT/email ya registrados con consultas por conjunto (IN),
+#    no una consulta por fila.
+# 3. Hashea las contraseñas en el pool de procesos masivo de hashing_service
+#    (los logins no esperan detrás) e informa el avance en la fila.
+# 4. Inserta usuarios, tokens y emails de activación (en la bandeja de
+#    salida) en lotes de IMPORTACION_LOTE, todo en una transacción junto con
+#    el resultado: la importación queda completa o no queda.
+# Una sola importación en curso en toda la BD (índice único parcial): una
+# segunda recibe 409, venga del worker que venga. La tarea
+# "importaciones_usuarios" retoma las pendientes cuyo worker se detuvo antes
+# de empezar y da por fallidas las que dejaron de avanzar.
+
+FORMATOS = ("csv", "ndjson")
+COLUMNAS_REQUERIDAS = ("rut", "nombres", "apellidos", "email", "password")
+
+# Reintentos de la transacción final si un registro concurrente ocupa un RUT/email
+INTENTOS_INSERCION = 3
+
+
+def _lotes(items: list, tamano: int) -> Iterable[list]:
+    for i in range(0, len(items), tamano):
+        yield items[i:i + tamano]
+
+
+def leer_archivo(contenido: bytes, formato: str) -> List[dict]:
+    """
+    Convertir el archivo subido en una lista de filas (dict).
+    Un archivo mal formado se rechaza completo con 400.
+    """
+    if formato not in FORMATOS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Formato inválido. Use: {', '.join(FORMATOS)}"
+        )
+
+    try:
+        texto = contenido.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El archivo debe estar codificado en UTF-8"
+        )
+
+    if formato == "csv":
+        lector = csv.DictReader(io.StringIO(texto))
+        faltantes = [c for c in COLUMNAS_REQUERIDAS if c not in (lector.fieldnames or [])]
+        if faltantes:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Faltan columnas: {', '.join(faltantes)}"
+            )
+        filas = list(lector)
+    else:
+        filas = []
+        for numero, linea in enumerate(texto.splitlines(), 1):
+            if not linea.strip():
+                continue
+            try:
+                fila = json.loads(linea)
+            except json.JSONDecodeError:
+                fila = None
+            if not isinstance(fila, dict):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Línea {numero}: se esperaba un objeto JSON"
+                )
+            filas.append(fila)
+
+    if len(filas) > settings.IMPORTACION_MAX_FILAS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El archivo supera el máximo de {settings.IMPORTACION_MAX_FILAS} filas"
+        )
+
+    return filas
+
+
+def _mensaje_validacion(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(l) for l in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+def validar_filas(filas: List[dict]) -> Tuple[List[Tuple[int, UsuarioCreate]], List[dict]]:
+    """
+    Validar todas las filas sin tocar la BD.
+    Retorna las filas válidas como (número de fila, datos con RUT formateado
+    y email en minúsculas) y los errores por fila.
+    """
+    validas = []
+    errores = []
+    fila_por_rut: Dict[str, int] = {}
+    fila_por_email: Dict[str, int] = {}
+
+    for numero, fila in enumerate(filas, 1):
+        # Las celdas vacías del CSV cuentan como ausentes (rol toma su default)
+        valores = {k: v.strip() if isinstance(v, str) else v for k, v in fila.items() if k}
+        valores = {k: v for k, v in valores.items() if v not in (None, "")}
+
+        try:
+            datos = UsuarioCreate.model_validate(valores)
+        except ValidationError as e:
+            errores.append({"fila": numero, "rut": valores.get("rut"), "error": _mensaje_validacion(e)})
+            continue
+
+        if not validar_rut(datos.rut):
+            errores.append({"fila": numero, "rut": datos.rut, "error": "RUT inválido"})
+            continue
+
+        datos.rut = formatear_rut(datos.rut)
+        datos.email = datos.email.lower()
+
+        if datos.rut in fila_por_rut:
+            errores.append({"fila": numero, "rut": datos.rut, "error": f"RUT repetido en la fila {fila_por_rut[datos.rut]}"})
+            continue
+        if datos.email in fila_por_email:
+            errores.append({"fila": numero, "rut": datos.rut, "error": f"Email repetido en la fila {fila_por_email[datos.email]}"})
+            continue
+
+        fila_por_rut[datos.rut] = numero
+        fila_por_email[datos.email] = numero
+        validas.append((numero, datos))
+
+    return validas, errores
+
+
+def buscar_existentes(db: Session, ruts: List[str], emails: List[str]) -> Tuple[Set[str], Set[str]]:
+    """RUTs y emails que ya están registrados (consultas IN por lotes)"""
+    ruts_existentes = set()
+    emails_existentes = set()
+
+    for lote_ruts, lote_emails in zip(
+        _lotes(ruts, settings.IMPORTACION_LOTE), _lotes(emails, settings.IMPORTACION_LOTE)
+    ):
+        filas = db.query(Usuario.rut, Usuario.email).filter(
+            or_(Usuario.rut.in_(lote_ruts), Usuario.email.in_(lote_emails))
+        ).all()
+        for rut, email in filas:
+            ruts_existentes.add(rut)
+            emails_existentes.add(email)
+
+    return ruts_existentes, emails_existentes
+
+
+def encolar_importacion(db: Session, contenido: bytes, formato: str, usuario_id: int) -> ImportacionUsuarios:
+    """
+    Revisar el archivo y dejarlo en la cola de importaciones.
+    400 si está mal formado; 409 si ya hay una importación en curso.
+    """
+    filas = leer_archivo(contenido, formato)
+
+    importacion = ImportacionUsuarios(
+        creada_por=usuario_id,
+        formato=formato,
+        archivo=contenido,
+        estado="pendiente",
+        en_curso=True,
+        total_filas=len(filas)
+    )
+    db.add(importacion)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Ya hay una importación de usuarios en curso"
+        )
+    db.refresh(importacion)
+    return importacion
+
+
+def ejecutar_importacion(importacion_id: int) -> bool:
+    """Procesar una importación pendiente con una sesión propia (tarea en segundo plano)"""
+    db = SessionLocal()
+    try:
+        return _ejecutar(db, importacion_id)
+    finally:
+        db.close()
+
+
+def procesar_importaciones(db: Session) -> dict:
+    """
+    Tarea periódica: dar por fallidas las importaciones que dejaron de avanzar
+    (su worker se detuvo) y procesar la pendiente, si la hay.
+    """
+    limite = datetime.utcnow() - timedelta(minutes=settings.IMPORTACION_ABANDONO_MINUTOS)
+    abandonadas = db.execute(
+        update(ImportacionUsuarios)
+        .where(ImportacionUsuarios.estado == "procesando", ImportacionUsuarios.actualizada_en < limite)
+        .values(**_terminada("fallida"), ultimo_error="Importación abandonada: el worker que la procesaba se detuvo")
+    ).rowcount
+    db.commit()
+    if abandonadas:
+        logger.warning("%d importaciones de usuarios abandonadas", abandonadas)
+
+    pendiente = db.query(ImportacionUsuarios.id).filter(
+        ImportacionUsuarios.estado == "pendiente"
+    ).order_by(ImportacionUsuarios.id).first()
+    procesada = _ejecutar(db, pendiente.id) if pendiente else False
+
+    return {"abandonadas": abandonadas, "procesada": pendiente.id if procesada else None}
+
+
+def _terminada(estado: str) -> dict:
+    """Valores de una importación que termina: libera el turno y borra el archivo"""
+    return {"estado": estado, "en_curso": None, "archivo": None, "terminada_en": datetime.utcnow()}
+
+
+def _ejecutar(db: Session, importacion_id: int) -> bool:
+    """
+    Tomar la importación (pendiente -> procesando) y procesarla. Retorna
+    False si otro worker ya la tomó. Un error la deja fallida, sin usuarios
+    creados.
+    """
+    ahora = datetime.utcnow()
+    tomada = db.execute(
+        update(ImportacionUsuarios)
+        .where(ImportacionUsuarios.id == importacion_id, ImportacionUsuarios.estado == "pendiente")
+        .values(estado="procesando", iniciada_en=ahora, actualizada_en=ahora)
+    ).rowcount
+    db.commit()
+    if not tomada:
+        return False
+
+    try:
+        _importar(db, importacion_id)
+    except Exception as e:
+        db.rollback()
+        logger.exception("Importación de usuarios %d fallida", importacion_id)
+        db.execute(
+            update(ImportacionUsuarios)
+            .where(ImportacionUsuarios.id == importacion_id, ImportacionUsuarios.estado == "procesando")
+            .values(**_terminada("fallida"), ultimo_error=getattr(e, "detail", None) or str(e) or type(e).__name__)
+        )
+        db.commit()
+    return True
+
+
+def _avance(db: Session, importacion_id: int, **valores):
+    """Registrar el avance (y que el worker sigue vivo) en su propia transacción"""
+    db.execute(
+        update(ImportacionUsuarios)
+        .where(ImportacionUsuarios.id == importacion_id, ImportacionUsuarios.estado == "procesando")
+        .values(actualizada_en=datetime.utcnow(), **valores)
+    )
+    db.commit()
+
+
+def _descartar_existentes(
+    db: Session, filas: List[Tuple[int, UsuarioCreate]], errores: List[dict]
+) -> List[Tuple[int, UsuarioCreate]]:
+    """Quitar las filas cuyo RUT o email ya está registrado (quedan en errores)"""
+    ruts_existentes, emails_existentes = buscar_existentes(
+        db, [d.rut for _, d in filas], [d.email for _, d in filas]
+    )
+
+    nuevas = []
+    for numero, datos in filas:
+        if datos.rut in ruts_existentes:
+            errores.append({"fila": numero, "rut": datos.rut, "error": "El RUT ya está registrado"})
+        elif datos.email in emails_existentes:
+            errores.append({"fila": numero, "rut": datos.rut, "error": "El email ya está registrado"})
+        else:
+            nuevas.append((numero, datos))
+    return nuevas
+
+
+def _importar(db: Session, importacion_id: int):
+    importacion = db.get(ImportacionUsuarios, importacion_id)
+    filas = leer_archivo(importacion.archivo, importacion.formato)
+    validas, errores = validar_filas(filas)
+
+    nuevas = _descartar_existentes(db, validas, errores)
+
+    # Liberar la conexión mientras se hashea (lo más lento de la importación)
+    db.rollback()
+    hashes = hashing_service.hash_many(
+        [datos.password for _, datos in nuevas],
+        al_avanzar=lambda hechas: _avance(db, importacion_id, hasheadas=hechas)
+    )
+    hash_por_fila = {numero: password_hash for (numero, _), password_hash in zip(nuevas, hashes)}
+
+    for intento in range(1, INTENTOS_INSERCION + 1):
+        try:
+            creados = _insertar(db, importacion_id, nuevas, hash_por_fila, errores)
+            break
+        except IntegrityError:
+            # Un registro concurrente tomó un RUT/email después de la revisión:
+            # se vuelve a revisar contra la BD y se reintenta sin esas filas
+            db.rollback()
+            if intento == INTENTOS_INSERCION:
+                raise
+            logger.warning("Importación de usuarios %d: conflicto de unicidad, reintentando", importacion_id)
+            nuevas = _descartar_existentes(db, nuevas, errores)
+
+    logger.info(
+        "Importación de usuarios %d: %d creados, %d rechazados", importacion_id, creados, len(errores)
+    )
+
+
+def _insertar(
+    db: Session,
+    importacion_id: int,
+    nuevas: List[Tuple[int, UsuarioCreate]],
+    hash_por_fila: Dict[int, str],
+    errores: List[dict]
+) -> int:
+    """
+    Insertar usuarios, tokens y emails de activación por lotes y cerrar la
+    importación con su resultado, en una sola transacción.
+    """
+    creados_total = 0
+    for lote in _lotes(nuevas, settings.IMPORTACION_LOTE):
+        ahora = datetime.utcnow()
+        creados = db.execute(
+            insert(Usuario).returning(Usuario.id, Usuario.email, Usuario.nombres, sort_by_parameter_order=True),
+            [
+                {
+                    "rut": datos.rut,
+                    "nombres": datos.nombres,
+                    "apellidos": datos.apellidos,
+                    "email": datos.email,
+                    "rol": datos.rol or "usuario",
+                    "password_hash": hash_por_fila[numero],
+                    "activo": False  # Pendiente de activación
+                }
+                for numero, datos in lote
+            ]
+        ).all()
+
+        tokens = [TokenValidacion.generar_token() for _ in creados]
+        db.execute(insert(TokenValidacion), [
+            {
+                "usuario_id": usuario_id,
+                "token": token,
+                "fecha_expiracion": ahora + timedelta(hours=24),
+                "usado": False,
+                "created_at": ahora
+            }
+            for (usuario_id, _, _), token in zip(creados, tokens)
+        ])
+
+        correos = []
+        for (usuario_id, email, nombres), token in zip(creados, tokens):
+            asunto, html = email_service.plantilla_validacion(nombres, token)
+            correos.append({
+                "usuario_id": usuario_id,
+                "tipo": "validacion",
+                "destinatario": email,
+                "asunto": asunto,
+                "html": html
+            })
+        encolar_correos(db, correos)
+        creados_total += len(creados)
+
+    errores = sorted(errores, key=lambda e: e["fila"])
+    cerrada = db.execute(
+        update(ImportacionUsuarios)
+        .where(ImportacionUsuarios.id == importacion_id, ImportacionUsuarios.estado == "procesando")
+        .values(
+            **_terminada("completada"),
+            actualizada_en=datetime.utcnow(),
+            creados=creados_total,
+            rechazados=len(errores),
+            errores=json.dumps(errores, ensure_ascii=False)
+        )
+    ).rowcount
+    if not cerrada:
+        # Se dio por abandonada mientras corría: no se deja nada
+        db.rollback()
+        raise RuntimeError("La importación dejó de estar en proceso")
+    db.commit()
+    return creados_total
+
+
+def resumen_importacion(importacion: ImportacionUsuarios) -> dict:
+    """Estado, avance y resultado de una importación (para el endpoint de consulta)"""
+    return {
+        "id": importacion.id,
+        "estado": importacion.estado,
+        "total_filas": importacion.total_filas,
+        "hasheadas": importacion.hasheadas,
+        "creados": importacion.creados,
+        "rechazados": importacion.rechazados,
+        "errores": json.loads(importacion.errores) if importacion.errores else [],
+        "ultimo_error": importacion.ultimo_error,
+        "created_at": importacion.created_at,
+        "iniciada_en": importacion.iniciada_en,
+        "terminada_en": importacion.terminada_en
+    }
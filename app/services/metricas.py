@@ -0,0 +1,174 @@
+import hmac
+import time
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import HTTPException, Request, status
+from sqlalchemy import event
+from app.config import settings
+from app.database import engine
+from app.utils.metricas import Contador, Gauge, Histograma, exportar_prometheus
+
+# --- MÉTRICAS DE LA API (GET /metrics) ---
+# MiddlewareMetricas es un middleware ASGI puro (sin BaseHTTPMiddleware, que
+# agrega una tarea y copia el cuerpo por respuesta): mide cada solicitud de
+# principio a fin, incluido el envío del cuerpo, y la registra con la ruta
+# como plantilla ("/api/v1/ejemplares/{ejemplar_id}"), no con la URL, para
+# no crear una serie por id. Las URLs que no calzan con ninguna ruta van a
+# "sin_ruta".
+#
+# Las consultas SQL se cuentan con eventos del engine y se atribuyen a la
+# solicitud en curso mediante una ContextVar (se propaga a los hilos donde
+# corren los endpoints síncronos). Las consultas de las tareas programadas
+# no tienen solicitud y no se cuentan.
+#
+# Las métricas son por proceso: con varios workers cada uno expone las suyas.
+#
+# Exponen rutas, volumen y latencias de la API: GET /metrics solo existe con
+# METRICAS_ACTIVAS y exige el token METRICAS_TOKEN (o, sin token configurado,
+# que la solicitud venga de la misma máquina).
+
+CLIENTES_LOCALES = ("127.0.0.1", "::1", "localhost")
+
+SIN_RUTA = "sin_ruta"
+
+solicitudes_total = Contador(
+    "http_solicitudes_total", "Solicitudes HTTP atendidas", ("metodo", "ruta", "estado")
+)
+duracion_solicitudes = Histograma(
+    "http_duracion_segundos", "Latencia de las solicitudes HTTP en segundos", ("metodo", "ruta")
+)
+solicitudes_en_curso = Gauge(
+    "http_solicitudes_en_curso", "Solicitudes HTTP en proceso"
+)
+consultas_total = Contador(
+    "db_consultas_total", "Consultas SQL ejecutadas durante solicitudes HTTP", ("ruta",)
+)
+consultas_segundos = Contador(
+    "db_consultas_segundos_total", "Tiempo total en consultas SQL durante solicitudes HTTP", ("ruta",)
+)
+consultas_por_solicitud = Histograma(
+    "db_consultas_por_solicitud", "Consultas SQL por solicitud HTTP", ("ruta",),
+    limites=(0, 1, 2, 5, 10, 25, 50, 100)
+)
+pool_conexiones = Gauge(
+    "db_pool_conexiones", "Conexiones del pool de la base de datos", ("estado",)
+)
+
+METRICAS = (
+    solicitudes_total,
+    duracion_solicitudes,
+    solicitudes_en_curso,
+    consultas_total,
+    consultas_segundos,
+    consultas_por_solicitud,
+    pool_conexiones,
+)
+
+# [consultas, segundos] de la solicitud en curso
+_consultas_solicitud: ContextVar[Optional[list]] = ContextVar("consultas_solicitud", default=None)
+
+
+# ============================================
+# CONSULTAS SQL
+# ============================================
+
+@event.listens_for(engine, "before_cursor_execute")
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _consultas_solicitud.get() is not None:
+        context._inicio_metricas = time.perf_counter()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    acumulado = _consultas_solicitud.get()
+    inicio = getattr(context, "_inicio_metricas", None)
+    if acumulado is None or inicio is None:
+        return
+    acumulado[0] += 1
+    acumulado[1] += time.perf_counter() - inicio
+
+
+# ============================================
+# MIDDLEWARE
+# ============================================
+
+class MiddlewareMetricas:
+    """Latencia, estado y consultas SQL por ruta de cada solicitud HTTP"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        estado = [500]  # Si la app lanza una excepción sin responder
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado[0] = mensaje["status"]
+            await send(mensaje)
+
+        consultas = [0, 0.0]
+        token = _consultas_solicitud.set(consultas)
+        solicitudes_en_curso.sumar()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracion = time.perf_counter() - inicio
+            solicitudes_en_curso.sumar(cantidad=-1)
+            _consultas_solicitud.reset(token)
+
+            ruta = getattr(scope.get("route"), "path", SIN_RUTA)
+            metodo = scope["method"]
+            solicitudes_total.incrementar((metodo, ruta, str(estado[0])))
+            duracion_solicitudes.observar((metodo, ruta), duracion)
+            consultas_por_solicitud.observar((ruta,), consultas[0])
+            if consultas[0]:
+                consultas_total.incrementar((ruta,), consultas[0])
+                consultas_segundos.incrementar((ruta,), consultas[1])
+
+
+# ============================================
+# EXPOSICIÓN
+# ============================================
+
+def _actualizar_pool():
+    pool = engine.pool
+    for estado, metodo in (
+        ("tamano", "size"),
+        ("en_uso", "checkedout"),
+        ("libres", "checkedin"),
+        ("desborde", "overflow"),
+    ):
+        medir = getattr(pool, metodo, None)
+        if medir is not None:
+            # overflow() es negativo mientras no se abran todas las conexiones base
+            pool_conexiones.fijar((estado,), max(medir(), 0))
+
+
+def exportar_metricas() -> str:
+    """Texto de /metrics en formato Prometheus"""
+    _actualizar_pool()
+    return exportar_prometheus(METRICAS)
+
+
+def autorizar_metricas(request: Request):
+    """Dependencia de GET /metrics: token Bearer METRICAS_TOKEN o cliente local"""
+    if settings.METRICAS_TOKEN:
+        esquema, _, token = request.headers.get("Authorization", "").partition(" ")
+        if esquema.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.METRICAS_TOKEN.encode()):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token de métricas inválido",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        return
+
+    if request.client is None or request.client.host not in CLIENTES_LOCALES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Sin METRICAS_TOKEN, las métricas solo se sirven a localhost"
+        )
@@ -0,0 +1,309 @@
+import itertools
+import json
+import logging
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.services.cache_usuarios import obtener_principal
+from app.utils.auth import decode_token
+
+logger = logging.getLogger(__name__)
+
+# --- PERFILADO DE SOLICITUDES BAJO DEMANDA ---
+# Un admin agrega el header "X-Perfilar: 1" (o ?perfilar=1) a una solicitud
+# y esa solicitud se perfila: un hilo muestreador lee las pilas de todos los
+# hilos cada PERFILADO_INTERVALO_MS (sys._current_frames, sin instrumentar
+# cada llamada como cProfile, que además solo ve su propio hilo y los
+# endpoints síncronos corren en el threadpool) y las consultas SQL de la
+# solicitud quedan en una línea de tiempo. La respuesta lleva el header
+# X-Perfil-Id para descargar el resultado desde /api/v1/admin/perfiles.
+#
+# Con PERFILADO_MUESTREO_CADA = N > 0 además se perfila 1 de cada N
+# solicitudes en segundo plano; se guardan en otro directorio que rota
+# (quedan los PERFILADO_MAX_ARCHIVOS más recientes de cada tipo).
+#
+# Archivos por perfil, en PERFILADO_DIRECTORIO/<tipo>/:
+#   <id>.folded  pilas colapsadas ("hilo;func;func N"), listas para
+#                flamegraph.pl, speedscope o inferno
+#   <id>.json    datos de la solicitud y consultas SQL (sin parámetros,
+#                que pueden traer datos personales)
+#
+# Se perfila una solicitud a la vez por proceso. El muestreador ve todos los
+# hilos ocupados, no solo el de la solicitud: con mucha concurrencia las
+# pilas incluyen trabajo de otras solicitudes (las consultas SQL sí son solo
+# de la solicitud perfilada).
+
+TIPO_SOLICITADO = "solicitados"
+TIPO_MUESTREO = "muestreo"
+
+HEADER_PERFILAR = b"x-perfilar"
+_PATRON_ID = re.compile(r"^\d{8}T\d{12}-[0-9a-f]{6}$")
+_MAX_SQL = 2000
+
+# Hilos detenidos en alguno de estos archivos están esperando (locks, colas,
+# el selector del event loop): no aportan al perfil
+_ARCHIVOS_OCIOSOS = ("threading.py", "selectors.py", "queue.py")
+
+_perfil_actual: ContextVar[Optional["Perfil"]] = ContextVar("perfil_actual", default=None)
+_perfilando = threading.Lock()
+_contador_solicitudes = itertools.count(1)
+
+
+# ============================================
+# MUESTREO DE PILAS
+# ============================================
+
+_etiquetas_codigo: Dict[object, str] = {}
+
+
+def _etiqueta(codigo) -> str:
+    """'funcion (ruta/archivo.py:linea)' de un objeto código, cacheada"""
+    etiqueta = _etiquetas_codigo.get(codigo)
+    if etiqueta is None:
+        archivo = codigo.co_filename
+        try:
+            archivo = os.path.relpath(archivo)
+            if archivo.startswith(".."):
+                archivo = "/".join(Path(codigo.co_filename).parts[-2:])
+        except ValueError:
+            pass
+        etiqueta = f"{codigo.co_name} ({archivo}:{codigo.co_firstlineno})".replace(";", ":")
+        _etiquetas_codigo[codigo] = etiqueta
+    return etiqueta
+
+
+class MuestreadorPilas(threading.Thread):
+    """Hilo que cuenta las pilas de los demás hilos cada cierto intervalo"""
+
+    def __init__(self, intervalo_segundos: float):
+        super().__init__(name="muestreador-perfil", daemon=True)
+        self.intervalo = intervalo_segundos
+        self.pilas: Counter = Counter()
+        self.muestras = 0
+        self._detener = threading.Event()
+
+    def run(self):
+        propio = threading.get_ident()
+        while not self._detener.wait(self.intervalo):
+            nombres = {h.ident: h.name for h in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == propio or frame.f_code.co_filename.endswith(_ARCHIVOS_OCIOSOS):
+                    continue
+                pila = []
+                while frame is not None:
+                    pila.append(_etiqueta(frame.f_code))
+                    frame = frame.f_back
+                pila.append(nombres.get(ident, str(ident)))
+                pila.reverse()
+                self.pilas[";".join(pila)] += 1
+            self.muestras += 1
+
+    def detener(self):
+        self._detener.set()
+        self.join()
+
+    def colapsadas(self) -> str:
+        return "".join(f"{pila} {n}\n" for pila, n in sorted(self.pilas.items()))
+
+
+# ============================================
+# PERFIL DE UNA SOLICITUD
+# ============================================
+
+class Perfil:
+    def __init__(self, tipo: str, metodo: str, url: str):
+        self.id = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{secrets.token_hex(3)}"
+        self.tipo = tipo
+        self.metodo = metodo
+        self.url = url
+        self.creado = datetime.utcnow()
+        self.inicio = time.perf_counter()
+        self.consultas: List[dict] = []
+        self.muestreador = MuestreadorPilas(settings.PERFILADO_INTERVALO_MS / 1000)
+
+    def resumen(self, ruta: Optional[str], estado: int, duracion: float) -> dict:
+        return {
+            "id": self.id,
+            "tipo": self.tipo,
+            "metodo": self.metodo,
+            "url": self.url,
+            "ruta": ruta,
+            "estado": estado,
+            "creado": self.creado.isoformat(),
+            "duracion_ms": round(duracion * 1000, 3),
+            "intervalo_ms": settings.PERFILADO_INTERVALO_MS,
+            "muestras": self.muestreador.muestras,
+            "consultas_sql": len(self.consultas),
+            "tiempo_sql_ms": round(sum(c["duracion_ms"] for c in self.consultas), 3),
+        }
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _perfil_actual.get() is not None:
+        context._inicio_perfil = time.perf_counter()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    perfil = _perfil_actual.get()
+    inicio = getattr(context, "_inicio_perfil", None)
+    if perfil is None or inicio is None:
+        return
+    fin = time.perf_counter()
+    perfil.consultas.append({
+        "inicio_ms": round((inicio - perfil.inicio) * 1000, 3),
+        "duracion_ms": round((fin - inicio) * 1000, 3),
+        "sql": statement[:_MAX_SQL],
+        "filas": cursor.rowcount,
+        "executemany": executemany,
+        "hilo": threading.current_thread().name,
+    })
+
+
+# ============================================
+# ARCHIVOS
+# ============================================
+
+def _directorio(tipo: str) -> Path:
+    return Path(settings.PERFILADO_DIRECTORIO) / tipo
+
+
+def _guardar(perfil: Perfil, resumen: dict):
+    directorio = _directorio(perfil.tipo)
+    directorio.mkdir(parents=True, exist_ok=True)
+    (directorio / f"{perfil.id}.folded").write_text(perfil.muestreador.colapsadas(), encoding="utf-8")
+    datos = dict(resumen, consultas=perfil.consultas)
+    (directorio / f"{perfil.id}.json").write_text(json.dumps(datos, ensure_ascii=False, indent=1), encoding="utf-8")
+
+    # Los ids empiezan con la fecha: ordenados por nombre quedan del más antiguo al más nuevo
+    archivos = sorted(directorio.glob("*.json"))
+    for archivo in archivos[:max(len(archivos) - settings.PERFILADO_MAX_ARCHIVOS, 0)]:
+        archivo.unlink(missing_ok=True)
+        archivo.with_suffix(".folded").unlink(missing_ok=True)
+
+
+def listar_perfiles(tipo: Optional[str] = None, limite: int = 50) -> List[dict]:
+    """Resúmenes de los perfiles guardados, del más reciente al más antiguo"""
+    archivos = []
+    for t in (tipo,) if tipo else (TIPO_SOLICITADO, TIPO_MUESTREO):
+        archivos.extend(_directorio(t).glob("*.json"))
+    archivos.sort(key=lambda a: a.name, reverse=True)
+
+    resultado = []
+    for archivo in archivos[:limite]:
+        try:
+            datos = json.loads(archivo.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        datos.pop("consultas", None)
+        resultado.append(datos)
+    return resultado
+
+
+def archivo_perfil(perfil_id: str, extension: str) -> Optional[Path]:
+    """Ruta del .folded o .json de un perfil; None si no existe"""
+    if not _PATRON_ID.match(perfil_id):
+        return None
+    for tipo in (TIPO_SOLICITADO, TIPO_MUESTREO):
+        archivo = _directorio(tipo) / f"{perfil_id}.{extension}"
+        if archivo.exists():
+            return archivo
+    return None
+
+
+# ============================================
+# MIDDLEWARE
+# ============================================
+
+def _solicita_perfil(scope) -> bool:
+    for nombre, valor in scope["headers"]:
+        if nombre == HEADER_PERFILAR:
+            return valor.strip().lower() not in (b"", b"0", b"false")
+    if b"perfilar" in scope.get("query_string", b""):
+        valores = parse_qs(scope["query_string"].decode("latin-1")).get("perfilar", [])
+        return any(v.lower() not in ("", "0", "false") for v in valores)
+    return False
+
+
+def _es_admin(scope) -> bool:
+    """Token Bearer válido de un admin activo (consulta la caché de usuarios o la BD)"""
+    autorizacion = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+    esquema, _, token = autorizacion.partition(" ")
+    if esquema.lower() != "bearer" or not token:
+        return False
+    datos = decode_token(token.strip())
+    if datos is None or datos.user_id is None:
+        return False
+    db = SessionLocal()
+    try:
+        principal = obtener_principal(datos.user_id, db)
+    finally:
+        db.close()
+    return principal is not None and principal.activo and principal.rol == "admin"
+
+
+class MiddlewarePerfilado:
+    """Perfila las solicitudes marcadas por un admin y 1 de cada N en segundo plano"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def _tipo_perfil(self, scope) -> Optional[str]:
+        if _solicita_perfil(scope) and await run_in_threadpool(_es_admin, scope):
+            return TIPO_SOLICITADO
+        cada = settings.PERFILADO_MUESTREO_CADA
+        if cada > 0 and next(_contador_solicitudes) % cada == 0:
+            return TIPO_MUESTREO
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tipo = await self._tipo_perfil(scope)
+        # Una sola solicitud perfilada a la vez: las demás pasan sin perfil
+        if tipo is None or not _perfilando.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            perfil = Perfil(tipo, scope["method"], scope["path"])
+            estado = [500]
+
+            async def enviar(mensaje):
+                if mensaje["type"] == "http.response.start":
+                    estado[0] = mensaje["status"]
+                    mensaje["headers"] = list(mensaje.get("headers", [])) + [(b"x-perfil-id", perfil.id.encode())]
+                await send(mensaje)
+
+            token = _perfil_actual.set(perfil)
+            perfil.muestreador.start()
+            try:
+                await self.app(scope, receive, enviar)
+            finally:
+                duracion = time.perf_counter() - perfil.inicio
+                # detener() hace join del hilo (hasta un intervalo): no en el event loop
+                await run_in_threadpool(perfil.muestreador.detener)
+                _perfil_actual.reset(token)
+                resumen = perfil.resumen(getattr(scope.get("route"), "path", None), estado[0], duracion)
+                try:
+                    await run_in_threadpool(_guardar, perfil, resumen)
+                except OSError as e:
+                    logger.error("No se pudo guardar el perfil %s: %s", perfil.id, e)
+        finally:
+            _perfilando.release()
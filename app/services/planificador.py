@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class Tarea:
+    """
+    Tarea periódica del planificador.
+    Se ejecuta cada 'intervalo_segundos' o una vez al día a la 'hora' indicada ("HH:MM").
+    La función recibe una sesión de BD propia y retorna un dict con su resultado.
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        funcion: Callable[[Session], dict],
+        intervalo_segundos: Optional[float] = None,
+        hora: Optional[str] = None
+    ):
+        if (intervalo_segundos is None) == (hora is None):
+            raise ValueError("Indicar 'intervalo_segundos' o 'hora', no ambos")
+
+        self.nombre = nombre
+        self.funcion = funcion
+        self.intervalo_segundos = intervalo_segundos
+        self.hora = hora
+        self.ejecuciones = 0
+        self.ultima_ejecucion: Optional[datetime] = None
+        self.ultimo_resultado: Optional[dict] = None
+        self.ultimo_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def segundos_hasta_proxima(self, ahora: Optional[datetime] = None) -> float:
+        """Segundos que faltan para la siguiente ejecución programada"""
+        if self.intervalo_segundos is not None:
+            return self.intervalo_segundos
+
+        ahora = ahora or datetime.now()
+        horas, minutos = (int(x) for x in self.hora.split(":"))
+        proxima = ahora.replace(hour=horas, minute=minutos, second=0, microsecond=0)
+        if proxima <= ahora:
+            proxima += timedelta(days=1)
+        return (proxima - ahora).total_seconds()
+
+    def estado(self) -> dict:
+        return {
+            "nombre": self.nombre,
+            "intervalo_segundos": self.intervalo_segundos,
+            "hora": self.hora,
+            "ejecuciones": self.ejecuciones,
+            "ultima_ejecucion": self.ultima_ejecucion,
+            "ultimo_resultado": self.ultimo_resultado,
+            "ultimo_error": self.ultimo_error
+        }
+
+
+class Planificador:
+    """
+    Planificador de tareas en segundo plano (por proceso).
+    Cada tarea corre en un hilo aparte para no bloquear el event loop.
+    """
+
+    def __init__(self):
+        self.tareas: Dict[str, Tarea] = {}
+        self._bucles: List[asyncio.Task] = []
+
+    def registrar(
+        self,
+        nombre: str,
+        funcion: Callable[[Session], dict],
+        intervalo_segundos: Optional[float] = None,
+        hora: Optional[str] = None
+    ) -> Tarea:
+        """Registrar una tarea periódica"""
+        tarea = Tarea(nombre, funcion, intervalo_segundos=intervalo_segundos, hora=hora)
+        self.tareas[nombre] = tarea
+        return tarea
+
+    def ejecutar(self, nombre: str) -> dict:
+        """
+        Ejecutar una tarea ahora mismo (de forma síncrona).
+        Si ya se está ejecutando, no se lanza una segunda vez.
+        """
+        tarea = self.tareas[nombre]
+
+        if not tarea._lock.acquire(blocking=False):
+            return {"omitida": True, "razon": "La tarea ya está en ejecución"}
+
+        db = SessionLocal()
+        try:
+            resultado = tarea.funcion(db) or {}
+            tarea.ultimo_resultado = resultado
+            tarea.ultimo_error = None
+            return resultado
+        except Exception as e:
+            db.rollback()
+            tarea.ultimo_error = str(e)
+            logger.exception("Error en tarea programada %s", nombre)
+            raise
+        finally:
+            tarea.ejecuciones += 1
+            tarea.ultima_ejecucion = datetime.utcnow()
+            db.close()
+            tarea._lock.release()
+
+    async def _bucle(self, tarea: Tarea):
+        while True:
+            await asyncio.sleep(tarea.segundos_hasta_proxima())
+            try:
+                await asyncio.to_thread(self.ejecutar, tarea.nombre)
+            except Exception:
+                # Ya quedó registrado; la tarea sigue en el próximo ciclo
+                pass
+
+    def iniciar(self):
+        """Lanzar los bucles de todas las tareas (llamar desde el startup de la app)"""
+        loop = asyncio.get_running_loop()
+        for tarea in self.tareas.values():
+            self._bucles.append(loop.create_task(self._bucle(tarea)))
+        logger.info("Planificador iniciado con %d tareas", len(self.tareas))
+
+    async def detener(self):
+        """Cancelar los bucles (llamar desde el shutdown de la app)"""
+        for bucle in self._bucles:
+            bucle.cancel()
+        await asyncio.gather(*self._bucles, return_exceptions=True)
+        self._bucles.clear()
+
+    def estado(self) -> List[dict]:
+        return [tarea.estado() for tarea in self.tareas.values()]
+
+
+# Instancia global del planificador
+planificador = Planificador()
+
+# Tareas que deben correr en cada worker (ej: mantener cachés locales al día)
+planificador_local = Planificador()
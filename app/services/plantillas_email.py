@@ -0,0 +1,276 @@
+from html import escape
+from string import Template
+from typing import Dict, Iterable, Tuple
+
+# --- PLANTILLAS DE EMAIL COMPILADAS ---
+# Cada plantilla se arma una sola vez al importar el módulo: el layout común,
+# el CSS y el encabezado quedan resueltos como texto fijo y solo quedan los
+# marcadores $variable del contenido. Luego se "compila" partiendo el texto
+# en trozos fijos y nombres de variables, así renderizar un email es copiar
+# la lista de trozos, poner los valores escapados y hacer un solo join, sin
+# volver a armar el HTML ni el CSS (ni a analizar la plantilla) por mensaje.
+
+PIE_DEFECTO = """\
+            <p>Biblioteca Estación Central</p>
+            <p>&copy; 2025 Todos los derechos reservados</p>"""
+
+_CSS_BASE = """\
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background-color: $color; color: white; padding: 20px; text-align: center; }
+        .content { padding: 20px; background-color: #f4f4f4; }
+        .footer { text-align: center; padding: 20px; font-size: 12px; color: #777; }"""
+
+_CSS_TABLA = """
+        table { width: 100%; border-collapse: collapse; margin: 20px 0; background: white; }
+        th { background-color: #2c3e50; color: white; padding: 12px; text-align: left; }"""
+
+_LAYOUT = Template("""\
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+$css
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>$titulo</h1>
+        </div>
+        <div class="content">
+$contenido
+        </div>
+        <div class="footer">
+$pie
+        </div>
+    </div>
+</body>
+</html>
+""")
+
+
+class Html(str):
+    """Texto ya renderizado como HTML: se inserta sin escapar"""
+
+
+def _compilar(texto: str) -> Tuple[list, Tuple[str, ...]]:
+    """
+    Partir una plantilla $variable en trozos fijos y marcadores. Retorna la
+    lista de partes (los marcadores quedan en las posiciones impares, como
+    None) y los nombres de las variables en orden.
+    """
+    partes = []
+    claves = []
+    fijo = []
+    inicio = 0
+    for m in Template.pattern.finditer(texto):
+        fijo.append(texto[inicio:m.start()])
+        if m.group("escaped") is not None:
+            fijo.append("$")
+        elif m.group("named") or m.group("braced"):
+            partes.append("".join(fijo))
+            partes.append(None)
+            claves.append(m.group("named") or m.group("braced"))
+            fijo = []
+        else:
+            raise ValueError(f"Marcador inválido en plantilla: {m.group()!r}")
+        inicio = m.end()
+    fijo.append(texto[inicio:])
+    partes.append("".join(fijo))
+    return partes, tuple(claves)
+
+
+def _escapar(valor) -> str:
+    tipo = type(valor)
+    if tipo is str:
+        return escape(valor)
+    if tipo is int:
+        return str(valor)
+    return valor if tipo is Html else escape(str(valor))
+
+
+class _Compilada:
+    """Texto con marcadores $variable, analizado una sola vez"""
+
+    def __init__(self, texto: str):
+        self._partes, self._claves = _compilar(texto)
+
+    def _renderizar(self, valores: dict) -> str:
+        partes = self._partes.copy()
+        partes[1::2] = [_escapar(valores[clave]) for clave in self._claves]
+        return "".join(partes)
+
+
+class Fragmento(_Compilada):
+    """Trozo de HTML con marcadores (p. ej. una fila de tabla), compilado una vez"""
+
+    def renderizar(self, **valores) -> Html:
+        return Html(self._renderizar(valores))
+
+    def renderizar_muchos(self, items: Iterable[dict]) -> Html:
+        """Concatenar el fragmento renderizado con cada dict de valores"""
+        partes, claves = self._partes, self._claves
+        salida = []
+        for item in items:
+            fila = partes.copy()
+            fila[1::2] = [_escapar(item[clave]) for clave in claves]
+            salida += fila
+        return Html("".join(salida))
+
+
+class PlantillaEmail(_Compilada):
+    """Email completo: asunto fijo y HTML con layout y CSS ya resueltos"""
+
+    def __init__(self, asunto: str, titulo: str, color: str, contenido: str, css_extra: str = "", pie: str = PIE_DEFECTO):
+        self.asunto = asunto
+        css = Template(_CSS_BASE).substitute(color=color) + css_extra
+        # Los valores sustituidos no se vuelven a examinar: los $ de 'contenido' quedan como marcadores
+        super().__init__(_LAYOUT.substitute(css=css, titulo=titulo, contenido=contenido, pie=pie))
+
+    def renderizar(self, **valores) -> Tuple[str, str]:
+        """Retorna (asunto, html) con los valores escapados"""
+        return self.asunto, self._renderizar(valores)
+
+
+# ============================================
+# PLANTILLAS
+# ============================================
+
+FILA_PRESTAMO_VENCIDO = Fragmento("""
+                <tr>
+                    <td style="padding: 10px; border: 1px solid #ddd;">$documento</td>
+                    <td style="padding: 10px; border: 1px solid #ddd;">$fecha_devolucion</td>
+                    <td style="padding: 10px; border: 1px solid #ddd; color: red; font-weight: bold;">$dias_atraso días</td>
+                </tr>""")
+
+FILA_PRESTAMO_PROXIMO = Fragmento("""
+                <tr>
+                    <td style="padding: 10px; border: 1px solid #ddd;">$documento</td>
+                    <td style="padding: 10px; border: 1px solid #ddd; font-weight: bold;">$fecha_devolucion</td>
+                </tr>""")
+
+FILA_DOCUMENTO_PRESTADO = Fragmento("""
+                <tr>
+                    <td style="padding: 10px; border: 1px solid #ddd;">$titulo</td>
+                    <td style="padding: 10px; border: 1px solid #ddd;">$autor</td>
+                    <td style="padding: 10px; border: 1px solid #ddd;">$fecha_devolucion</td>
+                </tr>""")
+
+plantillas: Dict[str, PlantillaEmail] = {
+    "validacion": PlantillaEmail(
+        asunto="Activa tu cuenta - Biblioteca Estación Central",
+        titulo="📚 Biblioteca Estación Central",
+        color="#2c3e50",
+        css_extra="""
+        .button { display: inline-block; padding: 12px 24px; background-color: #3498db; color: white; text-decoration: none; border-radius: 5px; margin: 20px 0; }""",
+        contenido="""\
+            <h2>¡Bienvenido, $nombre!</h2>
+            <p>Gracias por registrarte en nuestro sistema de préstamos.</p>
+            <p>Para activar tu cuenta, haz clic en el siguiente botón:</p>
+            <p style="text-align: center;">
+                <a href="$enlace" class="button">Activar mi cuenta</a>
+            </p>
+            <p>O copia y pega este enlace en tu navegador:</p>
+            <p style="word-break: break-all; color: #3498db;">$enlace</p>
+            <p><strong>Este enlace expirará en 24 horas.</strong></p>""",
+        pie="""\
+            <p>Si no solicitaste esta cuenta, ignora este mensaje.</p>
+            <p>&copy; 2025 Biblioteca Estación Central</p>"""
+    ),
+    "recordatorio_vencido": PlantillaEmail(
+        asunto="⚠️ Recordatorio: Tienes préstamos vencidos",
+        titulo="⚠️ Préstamos Vencidos",
+        color="#e74c3c",
+        css_extra=_CSS_TABLA + """
+        .warning { background-color: #fff3cd; border-left: 4px solid #ffc107; padding: 15px; margin: 20px 0; }""",
+        contenido="""\
+            <h2>Hola, $nombre</h2>
+            <p>Este es un recordatorio de que tienes los siguientes préstamos vencidos:</p>
+            <table>
+                <thead>
+                    <tr>
+                        <th>Documento</th>
+                        <th>Fecha de devolución</th>
+                        <th>Días de atraso</th>
+                    </tr>
+                </thead>
+                <tbody>$filas
+                </tbody>
+            </table>
+            <div class="warning">
+                <strong>⚠️ Importante:</strong>
+                <p>Por cada día de atraso se aplicarán 2 días de sanción (mínimo 3 días, máximo 30 días).</p>
+                <p>Durante el período de sanción no podrás solicitar nuevos préstamos.</p>
+            </div>
+            <p>Por favor, devuelve los documentos lo antes posible en el mesón de atención.</p>"""
+    ),
+    "recordatorio_proximo": PlantillaEmail(
+        asunto="⏰ Recordatorio: tus préstamos vencen pronto",
+        titulo="⏰ Devolución Próxima",
+        color="#f39c12",
+        css_extra=_CSS_TABLA,
+        contenido="""\
+            <h2>Hola, $nombre</h2>
+            <p>Te recordamos que los siguientes préstamos deben devolverse pronto:</p>
+            <table>
+                <thead>
+                    <tr>
+                        <th>Documento</th>
+                        <th>Fecha de devolución</th>
+                    </tr>
+                </thead>
+                <tbody>$filas
+                </tbody>
+            </table>
+            <p>Devuélvelos a tiempo en el mesón de atención para evitar sanciones.</p>"""
+    ),
+    "confirmacion_prestamo": PlantillaEmail(
+        asunto="✅ Confirmación de préstamo - Biblioteca EC",
+        titulo="✅ Préstamo Confirmado",
+        color="#27ae60",
+        css_extra=_CSS_TABLA + """
+        .info-box { background-color: #e8f5e9; border-left: 4px solid #27ae60; padding: 15px; margin: 20px 0; }""",
+        contenido="""\
+            <h2>Hola, $nombre</h2>
+            <p>Tu préstamo ha sido registrado exitosamente.</p>
+            <div class="info-box">
+                <strong>Tipo de préstamo:</strong> $tipo<br>
+                <strong>Fecha de préstamo:</strong> $fecha_prestamo<br>
+                <strong>Código de préstamo:</strong> #$id
+            </div>
+            <h3>Documentos prestados:</h3>
+            <table>
+                <thead>
+                    <tr>
+                        <th>Título</th>
+                        <th>Autor</th>
+                        <th>Fecha de devolución</th>
+                    </tr>
+                </thead>
+                <tbody>$filas
+                </tbody>
+            </table>
+            <p><strong>Recuerda devolver los documentos en la fecha indicada para evitar sanciones.</strong></p>"""
+    ),
+    "reserva_disponible": PlantillaEmail(
+        asunto="📚 Tu reserva está lista para retirar",
+        titulo="📚 Reserva Disponible",
+        color="#3498db",
+        css_extra="""
+        .info-box { background-color: #e3f2fd; border-left: 4px solid #3498db; padding: 15px; margin: 20px 0; }""",
+        contenido="""\
+            <h2>Hola, $nombre</h2>
+            <p>El documento que reservaste ya está disponible para retiro:</p>
+            <div class="info-box">
+                <strong>Documento:</strong> $documento<br>
+                <strong>Retirar hasta:</strong> $fecha_limite
+            </div>
+            <p>Si no lo retiras dentro del plazo, la reserva se cancelará automáticamente.</p>"""
+    ),
+}
+
+
+def renderizar(plantilla: str, /, **valores) -> Tuple[str, str]:
+    """Renderizar una plantilla registrada. Retorna (asunto, html)"""
+    return plantillas[plantilla].renderizar(**valores)
@@ -0,0 +1,217 @@
+import bisect
+import threading
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Union
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.ejemplar import Ejemplar
+from app.models.prestamos import Prestamo, DetallePrestamo, EstadoPrestamo
+from app.models.reserva import Reserva
+
+# --- PRONÓSTICO DE DISPONIBILIDAD POR DOCUMENTO ---
+# Para cada documento se guardan, como listas ordenadas de fechas:
+#   - retornos: fecha estimada de devolución de cada ejemplar prestado
+#   - reservas: fecha de cada reserva que todavía consumirá un ejemplar
+# y la cantidad de ejemplares libres hoy. Así, los disponibles en un día D son
+#
+#   libres + retornos en [hoy, D] - reservas con fecha <= D
+#
+# y cada término sale de una búsqueda binaria. Los préstamos atrasados no
+# cuentan como retorno (no se sabe cuándo vuelven).
+# Préstamos, devoluciones y reservas actualizan el índice al confirmarse; el
+# resto de los cambios (estados manuales, otros procesos) se recogen al
+# reconstruirlo pasados PRONOSTICO_TTL segundos.
+#
+# Con varios workers cada uno tiene su índice y solo ve al instante sus
+# propios cambios: lo que confirma otro worker llega, a más tardar, con la
+# reconstrucción PRONOSTICO_TTL segundos después. Es el atraso máximo del
+# pronóstico, que solo se informa (crear una reserva o asignar un ejemplar
+# no dependen de él: lo deciden la BD y la cola de reservas).
+
+ESTADOS_LIBRES = ["disponible", "devuelto"]
+
+Fecha = Union[date, datetime]
+
+
+def _dia(fecha: Fecha) -> date:
+    return fecha.date() if isinstance(fecha, datetime) else fecha
+
+
+def _quitar(lista: list, valor: date):
+    i = bisect.bisect_left(lista, valor)
+    if i < len(lista) and lista[i] == valor:
+        del lista[i]
+
+
+class _IndiceDocumento:
+    def __init__(self, libres: int, retornos: list, reservas: list):
+        self.libres = libres
+        self.retornos = sorted(retornos)
+        self.reservas = sorted(reservas)
+        self.cargado_en = time.monotonic()
+        self.descartado = False  # Invalidado mientras se construía
+
+    def disponibles(self, dia: date, hoy: date) -> int:
+        regresan = bisect.bisect_right(self.retornos, dia) - bisect.bisect_left(self.retornos, hoy)
+        reservados = bisect.bisect_right(self.reservas, dia)
+        return max(self.libres + max(regresan, 0) - reservados, 0)
+
+
+def _descartar(indice: _IndiceDocumento):
+    indice.descartado = True
+
+
+class PronosticoDisponibilidad:
+    """
+    Índice en memoria (por proceso) de ejemplares disponibles a futuro.
+    Se construye por documento la primera vez que se consulta. Las consultas
+    a la BD corren sin el lock global, con un lock por documento para no
+    construir dos veces el mismo; los eventos que llegan mientras tanto se
+    repiten sobre el índice construido antes de publicarlo.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self._indices: Dict[int, _IndiceDocumento] = {}
+        self._construcciones: Dict[int, threading.Lock] = {}  # Un lock por documento
+        self._cambios: Dict[int, List[Callable[[_IndiceDocumento], None]]] = {}  # De la construcción en curso
+        self._lock = threading.Lock()
+
+    def _construir(self, db: Session, documento_id: int) -> _IndiceDocumento:
+        libres = db.query(func.count(Ejemplar.id)).filter(
+            Ejemplar.documento_id == documento_id,
+            Ejemplar.estado.in_(ESTADOS_LIBRES)
+        ).scalar()
+
+        retornos = db.query(Prestamo.fecha_devolucion_estimada).join(
+            DetallePrestamo, DetallePrestamo.prestamo_id == Prestamo.id
+        ).join(
+            Ejemplar, Ejemplar.id == DetallePrestamo.ejemplar_id
+        ).filter(
+            Ejemplar.documento_id == documento_id,
+            DetallePrestamo.fecha_devolucion.is_(None),
+            Prestamo.estado.in_([EstadoPrestamo.activo, EstadoPrestamo.vencido]),
+            Prestamo.fecha_devolucion_estimada.isnot(None)
+        ).all()
+
+        # Las reservas activas con ejemplar asignado ya lo tienen retenido
+        reservas = db.query(Reserva.fecha_reserva).filter(
+            Reserva.documento_id == documento_id,
+            or_(
+                Reserva.estado == "pendiente",
+                and_(Reserva.estado == "activa", Reserva.ejemplar_id.is_(None))
+            )
+        ).all()
+
+        return _IndiceDocumento(
+            libres,
+            [_dia(f) for (f,) in retornos],
+            [f for (f,) in reservas]
+        )
+
+    def _vigente(self, documento_id: int) -> Optional[_IndiceDocumento]:
+        indice = self._indices.get(documento_id)
+        if indice is None or indice.descartado or (self.ttl and time.monotonic() - indice.cargado_en > self.ttl):
+            return None
+        return indice
+
+    def _indice(self, db: Session, documento_id: int) -> _IndiceDocumento:
+        with self._lock:
+            indice = self._vigente(documento_id)
+            if indice is not None:
+                return indice
+            construccion = self._construcciones.setdefault(documento_id, threading.Lock())
+
+        with construccion:
+            with self._lock:
+                # Otro hilo pudo construirlo mientras se esperaba el lock del documento
+                indice = self._vigente(documento_id)
+                if indice is not None:
+                    return indice
+                cambios = self._cambios[documento_id] = []
+
+            try:
+                indice = self._construir(db, documento_id)
+            except BaseException:
+                with self._lock:
+                    del self._cambios[documento_id]
+                raise
+
+            with self._lock:
+                del self._cambios[documento_id]
+                # Las consultas pudieron no ver lo confirmado mientras corrían
+                for cambio in cambios:
+                    cambio(indice)
+                self._indices[documento_id] = indice
+            return indice
+
+    def disponibles(self, db: Session, documento_id: int, dia: date, hoy: Optional[date] = None) -> int:
+        """Ejemplares del documento que se estiman libres el día indicado"""
+        hoy = hoy or date.today()
+        indice = self._indice(db, documento_id)
+        with self._lock:
+            return indice.disponibles(max(dia, hoy), hoy)
+
+    def _aplicar(self, documento_id: int, cambio: Callable[[_IndiceDocumento], None]):
+        """Aplicar un evento al índice del documento y a su construcción en curso"""
+        with self._lock:
+            indice = self._indices.get(documento_id)
+            if indice is not None:
+                cambio(indice)
+            if documento_id in self._cambios:
+                self._cambios[documento_id].append(cambio)
+
+    # --- Eventos (llamar después del commit) ---
+
+    def registrar_salida(self, documento_id: int, fecha_estimada: Optional[Fecha]):
+        """Un ejemplar del documento se prestó"""
+        def cambio(indice: _IndiceDocumento):
+            indice.libres -= 1
+            if fecha_estimada:
+                bisect.insort(indice.retornos, _dia(fecha_estimada))
+
+        self._aplicar(documento_id, cambio)
+
+    def registrar_retorno(self, documento_id: int, fecha_estimada: Optional[Fecha], fecha_reserva: Optional[date] = None):
+        """
+        Un ejemplar del documento se devolvió. Si se entregó a una reserva en
+        espera, indicar su fecha: la reserva deja de consumir a futuro y el
+        ejemplar sigue sin estar libre.
+        """
+        def cambio(indice: _IndiceDocumento):
+            if fecha_estimada:
+                _quitar(indice.retornos, _dia(fecha_estimada))
+            if fecha_reserva is not None:
+                _quitar(indice.reservas, fecha_reserva)
+            else:
+                indice.libres += 1
+
+        self._aplicar(documento_id, cambio)
+
+    def registrar_reserva(self, documento_id: int, fecha_reserva: date):
+        """Se creó una reserva pendiente"""
+        self._aplicar(documento_id, lambda indice: bisect.insort(indice.reservas, fecha_reserva))
+
+    def quitar_reserva(self, documento_id: int, fecha_reserva: date):
+        """Una reserva pendiente se canceló"""
+        self._aplicar(documento_id, lambda indice: _quitar(indice.reservas, fecha_reserva))
+
+    def invalidar(self, documento_id: Optional[int] = None):
+        """Forzar la reconstrucción de un documento (o de todos)"""
+        with self._lock:
+            if documento_id is None:
+                self._indices.clear()
+                en_curso = list(self._cambios.values())
+            else:
+                self._indices.pop(documento_id, None)
+                en_curso = [self._cambios[documento_id]] if documento_id in self._cambios else []
+            # Lo que se está construyendo pudo leer el estado anterior: se
+            # publica igual, pero la próxima consulta lo reconstruye
+            for cambios in en_curso:
+                cambios.append(_descartar)
+
+
+# Instancia global del pronóstico
+pronostico = PronosticoDisponibilidad(ttl=settings.PRONOSTICO_TTL)
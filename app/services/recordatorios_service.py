@@ -0,0 +1,261 @@
+import logging
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import List, Optional
+from sqlalchemy import or_, select, union, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.correo_saliente import CorreoSaliente
+from app.models.documento import Documento
+from app.models.ejemplar import Ejemplar
+from app.models.log_notificaciones import LogNotificacion
+from app.models.prestamos import Prestamo, DetallePrestamo, EstadoPrestamo
+from app.models.usuario import Usuario
+from app.services.bandeja_salida import ESTADOS_POR_ENVIAR, encolar_correos
+from app.services.email_service import email_service
+
+logger = logging.getLogger(__name__)
+
+# --- CAMPAÑA DE RECORDATORIOS DE PRÉSTAMOS VENCIDOS ---
+# 1. Pasa a 'vencido' los préstamos activos cuya fecha estimada ya pasó (un UPDATE).
+# 2. Trae en una sola consulta los préstamos vencidos no notificados con sus
+#    documentos pendientes, ordenados por usuario, y arma un email por usuario.
+# 3. Omite a los usuarios que ya recibieron (o tienen en cola) un recordatorio
+#    dentro de RECORDATORIOS_VENCIDOS_INTERVALO_HORAS.
+# 4. Por lote de CORREOS_LOTE usuarios: deja los emails en la bandeja de salida
+#    y marca los préstamos como notificados en la misma transacción.
+
+TIPO_RECORDATORIO_VENCIDO = "recordatorio_vencido"
+TIPO_RECORDATORIO_PROXIMO = "recordatorio_proximo"
+
+
+def marcar_prestamos_vencidos(db: Session, ahora: Optional[datetime] = None) -> int:
+    """Pasar a 'vencido' los préstamos activos atrasados. No hace commit."""
+    ahora = ahora or datetime.now()
+    return db.execute(
+        update(Prestamo)
+        .where(
+            Prestamo.estado == EstadoPrestamo.activo,
+            Prestamo.fecha_devolucion_estimada < ahora
+        )
+        .values(estado=EstadoPrestamo.vencido)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def _usuarios_recien_avisados(desde: datetime):
+    """Usuarios con un recordatorio enviado desde 'desde' o todavía en la bandeja"""
+    return union(
+        select(LogNotificacion.usuario_id).where(
+            LogNotificacion.tipo == TIPO_RECORDATORIO_VENCIDO,
+            LogNotificacion.enviado_exitosamente == True,
+            LogNotificacion.fecha_envio >= desde
+        ),
+        select(CorreoSaliente.usuario_id).where(
+            CorreoSaliente.tipo == TIPO_RECORDATORIO_VENCIDO,
+            CorreoSaliente.estado.in_(ESTADOS_POR_ENVIAR)
+        )
+    )
+
+
+def _encolar_lote(db: Session, usuarios: List[tuple], ahora: datetime) -> int:
+    """Encolar los emails de un lote de usuarios y marcar sus préstamos"""
+    correos = []
+    prestamo_ids = set()
+
+    for (usuario_id, email, nombres), filas in usuarios:
+        prestamos = []
+        for prestamo_id, _, _, _, titulo, fecha_estimada in filas:
+            prestamo_ids.add(prestamo_id)
+            prestamos.append({
+                "documento": titulo,
+                "fecha_devolucion": fecha_estimada.strftime("%d/%m/%Y"),
+                "dias_atraso": max((ahora - fecha_estimada).days, 1)
+            })
+
+        asunto, html = email_service.plantilla_recordatorio_vencido(nombres, prestamos)
+        correos.append({
+            "usuario_id": usuario_id,
+            "tipo": TIPO_RECORDATORIO_VENCIDO,
+            "destinatario": email,
+            "asunto": asunto,
+            "html": html
+        })
+
+    encolar_correos(db, correos)
+    db.execute(
+        update(Prestamo)
+        .where(Prestamo.id.in_(prestamo_ids))
+        .values(notificado=True)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return len(prestamo_ids)
+
+
+def enviar_recordatorios_vencidos(db: Session, ahora: Optional[datetime] = None) -> dict:
+    """
+    Tarea programada: un recordatorio por usuario con todos sus préstamos
+    vencidos no notificados. Los emails salen por la bandeja de salida.
+    """
+    ahora = ahora or datetime.now()
+
+    actualizados = marcar_prestamos_vencidos(db, ahora)
+    db.commit()
+
+    desde = datetime.utcnow() - timedelta(hours=settings.RECORDATORIOS_VENCIDOS_INTERVALO_HORAS)
+
+    # Documentos que el usuario aún no devuelve de cada préstamo vencido
+    filas = db.query(
+        Prestamo.id,
+        Usuario.id,
+        Usuario.email,
+        Usuario.nombres,
+        Documento.titulo,
+        Prestamo.fecha_devolucion_estimada
+    ).join(
+        Usuario, Usuario.id == Prestamo.usuario_id
+    ).join(
+        DetallePrestamo, DetallePrestamo.prestamo_id == Prestamo.id
+    ).join(
+        Ejemplar, Ejemplar.id == DetallePrestamo.ejemplar_id
+    ).join(
+        Documento, Documento.id == Ejemplar.documento_id
+    ).filter(
+        Prestamo.estado == EstadoPrestamo.vencido,
+        or_(Prestamo.notificado == False, Prestamo.notificado.is_(None)),
+        DetallePrestamo.fecha_devolucion.is_(None),
+        Prestamo.fecha_devolucion_estimada.isnot(None),
+        Prestamo.usuario_id.notin_(_usuarios_recien_avisados(desde))
+    ).order_by(
+        Usuario.id, Prestamo.fecha_devolucion_estimada
+    ).all()
+
+    # Agrupar por usuario (la consulta ya viene ordenada)
+    usuarios = [
+        (clave, list(grupo))
+        for clave, grupo in groupby(filas, key=lambda f: (f[1], f[2], f[3]))
+    ]
+
+    notificados = 0
+    for i in range(0, len(usuarios), settings.CORREOS_LOTE):
+        notificados += _encolar_lote(db, usuarios[i:i + settings.CORREOS_LOTE], ahora)
+
+    logger.info(
+        "Recordatorios de vencidos: %d usuarios, %d préstamos notificados",
+        len(usuarios), notificados
+    )
+
+    return {
+        "prestamos_vencidos_nuevos": actualizados,
+        "usuarios_notificados": len(usuarios),
+        "prestamos_notificados": notificados
+    }
+
+
+# ============================================
+# RECORDATORIOS PREVIOS AL VENCIMIENTO
+# ============================================
+# Avisa antes de que el préstamo venza, para que menos lleguen a la campaña de
+# vencidos. Recorre por el índice (estado, fecha_devolucion_estimada) solo los
+# préstamos activos que vencen en las próximas RECORDATORIOS_PROXIMOS_HORAS,
+# leyéndolos en tandas con yield_per, y arma un email por usuario. Cada
+# préstamo avisado queda con recordatorio_enviado_en en la misma transacción
+# que encola el email, así la tarea puede correr cada hora sin repetir avisos.
+
+def _encolar_lote_proximos(db: Session, usuarios: List[dict], ahora: datetime) -> int:
+    """Encolar los avisos de un lote de usuarios y marcar sus préstamos"""
+    correos = []
+    prestamo_ids = set()
+
+    for usuario in usuarios:
+        prestamo_ids.update(usuario["prestamo_ids"])
+        asunto, html = email_service.plantilla_recordatorio_proximo(usuario["nombres"], usuario["prestamos"])
+        correos.append({
+            "usuario_id": usuario["usuario_id"],
+            "tipo": TIPO_RECORDATORIO_PROXIMO,
+            "destinatario": usuario["email"],
+            "asunto": asunto,
+            "html": html
+        })
+
+    encolar_correos(db, correos)
+    db.execute(
+        update(Prestamo)
+        .where(
+            Prestamo.id.in_(prestamo_ids),
+            Prestamo.recordatorio_enviado_en.is_(None)
+        )
+        .values(recordatorio_enviado_en=ahora)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return len(prestamo_ids)
+
+
+def enviar_recordatorios_proximos(db: Session, ahora: Optional[datetime] = None) -> dict:
+    """
+    Tarea periódica: un aviso por usuario con sus préstamos activos que vencen
+    dentro de RECORDATORIOS_PROXIMOS_HORAS y que aún no fueron avisados.
+    """
+    ahora = ahora or datetime.now()
+    hasta = ahora + timedelta(hours=settings.RECORDATORIOS_PROXIMOS_HORAS)
+
+    consulta = select(
+        Prestamo.id,
+        Usuario.id,
+        Usuario.email,
+        Usuario.nombres,
+        Documento.titulo,
+        Prestamo.fecha_devolucion_estimada
+    ).join(
+        Usuario, Usuario.id == Prestamo.usuario_id
+    ).join(
+        DetallePrestamo, DetallePrestamo.prestamo_id == Prestamo.id
+    ).join(
+        Ejemplar, Ejemplar.id == DetallePrestamo.ejemplar_id
+    ).join(
+        Documento, Documento.id == Ejemplar.documento_id
+    ).where(
+        Prestamo.estado == EstadoPrestamo.activo,
+        Prestamo.fecha_devolucion_estimada.between(ahora, hasta),
+        Prestamo.recordatorio_enviado_en.is_(None),
+        DetallePrestamo.fecha_devolucion.is_(None)
+    ).order_by(
+        Prestamo.fecha_devolucion_estimada
+    ).execution_options(yield_per=settings.RECORDATORIOS_PROXIMOS_TANDA)
+
+    # Agrupar por usuario mientras se leen las tandas (solo entra la ventana de horas)
+    usuarios = {}
+    for tanda in db.execute(consulta).partitions():
+        for prestamo_id, usuario_id, email, nombres, titulo, fecha_estimada in tanda:
+            usuario = usuarios.get(usuario_id)
+            if usuario is None:
+                usuario = usuarios[usuario_id] = {
+                    "usuario_id": usuario_id,
+                    "email": email,
+                    "nombres": nombres,
+                    "prestamos": [],
+                    "prestamo_ids": set()
+                }
+            usuario["prestamo_ids"].add(prestamo_id)
+            usuario["prestamos"].append({
+                "documento": titulo,
+                "fecha_devolucion": fecha_estimada.strftime("%d/%m/%Y %H:%M")
+            })
+
+    pendientes = list(usuarios.values())
+    notificados = 0
+    for i in range(0, len(pendientes), settings.CORREOS_LOTE):
+        notificados += _encolar_lote_proximos(db, pendientes[i:i + settings.CORREOS_LOTE], ahora)
+
+    if pendientes:
+        logger.info(
+            "Recordatorios previos al vencimiento: %d usuarios, %d préstamos avisados",
+            len(pendientes), notificados
+        )
+
+    return {
+        "usuarios_notificados": len(pendientes),
+        "prestamos_notificados": notificados
+    }
@@ -0,0 +1,146 @@
+import logging
+from datetime import date, datetime
+from typing import List, Optional
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.orm import Session
+from app.models.ejemplar import Ejemplar
+from app.models.reserva import Reserva
+from app.services.cola_reservas import cola_reservas, encolar_avisos_reservas, registrar_historial
+from app.services.pronostico_disponibilidad import pronostico
+from app.utils.dates import calcular_fecha_limite_retiro
+
+logger = logging.getLogger(__name__)
+
+# --- PROCESO DIARIO DE RESERVAS ---
+# 1. Expira las reservas activas no retiradas dentro del plazo y suelta sus ejemplares.
+# 2. Activa las reservas pendientes cuya fecha llegó, entregando a cada una un
+#    ejemplar disponible de su documento en orden de cola. Las que no alcanzan
+#    ejemplar siguen en la cola y se atienden en las devoluciones.
+# 3. Deja en la bandeja de salida el aviso a los usuarios de las reservas activadas.
+# Los pasos 1 y 2 son UPDATEs sobre conjuntos (sin recorrer filas en Python).
+
+MOTIVO_NO_RETIRADA = "No retirada dentro del plazo"
+MOTIVO_ACTIVACION = "Reserva activada en su fecha"
+
+# Ids por sentencia en los UPDATE con IN (SQLite acepta hasta 32766 parámetros)
+LOTE_IDS = 10000
+
+
+def expirar_reservas_no_retiradas(db: Session, hoy: date) -> List[int]:
+    """
+    Cancelar las reservas activas cuyo plazo de retiro venció y dejar
+    disponibles los ejemplares que retenían. No hace commit.
+    Retorna los documentos afectados.
+    """
+    vencidas = and_(Reserva.estado == "activa", Reserva.fecha_limite_retiro < hoy)
+
+    # Primero los ejemplares: la subconsulta todavía ve las reservas como activas
+    liberados = db.execute(
+        update(Ejemplar)
+        .where(
+            Ejemplar.estado == "reservado",
+            Ejemplar.id.in_(select(Reserva.ejemplar_id).where(vencidas, Reserva.ejemplar_id.isnot(None)))
+        )
+        .values(estado="disponible")
+        .returning(Ejemplar.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    registrar_historial(db, [(e, "reservado", "disponible") for e in liberados], MOTIVO_NO_RETIRADA)
+
+    documentos = db.execute(
+        update(Reserva)
+        .where(vencidas)
+        .values(estado="cancelada", motivo_cancelacion=MOTIVO_NO_RETIRADA, fecha_actualizacion=datetime.utcnow())
+        .returning(Reserva.documento_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+
+    logger.info("Reservas expiradas por no retiro: %d", len(documentos))
+    return documentos
+
+
+def activar_reservas_del_dia(db: Session, hoy: date) -> list:
+    """
+    Activar las reservas pendientes con fecha hasta hoy que tengan un ejemplar
+    disponible de su documento. Empareja la n-ésima reserva de la cola con el
+    n-ésimo ejemplar disponible en un solo UPDATE ... FROM; los ejemplares
+    que tomó (según su RETURNING) pasan a 'reservado'. No hace commit.
+    Retorna filas (id, documento_id) de las reservas activadas.
+    """
+    pendientes_hoy = and_(Reserva.estado == "pendiente", Reserva.fecha_reserva <= hoy)
+
+    pendientes = select(
+        Reserva.id,
+        Reserva.documento_id,
+        func.row_number().over(
+            partition_by=Reserva.documento_id,
+            order_by=(Reserva.prioridad.desc(), Reserva.fecha_creacion, Reserva.id)
+        ).label("n")
+    ).where(pendientes_hoy).subquery()
+
+    libres = select(
+        Ejemplar.id,
+        Ejemplar.documento_id,
+        func.row_number().over(
+            partition_by=Ejemplar.documento_id,
+            order_by=Ejemplar.id
+        ).label("n")
+    ).where(
+        Ejemplar.estado == "disponible",
+        Ejemplar.documento_id.in_(select(Reserva.documento_id).where(pendientes_hoy))
+    ).subquery()
+
+    pares = select(
+        pendientes.c.id.label("reserva_id"),
+        libres.c.id.label("ejemplar_id")
+    ).join(
+        libres, and_(libres.c.documento_id == pendientes.c.documento_id, libres.c.n == pendientes.c.n)
+    ).subquery()
+
+    activadas = db.execute(
+        update(Reserva)
+        .where(Reserva.id == pares.c.reserva_id)
+        .values(
+            estado="activa",
+            ejemplar_id=pares.c.ejemplar_id,
+            fecha_limite_retiro=calcular_fecha_limite_retiro(hoy),
+            fecha_actualizacion=datetime.utcnow()
+        )
+        .returning(Reserva.id, Reserva.documento_id, Reserva.ejemplar_id)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    ejemplar_ids = [ejemplar_id for _, _, ejemplar_id in activadas]
+    reservados = []
+    for i in range(0, len(ejemplar_ids), LOTE_IDS):
+        reservados += db.execute(
+            update(Ejemplar)
+            .where(Ejemplar.id.in_(ejemplar_ids[i:i + LOTE_IDS]), Ejemplar.estado == "disponible")
+            .values(estado="reservado")
+            .returning(Ejemplar.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+    registrar_historial(db, [(e, "disponible", "reservado") for e in reservados], MOTIVO_ACTIVACION)
+
+    logger.info("Reservas activadas: %d", len(activadas))
+    return [(reserva_id, documento_id) for reserva_id, documento_id, _ in activadas]
+
+
+def procesar_reservas_diarias(db: Session, hoy: Optional[date] = None) -> dict:
+    """
+    Tarea diaria: expirar, activar y notificar.
+    Los avisos quedan en la bandeja de salida en la misma transacción que
+    las activaciones; el despachador de correos los envía después.
+    """
+    hoy = hoy or date.today()
+
+    documentos_expirados = expirar_reservas_no_retiradas(db, hoy)
+    activadas = activar_reservas_del_dia(db, hoy)
+    encolados = encolar_avisos_reservas(db, [reserva_id for reserva_id, _ in activadas])
+    db.commit()
+
+    for documento_id in set(documentos_expirados) | {documento_id for _, documento_id in activadas}:
+        cola_reservas.invalidar(documento_id)
+        pronostico.invalidar(documento_id)
+
+    return {"expiradas": len(documentos_expirados), "activadas": len(activadas), "correos_en_cola": encolados}
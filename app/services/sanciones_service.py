@@ -0,0 +1,165 @@
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import List, Optional
+from sqlalchemy import exists, func, insert, or_, update
+from sqlalchemy.orm import Session
+from app.models.usuario import Usuario
+from app.models.prestamos import Prestamo, DetallePrestamo, EstadoPrestamo
+from app.models.sancion import Sancion
+from app.services.cache_usuarios import invalidar_usuarios
+
+logger = logging.getLogger(__name__)
+
+# --- MOTOR DE SANCIONES ---
+# Regla: 2 días de sanción por cada día de atraso (mínimo 3, máximo 30).
+# La sanción vigente vive en Usuario.fecha_sancion_hasta (una sola columna,
+# así las verificaciones de elegibilidad siguen siendo baratas) y cada
+# sanción queda registrada en la tabla 'sanciones' para auditoría.
+
+_usuarios = Usuario.__table__
+
+
+def _extender_sanciones(db: Session, ids: List[int], hasta: datetime, limite: datetime) -> List[int]:
+    """
+    Fijar fecha_sancion_hasta = 'hasta' a los usuarios cuya sanción vigente
+    termina antes de 'limite' (o no tienen). Retorna los ids modificados.
+    """
+    return db.execute(
+        update(_usuarios)
+        .where(
+            _usuarios.c.id.in_(ids),
+            or_(_usuarios.c.fecha_sancion_hasta.is_(None), _usuarios.c.fecha_sancion_hasta < limite)
+        )
+        .values(fecha_sancion_hasta=hasta)
+        .returning(_usuarios.c.id)
+    ).scalars().all()
+
+
+def calcular_dias_sancion(dias_atraso: int) -> int:
+    """Días de sanción que corresponden a un atraso"""
+    if dias_atraso <= 0:
+        return 0
+    return min(max(dias_atraso * 2, 3), 30)
+
+
+def aplicar_sanciones(
+    db: Session,
+    sanciones: List[dict],
+    origen: str,
+    renovar_antes: Optional[datetime] = None
+) -> int:
+    """
+    Aplicar un conjunto de sanciones con UPDATEs masivos de usuarios (uno por
+    fecha de término distinta, a lo más 28) y una inserción masiva en la
+    auditoría. No hace commit.
+
+    La sanción solo se extiende: si la vigente termina después, el usuario
+    no cambia. Con 'renovar_antes' solo se sanciona a quien no tiene sanción
+    o la tiene terminando antes de esa fecha. La auditoría registra solo los
+    usuarios cuya fecha_sancion_hasta cambió (con la sanción que la fijó).
+
+    Cada sanción es un dict con: usuario_id, dias_atraso y opcionalmente prestamo_id.
+    Retorna la cantidad de usuarios afectados.
+    """
+    ahora = datetime.utcnow()
+    registro_por_usuario = {}
+
+    for s in sanciones:
+        dias_sancion = calcular_dias_sancion(s["dias_atraso"])
+        if dias_sancion == 0:
+            continue
+
+        fecha_hasta = ahora + timedelta(days=dias_sancion)
+        actual = registro_por_usuario.get(s["usuario_id"])
+        if actual is not None and actual["fecha_hasta"] >= fecha_hasta:
+            continue
+
+        registro_por_usuario[s["usuario_id"]] = {
+            "usuario_id": s["usuario_id"],
+            "prestamo_id": s.get("prestamo_id"),
+            "dias_atraso": s["dias_atraso"],
+            "dias_sancion": dias_sancion,
+            "fecha_hasta": fecha_hasta,
+            "origen": origen,
+            "aplicada_por": None,
+            "created_at": ahora
+        }
+
+    por_fecha = defaultdict(list)
+    for usuario_id, registro in registro_por_usuario.items():
+        por_fecha[registro["fecha_hasta"]].append(usuario_id)
+
+    modificados = []
+    for hasta, ids in por_fecha.items():
+        modificados.extend(_extender_sanciones(db, ids, hasta, renovar_antes or hasta))
+
+    if not modificados:
+        return 0
+
+    db.execute(insert(Sancion), [registro_por_usuario[usuario_id] for usuario_id in modificados])
+    invalidar_usuarios(db, modificados)
+
+    return len(modificados)
+
+
+def registrar_sancion_manual(db: Session, usuario: Usuario, dias: int, admin_id: int) -> Sancion:
+    """
+    Dejar en la auditoría una sanción fijada por un administrador.
+    No hace commit.
+    """
+    sancion = Sancion(
+        usuario_id=usuario.id,
+        dias_sancion=dias,
+        fecha_hasta=usuario.fecha_sancion_hasta,
+        origen="manual",
+        aplicada_por=admin_id
+    )
+    db.add(sancion)
+    return sancion
+
+
+def procesar_sanciones_atrasos(db: Session, hoy: Optional[datetime] = None) -> dict:
+    """
+    Proceso nocturno: sancionar a todos los usuarios con préstamos atrasados
+    aún no devueltos. Una consulta agregada (el préstamo más atrasado de cada
+    usuario) y UPDATEs masivos.
+
+    Solo se renueva la sanción de quien quedaría sin ella antes de la próxima
+    corrida: mientras el préstamo siga atrasado el usuario sigue bloqueado,
+    sin mover la fecha (ni dejar una fila de auditoría) cada noche. La
+    sanción definitiva se calcula al devolver.
+    """
+    hoy = hoy or datetime.now()
+    inicio_hoy = hoy.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    pendientes = exists().where(
+        DetallePrestamo.prestamo_id == Prestamo.id,
+        DetallePrestamo.fecha_devolucion.is_(None)
+    )
+
+    atrasados = db.query(
+        Prestamo.usuario_id,
+        func.min(Prestamo.fecha_devolucion_estimada).label("mas_antigua")
+    ).filter(
+        Prestamo.estado.in_([EstadoPrestamo.activo, EstadoPrestamo.vencido]),
+        Prestamo.fecha_devolucion_estimada < inicio_hoy,
+        pendientes
+    ).group_by(Prestamo.usuario_id).all()
+
+    sanciones = [
+        {
+            "usuario_id": usuario_id,
+            "dias_atraso": (hoy.date() - mas_antigua.date()).days
+        }
+        for usuario_id, mas_antigua in atrasados
+    ]
+
+    usuarios_sancionados = aplicar_sanciones(
+        db, sanciones, origen="automatica", renovar_antes=datetime.utcnow() + timedelta(days=1)
+    )
+    db.commit()
+
+    logger.info("Sanciones nocturnas aplicadas a %d usuarios", usuarios_sancionados)
+
+    return {"usuarios_sancionados": usuarios_sancionados}
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import threading
+from typing import List, Optional, Tuple
+import aiosmtplib
+from app.config import settings
+from app.services.email_service import EmailService, email_service
+
+logger = logging.getLogger(__name__)
+
+# --- POOL DE CONEXIONES SMTP ---
+# send_email/send_bulk abren una sesión SMTP (conexión, STARTTLS, login) por
+# llamada. Este pool mantiene hasta SMTP_CONEXIONES sesiones autenticadas
+# abiertas y las reutiliza: cada conexión envía sus mensajes uno tras otro y
+# las conexiones trabajan en paralelo, así la concurrencia contra el servidor
+# queda acotada por el tamaño del pool. Una conexión que el servidor cerró
+# (p. ej. por inactividad) se reabre y el mensaje se reintenta una vez.
+#
+# Las conexiones de asyncio pertenecen a un event loop, y el despachador de
+# correos corre en hilos del planificador; por eso el pool tiene su propio
+# loop en un hilo dedicado y expone una API síncrona (enviar_lote) además de
+# la asíncrona (enviar_lote_async, para usar desde otro loop).
+
+Mensaje = Tuple[str, str, str]  # (to, subject, html_content)
+Resultado = Tuple[bool, Optional[str]]
+
+# Errores que indican que la conexión ya no sirve
+_ERRORES_CONEXION = (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPTimeoutError, ConnectionError)
+
+
+class _SinServidor(Exception):
+    """No se pudo abrir una conexión con el servidor SMTP"""
+
+
+class PoolSMTP:
+    """Conexiones SMTP persistentes compartidas por todos los envíos del proceso"""
+
+    def __init__(self, servicio: EmailService, conexiones: int = 4, timeout: float = 30):
+        self.servicio = servicio
+        self.conexiones = conexiones
+        self.timeout = timeout
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._hilo: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._cupos: Optional[asyncio.Semaphore] = None
+        self._libres: List[aiosmtplib.SMTP] = []
+        self._abiertas = 0
+
+        self.enviados = 0
+        self.fallidos = 0
+        self.reconexiones = 0
+
+    # --- Event loop propio ---
+
+    def _asegurar_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._hilo = threading.Thread(target=self._loop.run_forever, name="smtp-pool", daemon=True)
+                self._hilo.start()
+            return self._loop
+
+    # --- Conexiones ---
+
+    def _nuevo_cliente(self) -> aiosmtplib.SMTP:
+        s = self.servicio
+        return aiosmtplib.SMTP(
+            hostname=s.smtp_server,
+            port=s.smtp_port,
+            username=s.smtp_user or None,
+            password=s.smtp_password or None,
+            start_tls=s.smtp_starttls,
+            timeout=self.timeout
+        )
+
+    async def _tomar(self) -> aiosmtplib.SMTP:
+        """Esperar un cupo y entregar una conexión libre (o abrir una nueva)"""
+        if self._cupos is None:
+            self._cupos = asyncio.Semaphore(self.conexiones)
+
+        await self._cupos.acquire()
+        if self._libres:
+            return self._libres.pop()
+
+        cliente = self._nuevo_cliente()
+        try:
+            await cliente.connect()
+        except Exception:
+            self._cupos.release()
+            raise
+        self._abiertas += 1
+        return cliente
+
+    def _devolver(self, cliente: aiosmtplib.SMTP):
+        self._libres.append(cliente)
+        self._cupos.release()
+
+    async def _reconectar(self, cliente: aiosmtplib.SMTP, error_lote: list):
+        cliente.close()
+        try:
+            await cliente.connect()
+        except Exception as e:
+            raise self._sin_servidor(error_lote, e)
+        self.reconexiones += 1
+
+    def _sin_servidor(self, error_lote: list, error: Exception) -> "_SinServidor":
+        if not error_lote:
+            logger.error("Error conectando al servidor SMTP: %s", error)
+            error_lote.append(str(error))
+        return _SinServidor(str(error))
+
+    async def _enviar(self, mensaje: Mensaje, error_lote: list) -> Resultado:
+        to, subject, html_content = mensaje
+
+        try:
+            # Si el servidor no acepta conexiones, el resto del lote falla sin reintentar
+            if error_lote:
+                raise _SinServidor(error_lote[0])
+            cliente = await self._tomar()
+        except _SinServidor as e:
+            return False, str(e)
+        except Exception as e:
+            return False, str(self._sin_servidor(error_lote, e))
+
+        try:
+            if error_lote:
+                raise _SinServidor(error_lote[0])
+            msg = self.servicio.crear_mensaje(to, subject, html_content)
+            if not cliente.is_connected:
+                await self._reconectar(cliente, error_lote)
+            try:
+                await cliente.send_message(msg)
+            except _ERRORES_CONEXION:
+                # El servidor cerró la sesión (p. ej. por inactividad): reabrir y reintentar una vez
+                await self._reconectar(cliente, error_lote)
+                await cliente.send_message(msg)
+            return True, None
+        except Exception as e:
+            # Un rechazo del destinatario deja la conexión usable; si quedó
+            # cerrada se reabrirá en el próximo uso
+            return False, str(e)
+        finally:
+            self._devolver(cliente)
+
+    async def _enviar_lote(self, mensajes: List[Mensaje]) -> List[Resultado]:
+        error_lote = []
+        resultados = await asyncio.gather(*(self._enviar(m, error_lote) for m in mensajes))
+        exitosos = sum(1 for ok, _ in resultados if ok)
+        self.enviados += exitosos
+        self.fallidos += len(resultados) - exitosos
+        return resultados
+
+    async def _cerrar_conexiones(self):
+        while self._libres:
+            cliente = self._libres.pop()
+            try:
+                await cliente.quit()
+            except Exception:
+                cliente.close()
+        self._abiertas = 0
+
+    # --- API pública ---
+
+    def enviar_lote(self, mensajes: List[Mensaje]) -> List[Resultado]:
+        """
+        Enviar emails (to, subject, html_content) por el pool, desde código
+        síncrono. Retorna, en el mismo orden, tuplas (exitoso, error),
+        igual que EmailService.send_bulk.
+        """
+        if not mensajes:
+            return []
+        futuro = asyncio.run_coroutine_threadsafe(self._enviar_lote(mensajes), self._asegurar_loop())
+        return futuro.result()
+
+    async def enviar_lote_async(self, mensajes: List[Mensaje]) -> List[Resultado]:
+        """Igual que enviar_lote, para usar desde otro event loop"""
+        if not mensajes:
+            return []
+        futuro = asyncio.run_coroutine_threadsafe(self._enviar_lote(mensajes), self._asegurar_loop())
+        return await asyncio.wrap_future(futuro)
+
+    def cerrar(self):
+        """Cerrar las conexiones y detener el loop del pool (shutdown de la app)"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._cerrar_conexiones(), loop).result(timeout=self.timeout)
+        except Exception:
+            logger.warning("No se pudieron cerrar limpiamente las conexiones SMTP")
+        loop.call_soon_threadsafe(loop.stop)
+        self._cupos = None
+
+    def estadisticas(self) -> dict:
+        return {
+            "conexiones_max": self.conexiones,
+            "conexiones_abiertas": self._abiertas,
+            "enviados": self.enviados,
+            "fallidos": self.fallidos,
+            "reconexiones": self.reconexiones
+        }
+
+
+# Instancia global del pool
+smtp_pool = PoolSMTP(email_service, conexiones=settings.SMTP_CONEXIONES)
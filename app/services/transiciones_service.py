@@ -0,0 +1,126 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.ejemplar import Ejemplar
+from app.models.historial_ejemplar import HistorialEjemplar
+from app.models.transicion_programada import TransicionProgramada
+
+logger = logging.getLogger(__name__)
+
+# --- TRANSICIONES DIFERIDAS DE ESTADO ---
+# Las devoluciones dejan el ejemplar en 'devuelto' y encolan su paso a
+# 'disponible'. Una tarea del planificador aplica las transiciones vencidas
+# en lotes: un UPDATE por lote y una inserción masiva en el historial.
+# Las transiciones se borran en la misma transacción en que se aplican o
+# descartan (el historial ya registra el cambio): la tabla solo guarda las
+# pendientes.
+
+MOTIVO_REUBICACION = "Reubicación automática tras devolución"
+
+
+def programar_reubicacion(db: Session, ejemplar_ids: Iterable[int], ahora: Optional[datetime] = None):
+    """
+    Encolar el paso devuelto → disponible de los ejemplares indicados.
+    No hace commit: queda en la misma transacción que la devolución.
+    """
+    ahora = ahora or datetime.now()
+    ejecutar_en = ahora + timedelta(minutes=settings.REUBICACION_MINUTOS)
+
+    filas = [
+        {
+            "ejemplar_id": ejemplar_id,
+            "estado_origen": "devuelto",
+            "estado_destino": "disponible",
+            "ejecutar_en": ejecutar_en,
+            "procesada": False,
+            "created_at": datetime.utcnow()
+        }
+        for ejemplar_id in ejemplar_ids
+    ]
+
+    if filas:
+        db.execute(insert(TransicionProgramada), filas)
+
+
+def procesar_transiciones_vencidas(db: Session, lote: Optional[int] = None) -> dict:
+    """
+    Aplicar todas las transiciones cuya hora ya llegó.
+    Solo cambia los ejemplares que siguen en el estado de origen (si alguien
+    los movió a mano entretanto, la transición se descarta).
+    """
+    lote = lote or settings.REUBICACION_LOTE
+    ahora = datetime.now()
+    aplicadas = 0
+    descartadas = 0
+
+    # Las que versiones anteriores marcaban como procesadas en vez de borrarlas
+    db.execute(
+        delete(TransicionProgramada)
+        .where(TransicionProgramada.procesada == True)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+    while True:
+        pendientes = db.query(
+            TransicionProgramada.id,
+            TransicionProgramada.ejemplar_id,
+            TransicionProgramada.estado_origen,
+            TransicionProgramada.estado_destino
+        ).filter(
+            TransicionProgramada.procesada == False,
+            TransicionProgramada.ejecutar_en <= ahora
+        ).order_by(
+            TransicionProgramada.ejecutar_en
+        ).limit(lote).with_for_update(skip_locked=True).all()
+
+        if not pendientes:
+            break
+
+        # Agrupar por par de estados para hacer un UPDATE por grupo
+        grupos = {}
+        for t in pendientes:
+            grupos.setdefault((t.estado_origen, t.estado_destino), set()).add(t.ejemplar_id)
+
+        for (origen, destino), ejemplar_ids in grupos.items():
+            actualizados = db.execute(
+                update(Ejemplar)
+                .where(Ejemplar.id.in_(ejemplar_ids), Ejemplar.estado == origen)
+                .values(estado=destino)
+                .returning(Ejemplar.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+
+            if actualizados:
+                db.execute(insert(HistorialEjemplar), [
+                    {
+                        "ejemplar_id": ejemplar_id,
+                        "estado_anterior": origen,
+                        "estado_nuevo": destino,
+                        "usuario_id": None,
+                        "motivo": MOTIVO_REUBICACION,
+                        "created_at": datetime.utcnow()
+                    }
+                    for ejemplar_id in actualizados
+                ])
+
+            aplicadas += len(actualizados)
+            descartadas += len(ejemplar_ids) - len(actualizados)
+
+        db.execute(
+            delete(TransicionProgramada)
+            .where(TransicionProgramada.id.in_([t.id for t in pendientes]))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+        if len(pendientes) < lote:
+            break
+
+    if aplicadas or descartadas:
+        logger.info("Transiciones aplicadas: %d, descartadas: %d", aplicadas, descartadas)
+
+    return {"aplicadas": aplicadas, "descartadas": descartadas}
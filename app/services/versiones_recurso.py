@@ -0,0 +1,131 @@
+import logging
+from datetime import datetime
+from typing import Dict, Iterable
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.version_recurso import VersionRecurso
+
+logger = logging.getLogger(__name__)
+
+# --- VERSIONES DE RECURSOS (ETag) ---
+# Cada recurso cacheable por los clientes tiene un contador en
+# versiones_recurso, compartido por todos los workers. La sesión anota los
+# recursos cuyas tablas escribe (flush del ORM o INSERT/UPDATE/DELETE masivo
+# con db.execute) y los incrementa al confirmarse la transacción, en una
+# transacción corta aparte: así préstamos y devoluciones no se serializan
+# esperando el bloqueo de la fila del contador. El incremento espera a que la
+# sesión devuelva su conexión al pool (after_transaction_end): en after_commit
+# aún la tiene, y cada solicitud ocuparía dos conexiones a la vez, lo que con
+# el pool lleno deja a todas esperando una segunda que nadie libera. Leerlo es una consulta por
+# clave primaria, mucho más barata que la consulta del listado.
+
+RECURSO_CATALOGO = "catalogo"
+RECURSO_EJEMPLARES = "ejemplares"
+
+# Tabla -> recurso cuya versión sube al escribirla
+TABLAS_VERSIONADAS = {
+    "documentos": RECURSO_CATALOGO,
+    "ejemplares": RECURSO_EJEMPLARES,
+    "historial_ejemplares": RECURSO_EJEMPLARES,
+}
+
+_tabla_versiones = VersionRecurso.__table__
+
+
+def _incrementar(conexion, recursos: Iterable[str]):
+    ahora = datetime.utcnow()
+    for recurso in sorted(set(recursos)):
+        actualizadas = conexion.execute(
+            update(_tabla_versiones)
+            .where(_tabla_versiones.c.recurso == recurso)
+            .values(version=_tabla_versiones.c.version + 1, updated_at=ahora)
+        ).rowcount
+        if not actualizadas:
+            conexion.execute(insert(_tabla_versiones).values(recurso=recurso, version=1, updated_at=ahora))
+
+
+def inicializar_versiones(db: Session):
+    """Crear los contadores que falten (al iniciar la app)"""
+    existentes = set(db.scalars(select(VersionRecurso.recurso)))
+    faltantes = set(TABLAS_VERSIONADAS.values()) - existentes
+    if not faltantes:
+        return
+    try:
+        db.execute(insert(VersionRecurso), [
+            {"recurso": recurso, "version": 0, "updated_at": datetime.utcnow()}
+            for recurso in faltantes
+        ])
+        db.commit()
+    except IntegrityError:
+        # Otro worker los creó al mismo tiempo
+        db.rollback()
+
+
+def obtener_versiones(db: Session, recursos: Iterable[str]) -> Dict[str, int]:
+    """Versión actual de cada recurso (0 si nunca se ha escrito)"""
+    recursos = list(recursos)
+    filas = db.execute(
+        select(VersionRecurso.recurso, VersionRecurso.version).where(VersionRecurso.recurso.in_(recursos))
+    ).all()
+    versiones = dict.fromkeys(recursos, 0)
+    versiones.update(filas)
+    return versiones
+
+
+# ============================================
+# EVENTOS DE LA SESIÓN
+# ============================================
+
+def _anotar(session: Session, recursos: Iterable[str]):
+    session.info.setdefault("recursos_modificados", set()).update(recursos)
+
+
+@event.listens_for(Session, "after_flush")
+def _al_escribir(session: Session, contexto):
+    recursos = {
+        TABLAS_VERSIONADAS[obj.__tablename__]
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if getattr(obj, "__tablename__", None) in TABLAS_VERSIONADAS
+    }
+    if recursos:
+        _anotar(session, recursos)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _al_ejecutar(estado):
+    # INSERT/UPDATE/DELETE masivos (db.execute(update(Modelo)...)) no pasan por el flush
+    if not (estado.is_insert or estado.is_update or estado.is_delete):
+        return
+    tabla = getattr(estado.statement, "table", None)
+    recurso = TABLAS_VERSIONADAS.get(getattr(tabla, "name", None))
+    if recurso:
+        _anotar(estado.session, [recurso])
+
+
+@event.listens_for(Session, "after_commit")
+def _al_confirmar(session: Session):
+    recursos = session.info.pop("recursos_modificados", None)
+    if recursos:
+        session.info.setdefault("recursos_confirmados", set()).update(recursos)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _al_terminar(session: Session, transaccion):
+    # Solo la transacción raíz suelta la conexión
+    if transaccion.parent is not None:
+        return
+    recursos = session.info.pop("recursos_confirmados", None)
+    if not recursos:
+        return
+    try:
+        with session.get_bind().begin() as conexion:
+            _incrementar(conexion, recursos)
+    except Exception as e:
+        # Sin el incremento los clientes pueden recibir 304 con datos viejos
+        logger.error("No se pudo incrementar la versión de %s: %s", sorted(recursos), e)
+
+
+@event.listens_for(Session, "after_rollback")
+def _al_deshacer(session: Session):
+    session.info.pop("recursos_modificados", None)
@@ -6,8 +6,8 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.config import settings
 from app.database import get_db
-from app.models.usuario import Usuario
 from app.schemas.usuario import TokenData
+from app.services.cache_usuarios import UsuarioPrincipal, obtener_principal
 
 security = HTTPBearer()
 
@@ -41,8 +41,12 @@ def decode_token(token: str) -> Optional[TokenData]:
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
-) -> Usuario:
-    """Obtener usuario actual desde token"""
+) -> UsuarioPrincipal:
+    """
+    Obtener usuario actual desde token.
+    Retorna solo los datos de autorización (id, rut, rol, activo, sanción),
+    normalmente desde la caché; quien necesite el resto debe cargar el Usuario.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudo validar las credenciales",
@@ -55,7 +59,7 @@ async def get_current_user(
     if token_data is None or token_data.user_id is None:
         raise credentials_exception
     
-    usuario = db.query(Usuario).filter(Usuario.id == token_data.user_id).first()
+    usuario = obtener_principal(token_data.user_id, db)
     
     if usuario is None:
         raise credentials_exception
@@ -85,7 +89,7 @@ def require_role(roles: list[str]):
         ):
             ...
     """
-    async def role_checker(current_user: Usuario = Depends(get_current_user)):
+    async def role_checker(current_user: UsuarioPrincipal = Depends(get_current_user)):
         if current_user.rol not in roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+# --- CACHÉ LRU EN MEMORIA (por proceso) ---
+# Pensado para datos que no cambian o que se invalidan explícitamente.
+# Es seguro entre hilos: FastAPI ejecuta los endpoints síncronos en un pool.
+
+_SIN_VALOR = object()
+
+
+class LRUCache:
+    """
+    Caché acotada con política LRU y TTL opcional.
+    Lleva contadores de aciertos/fallos para exponer métricas.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl  # Segundos; None = sin expiración
+        self._datos: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expirados = 0
+        self.desalojos = 0
+
+    def get(self, clave: Hashable, default: Any = None) -> Any:
+        """Obtener un valor (y marcarlo como usado recientemente)"""
+        with self._lock:
+            entrada = self._datos.get(clave, _SIN_VALOR)
+
+            if entrada is _SIN_VALOR:
+                self.fallos += 1
+                return default
+
+            valor, expira_en = entrada
+            if expira_en is not None and time.monotonic() > expira_en:
+                del self._datos[clave]
+                self.expirados += 1
+                self.fallos += 1
+                return default
+
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def set(self, clave: Hashable, valor: Any):
+        """Guardar un valor, desalojando el menos usado si se llena"""
+        expira_en = time.monotonic() + self.ttl if self.ttl else None
+
+        with self._lock:
+            self._datos[clave] = (valor, expira_en)
+            self._datos.move_to_end(clave)
+
+            while len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+                self.desalojos += 1
+
+    def invalidar(self, clave: Hashable):
+        """Eliminar una clave (si existe)"""
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def limpiar(self):
+        """Vaciar la caché completa"""
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+    def estadisticas(self) -> dict:
+        """Métricas de uso de la caché"""
+        consultas = self.aciertos + self.fallos
+        return {
+            "tamaño": len(self._datos),
+            "maxsize": self.maxsize,
+            "ttl_segundos": self.ttl,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "expirados": self.expirados,
+            "desalojos": self.desalojos,
+            "tasa_aciertos": round(self.aciertos / consultas * 100, 2) if consultas > 0 else 0
+        }
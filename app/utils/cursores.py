@@ -0,0 +1,32 @@
+import base64
+from datetime import datetime
+from typing import Tuple
+from fastapi import HTTPException, status
+
+# --- CURSORES PARA PAGINACIÓN KEYSET ---
+# El cursor es opaco para el cliente: codifica (created_at, id) del último
+# registro entregado, así la siguiente página parte justo después de él
+# sin usar OFFSET (que se vuelve lento con millones de filas).
+
+def codificar_cursor(created_at: datetime, id: int) -> str:
+    """
+    Codifica la posición (created_at, id) como cursor opaco.
+    """
+    crudo = f"{created_at.isoformat()}|{id}"
+    return base64.urlsafe_b64encode(crudo.encode()).decode()
+
+
+def decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decodifica un cursor generado por codificar_cursor.
+    Lanza una excepción HTTP 400 si el cursor no es válido.
+    """
+    try:
+        crudo = base64.urlsafe_b64decode(cursor.encode()).decode()
+        fecha, id = crudo.rsplit("|", 1)
+        return datetime.fromisoformat(fecha), int(id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor inválido"
+        )
@@ -1,10 +1,13 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from typing import Optional
+from app.config import settings
 
-def calcular_fecha_devolucion(tipo_prestamo: str, tipo_documento: str) -> datetime:
+def calcular_fecha_devolucion(tipo_prestamo: str, tipo_documento: str, desde: Optional[datetime] = None) -> datetime:
     '''
     Calcula la fecha de devolución basada en el tipo de préstamo y el tipo de documento.
+    Por defecto cuenta desde ahora; 'desde' permite calcularla para un préstamo pasado.
     '''
-    ahora = datetime.now()
+    ahora = desde or datetime.now()
 
     if tipo_prestamo == "sala":
         return ahora + timedelta(hours=4)
@@ -17,6 +20,13 @@ def calcular_fecha_devolucion(tipo_prestamo: str, tipo_documento: str) -> dateti
     
     return ahora + timedelta(days=5)  # Valor por defecto si no coincide ningún caso
 
+def calcular_fecha_limite_retiro(desde: date) -> date:
+    '''
+    Último día para retirar una reserva activada en la fecha indicada.
+    '''
+
+    return desde + timedelta(days=settings.RESERVA_DIAS_GRACIA)
+
 def verificar_vencimiento(fecha_estimada) -> bool:
 
     '''
@@ -1,6 +1,9 @@
+import logging
 from fastapi import HTTPException
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
 # --- LÓGICA DE VALIDACIÓN DE CATEGORÍA ---
 CATEGORIAS_VALIDAS={
     "literatura_chilena",
@@ -36,7 +39,7 @@ async def verificacion():
     """
     Placeholder para la dependencia de seguridad que verifica el rol.
     """
-    print("Verificando rol")
+    logger.debug("Verificando rol")
     '''
     Lógica de verificación.
     '''
@@ -0,0 +1,64 @@
+from fastapi import Depends, Request, Response
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.database import get_db
+from app.services.versiones_recurso import obtener_versiones
+
+# --- GET CONDICIONAL (ETag / If-None-Match) ---
+# El ETag de una respuesta se arma con la versión de los recursos de los que
+# depende (ver services/versiones_recurso.py). Si el cliente ya tiene esa
+# versión, la dependencia corta la petición con 304 antes de que el endpoint
+# ejecute su consulta. Es un ETag débil: identifica los datos, no los bytes
+# (la misma respuesta puede viajar comprimida o no).
+
+
+class NoModificado(Exception):
+    """El cliente ya tiene la versión vigente: responder 304"""
+
+    def __init__(self, etag: str):
+        self.etag = etag
+
+
+def _coincide(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    etiqueta = etag.removeprefix("W/")
+    return any(
+        candidato.strip().removeprefix("W/") == etiqueta
+        for candidato in if_none_match.split(",")
+    )
+
+
+def etag_por_version(*recursos: str):
+    """
+    Dependency factory: agrega ETag a la respuesta y contesta 304 si el
+    If-None-Match del cliente coincide.
+    
+    Uso:
+        @router.get("/", dependencies=[Depends(etag_por_version(RECURSO_CATALOGO))])
+    
+    En endpoints con autenticación va como parámetro después del usuario
+    (las dependencias de 'dependencies=[...]' se resuelven antes que las
+    del endpoint, y un 304 no debe saltarse la verificación de rol):
+        current_user = Depends(require_role([...])),
+        _etag: None = Depends(etag_por_version(RECURSO_EJEMPLARES))
+    """
+    def verificar_etag(request: Request, response: Response, db: Session = Depends(get_db)):
+        versiones = obtener_versiones(db, recursos)
+        etag = 'W/"{}-{}"'.format(
+            settings.VERSION,
+            "-".join(f"{recurso}.{versiones[recurso]}" for recurso in recursos)
+        )
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _coincide(if_none_match, etag):
+            raise NoModificado(etag)
+
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+    return verificar_etag
+
+
+async def respuesta_no_modificado(request: Request, exc: NoModificado) -> Response:
+    """Exception handler de NoModificado"""
+    return Response(status_code=304, headers={"ETag": exc.etag, "Cache-Control": "no-cache"})
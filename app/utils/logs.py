@@ -0,0 +1,147 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import traceback
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# --- LOGS ESTRUCTURADOS SIN BLOQUEAR LAS SOLICITUDES ---
+# Todos los loggers escriben en un QueueHandler: quien registra solo arma el
+# mensaje (el % de los argumentos) y lo deja en una cola en memoria. Un
+# QueueListener en su propio hilo serializa a JSON (una línea por registro)
+# y escribe a stdout, así el formato y la E/S (con su lock) no corren en el
+# event loop ni en los hilos de los endpoints.
+#
+# Cada línea lleva el request_id de la solicitud en curso (ContextVar que
+# fija MiddlewareIdSolicitud; se propaga a los hilos de los endpoints
+# síncronos). Se toma del header X-Request-ID si viene, o se genera, y se
+# devuelve en la respuesta. Los campos pasados con extra={...} se agregan
+# al JSON.
+#
+# Niveles: LOG_NIVEL para todo y LOG_NIVELES por módulo, p. ej.
+# LOG_NIVELES='{"app.services.bandeja_salida": "DEBUG", "sqlalchemy.engine": "WARNING"}'
+
+HEADER_ID_SOLICITUD = b"x-request-id"
+
+_id_solicitud: ContextVar[Optional[str]] = ContextVar("id_solicitud", default=None)
+_listener: Optional[QueueListener] = None
+
+# Atributos propios de LogRecord: lo demás viene de extra={...}
+_ATRIBUTOS_REGISTRO = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "request_id"}
+
+
+def id_solicitud_actual() -> Optional[str]:
+    return _id_solicitud.get()
+
+
+class _ColaHandler(QueueHandler):
+    """
+    QueueHandler que deja el formato para el hilo del listener. El estándar
+    formatea el registro completo al encolar (pensado para colas entre
+    procesos); aquí la cola es del mismo proceso y basta con fijar el mensaje
+    para que no cambie si los argumentos se modifican después.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.request_id = _id_solicitud.get()
+        return record
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro: fecha, nivel, logger, mensaje, request_id y extras"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            "fecha": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            datos["request_id"] = request_id
+        for clave, valor in vars(record).items():
+            if clave not in _ATRIBUTOS_REGISTRO:
+                datos[clave] = valor
+        if record.exc_info:
+            datos["excepcion"] = "".join(traceback.format_exception(*record.exc_info))
+        elif record.exc_text:
+            datos["excepcion"] = record.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+def configurar_logs(nivel: str = "INFO", niveles: Optional[Dict[str, str]] = None):
+    """
+    Dirigir los logs de la app a la cola y arrancar el hilo que los escribe.
+    Se puede llamar de nuevo para cambiar los niveles.
+    """
+    global _listener
+
+    raiz = logging.getLogger()
+    raiz.setLevel(nivel.upper())
+    for nombre, nivel_modulo in (niveles or {}).items():
+        logging.getLogger(nombre).setLevel(nivel_modulo.upper())
+
+    if _listener is not None:
+        return
+
+    cola = queue.SimpleQueue()
+    salida = logging.StreamHandler(sys.stdout)
+    salida.setFormatter(FormatoJSON())
+    _listener = QueueListener(cola, salida, respect_handler_level=True)
+    _listener.start()
+
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+    raiz.addHandler(_ColaHandler(cola))
+    atexit.register(detener_logs)
+
+
+def detener_logs():
+    """Escribir lo que queda en la cola y detener el hilo de los logs"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class MiddlewareIdSolicitud:
+    """Asigna un request_id a cada solicitud (o usa X-Request-ID) y lo devuelve en la respuesta"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for nombre, valor in scope["headers"]:
+            if nombre == HEADER_ID_SOLICITUD:
+                # Se acepta el del cliente o del proxy, acotado para no inflar los logs
+                request_id = valor.decode("latin-1")[:64] or None
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [
+                    (HEADER_ID_SOLICITUD, request_id.encode("latin-1"))
+                ]
+            await send(mensaje)
+
+        token = _id_solicitud.set(request_id)
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _id_solicitud.reset(token)
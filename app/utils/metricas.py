@@ -0,0 +1,176 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+# --- MÉTRICAS EN MEMORIA (por proceso) EN FORMATO PROMETHEUS ---
+# Contadores, gauges e histogramas con etiquetas. Cada hilo escribe en su
+# propio fragmento (un dict en threading.local), así registrar una
+# observación no toma locks: es una búsqueda en un dict, un bisect sobre los
+# límites fijos y dos sumas, bastante menos de un microsegundo, y se pueden
+# dejar activas en producción. Al exportar se suman los fragmentos de todos
+# los hilos; el texto para /metrics se arma solo cuando Prometheus lo pide.
+
+Etiquetas = Tuple[str, ...]
+
+# Límites de latencia en segundos (5 ms a 10 s)
+LIMITES_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas_texto(nombres: Sequence[str], valores: Etiquetas, extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _numero(valor: float) -> str:
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._local = threading.local()
+        self._lock = threading.Lock()  # Solo para registrar fragmentos nuevos
+        self._fragmentos: List[dict] = []
+
+    def _nuevo_fragmento(self) -> dict:
+        """Primer registro de este hilo: crear su dict de series"""
+        fragmento = self._local.series = {}
+        with self._lock:
+            self._fragmentos.append(fragmento)
+        return fragmento
+
+    def _sumar_fragmentos(self) -> Dict[Etiquetas, float]:
+        with self._lock:
+            fragmentos = list(self._fragmentos)
+        totales: Dict[Etiquetas, float] = {}
+        for fragmento in fragmentos:
+            for etiquetas, valor in list(fragmento.items()):
+                totales[etiquetas] = totales.get(etiquetas, 0) + valor
+        return totales
+
+    def _encabezado(self) -> List[str]:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+
+    def _exportar_valores(self, valores: Dict[Etiquetas, float]) -> List[str]:
+        return self._encabezado() + [
+            f"{self.nombre}{_etiquetas_texto(self.etiquetas, e)} {_numero(v)}"
+            for e, v in sorted(valores.items())
+        ]
+
+
+class Contador(_Metrica):
+    """Valor que solo aumenta (solicitudes, consultas, segundos acumulados)"""
+
+    tipo = "counter"
+
+    def incrementar(self, etiquetas: Etiquetas = (), cantidad: float = 1):
+        try:
+            series = self._local.series
+        except AttributeError:
+            series = self._nuevo_fragmento()
+        series[etiquetas] = series.get(etiquetas, 0) + cantidad
+
+    def valor(self, etiquetas: Etiquetas = ()) -> float:
+        return self._sumar_fragmentos().get(etiquetas, 0)
+
+    def exportar(self) -> List[str]:
+        return self._exportar_valores(self._sumar_fragmentos())
+
+
+class Gauge(_Metrica):
+    """
+    Valor que sube y baja (solicitudes en curso, conexiones en uso).
+    sumar() es para los que cambian en cada solicitud; fijar() para los que
+    se leen al exportar (no conviene mezclar ambos en la misma serie).
+    """
+
+    tipo = "gauge"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self._fijos: Dict[Etiquetas, float] = {}
+
+    def sumar(self, etiquetas: Etiquetas = (), cantidad: float = 1):
+        try:
+            series = self._local.series
+        except AttributeError:
+            series = self._nuevo_fragmento()
+        series[etiquetas] = series.get(etiquetas, 0) + cantidad
+
+    def fijar(self, etiquetas: Etiquetas, valor: float):
+        self._fijos[etiquetas] = valor - self._sumar_fragmentos().get(etiquetas, 0)
+
+    def _valores(self) -> Dict[Etiquetas, float]:
+        valores = self._sumar_fragmentos()
+        for etiquetas, base in list(self._fijos.items()):
+            valores[etiquetas] = valores.get(etiquetas, 0) + base
+        return valores
+
+    def valor(self, etiquetas: Etiquetas = ()) -> float:
+        return self._valores().get(etiquetas, 0)
+
+    def exportar(self) -> List[str]:
+        return self._exportar_valores(self._valores())
+
+
+class Histograma(_Metrica):
+    """Distribución de valores en buckets fijos, con suma y cantidad"""
+
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = (), limites: Sequence[float] = LIMITES_LATENCIA):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.limites = tuple(sorted(limites))
+
+    def observar(self, etiquetas: Etiquetas, valor: float):
+        try:
+            series = self._local.series
+        except AttributeError:
+            series = self._nuevo_fragmento()
+        # etiquetas -> [conteo por bucket (el último es +Inf), suma]
+        serie = series.get(etiquetas)
+        if serie is None:
+            serie = series[etiquetas] = [[0] * (len(self.limites) + 1), 0.0]
+        serie[0][bisect_left(self.limites, valor)] += 1
+        serie[1] += valor
+
+    def exportar(self) -> List[str]:
+        with self._lock:
+            fragmentos = list(self._fragmentos)
+        series: Dict[Etiquetas, list] = {}
+        for fragmento in fragmentos:
+            for etiquetas, (conteos, suma) in list(fragmento.items()):
+                total = series.setdefault(etiquetas, [[0] * len(conteos), 0.0])
+                total[0] = [a + b for a, b in zip(total[0], conteos)]
+                total[1] += suma
+
+        lineas = self._encabezado()
+        for etiquetas, (conteos, suma) in sorted(series.items()):
+            acumulado = 0
+            for limite, conteo in zip((*self.limites, "+Inf"), conteos):
+                acumulado += conteo
+                le = limite if limite == "+Inf" else _numero(limite)
+                texto = _etiquetas_texto(self.etiquetas, etiquetas, f'le="{le}"')
+                lineas.append(f"{self.nombre}_bucket{texto} {acumulado}")
+            texto = _etiquetas_texto(self.etiquetas, etiquetas)
+            lineas.append(f"{self.nombre}_sum{texto} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{texto} {acumulado}")
+        return lineas
+
+
+def exportar_prometheus(metricas: Sequence[_Metrica]) -> str:
+    """Texto en formato de exposición de Prometheus (version 0.0.4)"""
+    lineas = []
+    for metrica in metricas:
+        lineas.extend(metrica.exportar())
+    return "\n".join(lineas) + "\n"
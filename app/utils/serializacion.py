@@ -0,0 +1,57 @@
+import json
+from datetime import date, datetime
+from typing import Any, Dict, List
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+except ImportError:
+    orjson = None
+
+# --- SERIALIZACIÓN JSON RÁPIDA ---
+# Por defecto FastAPI valida cada fila contra el response_model (un objeto
+# pydantic por fila), la pasa por jsonable_encoder y recién ahí json.dumps.
+# En los listados grandes eso domina el tiempo de respuesta. Aquí:
+#   - RespuestaJSON: clase de respuesta por defecto de la app, con orjson
+#     (si está instalado) en lugar del encoder estándar.
+#   - filas_a_dicts + respuesta_json: camino rápido para los listados; la
+#     consulta trae solo las columnas del schema y las filas se escriben
+#     directo a bytes, sin pasar por pydantic. El response_model del endpoint
+#     se mantiene para la documentación de OpenAPI.
+
+RespuestaJSON = ORJSONResponse if orjson else JSONResponse
+
+
+def _por_defecto(valor: Any):
+    """Tipos que json estándar no sabe escribir (mismo formato que orjson)"""
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def a_json(contenido: Any) -> bytes:
+    """Serializar dicts, listas, fechas y enums a bytes JSON"""
+    if orjson:
+        return orjson.dumps(contenido, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(contenido, default=_por_defecto, ensure_ascii=False).encode("utf-8")
+
+
+def filas_a_dicts(resultado) -> List[Dict[str, Any]]:
+    """
+    Convertir el resultado de db.execute(select(columnas...)) en dicts
+    con los nombres de las columnas (o sus labels) como claves.
+    """
+    claves = list(resultado.keys())
+    return [dict(zip(claves, fila)) for fila in resultado]
+
+
+def respuesta_json(contenido: Any, status_code: int = 200) -> Response:
+    """Respuesta con el contenido ya serializado, sin validación de pydantic"""
+    return Response(content=a_json(contenido), status_code=status_code, media_type="application/json")
+
+
+def respuesta_filas(resultado, status_code: int = 200) -> Response:
+    """Atajo: filas de un select de columnas directo a una respuesta JSON"""
+    return respuesta_json(filas_a_dicts(resultado), status_code=status_code)
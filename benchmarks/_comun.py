@@ -0,0 +1,68 @@
+"""
+Utilidades compartidas por los benchmarks.
+Ejecutar cada benchmark desde la raíz del proyecto: python -m benchmarks.<nombre>
+"""
+
+import os
+import platform
+import statistics
+import time
+from typing import Callable, Dict, List
+
+
+def configurar_entorno(**variables: str):
+    """
+    Fijar variables de entorno antes de importar la app (app.config las lee
+    al importarse). No pisa las que ya vengan definidas.
+    """
+    for nombre, valor in variables.items():
+        os.environ.setdefault(nombre, str(valor))
+
+
+def describir_equipo() -> Dict[str, object]:
+    """Equipo donde se midió, para guardarlo junto a una línea base"""
+    procesador = platform.processor()
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            procesador = next(
+                (l.split(":", 1)[1].strip() for l in cpuinfo if l.startswith("model name")), procesador
+            )
+    except OSError:
+        pass
+    return {
+        "maquina": platform.node(),
+        "procesador": procesador or platform.machine(),
+        "cpus": os.cpu_count(),
+        "sistema": platform.platform(),
+        "python": platform.python_version(),
+    }
+
+
+def cronometrar(funcion: Callable[[], object], repeticiones: int = 5, calentamiento: int = 1) -> Dict[str, float]:
+    """Ejecutar una función varias veces y retornar los tiempos en ms"""
+    for _ in range(calentamiento):
+        funcion()
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    return {
+        "min_ms": min(tiempos),
+        "mediana_ms": statistics.median(tiempos),
+        "max_ms": max(tiempos)
+    }
+
+
+def imprimir_tabla(titulo: str, columnas: List[str], filas: List[list]):
+    """Imprimir resultados como tabla de texto alineada"""
+    textos = [[f"{v:,.2f}" if isinstance(v, float) else str(v) for v in fila] for fila in filas]
+    anchos = [max(len(c), *(len(f[i]) for f in textos)) for i, c in enumerate(columnas)]
+
+    print(f"\n{titulo}")
+    print("  ".join(c.ljust(a) for c, a in zip(columnas, anchos)))
+    print("  ".join("-" * a for a in anchos))
+    for fila in textos:
+        print("  ".join(v.rjust(a) if i else v.ljust(a) for i, (v, a) in enumerate(zip(fila, anchos))))
@@ -0,0 +1,89 @@
+"""
+Microbenchmark del costo de registrar métricas (app/utils/metricas.py).
+
+Mide cuánto tarda una observación de histograma, un incremento de contador
+y el registro completo que hace MiddlewareMetricas al terminar cada
+solicitud (contador + 2 histogramas + contadores de consultas). El objetivo
+es estar bajo 1 µs por observación.
+
+Ejecutar: python -m benchmarks.bench_metricas --observaciones 1000000
+"""
+
+import argparse
+import time
+
+from benchmarks._comun import configurar_entorno, imprimir_tabla
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--observaciones", type=int, default=1000000)
+    parser.add_argument("--rutas", type=int, default=50, help="rutas distintas (series por métrica)")
+    args = parser.parse_args()
+
+    configurar_entorno(PLANIFICADOR_ACTIVO="false")
+    from app.utils.metricas import Contador, Gauge, Histograma, exportar_prometheus
+
+    histograma = Histograma("bench_duracion_segundos", "bench", ("metodo", "ruta"))
+    contador = Contador("bench_total", "bench", ("metodo", "ruta", "estado"))
+    gauge = Gauge("bench_en_curso", "bench")
+    consultas = Histograma("bench_consultas", "bench", ("ruta",), limites=(0, 1, 2, 5, 10, 25, 50, 100))
+
+    n = args.observaciones
+    rutas = [f"/api/v1/recurso{i}/{{id}}" for i in range(args.rutas)]
+    etiquetas = [("GET", rutas[i % len(rutas)]) for i in range(n)]
+    etiquetas_estado = [("GET", rutas[i % len(rutas)], "200") for i in range(n)]
+    valores = [(i % 1000) / 10000 for i in range(n)]
+
+    def vacio():
+        for e, v in zip(etiquetas, valores):
+            pass
+
+    def observar():
+        for e, v in zip(etiquetas, valores):
+            histograma.observar(e, v)
+
+    def incrementar():
+        for e in etiquetas_estado:
+            contador.incrementar(e)
+
+    def solicitud_completa():
+        for e, e_estado, v in zip(etiquetas, etiquetas_estado, valores):
+            gauge.sumar()
+            gauge.sumar(cantidad=-1)
+            contador.incrementar(e_estado)
+            histograma.observar(e, v)
+            consultas.observar(e[1:], 3)
+
+    filas = []
+    base = None
+    for nombre, funcion, por_iteracion in (
+        ("bucle vacío (referencia)", vacio, 1),
+        ("Histograma.observar", observar, 1),
+        ("Contador.incrementar", incrementar, 1),
+        ("registro de una solicitud", solicitud_completa, 5),
+    ):
+        inicio = time.perf_counter()
+        funcion()
+        segundos = time.perf_counter() - inicio
+        if base is None:
+            base = segundos
+            filas.append([nombre, segundos / n * 1e9, "-"])
+            continue
+        neto = (segundos - base) / n * 1e9
+        filas.append([nombre, neto, neto / por_iteracion])
+
+    inicio = time.perf_counter()
+    texto = exportar_prometheus([contador, histograma, gauge, consultas])
+    exportar_ms = (time.perf_counter() - inicio) * 1000
+
+    imprimir_tabla(
+        f"Costo de registrar métricas ({n} iteraciones, {args.rutas} rutas)",
+        ["operación", "ns/iteración", "ns/observación"],
+        filas
+    )
+    print(f"\nExportar /metrics: {exportar_ms:.2f} ms ({len(texto.splitlines())} líneas)")
+
+
+if __name__ == "__main__":
+    main()
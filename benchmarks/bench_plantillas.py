@@ -0,0 +1,168 @@
+"""
+Microbenchmark de renderizado de emails: recordatorio de préstamos vencidos.
+
+Compara la plantilla compilada del registro (app/services/plantillas_email.py)
+con la implementación anterior, que armaba todo el HTML y el CSS con
+f-strings en cada mensaje (copiada abajo como referencia). La anterior no
+escapaba los valores; la fila "anterior + escape" agrega html.escape para
+comparar trabajo equivalente. Con --mime también mide armar el mensaje MIME.
+
+Ejecutar: python -m benchmarks.bench_plantillas --emails 100000
+"""
+
+import argparse
+import time
+from html import escape
+import tracemalloc
+
+from benchmarks._comun import configurar_entorno, imprimir_tabla
+
+
+def _recordatorio_fstring(nombre: str, prestamos_vencidos: list):
+    """Implementación anterior de EmailService.plantilla_recordatorio_vencido"""
+    subject = "⚠️ Recordatorio: Tienes préstamos vencidos"
+    
+    # Generar tabla de préstamos
+    tabla_prestamos = ""
+    for prestamo in prestamos_vencidos:
+        tabla_prestamos += f"""
+        <tr>
+            <td style="padding: 10px; border: 1px solid #ddd;">{prestamo['documento']}</td>
+            <td style="padding: 10px; border: 1px solid #ddd;">{prestamo['fecha_devolucion']}</td>
+            <td style="padding: 10px; border: 1px solid #ddd; color: red; font-weight: bold;">
+                {prestamo['dias_atraso']} días
+            </td>
+        </tr>
+        """
+    
+    html_content = f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background-color: #e74c3c; color: white; padding: 20px; text-align: center; }}
+            .content {{ padding: 20px; background-color: #f4f4f4; }}
+            .warning {{ background-color: #fff3cd; border-left: 4px solid #ffc107; padding: 15px; margin: 20px 0; }}
+            table {{ width: 100%; border-collapse: collapse; margin: 20px 0; background: white; }}
+            th {{ background-color: #2c3e50; color: white; padding: 12px; text-align: left; }}
+            .footer {{ text-align: center; padding: 20px; font-size: 12px; color: #777; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>⚠️ Préstamos Vencidos</h1>
+            </div>
+            <div class="content">
+                <h2>Hola, {nombre}</h2>
+                <p>Este es un recordatorio de que tienes los siguientes préstamos vencidos:</p>
+                
+                <table>
+                    <thead>
+                        <tr>
+                            <th>Documento</th>
+                            <th>Fecha de devolución</th>
+                            <th>Días de atraso</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+                        {tabla_prestamos}
+                    </tbody>
+                </table>
+                
+                <div class="warning">
+                    <strong>⚠️ Importante:</strong>
+                    <p>Por cada día de atraso se aplicarán 2 días de sanción (mínimo 3 días, máximo 30 días).</p>
+                    <p>Durante el período de sanción no podrás solicitar nuevos préstamos.</p>
+                </div>
+                
+                <p>Por favor, devuelve los documentos lo antes posible en el mesón de atención.</p>
+            </div>
+            <div class="footer">
+                <p>Biblioteca Estación Central</p>
+                <p>&copy; 2025 Todos los derechos reservados</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    return subject, html_content
+
+
+def _recordatorio_fstring_escapado(nombre: str, prestamos_vencidos: list):
+    return _recordatorio_fstring(escape(nombre), [
+        {"documento": escape(p["documento"]), "fecha_devolucion": escape(p["fecha_devolucion"]), "dias_atraso": p["dias_atraso"]}
+        for p in prestamos_vencidos
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=100000)
+    parser.add_argument("--prestamos", type=int, default=2, help="préstamos vencidos por email")
+    parser.add_argument("--mime", action="store_true", help="incluir la creación del mensaje MIME")
+    args = parser.parse_args()
+
+    configurar_entorno(PLANIFICADOR_ACTIVO="false")
+    from app.services.email_service import email_service
+
+    destinatarios = [
+        (
+            f"Usuario {i}",
+            [
+                {"documento": f"Documento {i}-{j}", "fecha_devolucion": "01/03/2026", "dias_atraso": j + 1}
+                for j in range(args.prestamos)
+            ]
+        )
+        for i in range(args.emails)
+    ]
+
+    metodos = [
+        ("f-string por mensaje (anterior)", _recordatorio_fstring),
+        ("f-string anterior + escape", _recordatorio_fstring_escapado),
+        ("plantilla compilada", email_service.plantilla_recordatorio_vencido),
+    ]
+
+    filas = []
+    for nombre, renderizar in metodos:
+        if args.mime:
+            def funcion(nombre_usuario, prestamos, renderizar=renderizar):
+                asunto, html = renderizar(nombre_usuario, prestamos)
+                return email_service.crear_mensaje("usuario@example.cl", asunto, html)
+        else:
+            funcion = renderizar
+
+        inicio = time.perf_counter()
+        for nombre_usuario, prestamos in destinatarios:
+            funcion(nombre_usuario, prestamos)
+        segundos = time.perf_counter() - inicio
+
+        # Memoria asignada por email (muestra de 1000)
+        muestra = destinatarios[:1000]
+        tracemalloc.start()
+        resultados = [funcion(n, p) for n, p in muestra]
+        actual, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del resultados
+
+        filas.append([
+            nombre,
+            args.emails,
+            segundos,
+            segundos / args.emails * 1e6,
+            args.emails / segundos,
+            actual / len(muestra) / 1024
+        ])
+
+    imprimir_tabla(
+        f"Renderizado de {args.emails} recordatorios ({args.prestamos} préstamos c/u{', con MIME' if args.mime else ''})",
+        ["método", "emails", "segundos", "µs/email", "emails/s", "KB/email"],
+        filas
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Benchmark de serialización de los listados: páginas de 500 filas de
+/ejemplares/, /usuarios/ y /reservas/.
+
+"antes" reproduce lo que hacían los endpoints: cargar objetos ORM (y en
+reservas, 2 consultas extra por fila), validar cada fila contra el
+response_model y serializar con el encoder estándar, como FastAPI con
+JSONResponse. "después" usa el camino rápido de app/utils/serializacion.py:
+select de columnas y escritura directa a bytes JSON (orjson si está instalado).
+
+Se mide por separado la serialización sola (filas ya cargadas) y el total
+incluyendo la consulta, sobre una base SQLite temporal.
+
+Ejecutar: python -m benchmarks.bench_serializacion --filas 500
+"""
+
+import argparse
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from typing import List
+
+from benchmarks._comun import configurar_entorno, cronometrar, imprimir_tabla
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=500, help="filas por página")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="bench_serializacion_")
+    configurar_entorno(
+        DATABASE_URL=f"sqlite:///{os.path.join(directorio, 'bench.db')}",
+        PLANIFICADOR_ACTIVO="false"
+    )
+
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+    from sqlalchemy import insert, select
+
+    from app.database import Base, SessionLocal, engine
+    import app.models  # noqa: F401 (registra todos los modelos)
+    import app.models.biblioteca  # noqa: F401 (prestamos.biblioteca_id)
+    from app.models.documento import Documento
+    from app.models.ejemplar import Ejemplar
+    from app.models.reserva import Reserva
+    from app.models.usuario import Usuario
+    from app.schemas.ejemplar_schema import EjemplarResponse
+    from app.schemas.usuario import UsuarioResponse
+    from app.utils.serializacion import a_json, filas_a_dicts, orjson
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    n = args.filas
+    ahora = datetime.utcnow()
+    db.execute(insert(Usuario), [
+        {"rut": f"{i}-K", "nombres": f"Nombre {i}", "apellidos": "Apellido", "email": f"u{i}@example.cl",
+         "password_hash": "x", "rol": "usuario", "activo": True, "created_at": ahora,
+         "fecha_sancion_hasta": ahora + timedelta(days=3) if i % 5 == 0 else None}
+        for i in range(n)
+    ])
+    db.execute(insert(Documento), [
+        {"tipo": "libro", "titulo": f"Documento {i}", "autor": "Autor", "activo": True}
+        for i in range(100)
+    ])
+    db.execute(insert(Ejemplar), [
+        {"documento_id": i % 100 + 1, "codigo": f"EJ-{i:06d}", "estado": "disponible", "ubicacion": "A1", "created_at": ahora}
+        for i in range(n)
+    ])
+    db.execute(insert(Reserva), [
+        {"usuario_id": i + 1, "documento_id": i % 100 + 1, "fecha_reserva": date.today() + timedelta(days=i % 30),
+         "estado": "pendiente", "prioridad": 0, "fecha_creacion": ahora}
+        for i in range(n)
+    ])
+    db.commit()
+
+    def responder_antes(contenido):
+        # Lo que hace FastAPI con response_model y JSONResponse
+        return JSONResponse(contenido).body
+
+    # --- /ejemplares/ ---
+    adaptador_ejemplares = TypeAdapter(List[EjemplarResponse])
+
+    def serializar_ejemplares_antes(ejemplares):
+        validados = adaptador_ejemplares.validate_python(ejemplares, from_attributes=True)
+        return responder_antes(adaptador_ejemplares.dump_python(validados, mode="json"))
+
+    def ejemplares_antes():
+        return serializar_ejemplares_antes(db.query(Ejemplar).limit(n).all())
+
+    consulta_ejemplares = select(
+        Ejemplar.id, Ejemplar.documento_id, Ejemplar.codigo,
+        Ejemplar.estado, Ejemplar.ubicacion, Ejemplar.created_at
+    ).limit(n)
+
+    def ejemplares_despues():
+        return a_json(filas_a_dicts(db.execute(consulta_ejemplares)))
+
+    # --- /usuarios/ ---
+    adaptador_usuarios = TypeAdapter(List[UsuarioResponse])
+
+    def serializar_usuarios_antes(usuarios):
+        resultado = [
+            UsuarioResponse(**{
+                "id": u.id, "rut": u.rut, "nombres": u.nombres, "apellidos": u.apellidos,
+                "email": u.email, "rol": u.rol, "activo": u.activo, "foto_url": u.foto_url,
+                "sancionado": u.esta_sancionado(), "fecha_sancion_hasta": u.fecha_sancion_hasta,
+                "created_at": u.created_at
+            })
+            for u in usuarios
+        ]
+        validados = adaptador_usuarios.validate_python(resultado, from_attributes=True)
+        return responder_antes(adaptador_usuarios.dump_python(validados, mode="json"))
+
+    def usuarios_antes():
+        return serializar_usuarios_antes(db.query(Usuario).limit(n).all())
+
+    consulta_usuarios = select(
+        Usuario.id, Usuario.rut, Usuario.nombres, Usuario.apellidos, Usuario.email, Usuario.rol,
+        Usuario.activo, Usuario.foto_url, Usuario.fecha_sancion_hasta, Usuario.created_at
+    ).limit(n)
+
+    def serializar_usuarios_despues(usuarios):
+        ahora = datetime.utcnow()
+        for u in usuarios:
+            u["sancionado"] = u["fecha_sancion_hasta"] is not None and ahora < u["fecha_sancion_hasta"]
+        return a_json(usuarios)
+
+    def usuarios_despues():
+        return serializar_usuarios_despues(filas_a_dicts(db.execute(consulta_usuarios)))
+
+    # --- /reservas/ ---
+    def reservas_antes():
+        resultado = []
+        for reserva in db.query(Reserva).order_by(Reserva.fecha_reserva.asc()).limit(n).all():
+            usuario = db.query(Usuario).filter(Usuario.id == reserva.usuario_id).first()
+            documento = db.query(Documento).filter(Documento.id == reserva.documento_id).first()
+            resultado.append({
+                "id": reserva.id,
+                "usuario_rut": usuario.rut if usuario else "N/A",
+                "usuario_nombre": f"{usuario.nombres} {usuario.apellidos}" if usuario else "N/A",
+                "documento_id": reserva.documento_id,
+                "documento_titulo": documento.titulo if documento else "N/A",
+                "fecha_reserva": reserva.fecha_reserva,
+                "estado": reserva.estado,
+                "fecha_creacion": reserva.fecha_creacion
+            })
+        adaptador = TypeAdapter(List[dict])
+        return responder_antes(adaptador.dump_python(adaptador.validate_python(resultado), mode="json"))
+
+    consulta_reservas = select(
+        Reserva.id, Usuario.rut.label("usuario_rut"), Usuario.nombres, Usuario.apellidos,
+        Reserva.documento_id, Documento.titulo.label("documento_titulo"),
+        Reserva.fecha_reserva, Reserva.estado, Reserva.fecha_creacion
+    ).outerjoin(Usuario, Usuario.id == Reserva.usuario_id).outerjoin(
+        Documento, Documento.id == Reserva.documento_id
+    ).order_by(Reserva.fecha_reserva.asc()).limit(n)
+
+    def reservas_despues():
+        return a_json([
+            {
+                "id": r.id,
+                "usuario_rut": r.usuario_rut or "N/A",
+                "usuario_nombre": f"{r.nombres} {r.apellidos}" if r.usuario_rut else "N/A",
+                "documento_id": r.documento_id,
+                "documento_titulo": r.documento_titulo or "N/A",
+                "fecha_reserva": r.fecha_reserva,
+                "estado": r.estado,
+                "fecha_creacion": r.fecha_creacion
+            }
+            for r in db.execute(consulta_reservas)
+        ])
+
+    # Filas ya cargadas, para medir solo la serialización
+    ejemplares_orm = db.query(Ejemplar).limit(n).all()
+    ejemplares_filas = filas_a_dicts(db.execute(consulta_ejemplares))
+    usuarios_orm = db.query(Usuario).limit(n).all()
+    usuarios_filas = filas_a_dicts(db.execute(consulta_usuarios))
+
+    casos = [
+        ("/ejemplares/", "serialización", lambda: serializar_ejemplares_antes(ejemplares_orm), lambda: a_json(ejemplares_filas)),
+        ("/ejemplares/", "consulta + serialización", ejemplares_antes, ejemplares_despues),
+        ("/usuarios/", "serialización", lambda: serializar_usuarios_antes(usuarios_orm),
+         lambda: serializar_usuarios_despues([dict(u) for u in usuarios_filas])),
+        ("/usuarios/", "consulta + serialización", usuarios_antes, usuarios_despues),
+        ("/reservas/", "consulta + serialización", reservas_antes, reservas_despues),
+    ]
+
+    filas = []
+    try:
+        for listado, medida, antes, despues in casos:
+            t_antes = cronometrar(antes, repeticiones=args.repeticiones)["mediana_ms"]
+            t_despues = cronometrar(despues, repeticiones=args.repeticiones)["mediana_ms"]
+            filas.append([listado, medida, t_antes, t_despues, t_antes / t_despues])
+    finally:
+        db.close()
+
+    imprimir_tabla(
+        f"Páginas de {n} filas (mediana de {args.repeticiones}, encoder: {'orjson' if orjson else 'json estándar'})",
+        ["listado", "medida", "antes ms", "después ms", "mejora x"],
+        filas
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark de envío de emails contra un servidor SMTP local (aiosmtpd).
+
+Compara:
+  - send_email: una sesión SMTP por mensaje (implementación original)
+  - send_bulk: una sesión SMTP por lote, mensajes en serie
+  - pool: PoolSMTP con SMTP_CONEXIONES sesiones persistentes en paralelo
+
+El servidor puede simular la latencia de un servidor real por mensaje y
+por conexión (--latencia-ms, --latencia-conexion-ms).
+
+Requiere: pip install aiosmtpd
+Ejecutar: python -m benchmarks.bench_smtp --mensajes 10000
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks._comun import configurar_entorno, imprimir_tabla
+
+try:
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import SMTP as ServidorSMTP
+except ImportError:
+    raise SystemExit("Este benchmark necesita aiosmtpd: pip install aiosmtpd")
+
+
+class _Receptor:
+    """Handler de aiosmtpd que cuenta los mensajes y simula latencia"""
+
+    def __init__(self, latencia: float):
+        self.latencia = latencia
+        self.recibidos = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+        self.recibidos += 1
+        return "250 OK"
+
+
+class _ServidorLento(ServidorSMTP):
+    """Servidor que tarda en saludar, como el handshake de uno real"""
+
+    latencia_conexion = 0.0
+
+    async def _handle_client(self):
+        if self.latencia_conexion:
+            await asyncio.sleep(self.latencia_conexion)
+        await super()._handle_client()
+
+
+class _Controlador(Controller):
+    def factory(self):
+        return _ServidorLento(self.handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mensajes", type=int, default=10000)
+    parser.add_argument("--conexiones", type=int, default=4, help="tamaño del pool")
+    parser.add_argument("--lote", type=int, default=200, help="mensajes por llamada (CORREOS_LOTE)")
+    parser.add_argument("--latencia-ms", type=float, default=0.0, help="demora del servidor por mensaje")
+    parser.add_argument("--latencia-conexion-ms", type=float, default=0.0, help="demora del servidor al conectar")
+    parser.add_argument("--puerto", type=int, default=8025)
+    parser.add_argument("--max-send-email", type=int, default=2000,
+                        help="tope de mensajes para send_email (una conexión por mensaje es lenta)")
+    args = parser.parse_args()
+
+    configurar_entorno(
+        SMTP_SERVER="127.0.0.1",
+        SMTP_PORT=args.puerto,
+        SMTP_STARTTLS="false",
+        SMTP_USER="",
+        SMTP_CONEXIONES=args.conexiones,
+        PLANIFICADOR_ACTIVO="false"
+    )
+    from app.services.email_service import email_service
+    from app.services.smtp_pool import PoolSMTP
+
+    receptor = _Receptor(args.latencia_ms / 1000)
+    _ServidorLento.latencia_conexion = args.latencia_conexion_ms / 1000
+    controlador = _Controlador(receptor, hostname="127.0.0.1", port=args.puerto)
+    controlador.start()
+
+    html = "<html><body>\n" + "<p>Recordatorio de la biblioteca</p>\n" * 40 + "</body></html>"
+    mensajes = [(f"usuario{i}@example.cl", f"Mensaje {i}", html) for i in range(args.mensajes)]
+    lotes = [mensajes[i:i + args.lote] for i in range(0, len(mensajes), args.lote)]
+
+    def enviar_uno_a_uno():
+        return sum(
+            email_service.send_email(to, subject, contenido)
+            for to, subject, contenido in mensajes[:args.max_send_email]
+        )
+
+    def enviar_bulk():
+        return sum(ok for lote in lotes for ok, _ in email_service.send_bulk(lote))
+
+    pool = PoolSMTP(email_service, conexiones=args.conexiones)
+
+    def enviar_pool():
+        return sum(ok for lote in lotes for ok, _ in pool.enviar_lote(lote))
+
+    filas = []
+    try:
+        for nombre, funcion in (
+            ("send_email (1 conexión por mensaje)", enviar_uno_a_uno),
+            ("send_bulk (1 conexión por lote)", enviar_bulk),
+            (f"pool ({args.conexiones} conexiones persistentes)", enviar_pool),
+        ):
+            recibidos_antes = receptor.recibidos
+            inicio = time.perf_counter()
+            enviados = funcion()
+            segundos = time.perf_counter() - inicio
+            recibidos = receptor.recibidos - recibidos_antes
+            filas.append([nombre, enviados, recibidos, segundos, enviados / segundos])
+    finally:
+        pool.cerrar()
+        controlador.stop()
+
+    imprimir_tabla(
+        f"Envío de emails (latencia por mensaje {args.latencia_ms} ms, al conectar {args.latencia_conexion_ms} ms)",
+        ["método", "mensajes", "recibidos", "segundos", "mensajes/s"],
+        filas
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Microbenchmarks de las funciones puras que corren en cada solicitud o lote:
+validación y formato de RUT, fecha de devolución, emisión y lectura de JWT,
+validación de categoría, plantillas de email y la conversión de objetos ORM
+a EjemplarResponse/PrestamoResponse (como la hace FastAPI con response_model).
+
+Cada caso se repite hasta durar ~0,2 s y se toma el mínimo de varias
+repeticiones, en ns por llamada. Con --guardar-baseline el resultado queda en
+benchmarks/baselines/utilidades.json; las corridas siguientes se comparan con
+ese archivo y terminan con código 1 si algún caso es más lento que la línea
+base por más de --umbral, o con 2 si no hay línea base. La línea base es
+propia de cada máquina (el archivo registra el equipo en "entorno"):
+la del repositorio sirve de referencia; para comparar un cambio, guardar una
+antes y medir después en el mismo equipo.
+
+Ejecutar: python -m benchmarks.bench_utilidades [--guardar-baseline] [--solo rut]
+"""
+
+import argparse
+import json
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks._comun import configurar_entorno, describir_equipo, imprimir_tabla
+
+BASELINE = Path(__file__).parent / "baselines" / "utilidades.json"
+
+
+def medir(funcion: Callable[[], object], repeticiones: int) -> float:
+    """ns por llamada: mínimo de las repeticiones, cada una de ~0,2 s"""
+    temporizador = timeit.Timer(funcion)
+    numero, _ = temporizador.autorange()
+    return min(temporizador.repeat(repeticiones, numero)) / numero * 1e9
+
+
+def casos() -> List[Tuple[str, Callable[[], object]]]:
+    from fastapi import HTTPException
+
+    import app.models  # noqa: F401 (registra todos los modelos para las relaciones)
+    from app.models.ejemplar import Ejemplar
+    from app.models.prestamos import DetallePrestamo, EstadoPrestamo, Prestamo, TipoPrestamo
+    from app.schemas.ejemplar_schema import EjemplarResponse
+    from app.schemas.prestamo import PrestamoResponse
+    from app.services.email_service import email_service
+    from app.utils.auth import create_access_token, decode_token
+    from app.utils.dates import calcular_fecha_devolucion
+    from app.utils.dependencies import validacion_categoria
+    from app.utils.validations import formatear_rut, validar_rut
+
+    datos_token = {"user_id": 1234, "rut": "12345678-5", "rol": "bibliotecario"}
+    token = create_access_token(datos_token)
+    token_alterado = token[:-4] + ("AAAA" if not token.endswith("AAAA") else "BBBB")
+
+    def categoria_invalida():
+        try:
+            validacion_categoria("poesia")
+        except HTTPException:
+            pass
+
+    ahora = datetime(2026, 3, 2, 10, 30)
+    vencidos = [
+        {"documento": f"Documento {i}", "fecha_devolucion": "01/03/2026", "dias_atraso": i + 1}
+        for i in range(3)
+    ]
+    proximos = [{"documento": f"Documento {i}", "fecha_devolucion": "05/03/2026"} for i in range(3)]
+    prestamo_info = {
+        "id": 98765, "tipo": "domicilio", "fecha_prestamo": "02/03/2026",
+        "documentos": [
+            {"titulo": f"Título {i}", "autor": "Autor", "fecha_devolucion": "09/03/2026"} for i in range(2)
+        ],
+    }
+
+    ejemplar = Ejemplar(
+        id=1, documento_id=10, codigo="LIT-ESP-001-01", estado="disponible", ubicacion="A3-E2", created_at=ahora
+    )
+    prestamo = Prestamo(
+        id=1, tipo_prestamo=TipoPrestamo.domicilio, usuario_id=2, bibliotecario_id=5, biblioteca_id=1,
+        fecha_prestamo=ahora, fecha_devolucion_estimada=ahora + timedelta(days=7), estado=EstadoPrestamo.activo
+    )
+    prestamo.detalles = [DetallePrestamo(ejemplar_id=i) for i in range(3)]
+
+    return [
+        ("validar_rut (válido, con puntos)", lambda: validar_rut("12.345.678-5")),
+        ("validar_rut (formato inválido)", lambda: validar_rut("12.345-X")),
+        ("formatear_rut", lambda: formatear_rut("12.345.678-5")),
+        ("calcular_fecha_devolucion", lambda: calcular_fecha_devolucion("domicilio", "Libro", ahora)),
+        ("create_access_token", lambda: create_access_token(datos_token)),
+        ("decode_token", lambda: decode_token(token)),
+        ("decode_token (firma inválida)", lambda: decode_token(token_alterado)),
+        ("validacion_categoria (válida)", lambda: validacion_categoria("novela")),
+        ("validacion_categoria (inválida, 400)", categoria_invalida),
+        ("plantilla_validacion", lambda: email_service.plantilla_validacion("Ana Pérez", "a" * 43)),
+        ("plantilla_recordatorio_vencido (3)", lambda: email_service.plantilla_recordatorio_vencido("Ana Pérez", vencidos)),
+        ("plantilla_recordatorio_proximo (3)", lambda: email_service.plantilla_recordatorio_proximo("Ana Pérez", proximos)),
+        ("plantilla_confirmacion_prestamo (2)", lambda: email_service.plantilla_confirmacion_prestamo("Ana Pérez", prestamo_info)),
+        ("plantilla_reserva_disponible", lambda: email_service.plantilla_reserva_disponible("Ana Pérez", "Documento", "05/03/2026")),
+        ("EjemplarResponse desde ORM",
+         lambda: EjemplarResponse.model_validate(ejemplar, from_attributes=True).model_dump(mode="json")),
+        ("PrestamoResponse desde ORM (3 detalles)",
+         lambda: PrestamoResponse.model_validate(prestamo, from_attributes=True).model_dump(mode="json")),
+    ]
+
+
+def comparar(actual: Dict[str, float], base: Dict[str, float], umbral: float) -> List[str]:
+    """Casos más lentos que la línea base por más de 'umbral' (fracción)"""
+    return [
+        f"{nombre}: {base[nombre]:,.0f} → {ns:,.0f} ns ({ns / base[nombre] - 1:+.0%})"
+        for nombre, ns in actual.items()
+        if nombre in base and ns > base[nombre] * (1 + umbral)
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--solo", help="medir solo los casos cuyo nombre contiene este texto")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--guardar-baseline", action="store_true")
+    parser.add_argument("--umbral", type=float, default=0.2, help="lentitud tolerada respecto de la línea base (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    configurar_entorno(DATABASE_URL="sqlite://", PLANIFICADOR_ACTIVO="false")
+
+    base = {}
+    if not args.guardar_baseline:
+        if not args.baseline.exists():
+            print(f"Sin línea base en {args.baseline}: guardar una con --guardar-baseline", file=sys.stderr)
+            return 2
+        base = json.loads(args.baseline.read_text())["resultados"]
+
+    resultados: Dict[str, float] = {}
+    filas = []
+    for nombre, funcion in casos():
+        if args.solo and args.solo.lower() not in nombre.lower():
+            continue
+        ns = round(medir(funcion, args.repeticiones), 1)
+        resultados[nombre] = ns
+        anterior = base.get(nombre)
+        filas.append([nombre, ns, anterior if anterior else "-", f"{ns / anterior - 1:+.1%}" if anterior else "-"])
+
+    imprimir_tabla(
+        f"Funciones por solicitud (mínimo de {args.repeticiones} repeticiones)",
+        ["caso", "ns/llamada", "línea base", "cambio"],
+        filas
+    )
+
+    if args.guardar_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "entorno": describir_equipo(),
+            "resultados": resultados,
+        }, indent=2, ensure_ascii=False))
+        print(f"\nLínea base guardada en {args.baseline}")
+        return 0
+
+    regresiones = comparar(resultados, base, args.umbral)
+    if not regresiones:
+        print(f"\nSin regresiones (umbral {args.umbral:.0%})")
+        return 0
+    print(f"\nRegresiones (umbral {args.umbral:.0%}):")
+    for regresion in regresiones:
+        print(f"  {regresion}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,512 @@
+"""
+Generador de datos sintéticos para benchmarks y pruebas de carga.
+
+Crea documentos, ejemplares, usuarios y varios años de préstamos,
+devoluciones y reservas con una distribución realista: la popularidad de
+los documentos y la actividad de los usuarios siguen una ley de Zipf (unos
+pocos títulos concentran la mayoría de los préstamos), hay menos movimiento
+los fines de semana, la mayoría devuelve a tiempo y algunos con atraso, y
+los préstamos recientes quedan activos o vencidos.
+
+Con la misma semilla y los mismos parámetros se obtiene exactamente el mismo
+dataset. Las filas se generan por día y se cargan por lotes, sin pasar por
+el ORM: con PostgreSQL (psycopg2) usando COPY, en otras bases con
+executemany. Los ids se asignan aquí, a continuación de los que ya existan.
+
+Todos los usuarios generados tienen la contraseña "password123".
+
+Ejecutar:
+    python generar_dataset.py --documentos 20000 --ejemplares 60000 --usuarios 50000 --anios 3
+    python generar_dataset.py --vaciar --semilla 7      (borra y recrea TODAS las tablas)
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import random
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+CONTRASENA = "password123"
+
+TITULOS_A = [
+    "El", "La", "Los", "Las", "Un", "Una", "Memorias de", "Crónica de", "Historia de", "Manual de",
+    "Viaje a", "Cartas a", "Sombras de", "El secreto de", "La ciudad de", "Introducción a",
+]
+TITULOS_B = [
+    "mar", "desierto", "invierno", "tiempo", "jardín", "silencio", "cordillera", "puerto", "río",
+    "noche", "fuego", "viento", "laberinto", "espejo", "camino", "isla", "sur", "bosque", "lluvia",
+    "álgebra lineal", "programación", "química orgánica", "economía", "derecho civil",
+]
+NOMBRES = [
+    "María", "José", "Ana", "Juan", "Camila", "Diego", "Valentina", "Matías", "Francisca", "Benjamín",
+    "Javiera", "Sebastián", "Catalina", "Tomás", "Constanza", "Ignacio", "Fernanda", "Vicente", "Isidora", "Martín",
+]
+APELLIDOS = [
+    "González", "Muñoz", "Rojas", "Díaz", "Pérez", "Soto", "Contreras", "Silva", "Martínez", "Sepúlveda",
+    "Morales", "Rodríguez", "López", "Fuentes", "Hernández", "Torres", "Araya", "Flores", "Espinoza", "Valenzuela",
+]
+EDITORIALES = ["Planeta", "Zig-Zag", "Universitaria", "Lom", "Sudamericana", "Anagrama", "Alfaguara", "Salamandra"]
+
+# (tipo, peso, tipo_medio)
+TIPOS_DOCUMENTO = [("libro", 70, "fisico"), ("revista", 10, "fisico"), ("audio", 10, "cd"), ("video", 10, "dvd")]
+
+# Movimiento relativo por día de la semana (lunes = 0)
+ACTIVIDAD_DIA = [1.0, 1.0, 1.0, 1.0, 1.1, 0.6, 0.2]
+
+
+# ============================================
+# DISTRIBUCIONES
+# ============================================
+
+class Zipf:
+    """
+    Muestreo de elementos con probabilidad proporcional a 1 / rango^s. El
+    orden de popularidad es una permutación aleatoria (con la semilla), así
+    los más populares no son siempre los primeros ids.
+    """
+
+    def __init__(self, rng: random.Random, elementos: Sequence[int], s: float):
+        self.rng = rng
+        self.elementos = list(elementos)
+        rng.shuffle(self.elementos)
+        acumulado = 0.0
+        self.acumulados = []
+        for rango in range(1, len(self.elementos) + 1):
+            acumulado += 1.0 / rango ** s
+            self.acumulados.append(acumulado)
+
+    def muestras(self, k: int) -> List[int]:
+        return self.rng.choices(self.elementos, cum_weights=self.acumulados, k=k)
+
+
+def digito_verificador(numero: int) -> str:
+    """Dígito verificador de un RUT (módulo 11)"""
+    suma, factor = 0, 2
+    for d in reversed(str(numero)):
+        suma += int(d) * factor
+        factor = 2 if factor == 7 else factor + 1
+    resto = 11 - suma % 11
+    return {10: "K", 11: "0"}.get(resto, str(resto))
+
+
+def cantidad_del_dia(rng: random.Random, media: float) -> int:
+    """Cantidad entera con media dada (parte decimal resuelta al azar)"""
+    base = int(media)
+    return base + (rng.random() < media - base)
+
+
+# ============================================
+# GENERACIÓN
+# ============================================
+
+class Generador:
+    def __init__(self, args, bibliotecas: List[int], ids_iniciales: Dict[str, int]):
+        from app.utils.dependencies import CATEGORIAS_VALIDAS
+        self.args = args
+        self.rng = random.Random(args.semilla)
+        self.bibliotecas = bibliotecas
+        self.ids = ids_iniciales
+        self.categorias = sorted(CATEGORIAS_VALIDAS)  # Orden fijo: los sets varían entre ejecuciones
+        self.ahora = args.hasta
+        self.inicio = datetime.combine(self.ahora.date() - timedelta(days=int(365 * args.anios)), datetime.min.time())
+
+        # Documento → (primer ejemplar, cantidad, tipo); se llena al generar los ejemplares
+        self.ejemplares_de: Dict[int, Tuple[int, int, str]] = {}
+        self.prestados: set = set()  # Ejemplares en préstamos sin devolver
+        self.detalles: List[dict] = []  # Detalles de los préstamos generados y aún no cargados
+
+    def _siguiente_id(self, tabla: str) -> int:
+        self.ids[tabla] += 1
+        return self.ids[tabla]
+
+    def documentos(self) -> Iterator[dict]:
+        rng = self.rng
+        tipos = [t for t, _, _ in TIPOS_DOCUMENTO]
+        pesos = [p for _, p, _ in TIPOS_DOCUMENTO]
+        medios = {t: m for t, _, m in TIPOS_DOCUMENTO}
+        self.tipos_documento: Dict[int, str] = {}
+        for _ in range(self.args.documentos):
+            doc_id = self._siguiente_id("documentos")
+            tipo = rng.choices(tipos, pesos)[0]
+            self.tipos_documento[doc_id] = tipo
+            yield {
+                "id": doc_id,
+                "tipo": tipo,
+                "titulo": f"{rng.choice(TITULOS_A)} {rng.choice(TITULOS_B)} {doc_id}",
+                "autor": f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}",
+                "editorial": rng.choice(EDITORIALES),
+                "año": rng.randint(1950, self.ahora.year),
+                "edicion": f"{rng.randint(1, 5)}ª",
+                "categoria": rng.choice(self.categorias),
+                "tipo_medio": "digital" if tipo == "libro" and rng.random() < 0.1 else medios[tipo],
+                "activo": rng.random() >= 0.02,
+                "created_at": self.inicio - timedelta(days=rng.randint(0, 3650)),
+            }
+
+    def ejemplares(self) -> Iterator[dict]:
+        """Un ejemplar por documento y el resto repartido según popularidad (con Zipf)"""
+        rng = self.rng
+        documentos = list(self.tipos_documento)
+        self.popularidad = Zipf(rng, documentos, self.args.zipf_documentos)
+
+        copias = dict.fromkeys(documentos, 1 if self.args.ejemplares >= len(documentos) else 0)
+        extra = self.args.ejemplares - sum(copias.values())
+        for doc_id in self.popularidad.muestras(extra):
+            copias[doc_id] += 1
+
+        for doc_id in documentos:
+            cantidad = copias[doc_id]
+            if not cantidad:
+                continue
+            self.ejemplares_de[doc_id] = (self.ids["ejemplares"] + 1, cantidad, self.tipos_documento[doc_id])
+            ubicacion = f"{chr(65 + rng.randrange(8))}{rng.randint(1, 9)}-E{rng.randint(1, 6)}"
+            for n in range(1, cantidad + 1):
+                yield {
+                    "id": self._siguiente_id("ejemplares"),
+                    "documento_id": doc_id,
+                    "codigo": f"GEN-{doc_id:08d}-{n:03d}",
+                    "estado": "mantenimiento" if rng.random() < 0.01 else "disponible",
+                    "ubicacion": ubicacion,
+                    "created_at": self.inicio - timedelta(days=rng.randint(0, 365)),
+                }
+
+    def usuarios(self, password_hash: str) -> Iterator[dict]:
+        rng = self.rng
+        primero = self.ids["usuarios"] + 1
+        for _ in range(self.args.usuarios):
+            usuario_id = self._siguiente_id("usuarios")
+            numero = 10_000_000 + usuario_id
+            sorteo = rng.random()
+            yield {
+                "id": usuario_id,
+                "rut": f"{numero}-{digito_verificador(numero)}",
+                "nombres": rng.choice(NOMBRES),
+                "apellidos": f"{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}",
+                "email": f"usuario{usuario_id}@dataset.cl",
+                "password_hash": password_hash,
+                "rol": "admin" if sorteo < 0.002 else "bibliotecario" if sorteo < 0.01 else "usuario",
+                "activo": rng.random() >= 0.05,
+                "created_at": self.inicio - timedelta(days=rng.randint(0, 730)),
+            }
+        self.actividad = Zipf(rng, range(primero, self.ids["usuarios"] + 1), self.args.zipf_usuarios)
+
+    def _dias(self) -> Iterator[datetime]:
+        dia = self.inicio
+        while dia.date() <= self.ahora.date():
+            yield dia
+            dia += timedelta(days=1)
+
+    def _ejemplar_libre(self, doc_id: int, abierto: bool) -> Optional[int]:
+        primero, cantidad, _ = self.ejemplares_de[doc_id]
+        for _ in range(3):
+            ejemplar_id = primero + self.rng.randrange(cantidad)
+            # Las superposiciones en préstamos ya cerrados no se controlan; en los abiertos sí
+            if not abierto or ejemplar_id not in self.prestados:
+                return ejemplar_id
+        return None
+
+    def prestamos(self) -> Iterator[dict]:
+        """
+        Préstamos día por día. Los detalles de cada préstamo quedan en
+        self.detalles, para cargarlos después de su lote de préstamos (FK).
+        """
+        from app.utils.dates import calcular_fecha_devolucion
+        rng = self.rng
+        media_diaria = self.args.usuarios * self.args.prestamos_por_usuario / 365 / (sum(ACTIVIDAD_DIA) / 7)
+
+        for dia in self._dias():
+            cantidad = cantidad_del_dia(rng, media_diaria * ACTIVIDAD_DIA[dia.weekday()])
+            usuarios = self.actividad.muestras(cantidad)
+            documentos = self.popularidad.muestras(cantidad * 3)
+            for i, usuario_id in enumerate(usuarios):
+                fecha = dia + timedelta(seconds=rng.randint(9 * 3600, 20 * 3600))
+                if fecha > self.ahora:
+                    continue
+                tipo = "sala" if rng.random() < 0.2 else "domicilio"
+                n_ejemplares = rng.choices((1, 2, 3), (70, 20, 10))[0]
+                docs = [d for d in documentos[i * 3:i * 3 + n_ejemplares] if d in self.ejemplares_de]
+                if not docs:
+                    continue
+                estimada = calcular_fecha_devolucion(tipo, self.ejemplares_de[docs[0]][2], desde=fecha)
+
+                # 75% devuelve a tiempo, 20% con poco atraso y 5% con mucho
+                sorteo = rng.random()
+                if sorteo < 0.75:
+                    real = fecha + (estimada - fecha) * rng.random()
+                elif sorteo < 0.95:
+                    real = estimada + timedelta(days=rng.randint(1, 10), seconds=rng.randint(0, 36000))
+                else:
+                    real = estimada + timedelta(days=rng.randint(11, 60), seconds=rng.randint(0, 36000))
+                real = real.replace(microsecond=0)
+                abierto = real > self.ahora
+
+                ejemplares = []
+                for doc_id in docs:
+                    ejemplar_id = self._ejemplar_libre(doc_id, abierto)
+                    if ejemplar_id is not None and ejemplar_id not in ejemplares:
+                        ejemplares.append(ejemplar_id)
+                if not ejemplares:
+                    continue
+
+                prestamo_id = self._siguiente_id("prestamos")
+                if abierto:
+                    self.prestados.update(ejemplares)
+                    estado = "activo" if estimada >= self.ahora else "vencido"
+                else:
+                    estado = "devuelto"
+                yield {
+                    "id": prestamo_id,
+                    "tipo_prestamo": tipo,
+                    "usuario_id": usuario_id,
+                    "biblioteca_id": rng.choice(self.bibliotecas),
+                    "fecha_prestamo": fecha,
+                    "hora_prestamo": fecha.time(),
+                    "fecha_devolucion_estimada": estimada,
+                    "hora_devolucion_estimada": estimada.time(),
+                    "fecha_devolucion_real": None if abierto else real,
+                    "hora_devolucion_real": None if abierto else real.time(),
+                    "estado": estado,
+                    "notificado": estado == "vencido" and rng.random() < 0.5,
+                }
+                for ejemplar_id in ejemplares:
+                    self.detalles.append({
+                        "id": self._siguiente_id("detalles_prestamo"),
+                        "prestamo_id": prestamo_id,
+                        "ejemplar_id": ejemplar_id,
+                        "fecha_devolucion": None if abierto else real,
+                    })
+
+    def reservas(self) -> Iterator[dict]:
+        rng = self.rng
+        hoy = self.ahora.date()
+        vigentes = set()  # (usuario, documento) con reserva pendiente: índice único parcial
+        media_diaria = self.args.usuarios * self.args.reservas_por_usuario / 365 / (sum(ACTIVIDAD_DIA) / 7)
+
+        for dia in self._dias():
+            cantidad = cantidad_del_dia(rng, media_diaria * ACTIVIDAD_DIA[dia.weekday()])
+            for usuario_id, doc_id in zip(self.actividad.muestras(cantidad), self.popularidad.muestras(cantidad)):
+                creacion = dia + timedelta(seconds=rng.randint(0, 86399))
+                if creacion > self.ahora:
+                    continue
+                fecha_reserva = creacion.date() + timedelta(days=rng.randint(0, 14))
+                motivo = None
+                if fecha_reserva >= hoy:
+                    if (usuario_id, doc_id) in vigentes:
+                        continue
+                    vigentes.add((usuario_id, doc_id))
+                    estado = "pendiente"
+                elif rng.random() < 0.7:
+                    estado = "completada"
+                else:
+                    estado = "cancelada"
+                    motivo = rng.choice(("Cancelada por el usuario", "No retirada dentro del plazo"))
+                yield {
+                    "id": self._siguiente_id("reservas"),
+                    "usuario_id": usuario_id,
+                    "documento_id": doc_id,
+                    "fecha_reserva": fecha_reserva,
+                    "estado": estado,
+                    "prioridad": 0,
+                    "fecha_creacion": creacion,
+                    "motivo_cancelacion": motivo,
+                }
+
+
+# ============================================
+# CARGA MASIVA
+# ============================================
+
+# Formato de texto de DateTime, Date y Time de SQLAlchemy en SQLite
+_FORMATOS_SQLITE = {
+    datetime: lambda v: v.isoformat(" ", "microseconds"),
+    date: date.isoformat,
+    dt_time: lambda v: v.isoformat("microseconds"),
+}
+
+
+def _valor_sqlite(valor):
+    formato = _FORMATOS_SQLITE.get(type(valor))
+    return formato(valor) if formato else valor
+
+
+class Cargador:
+    """
+    Inserta filas por lotes sin el ORM: COPY en PostgreSQL con psycopg2,
+    executemany directo del driver en SQLite (con fechas en el mismo formato
+    de texto que usa SQLAlchemy, cuyo procesamiento por fila duplicaba el
+    tiempo de carga) y executemany de SQLAlchemy Core en el resto.
+    """
+
+    def __init__(self, conexion, lote: int):
+        self.conexion = conexion
+        self.lote = lote
+        self.dialecto = conexion.dialect
+        self.usa_copy = self.dialecto.name == "postgresql" and self.dialecto.driver == "psycopg2"
+        self.usa_sqlite = self.dialecto.name == "sqlite"
+
+    def _columnas(self, tabla, fila: dict) -> str:
+        quote = self.dialecto.identifier_preparer.quote
+        return ", ".join(quote(tabla.c[clave].name) for clave in fila)
+
+    def _copiar(self, tabla, filas: List[dict]):
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        for fila in filas:
+            # Campo vacío sin comillas = NULL en COPY ... CSV
+            escritor.writerow(["" if v is None else v for v in fila.values()])
+        buffer.seek(0)
+        cursor = self.conexion.connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {tabla.name} ({self._columnas(tabla, filas[0])}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+
+    def _insertar_sqlite(self, tabla, filas: List[dict]):
+        marcadores = ", ".join("?" * len(filas[0]))
+        sql = f"INSERT INTO {tabla.name} ({self._columnas(tabla, filas[0])}) VALUES ({marcadores})"
+        cursor = self.conexion.connection.cursor()
+        try:
+            cursor.executemany(sql, [tuple(map(_valor_sqlite, fila.values())) for fila in filas])
+        finally:
+            cursor.close()
+
+    def cargar(self, tabla, filas: Iterable[dict], despues_de_lote: Optional[Callable[[], None]] = None) -> int:
+        total = 0
+        filas = iter(filas)
+        while True:
+            lote = list(itertools.islice(filas, self.lote))
+            if not lote:
+                return total
+            if self.usa_copy:
+                self._copiar(tabla, lote)
+            elif self.usa_sqlite:
+                self._insertar_sqlite(tabla, lote)
+            else:
+                self.conexion.execute(tabla.insert(), lote)
+            total += len(lote)
+            if despues_de_lote:
+                despues_de_lote()
+
+    def ajustar_secuencia(self, tabla):
+        """Con ids explícitos la secuencia de PostgreSQL queda atrás: moverla al máximo"""
+        if self.conexion.dialect.name == "postgresql":
+            from sqlalchemy import text
+            self.conexion.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{tabla.name}', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM {tabla.name}), 1))"
+            ))
+
+
+# ============================================
+# MAIN
+# ============================================
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documentos", type=int, default=10000)
+    parser.add_argument("--ejemplares", type=int, default=30000)
+    parser.add_argument("--usuarios", type=int, default=20000)
+    parser.add_argument("--anios", type=float, default=3, help="años de historia de préstamos y reservas")
+    parser.add_argument("--prestamos-por-usuario", type=float, default=6, help="préstamos por usuario al año (promedio)")
+    parser.add_argument("--reservas-por-usuario", type=float, default=1, help="reservas por usuario al año (promedio)")
+    parser.add_argument("--zipf-documentos", type=float, default=1.1, help="exponente de popularidad de documentos")
+    parser.add_argument("--zipf-usuarios", type=float, default=0.8, help="exponente de actividad de usuarios")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--hasta", type=date.fromisoformat, default=date.today(),
+                        help="último día de la historia (AAAA-MM-DD); fijarlo para reproducir un dataset otro día")
+    parser.add_argument("--lote", type=int, default=20000, help="filas por COPY / executemany")
+    parser.add_argument("--database-url", help="por defecto la de DATABASE_URL")
+    parser.add_argument("--vaciar", action="store_true", help="borrar y recrear TODAS las tablas antes de cargar")
+    args = parser.parse_args()
+    args.hasta = datetime.combine(args.hasta, datetime.max.time()).replace(microsecond=0)
+
+    if args.database_url:
+        import os
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from sqlalchemy import func, select, text, update
+    from app.database import Base, engine
+    from app.migraciones import aplicar_migraciones
+    import app.models  # noqa: F401 (registra todos los modelos)
+    import app.models.biblioteca  # noqa: F401 (prestamos.biblioteca_id)
+    from app.models.biblioteca import Biblioteca
+    from app.models.usuario import Usuario
+
+    tablas = Base.metadata.tables
+    if args.vaciar:
+        print("🗑️  Borrando y recreando todas las tablas...")
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    aplicar_migraciones()
+
+    usuario_modelo = Usuario()
+    usuario_modelo.set_password(CONTRASENA)  # Un solo hash bcrypt para todos
+
+    inicio_total = time.perf_counter()
+    with engine.begin() as conexion:
+        if conexion.dialect.name == "sqlite":
+            conexion.execute(text("PRAGMA synchronous = OFF"))
+
+        bibliotecas = list(conexion.execute(select(Biblioteca.id)).scalars())
+        if not bibliotecas:
+            conexion.execute(Biblioteca.__table__.insert(), [
+                {"nombre": nombre, "activo": True, "created_at": args.hasta.replace(year=args.hasta.year - 10)}
+                for nombre in ("Biblioteca Estación Central", "Sucursal Los Nogales", "Sucursal Villa Francia")
+            ])
+            bibliotecas = list(conexion.execute(select(Biblioteca.id)).scalars())
+
+        nombres = ("documentos", "ejemplares", "usuarios", "prestamos", "detalles_prestamo", "reservas")
+        ids = {
+            nombre: conexion.execute(select(func.coalesce(func.max(tablas[nombre].c.id), 0))).scalar()
+            for nombre in nombres
+        }
+        generador = Generador(args, bibliotecas, ids)
+        cargador = Cargador(conexion, args.lote)
+
+        def informar(nombre: str, cantidad: int, segundos: float):
+            print(f"✅ {nombre:<18} {cantidad:>10,} filas  {segundos:7.1f} s  ({cantidad / max(segundos, 1e-9) * 60:,.0f} filas/min)")
+
+        for nombre, filas in (
+            ("documentos", generador.documentos),
+            ("ejemplares", generador.ejemplares),
+            ("usuarios", lambda: generador.usuarios(usuario_modelo.password_hash)),
+        ):
+            inicio = time.perf_counter()
+            informar(nombre, cargador.cargar(tablas[nombre], filas()), time.perf_counter() - inicio)
+
+        # Préstamos por lotes, cada uno seguido de sus detalles (sin acumular millones de filas)
+        cantidad_detalles = 0
+
+        def cargar_detalles():
+            nonlocal cantidad_detalles
+            cantidad_detalles += cargador.cargar(tablas["detalles_prestamo"], generador.detalles)
+            generador.detalles.clear()
+
+        inicio = time.perf_counter()
+        cantidad = cargador.cargar(tablas["prestamos"], generador.prestamos(), despues_de_lote=cargar_detalles)
+        informar("prestamos", cantidad, time.perf_counter() - inicio)
+        informar("detalles_prestamo", cantidad_detalles, time.perf_counter() - inicio)
+
+        inicio = time.perf_counter()
+        informar("reservas", cargador.cargar(tablas["reservas"], generador.reservas()), time.perf_counter() - inicio)
+
+        for nombre in ("documentos", "ejemplares", "usuarios", "prestamos", "detalles_prestamo", "reservas"):
+            cargador.ajustar_secuencia(tablas[nombre])
+
+        # Los ejemplares de préstamos sin devolver quedan prestados
+        prestados = sorted(generador.prestados)
+        ejemplares = tablas["ejemplares"]
+        for i in range(0, len(prestados), args.lote):
+            conexion.execute(
+                update(ejemplares).where(ejemplares.c.id.in_(prestados[i:i + args.lote])).values(estado="prestado")
+            )
+
+    print(f"\n🏁 Dataset generado en {time.perf_counter() - inicio_total:.1f} s "
+          f"(semilla {args.semilla}, {len(prestados):,} ejemplares prestados)")
+
+
+if __name__ == "__main__":
+    main()
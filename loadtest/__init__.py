@@ -0,0 +1,37 @@
+"""
+Pruebas de carga de punta a punta contra la API corriendo (uvicorn).
+
+Perfiles de carga (loadtest/escenarios.py):
+    opac           búsqueda y navegación del catálogo público
+    meson          préstamos y devoluciones por código en el mesón de atención
+    bibliotecario  paneles y reportes del personal
+    nocturno       cada tarea programada una vez, en secuencia
+    mixto          opac + meson + bibliotecario con el peso de un día normal
+
+Reporta solicitudes por segundo y latencia p50/p95/p99 por endpoint y las
+compara con una línea base guardada; termina con código 1 si hay regresión
+y con 2, sin correr la carga, si el perfil no tiene línea base (salvo con
+--guardar-baseline). Las líneas base de loadtest/baselines/ se tomaron con
+el dataset y el equipo que indica cada archivo ("entorno"): en otro equipo,
+guardar una propia antes del cambio a comparar.
+
+Preparar los datos y guardar una línea base:
+    python setup_inicial.py                       (admin@test.cl / password123)
+    python generar_dataset.py --usuarios 20000
+    python -m loadtest --perfil mixto --iniciar-servidor --guardar-baseline
+
+Comparar después de un cambio:
+    python -m loadtest --perfil mixto --iniciar-servidor
+
+meson, mixto y nocturno modifican la base (préstamos, devoluciones, tareas):
+para comparar con la línea base, regenerar los datos antes de cada corrida
+con los mismos parámetros (generar_dataset.py --vaciar, luego setup_inicial.py).
+
+nocturno despacha los correos en cola: sin un servidor SMTP alcanzable la
+tarea espera la conexión y la medición no sirve. Usar uno local (el servidor
+de la prueba hereda el entorno):
+    python -m aiosmtpd -n -l 127.0.0.1:8025 &
+    SMTP_SERVER=127.0.0.1 SMTP_PORT=8025 SMTP_STARTTLS=false python -m loadtest --perfil nocturno --iniciar-servidor
+
+Contra un servidor ya levantado (p. ej. con PostgreSQL): --url http://host:8000
+"""
@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import json
+import sys
+from contextlib import nullcontext
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from benchmarks._comun import describir_equipo, imprimir_tabla
+from loadtest.escenarios import PERFILES, Contexto
+from loadtest.motor import comparar, ejecutar_perfil
+from loadtest.servidor import servidor_local
+
+DIRECTORIO_BASELINES = Path(__file__).parent / "baselines"
+
+COLUMNAS = ["endpoint", "solicitudes", "rps", "p50 ms", "p95 ms", "p99 ms", "errores %", "rechazos %"]
+CAMPOS = ["solicitudes", "rps", "p50_ms", "p95_ms", "p99_ms", "errores_pct", "rechazos_pct"]
+
+
+def parsear_argumentos() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description="Prueba de carga de punta a punta")
+    parser.add_argument("--perfil", choices=sorted(PERFILES), default="mixto")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="API ya levantada (se ignora con --iniciar-servidor)")
+    parser.add_argument("--email", default="admin@test.cl")
+    parser.add_argument("--password", default="password123")
+    parser.add_argument("--usuarios", type=int, default=20, help="Usuarios virtuales concurrentes")
+    parser.add_argument("--duracion", type=float, default=60, help="Segundos medidos")
+    parser.add_argument("--calentamiento", type=float, default=10, help="Segundos iniciales sin medir")
+    parser.add_argument("--pausa", type=float, default=0, help="Pausa media entre solicitudes de un usuario (s)")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--baseline", type=Path, help="Archivo de línea base (por defecto loadtest/baselines/<perfil>.json)")
+    parser.add_argument("--guardar-baseline", action="store_true", help="Guardar el resultado como nueva línea base")
+    parser.add_argument("--umbral", type=float, default=0.2, help="Empeoramiento tolerado respecto de la línea base (0.2 = 20%%)")
+    parser.add_argument("--salida", type=Path, help="Guardar también el resultado en este JSON")
+    parser.add_argument("--iniciar-servidor", action="store_true", help="Levantar uvicorn para la prueba")
+    parser.add_argument("--puerto", type=int, default=8765, help="Puerto con --iniciar-servidor")
+    parser.add_argument("--database-url", help="DATABASE_URL del servidor con --iniciar-servidor")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn con --iniciar-servidor")
+    return parser.parse_args()
+
+
+async def correr(args: argparse.Namespace, url: str) -> dict:
+    limites = httpx.Limits(max_connections=args.usuarios, max_keepalive_connections=args.usuarios)
+    async with httpx.AsyncClient(base_url=url, timeout=60.0, limits=limites) as cliente:
+        ctx = Contexto(cliente)
+        await ctx.preparar(args.email, args.password)
+        # Tal como estaban al empezar (la carga los modifica)
+        datos = {
+            "documentos": len(ctx.documentos),
+            "usuarios": len(ctx.usuarios),
+            "disponibles": len(ctx.disponibles),
+            "prestados": len(ctx.prestados),
+        }
+        print(
+            f"Datos: {datos['documentos']} documentos, {datos['usuarios']} usuarios, "
+            f"{datos['disponibles']} ejemplares disponibles, {datos['prestados']} prestados"
+        )
+        perfil = PERFILES[args.perfil]
+        print(f"Perfil {args.perfil}: {perfil.descripcion}")
+        resumen = await ejecutar_perfil(
+            ctx, perfil,
+            usuarios=args.usuarios,
+            duracion=args.duracion,
+            calentamiento=args.calentamiento,
+            pausa=args.pausa,
+            semilla=args.semilla
+        )
+        resumen["datos"] = datos
+        return resumen
+
+
+def main() -> int:
+    args = parsear_argumentos()
+
+    # Sin línea base no hay con qué comparar: fallar antes de correr la carga
+    ruta_base = args.baseline or DIRECTORIO_BASELINES / f"{args.perfil}.json"
+    if not args.guardar_baseline and not ruta_base.exists():
+        print(f"Sin línea base en {ruta_base}: guardar una con --guardar-baseline", file=sys.stderr)
+        return 2
+
+    if args.iniciar_servidor:
+        contexto_servidor = servidor_local(args.puerto, args.database_url, args.workers)
+    else:
+        contexto_servidor = nullcontext(args.url)
+    with contexto_servidor as url:
+        resumen = asyncio.run(correr(args, url))
+
+    resultado = {
+        "perfil": args.perfil,
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "url": url,
+        "usuarios": args.usuarios,
+        "duracion_s": resumen["segundos"],
+        "semilla": args.semilla,
+        "entorno": dict(describir_equipo(), workers=args.workers if args.iniciar_servidor else None),
+        "datos": resumen["datos"],
+        "secuencial": resumen["secuencial"],
+        "total": resumen["total"],
+        "endpoints": resumen["endpoints"],
+    }
+
+    filas = [[nombre] + [fila[c] for c in CAMPOS] for nombre, fila in resultado["endpoints"].items()]
+    filas.append(["TOTAL"] + [resultado["total"][c] for c in CAMPOS])
+    carga = "secuencial" if resumen["secuencial"] else f"{args.usuarios} usuarios"
+    imprimir_tabla(f"Perfil {args.perfil} ({carga}, {resumen['segundos']} s)", COLUMNAS, filas)
+
+    if args.salida:
+        args.salida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+    if args.guardar_baseline:
+        ruta_base.parent.mkdir(parents=True, exist_ok=True)
+        ruta_base.write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+        print(f"\nLínea base guardada en {ruta_base}")
+        return 0
+
+    base = json.loads(ruta_base.read_text())
+    regresiones = comparar(resultado, base, args.umbral)
+    print(f"\nComparación con {ruta_base} ({base['fecha']}, umbral {args.umbral:.0%}):")
+    if not regresiones:
+        print("  sin regresiones")
+        return 0
+    for regresion in regresiones:
+        print(f"  REGRESIÓN {regresion}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+import random
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from generar_dataset import APELLIDOS, TITULOS_B
+
+# --- ESCENARIOS DE CARGA ---
+# Cada operación es una llamada a un endpoint, identificada por el nombre de
+# la función del endpoint (así la línea base dice "registrar_prestamo", no
+# una URL). Una operación retorna None si no tiene datos para ejecutarse
+# (p. ej. no quedan ejemplares prestados que devolver) y no se mide.
+#
+# Los datos (documentos, categorías, ejemplares, usuarios) se descubren por
+# la API al empezar, así sirven para cualquier base: la de generar_dataset.py
+# o una copia de producción.
+
+TERMINOS_BUSQUEDA = TITULOS_B + APELLIDOS
+
+
+@dataclass
+class Contexto:
+    """Cliente HTTP, token de admin y datos descubiertos para armar las solicitudes"""
+
+    cliente: httpx.AsyncClient
+    headers: Dict[str, str] = field(default_factory=dict)
+    admin_id: int = 0
+    documentos: List[int] = field(default_factory=list)
+    categorias: List[str] = field(default_factory=list)
+    usuarios: List[int] = field(default_factory=list)
+    codigos: List[str] = field(default_factory=list)
+    disponibles: List[Tuple[int, str]] = field(default_factory=list)  # (id, código)
+    prestados: List[str] = field(default_factory=list)  # códigos
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        try:
+            return await self.cliente.get(url, headers=self.headers, **kwargs)
+        except (httpx.ReadError, httpx.RemoteProtocolError):
+            # Tras un 500, uvicorn cierra la conexión keep-alive y la siguiente
+            # solicitud que la reusa falla; como un navegador, reintentar los GET
+            return await self.cliente.get(url, headers=self.headers, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.cliente.post(url, headers=self.headers, **kwargs)
+
+    async def preparar(self, email: str, password: str, maximo: int = 2000):
+        """Login de admin y descubrimiento de datos por la API"""
+        respuesta = await self.cliente.post("/api/v1/auth/login", json={"email": email, "password": password})
+        if respuesta.status_code != 200:
+            raise RuntimeError(f"Login fallido ({respuesta.status_code}): {respuesta.text[:200]}")
+        datos = respuesta.json()["data"]
+        self.headers = {"Authorization": f"Bearer {datos['token']}"}
+        self.admin_id = datos["usuario"]["id"]
+
+        for pagina in range(1, maximo // 100 + 1):
+            items = (await self.get("/documentos/", params={"page": pagina, "size": 100})).json().get("items", [])
+            self.documentos.extend(d["id"] for d in items)
+            if len(items) < 100:
+                break
+
+        self.categorias = [c["categoria"] for c in (await self.get("/categorias/")).json()]
+        self.usuarios = [
+            u["id"] for u in (await self.get("/api/v1/usuarios/", params={"activo": True, "limit": 500})).json()
+            if not u.get("sancionado")
+        ]
+
+        for offset in range(0, maximo, 500):
+            filas = (await self.get("/api/v1/ejemplares/", params={"estados": "disponible", "limit": 500, "offset": offset})).json()
+            self.disponibles.extend((e["id"], e["codigo"]) for e in filas)
+            if len(filas) < 500:
+                break
+        filas = (await self.get("/api/v1/ejemplares/", params={"estados": "prestado", "limit": 500})).json()
+        self.prestados = [e["codigo"] for e in filas]
+        self.codigos = [c for _, c in self.disponibles] + self.prestados
+
+        if not self.documentos:
+            raise RuntimeError("La base no tiene documentos: generar datos con generar_dataset.py")
+
+
+@dataclass
+class Operacion:
+    nombre: str
+    peso: float
+    ejecutar: Callable[[Contexto, random.Random], Awaitable[Optional[httpx.Response]]]
+
+
+@dataclass
+class Perfil:
+    descripcion: str
+    operaciones: List[Operacion]
+    secuencial: bool = False  # Cada operación una vez, en orden y sin concurrencia
+
+
+# ============================================
+# OPAC (catálogo público)
+# ============================================
+
+async def busqueda_basica(ctx: Contexto, rng: random.Random):
+    return await ctx.get("/catalogo/buscar/", params={
+        "q": rng.choice(TERMINOS_BUSQUEDA), "page": rng.choice((1, 1, 1, 2, 3)), "size": 10
+    })
+
+
+async def listar_categorias(ctx: Contexto, rng: random.Random):
+    return await ctx.get("/categorias/")
+
+
+async def documentos_por_categoria(ctx: Contexto, rng: random.Random):
+    if not ctx.categorias:
+        return None
+    return await ctx.get(f"/categorias/{rng.choice(ctx.categorias)}/documentos/", params={"page": rng.randint(1, 5)})
+
+
+async def listar_documentos(ctx: Contexto, rng: random.Random):
+    return await ctx.get("/documentos/", params={"page": rng.randint(1, 20), "size": 20})
+
+
+async def ver_documento(ctx: Contexto, rng: random.Random):
+    return await ctx.get(f"/documentos/{rng.choice(ctx.documentos)}")
+
+
+async def disponibilidad_documento(ctx: Contexto, rng: random.Random):
+    return await ctx.get(f"/api/v1/ejemplares/documento/{rng.choice(ctx.documentos)}/disponibilidad")
+
+
+async def pronostico_documento(ctx: Contexto, rng: random.Random):
+    fecha = date.today() + timedelta(days=rng.randint(1, 30))
+    return await ctx.get(
+        f"/api/v1/reservas/documento/{rng.choice(ctx.documentos)}/pronostico", params={"fecha": fecha.isoformat()}
+    )
+
+
+# ============================================
+# MESÓN (préstamos y devoluciones)
+# ============================================
+
+async def registrar_prestamo(ctx: Contexto, rng: random.Random):
+    if not ctx.disponibles or not ctx.usuarios:
+        return None
+    ejemplar_id, codigo = ctx.disponibles.pop(rng.randrange(len(ctx.disponibles)))
+    respuesta = await ctx.post("/api/v1/prestamos/registrar", json={
+        "tipo_prestamo": "domicilio",
+        "usuario_id": rng.choice(ctx.usuarios),
+        "bibliotecario_id": ctx.admin_id,
+        "ejemplares_ids": [ejemplar_id],
+    })
+    if respuesta.status_code == 200:
+        ctx.prestados.append(codigo)
+    else:
+        ctx.disponibles.append((ejemplar_id, codigo))
+    return respuesta
+
+
+async def registrar_devolucion(ctx: Contexto, rng: random.Random):
+    if not ctx.prestados:
+        return None
+    # Devuelto no vuelve a disponibles: queda en reubicación (o retenido para una reserva)
+    codigo = ctx.prestados.pop(rng.randrange(len(ctx.prestados)))
+    return await ctx.post("/api/v1/devoluciones/", json={"ejemplar_codigo": codigo})
+
+
+async def buscar_por_codigo(ctx: Contexto, rng: random.Random):
+    if not ctx.codigos:
+        return None
+    return await ctx.get(f"/api/v1/ejemplares/codigo/{rng.choice(ctx.codigos)}")
+
+
+async def historial_prestamos_usuario(ctx: Contexto, rng: random.Random):
+    if not ctx.usuarios:
+        return None
+    return await ctx.get(f"/api/v1/prestamos/usuarios/{rng.choice(ctx.usuarios)}/historial")
+
+
+# ============================================
+# PANELES DEL PERSONAL
+# ============================================
+
+def _consulta(url: str):
+    async def ejecutar(ctx: Contexto, rng: random.Random):
+        return await ctx.get(url)
+    return ejecutar
+
+
+# ============================================
+# TAREAS NOCTURNAS
+# ============================================
+
+def _tarea(nombre: str):
+    async def ejecutar(ctx: Contexto, rng: random.Random):
+        return await ctx.post(f"/api/v1/admin/tareas/{nombre}/ejecutar")
+    return ejecutar
+
+
+# ============================================
+# PERFILES
+# ============================================
+
+OPAC = [
+    Operacion("api_buscar_documentos_basico", 35, busqueda_basica),
+    Operacion("api_listar_categorias", 5, listar_categorias),
+    Operacion("api_listar_documentos_por_categoria", 20, documentos_por_categoria),
+    Operacion("api_listar_documentos", 5, listar_documentos),
+    Operacion("api_get_documento", 20, ver_documento),
+    Operacion("obtener_disponibilidad", 10, disponibilidad_documento),
+    Operacion("pronosticar_disponibilidad", 5, pronostico_documento),
+]
+
+MESON = [
+    Operacion("registrar_prestamo", 30, registrar_prestamo),
+    Operacion("registrar_devolucion", 30, registrar_devolucion),
+    Operacion("buscar_por_codigo", 25, buscar_por_codigo),
+    Operacion("historial_prestamos_usuario", 15, historial_prestamos_usuario),
+]
+
+BIBLIOTECARIO = [
+    Operacion("obtener_estadisticas", 20, _consulta("/api/v1/ejemplares/estadisticas")),
+    Operacion("obtener_reporte_ubicaciones", 10, _consulta("/api/v1/ejemplares/reportes/por-ubicacion")),
+    Operacion("obtener_ejemplares_con_problemas", 10, _consulta("/api/v1/ejemplares/reportes/con-problemas")),
+    Operacion("obtener_alertas", 15, _consulta("/api/v1/ejemplares/alertas")),
+    Operacion("estadisticas_prestamos", 20, _consulta("/api/v1/prestamos/estadisticas")),
+    Operacion("obtener_estadisticas_reservas", 10, _consulta("/api/v1/reservas/estadisticas")),
+    Operacion("listar_todas_reservas", 10, _consulta("/api/v1/reservas/")),
+    Operacion("listar_correos", 5, _consulta("/api/v1/admin/correos")),
+]
+
+TAREAS_NOCTURNAS = [
+    "reubicacion_devueltos",
+    "sanciones_atrasos",
+    "activacion_reservas",
+    "recordatorios_vencidos",
+    "recordatorios_proximos",
+    "despacho_correos",
+]
+
+
+def _mezclar(*grupos: Tuple[float, List[Operacion]]) -> List[Operacion]:
+    """Unir perfiles: cada grupo aporta 'fraccion' del total de solicitudes"""
+    operaciones = []
+    for fraccion, grupo in grupos:
+        total = sum(o.peso for o in grupo)
+        operaciones.extend(Operacion(o.nombre, o.peso / total * fraccion, o.ejecutar) for o in grupo)
+    return operaciones
+
+
+PERFILES: Dict[str, Perfil] = {
+    "opac": Perfil("Búsqueda y navegación del catálogo público", OPAC),
+    "meson": Perfil("Préstamos, devoluciones y consultas por código en el mesón", MESON),
+    "bibliotecario": Perfil("Paneles y reportes del personal", BIBLIOTECARIO),
+    "nocturno": Perfil(
+        "Tareas programadas, una vez cada una y en secuencia",
+        [Operacion(f"tarea:{nombre}", 1, _tarea(nombre)) for nombre in TAREAS_NOCTURNAS],
+        secuencial=True
+    ),
+    "mixto": Perfil(
+        "Día normal: 60% catálogo, 25% mesón, 15% personal",
+        _mezclar((0.60, OPAC), (0.25, MESON), (0.15, BIBLIOTECARIO))
+    ),
+}
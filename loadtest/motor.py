@@ -0,0 +1,152 @@
+import asyncio
+import math
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from loadtest.escenarios import Contexto, Perfil
+
+# --- EJECUCIÓN Y RESULTADOS ---
+# Carga de lazo cerrado: cada usuario virtual elige una operación según los
+# pesos del perfil, espera la respuesta (y opcionalmente una pausa) y sigue.
+# Las solicitudes del calentamiento no se miden. Es error un 5xx o una falla
+# de conexión/timeout; un 4xx es un rechazo (el dato ya no aplicaba, p. ej.
+# un ejemplar que otro usuario virtual prestó antes) y se informa aparte.
+
+
+class Medicion:
+    def __init__(self):
+        self.latencias: List[float] = []
+        self.errores = 0
+        self.rechazos = 0
+
+    def registrar(self, segundos: float, estado: Optional[int]):
+        self.latencias.append(segundos)
+        if estado is None or estado >= 500:
+            self.errores += 1
+        elif estado >= 400:
+            self.rechazos += 1
+
+
+def percentil(ordenados: List[float], p: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not ordenados:
+        return 0.0
+    return ordenados[max(math.ceil(p / 100 * len(ordenados)) - 1, 0)]
+
+
+async def _ejecutar_medida(ctx: Contexto, operacion, rng: random.Random, mediciones: Dict[str, Medicion], medir: bool) -> bool:
+    """Ejecutar una operación; False si no tenía datos para ejecutarse"""
+    inicio = time.perf_counter()
+    try:
+        respuesta = await operacion.ejecutar(ctx, rng)
+        if respuesta is None:
+            return False
+        estado = respuesta.status_code
+    except httpx.HTTPError:
+        estado = None
+    if medir:
+        mediciones[operacion.nombre].registrar(time.perf_counter() - inicio, estado)
+    return True
+
+
+async def ejecutar_perfil(
+    ctx: Contexto,
+    perfil: Perfil,
+    usuarios: int,
+    duracion: float,
+    calentamiento: float = 0,
+    pausa: float = 0,
+    semilla: int = 1
+) -> Dict[str, object]:
+    """Correr el perfil y retornar el resumen por endpoint"""
+    mediciones: Dict[str, Medicion] = defaultdict(Medicion)
+
+    if perfil.secuencial:
+        rng = random.Random(semilla)
+        inicio = time.perf_counter()
+        for operacion in perfil.operaciones:
+            await _ejecutar_medida(ctx, operacion, rng, mediciones, True)
+        return resumir(mediciones, time.perf_counter() - inicio, secuencial=True)
+
+    operaciones = perfil.operaciones
+    pesos = [o.peso for o in operaciones]
+    reloj = time.perf_counter()
+    inicio_medicion = reloj + calentamiento
+    fin = inicio_medicion + duracion
+
+    async def usuario_virtual(numero: int):
+        rng = random.Random(semilla * 1000 + numero)
+        sin_datos = 0
+        while (ahora := time.perf_counter()) < fin:
+            operacion = rng.choices(operaciones, pesos)[0]
+            if await _ejecutar_medida(ctx, operacion, rng, mediciones, ahora >= inicio_medicion):
+                sin_datos = 0
+            else:
+                sin_datos += 1
+                if sin_datos >= 20:
+                    # Ninguna operación tiene datos: no girar en vacío
+                    await asyncio.sleep(0.05)
+                continue
+            if pausa:
+                await asyncio.sleep(rng.expovariate(1 / pausa))
+
+    await asyncio.gather(*(usuario_virtual(i) for i in range(usuarios)))
+    return resumir(mediciones, duracion)
+
+
+def _fila(medicion: Medicion, segundos: float) -> Dict[str, float]:
+    ordenadas = sorted(medicion.latencias)
+    n = len(ordenadas)
+    return {
+        "solicitudes": n,
+        "rps": round(n / segundos, 2) if segundos else 0.0,
+        "p50_ms": round(percentil(ordenadas, 50) * 1000, 2),
+        "p95_ms": round(percentil(ordenadas, 95) * 1000, 2),
+        "p99_ms": round(percentil(ordenadas, 99) * 1000, 2),
+        "errores_pct": round(100 * medicion.errores / n, 2) if n else 0.0,
+        "rechazos_pct": round(100 * medicion.rechazos / n, 2) if n else 0.0,
+    }
+
+
+def resumir(mediciones: Dict[str, Medicion], segundos: float, secuencial: bool = False) -> Dict[str, object]:
+    total = Medicion()
+    for medicion in mediciones.values():
+        total.latencias.extend(medicion.latencias)
+        total.errores += medicion.errores
+        total.rechazos += medicion.rechazos
+    return {
+        "segundos": round(segundos, 2),
+        "secuencial": secuencial,
+        "total": _fila(total, segundos),
+        "endpoints": {nombre: _fila(m, segundos) for nombre, m in sorted(mediciones.items())},
+    }
+
+
+# ============================================
+# LÍNEA BASE
+# ============================================
+
+def comparar(actual: Dict[str, object], base: Dict[str, object], umbral: float, piso_ms: float = 2.0) -> List[str]:
+    """
+    Regresiones de 'actual' respecto de 'base': p95 más de 'umbral' (fracción)
+    sobre la base y al menos 'piso_ms' más lento (para no alarmar por ruido en
+    endpoints de 1 ms), rps 'umbral' bajo la base, o más errores. Los
+    endpoints que no están en ambos no se comparan.
+    """
+    regresiones = []
+    endpoints_base = base.get("endpoints", {})
+    for nombre, fila in actual.get("endpoints", {}).items():
+        anterior = endpoints_base.get(nombre)
+        if not anterior or not anterior["solicitudes"] or not fila["solicitudes"]:
+            continue
+        if fila["p95_ms"] > anterior["p95_ms"] * (1 + umbral) and fila["p95_ms"] - anterior["p95_ms"] >= piso_ms:
+            regresiones.append(f"{nombre}: p95 {anterior['p95_ms']:.1f} → {fila['p95_ms']:.1f} ms")
+        if not actual.get("secuencial") and fila["rps"] < anterior["rps"] * (1 - umbral):
+            regresiones.append(f"{nombre}: {anterior['rps']:.1f} → {fila['rps']:.1f} solicitudes/s")
+        if fila["errores_pct"] > anterior["errores_pct"] + 1.0:
+            regresiones.append(f"{nombre}: errores {anterior['errores_pct']:.1f}% → {fila['errores_pct']:.1f}%")
+    return regresiones
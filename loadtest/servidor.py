@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import httpx
+
+# --- SERVIDOR PARA LA PRUEBA ---
+# Levanta uvicorn en un subproceso con la base indicada y sin el planificador
+# (sus tareas competirían con la carga medida), espera a que /health responda
+# y lo detiene al terminar.
+
+
+@contextmanager
+def servidor_local(
+    puerto: int = 8000,
+    database_url: Optional[str] = None,
+    workers: int = 1,
+    espera: float = 30.0
+) -> Iterator[str]:
+    entorno = dict(os.environ, PLANIFICADOR_ACTIVO="false")
+    if database_url:
+        entorno["DATABASE_URL"] = database_url
+
+    comando = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(puerto),
+        "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+    ]
+    proceso = subprocess.Popen(comando, env=entorno, stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{puerto}"
+    try:
+        limite = time.monotonic() + espera
+        while True:
+            if proceso.poll() is not None:
+                raise RuntimeError(f"uvicorn terminó al iniciar (código {proceso.returncode})")
+            try:
+                if httpx.get(f"{url}/health", timeout=1.0).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > limite:
+                raise RuntimeError(f"El servidor no respondió /health en {espera:.0f} s")
+            time.sleep(0.2)
+        yield url
+    finally:
+        proceso.terminate()
+        try:
+            proceso.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proceso.kill()
@@ -0,0 +1,116 @@
+"""
+Configuración compartida de las pruebas: una base SQLite temporal y la app
+sin el planificador. Las variables se fijan antes de importar la app, porque
+app.config y app.database las leen al importarse.
+
+Ejecutar desde la raíz del proyecto: python -m pytest -q
+"""
+
+import os
+import tempfile
+
+_DIRECTORIO = tempfile.mkdtemp(prefix="pruebas_biblioteca_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DIRECTORIO, 'pruebas.db')}"
+os.environ["PLANIFICADOR_ACTIVO"] = "false"
+
+import itertools  # noqa: E402
+from datetime import datetime, timedelta  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.biblioteca import Biblioteca  # noqa: E402
+from app.models.documento import Documento  # noqa: E402
+from app.models.ejemplar import Ejemplar  # noqa: E402
+from app.models.prestamos import DetallePrestamo, EstadoPrestamo, Prestamo, TipoPrestamo  # noqa: E402
+from app.models.usuario import Usuario  # noqa: E402
+from app.utils.auth import create_access_token  # noqa: E402
+
+_secuencia = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def cliente():
+    with TestClient(app) as cliente:
+        yield cliente
+
+
+@pytest.fixture
+def db():
+    sesion = SessionLocal()
+    try:
+        yield sesion
+    finally:
+        sesion.close()
+
+
+@pytest.fixture
+def crear_usuario(db):
+    """Crear un usuario activo y retornar (usuario, headers con su token)"""
+    def crear(rol: str = "usuario"):
+        n = next(_secuencia)
+        usuario = Usuario(
+            rut=f"{n}-{n % 10}", nombres="Prueba", apellidos=str(n), email=f"prueba{n}@example.cl",
+            password_hash="x", rol=rol, activo=True
+        )
+        db.add(usuario)
+        db.commit()
+        token = create_access_token({"user_id": usuario.id, "rut": usuario.rut, "rol": usuario.rol})
+        return usuario, {"Authorization": f"Bearer {token}"}
+    return crear
+
+
+@pytest.fixture
+def documento(db):
+    documento = Documento(tipo="libro", titulo=f"Documento {next(_secuencia)}", autor="Autor", activo=True)
+    db.add(documento)
+    db.commit()
+    return documento
+
+
+@pytest.fixture
+def crear_ejemplares(db, documento):
+    """Crear n ejemplares del documento en el estado indicado"""
+    def crear(n: int = 1, estado: str = "disponible"):
+        ejemplares = [
+            Ejemplar(documento_id=documento.id, codigo=f"EJ-{next(_secuencia)}", estado=estado)
+            for _ in range(n)
+        ]
+        db.add_all(ejemplares)
+        db.commit()
+        return ejemplares
+    return crear
+
+
+@pytest.fixture
+def prestar(db):
+    """
+    Registrar en la BD un préstamo activo de los ejemplares indicados (que
+    quedan 'prestado'), con devolución estimada en 'dias' días (negativo:
+    atrasado).
+    """
+    def prestar(usuario, ejemplares, dias: int = 7):
+        biblioteca = db.query(Biblioteca).first()
+        if biblioteca is None:
+            biblioteca = Biblioteca(nombre="Biblioteca de pruebas")
+            db.add(biblioteca)
+            db.flush()
+
+        ahora = datetime.now()
+        estimada = ahora + timedelta(days=dias)
+        prestamo = Prestamo(
+            tipo_prestamo=TipoPrestamo.domicilio, usuario_id=usuario.id, biblioteca_id=biblioteca.id,
+            fecha_prestamo=min(ahora, estimada - timedelta(days=7)), hora_prestamo=ahora.time(),
+            fecha_devolucion_estimada=estimada, hora_devolucion_estimada=estimada.time(),
+            estado=EstadoPrestamo.activo if dias >= 0 else EstadoPrestamo.vencido
+        )
+        db.add(prestamo)
+        db.flush()
+        for ejemplar in ejemplares:
+            ejemplar.estado = "prestado"
+            db.add(DetallePrestamo(prestamo_id=prestamo.id, ejemplar_id=ejemplar.id))
+        db.commit()
+        return prestamo
+    return prestar
@@ -0,0 +1,40 @@
+"""Login (bcrypt en el pool de hashing) y GET /auth/me"""
+
+from sqlalchemy import text
+
+from app.database import engine
+from app.services.cache_usuarios import cache_usuarios
+from app.services.hashing_service import hashing_service
+
+
+def test_login_verifica_la_contrasena(cliente, db, crear_usuario):
+    usuario, _ = crear_usuario()
+    usuario.password_hash = hashing_service.hash("clave123")
+    db.commit()
+    credenciales = {"email": usuario.email, "password": "clave123"}
+
+    assert cliente.post("/api/v1/auth/login", json=credenciales).status_code == 200
+    credenciales["password"] = "otra"
+    assert cliente.post("/api/v1/auth/login", json=credenciales).status_code == 401
+
+
+def test_me_retorna_el_usuario(cliente, crear_usuario):
+    usuario, headers = crear_usuario()
+
+    respuesta = cliente.get("/api/v1/auth/me", headers=headers)
+
+    assert respuesta.status_code == 200
+    assert respuesta.json()["data"]["email"] == usuario.email
+
+
+def test_me_con_usuario_borrado_retorna_401(cliente, crear_usuario):
+    usuario, headers = crear_usuario()
+    assert cliente.get("/api/v1/auth/me", headers=headers).status_code == 200
+
+    # Borrado sin invalidar la caché: el principal sigue ahí, la fila no
+    with engine.begin() as conexion:
+        conexion.execute(text("DELETE FROM usuarios WHERE id = :id"), {"id": usuario.id})
+
+    assert cliente.get("/api/v1/auth/me", headers=headers).status_code == 401
+    # Y el principal huérfano ya no autoriza otras rutas
+    assert cache_usuarios.get(usuario.id) is None
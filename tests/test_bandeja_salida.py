@@ -0,0 +1,104 @@
+"""
+Bandeja de salida: un envío fallido se reintenta con espera creciente y tras
+CORREOS_MAX_INTENTOS queda 'muerto' hasta que un admin lo devuelve a la cola.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.models.correo_saliente import CorreoSaliente
+from app.models.log_notificaciones import LogNotificacion
+from app.services.bandeja_salida import calcular_espera, despachar_correos, encolar_correo
+from app.services.email_service import email_service
+
+ERROR = "550 Buzón no disponible"
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    """Servidor SMTP falso: rechaza los destinatarios de 'caidos' y acepta el resto"""
+    caidos = set()
+
+    def enviar(mensajes):
+        return [(False, ERROR) if destinatario in caidos else (True, None) for destinatario, _, _ in mensajes]
+
+    monkeypatch.setattr(settings, "SMTP_POOL_ACTIVO", False)
+    monkeypatch.setattr(email_service, "send_bulk", enviar)
+    return caidos
+
+
+def _encolar(db, usuario) -> CorreoSaliente:
+    correo = encolar_correo(db, usuario.id, "prueba", usuario.email, "Asunto", "<p>Hola</p>")
+    db.commit()
+    return correo
+
+
+def test_espera_creciente_con_tope():
+    base = settings.CORREOS_ESPERA_BASE_SEGUNDOS
+    assert [calcular_espera(i) for i in (1, 2, 3)] == [timedelta(seconds=base * f) for f in (1, 2, 4)]
+    assert calcular_espera(50) == timedelta(seconds=settings.CORREOS_ESPERA_MAX_SEGUNDOS)
+
+
+def test_envio_exitoso(db, crear_usuario, servidor):
+    usuario, _ = crear_usuario()
+    correo = _encolar(db, usuario)
+
+    despachar_correos(db)
+
+    db.refresh(correo)
+    assert (correo.estado, correo.intentos, correo.ultimo_error) == ("enviado", 1, None)
+    assert correo.enviado_en is not None
+
+
+def test_fallo_se_reintenta_con_espera(db, crear_usuario, servidor):
+    usuario, _ = crear_usuario()
+    servidor.add(usuario.email)
+    correo = _encolar(db, usuario)
+
+    despachar_correos(db)
+    db.refresh(correo)
+    assert (correo.estado, correo.intentos, correo.ultimo_error) == ("fallido", 1, ERROR)
+    primer_reintento = correo.proximo_intento
+
+    # Antes de su próximo intento no se toma
+    despachar_correos(db, ahora=primer_reintento - timedelta(seconds=1))
+    db.refresh(correo)
+    assert correo.intentos == 1
+
+    enviado_desde = datetime.utcnow()
+    despachar_correos(db, ahora=primer_reintento)
+    db.refresh(correo)
+    assert (correo.estado, correo.intentos) == ("fallido", 2)
+    # La espera se duplicó (se mide desde el envío)
+    assert enviado_desde + calcular_espera(2) <= correo.proximo_intento <= datetime.utcnow() + calcular_espera(2)
+
+
+def test_muerto_tras_el_maximo_de_intentos(cliente, db, crear_usuario, servidor, monkeypatch):
+    monkeypatch.setattr(settings, "CORREOS_MAX_INTENTOS", 2)
+    usuario, _ = crear_usuario()
+    _, admin = crear_usuario("admin")
+    servidor.add(usuario.email)
+    correo = _encolar(db, usuario)
+
+    despachar_correos(db)
+    db.refresh(correo)
+    despachar_correos(db, ahora=correo.proximo_intento)
+    db.refresh(correo)
+    assert (correo.estado, correo.intentos) == ("muerto", 2)
+
+    # Muerto: el despachador ya no lo toma
+    despachar_correos(db, ahora=correo.proximo_intento + timedelta(days=1))
+    db.refresh(correo)
+    assert correo.intentos == 2
+    assert db.query(LogNotificacion).filter(
+        LogNotificacion.usuario_id == usuario.id, LogNotificacion.enviado_exitosamente.is_(False)
+    ).count() == 2
+
+    # Un admin lo devuelve a la cola y sale con el servidor de vuelta
+    assert cliente.post(f"/api/v1/admin/correos/{correo.id}/reintentar", headers=admin).status_code == 200
+    servidor.clear()
+    despachar_correos(db)
+    db.refresh(correo)
+    assert (correo.estado, correo.intentos) == ("enviado", 1)
@@ -0,0 +1,82 @@
+"""
+Espejo en memoria de la cola de reservas: la carga desde la BD corre sin el
+lock (no frena a los demás documentos) y no pierde los cambios que llegan
+mientras corre.
+"""
+
+import asyncio
+import threading
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from app.api.reservas import crear_reserva
+from app.services.cola_reservas import ColaReservas
+
+MANANA = date(2026, 3, 3)
+
+
+class _SesionFalsa:
+    """Responde db.query(...).filter(...).all() con filas fijas, esperando 'liberar' si se indica"""
+
+    def __init__(self, filas, liberar: threading.Event = None):
+        self.filas = filas
+        self.liberar = liberar
+        self.consultando = threading.Event()
+
+    def query(self, *columnas):
+        return self
+
+    def filter(self, *condiciones):
+        return self
+
+    def all(self):
+        self.consultando.set()
+        if self.liberar is not None:
+            assert self.liberar.wait(5)
+        return self.filas
+
+
+def _fila(reserva_id: int, prioridad: int = 0):
+    return (reserva_id, prioridad, datetime(2026, 3, 1, 10, reserva_id), MANANA)
+
+
+def _reserva(documento_id: int, reserva_id: int, prioridad: int = 0):
+    return SimpleNamespace(
+        id=reserva_id, documento_id=documento_id, prioridad=prioridad,
+        fecha_creacion=datetime(2026, 3, 1, 10, reserva_id), fecha_reserva=MANANA
+    )
+
+
+def test_carga_lenta_no_bloquea_ni_pierde_cambios():
+    colas = ColaReservas()
+    liberar = threading.Event()
+    lenta = _SesionFalsa([_fila(1), _fila(2)], liberar)
+    resultado = {}
+
+    hilo = threading.Thread(target=lambda: resultado.update(largo=colas.largo(lenta, 10)))
+    hilo.start()
+    assert lenta.consultando.wait(5)
+
+    # Con la carga del documento 10 en curso, otro documento se consulta sin esperar
+    assert colas.largo(_SesionFalsa([_fila(7)]), 20) == 1
+    # Confirmados mientras la consulta corría: se aplican sobre su resultado
+    colas.agregar(_reserva(10, 3, prioridad=1))
+    colas.quitar(10, 1)
+
+    liberar.set()
+    hilo.join(5)
+
+    assert resultado == {"largo": 2}
+    assert [c.reserva_id for c in colas.candidatos(lenta, 10, MANANA)] == [3, 2]
+
+
+def test_agregar_sin_espejo_no_consulta():
+    colas = ColaReservas()
+    colas.agregar(_reserva(10, 1))
+
+    # Sin espejo no hay nada que actualizar: la primera consulta lo carga de la BD
+    assert colas.largo(_SesionFalsa([_fila(1)]), 10) == 1
+
+
+def test_crear_reserva_corre_en_el_threadpool():
+    assert not asyncio.iscoroutinefunction(crear_reserva)
@@ -0,0 +1,80 @@
+"""
+Devoluciones de a un ejemplar y en lote: resultado por código, cierre del
+préstamo cuando vuelve su último ejemplar y reubicación programada.
+"""
+
+from app.models.prestamos import DetallePrestamo, EstadoPrestamo
+from app.models.transicion_programada import TransicionProgramada
+
+
+def _devolver(cliente, codigo: str):
+    return cliente.post("/api/v1/devoluciones/", json={"ejemplar_codigo": codigo})
+
+
+def _devolver_lote(cliente, codigos: list):
+    return cliente.post("/api/v1/devoluciones/lote", json={"ejemplares_codigos": codigos})
+
+
+def test_devolucion_cierra_el_prestamo_con_el_ultimo_ejemplar(cliente, db, crear_usuario, crear_ejemplares, prestar):
+    usuario, _ = crear_usuario()
+    primero, segundo = crear_ejemplares(2)
+    prestamo = prestar(usuario, [primero, segundo])
+
+    respuesta = _devolver(cliente, primero.codigo)
+
+    assert respuesta.status_code == 200
+    datos = respuesta.json()
+    assert (datos["ejemplar_codigo"], datos["dias_atraso"], datos["estado_prestamo"]) == (primero.codigo, 0, "activo")
+    assert datos["reserva_asignada"] is None
+    # Ya devuelto: no tiene préstamo abierto
+    assert _devolver(cliente, primero.codigo).status_code == 404
+
+    assert _devolver(cliente, segundo.codigo).json()["estado_prestamo"] == "devuelto"
+
+    db.expire_all()
+    assert prestamo.estado == EstadoPrestamo.devuelto
+    assert (primero.estado, segundo.estado) == ("devuelto", "devuelto")
+    assert all(d.fecha_devolucion for d in db.query(DetallePrestamo).filter(DetallePrestamo.prestamo_id == prestamo.id))
+    assert db.query(TransicionProgramada).filter(
+        TransicionProgramada.ejemplar_id.in_([primero.id, segundo.id])
+    ).count() == 2
+
+
+def test_devolucion_de_codigo_desconocido(cliente, crear_ejemplares):
+    (libre,) = crear_ejemplares(1)
+
+    assert _devolver(cliente, "NO-EXISTE").status_code == 404
+    assert _devolver(cliente, libre.codigo).json()["detail"] == "No hay un préstamo activo para este ejemplar"
+
+
+def test_devolucion_en_lote(cliente, db, crear_usuario, crear_ejemplares, prestar):
+    usuario, _ = crear_usuario()
+    otro, _ = crear_usuario()
+    a1, a2, b1, libre = crear_ejemplares(4)
+    completo = prestar(usuario, [a1, a2])
+    parcial = prestar(otro, [b1, libre])
+    (sin_prestamo,) = crear_ejemplares(1)
+    codigos = [a1.codigo, a2.codigo, "NO-EXISTE", b1.codigo, sin_prestamo.codigo, a1.codigo]
+
+    respuesta = _devolver_lote(cliente, codigos)
+
+    assert respuesta.status_code == 200
+    datos = respuesta.json()
+    # Los repetidos cuentan una vez y se informan con el mismo resultado
+    assert (datos["total"], datos["exitosas"], datos["fallidas"]) == (5, 3, 2)
+    resultados = datos["resultados"]
+    assert [r["ejemplar_codigo"] for r in resultados] == codigos
+    assert [r["exitoso"] for r in resultados] == [True, True, False, True, False, True]
+    assert resultados[5] == resultados[0]
+    assert resultados[2]["mensaje"] == "Ejemplar no encontrado"
+    assert resultados[4]["mensaje"] == "No hay un préstamo activo para este ejemplar"
+    assert [r["estado_prestamo"] for r in resultados[:2]] == ["devuelto", "devuelto"]
+    assert resultados[3]["estado_prestamo"] == "activo"
+
+    db.expire_all()
+    assert completo.estado == EstadoPrestamo.devuelto
+    assert parcial.estado == EstadoPrestamo.activo
+    assert (b1.estado, libre.estado, sin_prestamo.estado) == ("devuelto", "prestado", "disponible")
+
+    # Una segunda pasada del buzón no repite nada
+    assert _devolver_lote(cliente, [a1.codigo, b1.codigo]).json()["exitosas"] == 0
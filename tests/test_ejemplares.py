@@ -0,0 +1,75 @@
+"""Paneles del personal: alertas de ejemplares y reportes de estadísticas"""
+
+import asyncio
+
+import pytest
+
+from app.main import app
+from app.models.documento import Documento
+from app.models.ejemplar import Ejemplar
+
+REPORTES_PERSONAL = [
+    "/api/v1/ejemplares/estadisticas",
+    "/api/v1/ejemplares/reportes/con-problemas",
+    "/api/v1/ejemplares/reportes/por-ubicacion",
+    "/api/v1/ejemplares/alertas",
+    "/api/v1/reservas/",
+    "/api/v1/reservas/estadisticas",
+]
+
+
+def _documento_con_ejemplares(db, disponibles: int, prestados: int) -> Documento:
+    documento = Documento(tipo="libro", titulo="Documento con ejemplares", autor="Autor", activo=True)
+    db.add(documento)
+    db.flush()
+    estados = ["disponible"] * disponibles + ["prestado"] * prestados
+    db.add_all(
+        Ejemplar(documento_id=documento.id, codigo=f"ALR-{documento.id}-{n:02d}", estado=estado, ubicacion="A1")
+        for n, estado in enumerate(estados)
+    )
+    db.commit()
+    return documento
+
+
+def _baja_disponibilidad(alertas: dict) -> dict:
+    for alerta in alertas["alertas"]:
+        if alerta["tipo"] == "baja_disponibilidad":
+            return {d["documento_id"]: d for d in alerta["documentos"]}
+    return {}
+
+
+def test_alerta_baja_disponibilidad(cliente, db, crear_usuario):
+    _, headers = crear_usuario("bibliotecario")
+    escaso = _documento_con_ejemplares(db, disponibles=0, prestados=5)
+    suficiente = _documento_con_ejemplares(db, disponibles=2, prestados=4)
+    pocos = _documento_con_ejemplares(db, disponibles=0, prestados=4)
+
+    respuesta = cliente.get("/api/v1/ejemplares/alertas", headers=headers)
+
+    assert respuesta.status_code == 200
+    documentos = _baja_disponibilidad(respuesta.json())
+    assert documentos[escaso.id] == {"documento_id": escaso.id, "total": 5, "disponibles": 0}
+    assert suficiente.id not in documentos
+    # Con menos de 5 ejemplares no se alerta
+    assert pocos.id not in documentos
+
+
+@pytest.mark.parametrize("ruta", REPORTES_PERSONAL)
+def test_reportes_corren_en_el_threadpool(cliente, crear_usuario, ruta):
+    # Consultan la BD de forma síncrona: como async def bloquearían el event loop
+    endpoint = next(r.endpoint for r in app.routes if getattr(r, "path", None) == ruta and "GET" in r.methods)
+    assert not asyncio.iscoroutinefunction(endpoint)
+
+    _, headers = crear_usuario("bibliotecario")
+    assert cliente.get(ruta, headers=headers).status_code == 200
+
+
+def test_estadisticas_ejemplares(cliente, db, crear_usuario):
+    _, headers = crear_usuario("bibliotecario")
+    _documento_con_ejemplares(db, disponibles=1, prestados=2)
+
+    estadisticas = cliente.get("/api/v1/ejemplares/estadisticas", headers=headers).json()
+
+    assert estadisticas["total_ejemplares"] == db.query(Ejemplar).count()
+    assert estadisticas["disponibles"] == db.query(Ejemplar).filter(Ejemplar.estado == "disponible").count()
+    assert estadisticas["prestados"] == db.query(Ejemplar).filter(Ejemplar.estado == "prestado").count()
@@ -0,0 +1,123 @@
+"""
+Importación masiva: corre en segundo plano con su propio pool de hashing,
+una a la vez en toda la BD y sin dejar usuarios de una importación fallida.
+"""
+
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.models.importacion_usuarios import ImportacionUsuarios
+from app.models.usuario import Usuario, pwd_context
+from app.services.email_service import email_service
+from app.services.hashing_service import HashingService
+from app.services.importacion_usuarios import procesar_importaciones
+
+ENCABEZADO = "rut,nombres,apellidos,email,password\n"
+
+
+def _csv(*filas: str) -> bytes:
+    return (ENCABEZADO + "".join(f"{fila}\n" for fila in filas)).encode()
+
+
+def _importar(cliente, headers, contenido: bytes):
+    return cliente.post(
+        "/api/v1/usuarios/importar", headers=headers, files={"archivo": ("usuarios.csv", contenido, "text/csv")}
+    )
+
+
+def _estado(cliente, headers, importacion_id: int) -> dict:
+    return cliente.get(f"/api/v1/usuarios/importaciones/{importacion_id}", headers=headers).json()["data"]
+
+
+def test_hash_many_usa_su_propio_pool():
+    servicio = HashingService(trabajadores=2, trabajadores_masivo=1)
+    avances = []
+    try:
+        passwords = [f"clave{i}" for i in range(5)]
+        hashes = servicio.hash_many(passwords, tanda=2, al_avanzar=avances.append)
+    finally:
+        servicio.cerrar()
+
+    assert all(pwd_context.verify(p, h) for p, h in zip(passwords, hashes))
+    assert avances == [2, 4, 5]
+    assert servicio.hasheadas_masivo == 5
+    # Los logins no vieron pasar ninguna
+    assert servicio.completadas == 0
+    assert servicio.max_pendientes == 0
+
+
+def test_importacion_en_segundo_plano(cliente, db, crear_usuario):
+    _, headers = crear_usuario("admin")
+    contenido = _csv(
+        "11111111-1,Ana,Rojas,ana.importada@example.cl,clave123",
+        "12345678-0,Rut,Malo,rut.malo@example.cl,clave123"
+    )
+
+    respuesta = _importar(cliente, headers, contenido)
+
+    assert respuesta.status_code == 202
+    importacion_id = respuesta.json()["data"]["id"]
+    # El cliente de pruebas corre la tarea en segundo plano antes de retornar
+    estado = _estado(cliente, headers, importacion_id)
+    assert estado["estado"] == "completada"
+    assert (estado["total_filas"], estado["hasheadas"], estado["creados"], estado["rechazados"]) == (2, 1, 1, 1)
+    assert estado["errores"] == [{"fila": 2, "rut": "12345678-0", "error": "RUT inválido"}]
+    assert db.query(Usuario).filter(Usuario.email == "ana.importada@example.cl", Usuario.activo.is_(False)).count() == 1
+    # El archivo (con contraseñas en claro) no queda guardado
+    assert db.get(ImportacionUsuarios, importacion_id).archivo is None
+
+
+def test_importacion_en_curso_rechaza_otra(cliente, db, crear_usuario):
+    admin, headers = crear_usuario("admin")
+    # En curso en otro worker: solo existe su fila
+    en_curso = ImportacionUsuarios(creada_por=admin.id, formato="csv", estado="procesando", en_curso=True)
+    db.add(en_curso)
+    db.commit()
+    try:
+        assert _importar(cliente, headers, _csv("22222222-2,Beto,Soto,beto@example.cl,clave123")).status_code == 409
+    finally:
+        en_curso.estado, en_curso.en_curso = "completada", None
+        db.commit()
+
+    assert _importar(cliente, headers, _csv("22222222-2,Beto,Soto,beto@example.cl,clave123")).status_code == 202
+
+
+def test_importacion_fallida_no_deja_usuarios(cliente, db, crear_usuario, monkeypatch):
+    _, headers = crear_usuario("admin")
+    plantilla = email_service.plantilla_validacion
+    llamadas = []
+
+    def plantilla_que_falla(nombres, token):
+        llamadas.append(nombres)
+        if len(llamadas) > 1:
+            raise RuntimeError("Plantilla no disponible")
+        return plantilla(nombres, token)
+
+    # Un lote por usuario: el primero alcanza a insertarse antes del error
+    monkeypatch.setattr(settings, "IMPORTACION_LOTE", 1)
+    monkeypatch.setattr(email_service, "plantilla_validacion", plantilla_que_falla)
+
+    respuesta = _importar(cliente, headers, _csv(
+        "33333333-3,Carla,Diaz,carla@example.cl,clave123",
+        "44444444-4,Dario,Vega,dario@example.cl,clave123"
+    ))
+
+    estado = _estado(cliente, headers, respuesta.json()["data"]["id"])
+    assert estado["estado"] == "fallida"
+    assert estado["ultimo_error"] == "Plantilla no disponible"
+    assert db.query(Usuario).filter(Usuario.email.in_(["carla@example.cl", "dario@example.cl"])).count() == 0
+
+
+def test_importacion_abandonada_se_da_por_fallida(db, crear_usuario):
+    admin, _ = crear_usuario("admin")
+    abandonada = ImportacionUsuarios(
+        creada_por=admin.id, formato="csv", archivo=b"...", estado="procesando", en_curso=True,
+        actualizada_en=datetime.utcnow() - timedelta(minutes=settings.IMPORTACION_ABANDONO_MINUTOS + 1)
+    )
+    db.add(abandonada)
+    db.commit()
+
+    assert procesar_importaciones(db) == {"abandonadas": 1, "procesada": None}
+
+    db.refresh(abandonada)
+    assert (abandonada.estado, abandonada.en_curso, abandonada.archivo) == ("fallida", None, None)
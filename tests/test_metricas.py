@@ -0,0 +1,33 @@
+"""GET /metrics: solo con METRICAS_TOKEN como Bearer o desde localhost"""
+
+import pytest
+from fastapi import HTTPException, Request
+
+from app.config import settings
+from app.services.metricas import autorizar_metricas
+
+TOKEN = "token-de-prometheus"
+
+
+def _solicitud(host: str) -> Request:
+    return Request({"type": "http", "client": (host, 50000), "headers": []})
+
+
+def test_sin_token_solo_localhost(cliente, monkeypatch):
+    monkeypatch.setattr(settings, "METRICAS_TOKEN", None)
+
+    assert cliente.get("/metrics").status_code == 403
+    autorizar_metricas(_solicitud("127.0.0.1"))
+    with pytest.raises(HTTPException):
+        autorizar_metricas(_solicitud("10.0.0.8"))
+
+
+def test_con_token(cliente, monkeypatch):
+    monkeypatch.setattr(settings, "METRICAS_TOKEN", TOKEN)
+
+    assert cliente.get("/metrics").status_code == 401
+    assert cliente.get("/metrics", headers={"Authorization": "Bearer otro"}).status_code == 401
+
+    respuesta = cliente.get("/metrics", headers={"Authorization": f"Bearer {TOKEN}"})
+    assert respuesta.status_code == 200
+    assert "http_solicitudes_total" in respuesta.text
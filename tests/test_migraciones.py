@@ -0,0 +1,177 @@
+"""
+Migraciones de esquema: una base creada antes de las columnas nuevas recibe
+las columnas al arrancar, con las filas existentes rellenadas, y el código
+actual puede usarla.
+"""
+
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app.api.devoluciones import _cerrar_prestamos_completos
+from app.database import Base, engine
+from app.migraciones import aplicar_migraciones
+from app.models.prestamos import DetallePrestamo
+from app.models.reserva import Reserva
+from app.utils.dates import calcular_fecha_limite_retiro
+
+# Tablas tal como las creaba create_all antes de las columnas nuevas
+ESQUEMA_ANTIGUO = {
+    "prestamos": """
+        CREATE TABLE prestamos (
+            id INTEGER NOT NULL,
+            tipo_prestamo VARCHAR(9) NOT NULL,
+            usuario_id INTEGER NOT NULL,
+            biblioteca_id INTEGER NOT NULL,
+            fecha_prestamo DATETIME NOT NULL,
+            hora_prestamo TIME NOT NULL,
+            fecha_devolucion_estimada DATETIME,
+            hora_devolucion_estimada TIME,
+            fecha_devolucion_real DATETIME,
+            hora_devolucion_real TIME,
+            estado VARCHAR(8),
+            notificado BOOLEAN,
+            PRIMARY KEY (id),
+            FOREIGN KEY(usuario_id) REFERENCES usuarios (id),
+            FOREIGN KEY(biblioteca_id) REFERENCES bibliotecas (id)
+        )
+    """,
+    "detalles_prestamo": """
+        CREATE TABLE detalles_prestamo (
+            id INTEGER NOT NULL,
+            prestamo_id INTEGER NOT NULL,
+            ejemplar_id INTEGER NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(prestamo_id) REFERENCES prestamos (id),
+            FOREIGN KEY(ejemplar_id) REFERENCES ejemplares (id)
+        )
+    """,
+    "reservas": """
+        CREATE TABLE reservas (
+            id INTEGER NOT NULL,
+            usuario_id INTEGER NOT NULL,
+            documento_id INTEGER NOT NULL,
+            fecha_reserva DATE NOT NULL,
+            estado VARCHAR(20) NOT NULL,
+            fecha_creacion DATETIME NOT NULL,
+            fecha_actualizacion DATETIME,
+            motivo_cancelacion VARCHAR(255),
+            PRIMARY KEY (id),
+            FOREIGN KEY(usuario_id) REFERENCES usuarios (id),
+            FOREIGN KEY(documento_id) REFERENCES documentos (id)
+        )
+    """,
+}
+
+
+@pytest.fixture
+def base_antigua(tmp_path):
+    motor = create_engine(f"sqlite:///{tmp_path / 'antigua.db'}")
+    Base.metadata.create_all(bind=motor)
+    with motor.begin() as conexion:
+        for tabla, ddl in ESQUEMA_ANTIGUO.items():
+            conexion.execute(text(f"DROP TABLE {tabla}"))
+            conexion.execute(text(ddl))
+    yield motor
+    motor.dispose()
+
+
+def _insertar(conexion, tabla: str, **valores):
+    columnas = ", ".join(valores)
+    parametros = ", ".join(f":{c}" for c in valores)
+    conexion.execute(text(f"INSERT INTO {tabla} ({columnas}) VALUES ({parametros})"), valores)
+
+
+def _prestamo(conexion, id: int, estado: str, devuelto: str = None):
+    _insertar(
+        conexion, "prestamos", id=id, tipo_prestamo="domicilio", usuario_id=1, biblioteca_id=1,
+        fecha_prestamo=f"2026-01-0{id} 10:00:00.000000", hora_prestamo="10:00:00.000000",
+        fecha_devolucion_real=devuelto, estado=estado
+    )
+
+
+def _detalle(conexion, id: int, prestamo_id: int, ejemplar_id: int, estado_ejemplar: str = None):
+    if estado_ejemplar:
+        _insertar(conexion, "ejemplares", id=ejemplar_id, documento_id=1, codigo=f"MIG-{ejemplar_id}", estado=estado_ejemplar)
+    _insertar(conexion, "detalles_prestamo", id=id, prestamo_id=prestamo_id, ejemplar_id=ejemplar_id)
+
+
+def _fechas_devolucion(motor) -> dict:
+    with motor.connect() as conexion:
+        return dict(conexion.execute(text("SELECT id, fecha_devolucion FROM detalles_prestamo")).all())
+
+
+def test_fecha_devolucion_de_detalles_existentes(base_antigua):
+    with base_antigua.begin() as conexion:
+        # Préstamo cerrado con dos ejemplares
+        _prestamo(conexion, 1, "devuelto", devuelto="2026-01-10 09:00:00.000000")
+        _detalle(conexion, 1, 1, 1, "disponible")
+        _detalle(conexion, 2, 1, 2, "disponible")
+        # Préstamo abierto con un ejemplar devuelto y otro todavía prestado
+        _prestamo(conexion, 2, "activo", devuelto="2026-01-12 09:00:00.000000")
+        _detalle(conexion, 3, 2, 3, "devuelto")
+        _detalle(conexion, 4, 2, 4, "prestado")
+        # Ejemplar devuelto y vuelto a prestar en un préstamo posterior
+        _prestamo(conexion, 3, "vencido")
+        _detalle(conexion, 5, 3, 5, "prestado")
+        _prestamo(conexion, 4, "activo")
+        _detalle(conexion, 6, 4, 5)
+
+    assert "detalles_prestamo.fecha_devolucion" in aplicar_migraciones(base_antigua)
+
+    assert _fechas_devolucion(base_antigua) == {
+        1: "2026-01-10 09:00:00.000000",
+        2: "2026-01-10 09:00:00.000000",
+        3: "2026-01-12 09:00:00.000000",
+        4: None,
+        5: "2026-01-03 10:00:00.000000",
+        6: None,
+    }
+    # Aplicada una vez, no se repite
+    assert aplicar_migraciones(base_antigua) == []
+
+
+def test_prestamo_antiguo_devuelto_en_parte_se_cierra(base_antigua):
+    with base_antigua.begin() as conexion:
+        _prestamo(conexion, 1, "activo", devuelto="2026-01-12 09:00:00.000000")
+        _detalle(conexion, 1, 1, 1, "devuelto")
+        _detalle(conexion, 2, 1, 2, "prestado")
+    aplicar_migraciones(base_antigua)
+
+    with Session(base_antigua) as sesion:
+        pendiente = sesion.get(DetallePrestamo, 2)
+        # El préstamo se carga con las columnas nuevas
+        assert pendiente.prestamo.recordatorio_enviado_en is None
+        assert pendiente.prestamo.bibliotecario_id is None
+        pendiente.fecha_devolucion = pendiente.prestamo.fecha_prestamo
+
+        assert _cerrar_prestamos_completos(sesion, [1]) == {1}
+
+
+def test_columnas_de_reservas_existentes(base_antigua):
+    with base_antigua.begin() as conexion:
+        for id, estado in [(1, "pendiente"), (2, "activa"), (3, "completada")]:
+            _insertar(
+                conexion, "reservas", id=id, usuario_id=id, documento_id=1, fecha_reserva="2026-01-05",
+                estado=estado, fecha_creacion="2026-01-01 10:00:00.000000"
+            )
+
+    assert {"reservas.prioridad", "reservas.ejemplar_id", "reservas.fecha_limite_retiro"} <= set(aplicar_migraciones(base_antigua))
+
+    with Session(base_antigua) as sesion:
+        reservas = {r.id: r for r in sesion.query(Reserva).order_by(Reserva.id)}
+    assert [r.prioridad for r in reservas.values()] == [0, 0, 0]
+    assert all(r.ejemplar_id is None for r in reservas.values())
+    # Solo la activa recibe plazo de retiro (si no, nunca expiraría)
+    assert reservas[1].fecha_limite_retiro is None
+    assert reservas[2].fecha_limite_retiro == calcular_fecha_limite_retiro(date.today())
+    assert reservas[3].fecha_limite_retiro is None
+
+
+def test_base_actual_no_se_migra(cliente):
+    assert aplicar_migraciones() == []
+    assert "fecha_devolucion" in {c["name"] for c in inspect(engine).get_columns("detalles_prestamo")}
+    assert "prioridad" in {c["name"] for c in inspect(engine).get_columns("reservas")}
+    assert "recordatorio_enviado_en" in {c["name"] for c in inspect(engine).get_columns("prestamos")}
@@ -0,0 +1,54 @@
+"""Préstamos: registro (detalles y estado de los ejemplares) y estadísticas"""
+
+from datetime import datetime, timedelta
+
+from app.models.biblioteca import Biblioteca
+from app.models.ejemplar import Ejemplar
+from app.models.prestamos import Prestamo
+
+
+def _ejemplar(db, documento, codigo):
+    ejemplar = Ejemplar(documento_id=documento.id, codigo=codigo, estado="disponible")
+    db.add(ejemplar)
+    db.commit()
+    return ejemplar
+
+
+def test_registrar_prestamo(cliente, db, crear_usuario, documento):
+    db.add(Biblioteca(nombre="Biblioteca Central"))
+    db.commit()
+    usuario, _ = crear_usuario()
+    bibliotecario, _ = crear_usuario("bibliotecario")
+    ejemplar = _ejemplar(db, documento, f"PRE-{documento.id}-01")
+    datos = {
+        "tipo_prestamo": "domicilio",
+        "usuario_id": usuario.id,
+        "bibliotecario_id": bibliotecario.id,
+        "ejemplares_ids": [ejemplar.id],
+    }
+
+    respuesta = cliente.post("/api/v1/prestamos/registrar", json=datos)
+
+    assert respuesta.status_code == 200
+    prestamo = respuesta.json()
+    assert prestamo["bibliotecario_id"] == bibliotecario.id
+    assert prestamo["detalles"] == [{"ejemplar_id": ejemplar.id}]
+    # Un libro a domicilio: 7 días
+    estimada = datetime.fromisoformat(prestamo["fecha_devolucion_estimada"])
+    assert estimada - datetime.fromisoformat(prestamo["fecha_prestamo"]) == timedelta(days=7)
+    db.refresh(ejemplar)
+    assert ejemplar.estado == "prestado"
+    # Queda guardado: las lecturas posteriores también lo informan
+    historial = cliente.get(f"/api/v1/prestamos/usuarios/{usuario.id}/historial").json()
+    assert [p["bibliotecario_id"] for p in historial] == [bibliotecario.id]
+
+    assert cliente.post("/api/v1/prestamos/registrar", json=datos).status_code == 400
+
+
+def test_estadisticas_prestamos(cliente, db):
+    respuesta = cliente.get("/api/v1/prestamos/estadisticas")
+
+    assert respuesta.status_code == 200
+    estadisticas = respuesta.json()
+    assert estadisticas["total_salas"] == db.query(Prestamo).filter(Prestamo.tipo_prestamo == "sala").count()
+    assert estadisticas["total_domicilio"] == db.query(Prestamo).filter(Prestamo.tipo_prestamo == "domicilio").count()
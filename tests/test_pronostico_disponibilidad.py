@@ -0,0 +1,97 @@
+"""
+Pronóstico de disponibilidad: el índice de un documento se construye sin el
+lock global, una sola vez aunque lo pidan varios hilos, y sin perder los
+eventos que llegan mientras se construye.
+"""
+
+import threading
+from datetime import date
+
+from app.services.pronostico_disponibilidad import PronosticoDisponibilidad
+
+HOY = date(2026, 3, 2)
+MANANA = date(2026, 3, 3)
+
+
+class _SesionFalsa:
+    """
+    Responde las consultas de _construir: scalar() con los ejemplares libres
+    y all() con los retornos y después las reservas. Si se indica, espera
+    'liberar' antes de responder.
+    """
+
+    def __init__(self, libres: int, retornos=(), reservas=(), liberar: threading.Event = None):
+        self.libres = libres
+        self.resultados = [[(f,) for f in retornos], [(f,) for f in reservas]]
+        self.liberar = liberar
+        self.consultando = threading.Event()
+        self.construcciones = 0
+
+    def query(self, *columnas):
+        return self
+
+    def join(self, *args):
+        return self
+
+    def filter(self, *condiciones):
+        return self
+
+    def scalar(self):
+        self.construcciones += 1
+        self.consultando.set()
+        if self.liberar is not None:
+            assert self.liberar.wait(5)
+        return self.libres
+
+    def all(self):
+        return self.resultados.pop(0)
+
+
+def _consultar(pronostico, db, documento_id: int, resultados: list) -> threading.Thread:
+    hilo = threading.Thread(
+        target=lambda: resultados.append(pronostico.disponibles(db, documento_id, MANANA, HOY))
+    )
+    hilo.start()
+    return hilo
+
+
+def test_construccion_lenta_no_bloquea_ni_pierde_eventos():
+    pronostico = PronosticoDisponibilidad()
+    liberar = threading.Event()
+    lenta = _SesionFalsa(libres=2, reservas=[MANANA], liberar=liberar)
+    resultados = []
+
+    hilos = [_consultar(pronostico, lenta, 10, resultados) for _ in range(3)]
+    assert lenta.consultando.wait(5)
+
+    # Con la construcción del documento 10 en curso, otro documento se consulta sin esperar
+    assert pronostico.disponibles(_SesionFalsa(libres=4), 20, MANANA, HOY) == 4
+    # Confirmados mientras la consulta corría: se aplican sobre su resultado
+    pronostico.registrar_salida(10, None)
+    pronostico.registrar_reserva(10, MANANA)
+
+    liberar.set()
+    for hilo in hilos:
+        hilo.join(5)
+
+    # Una sola construcción para los tres hilos: 2 libres - 1 prestado - 2 reservas
+    assert lenta.construcciones == 1
+    assert resultados == [0, 0, 0]
+    assert pronostico.disponibles(lenta, 10, HOY, HOY) == 1
+
+
+def test_invalidar_durante_la_construccion_la_descarta():
+    pronostico = PronosticoDisponibilidad()
+    liberar = threading.Event()
+    lenta = _SesionFalsa(libres=2, liberar=liberar)
+    resultados = []
+
+    hilo = _consultar(pronostico, lenta, 10, resultados)
+    assert lenta.consultando.wait(5)
+    pronostico.invalidar(10)
+    liberar.set()
+    hilo.join(5)
+
+    # La consulta en curso responde con lo que leyó, la siguiente reconstruye
+    assert resultados == [2]
+    assert pronostico.disponibles(_SesionFalsa(libres=1), 10, MANANA, HOY) == 1
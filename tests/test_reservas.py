@@ -0,0 +1,115 @@
+"""
+Cola de espera de reservas: prioridad fijada por el personal sobre la reserva
+de un usuario y entrega de los ejemplares devueltos a la cola.
+"""
+
+from datetime import date, timedelta
+
+from app.models.correo_saliente import CorreoSaliente
+from app.models.reserva import Reserva
+from app.models.transicion_programada import TransicionProgramada
+from app.utils.dates import calcular_fecha_limite_retiro
+
+
+def _reservar(cliente, headers, documento_id, **extra):
+    return cliente.post("/api/v1/reservas/", headers=headers, json={
+        "documento_id": documento_id,
+        "fecha_reserva": (date.today() + timedelta(days=1)).isoformat(),
+        **extra
+    })
+
+
+def _en_espera(db, usuario, documento, fecha: date = None, prioridad: int = 0) -> Reserva:
+    """Reserva pendiente creada directo en la BD (la API no acepta fechas de hoy)"""
+    reserva = Reserva(
+        usuario_id=usuario.id, documento_id=documento.id, fecha_reserva=fecha or date.today(),
+        estado="pendiente", prioridad=prioridad
+    )
+    db.add(reserva)
+    db.commit()
+    return reserva
+
+
+def _posicion(cliente, headers, reserva_id) -> int:
+    return cliente.get(f"/api/v1/reservas/{reserva_id}/posicion", headers=headers).json()["posicion"]
+
+
+def test_personal_adelanta_la_reserva_de_un_usuario(cliente, db, crear_usuario, documento):
+    _, primero = crear_usuario()
+    _, segundo = crear_usuario()
+    _, personal = crear_usuario("bibliotecario")
+    anterior = _reservar(cliente, primero, documento.id).json()["data"]["id"]
+    posterior = _reservar(cliente, segundo, documento.id).json()["data"]["id"]
+    assert _posicion(cliente, segundo, posterior) == 2
+
+    respuesta = cliente.patch(f"/api/v1/reservas/{posterior}/prioridad", headers=personal, json={"prioridad": 5})
+
+    assert respuesta.status_code == 200
+    assert respuesta.json()["data"]["posicion_cola"] == 1
+    assert db.get(Reserva, posterior).prioridad == 5
+    assert _posicion(cliente, segundo, posterior) == 1
+    assert _posicion(cliente, primero, anterior) == 2
+
+
+def test_usuario_no_cambia_prioridades(cliente, crear_usuario, documento):
+    _, headers = crear_usuario()
+    # La prioridad al crear se ignora: todas entran con la normal
+    creada = _reservar(cliente, headers, documento.id, prioridad=10).json()["data"]
+    assert creada["prioridad"] == 0
+
+    respuesta = cliente.patch(f"/api/v1/reservas/{creada['id']}/prioridad", headers=headers, json={"prioridad": 10})
+
+    assert respuesta.status_code == 403
+
+
+def test_prioridad_solo_en_reservas_en_espera(cliente, crear_usuario, documento):
+    _, headers = crear_usuario()
+    _, personal = crear_usuario("admin")
+    reserva_id = _reservar(cliente, headers, documento.id).json()["data"]["id"]
+    assert cliente.delete(f"/api/v1/reservas/{reserva_id}", headers=headers).status_code == 200
+
+    respuesta = cliente.patch(f"/api/v1/reservas/{reserva_id}/prioridad", headers=personal, json={"prioridad": 3})
+
+    assert respuesta.status_code == 400
+    assert cliente.patch("/api/v1/reservas/999999/prioridad", headers=personal, json={"prioridad": 3}).status_code == 404
+
+
+def test_devolucion_entrega_el_ejemplar_a_la_cola(cliente, db, crear_usuario, crear_ejemplares, prestar, documento):
+    lector, _ = crear_usuario()
+    primero, _ = crear_usuario()
+    urgente, _ = crear_usuario()
+    futuro, _ = crear_usuario()
+    (ejemplar,) = crear_ejemplares(1)
+    prestar(lector, [ejemplar])
+    anterior = _en_espera(db, primero, documento)
+    adelantada = _en_espera(db, urgente, documento, prioridad=5)
+    _en_espera(db, futuro, documento, fecha=date.today() + timedelta(days=3), prioridad=9)
+
+    respuesta = cliente.post("/api/v1/devoluciones/", json={"ejemplar_codigo": ejemplar.codigo})
+
+    # La de mayor prioridad cuya fecha ya llegó
+    assert respuesta.json()["reserva_asignada"] == adelantada.id
+    db.expire_all()
+    assert (adelantada.estado, adelantada.ejemplar_id) == ("activa", ejemplar.id)
+    assert adelantada.fecha_limite_retiro == calcular_fecha_limite_retiro(date.today())
+    assert anterior.estado == "pendiente"
+    # Retenido para la reserva: no vuelve al estante
+    assert ejemplar.estado == "reservado"
+    assert db.query(TransicionProgramada).filter(TransicionProgramada.ejemplar_id == ejemplar.id).count() == 0
+    assert db.query(CorreoSaliente).filter(
+        CorreoSaliente.usuario_id == urgente.id, CorreoSaliente.tipo == "reserva_disponible"
+    ).count() == 1
+
+
+def test_devolucion_en_lote_reparte_ejemplares_en_orden_de_cola(cliente, db, crear_usuario, crear_ejemplares, prestar, documento):
+    lector, _ = crear_usuario()
+    ejemplares = crear_ejemplares(3)
+    prestar(lector, ejemplares)
+    reservas = [_en_espera(db, crear_usuario()[0], documento) for _ in range(2)]
+
+    respuesta = cliente.post("/api/v1/devoluciones/lote", json={"ejemplares_codigos": [e.codigo for e in ejemplares]})
+
+    assert [r["reserva_asignada"] for r in respuesta.json()["resultados"]] == [reservas[0].id, reservas[1].id, None]
+    db.expire_all()
+    assert [r.estado for r in reservas] == ["activa", "activa"]
+    assert [e.estado for e in ejemplares] == ["reservado", "reservado", "devuelto"]
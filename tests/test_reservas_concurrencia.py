@@ -0,0 +1,79 @@
+"""
+Reservas duplicadas: el índice único parcial sobre (usuario_id, documento_id)
+de las reservas vigentes es la única protección de crear_reserva, también con
+solicitudes simultáneas y en bases creadas antes de que existiera el índice.
+"""
+
+import threading
+from collections import Counter
+from datetime import date, timedelta
+
+from sqlalchemy import inspect, text
+
+from app.database import crear_indices_faltantes, engine
+from app.models.reserva import Reserva
+
+INDICE = "uq_reservas_usuario_documento_vigente"
+SOLICITUDES = 8
+
+
+def _reservar(cliente, headers, documento_id):
+    return cliente.post("/api/v1/reservas/", headers=headers, json={
+        "documento_id": documento_id,
+        "fecha_reserva": (date.today() + timedelta(days=1)).isoformat()
+    })
+
+
+def _reservar_en_paralelo(cliente, headers, documento_id, n=SOLICITUDES) -> Counter:
+    barrera = threading.Barrier(n)
+    estados = []
+
+    def reservar():
+        barrera.wait()
+        estados.append(_reservar(cliente, headers, documento_id).status_code)
+
+    hilos = [threading.Thread(target=reservar) for _ in range(n)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return Counter(estados)
+
+
+def _vigentes(db, usuario_id, documento_id) -> int:
+    return db.query(Reserva).filter(
+        Reserva.usuario_id == usuario_id,
+        Reserva.documento_id == documento_id,
+        Reserva.estado.in_(["pendiente", "activa"])
+    ).count()
+
+
+def test_reservas_simultaneas_crean_una_sola(cliente, db, crear_usuario, documento):
+    usuario, headers = crear_usuario()
+
+    estados = _reservar_en_paralelo(cliente, headers, documento.id)
+
+    assert estados == Counter({201: 1, 409: SOLICITUDES - 1})
+    assert _vigentes(db, usuario.id, documento.id) == 1
+
+
+def test_cancelada_no_impide_reservar_de_nuevo(cliente, db, crear_usuario, documento):
+    usuario, headers = crear_usuario()
+    reserva_id = _reservar(cliente, headers, documento.id).json()["data"]["id"]
+
+    assert cliente.delete(f"/api/v1/reservas/{reserva_id}", headers=headers).status_code == 200
+    assert _reservar(cliente, headers, documento.id).status_code == 201
+    assert _vigentes(db, usuario.id, documento.id) == 1
+
+
+def test_indice_se_crea_en_base_existente(cliente, db, crear_usuario, documento):
+    # Base creada antes del índice: create_all no lo agrega a una tabla existente
+    with engine.begin() as conexion:
+        conexion.execute(text(f"DROP INDEX {INDICE}"))
+    assert INDICE not in {i["name"] for i in inspect(engine).get_indexes("reservas")}
+
+    crear_indices_faltantes()
+
+    assert INDICE in {i["name"] for i in inspect(engine).get_indexes("reservas")}
+    usuario, headers = crear_usuario()
+    assert _reservar_en_paralelo(cliente, headers, documento.id) == Counter({201: 1, 409: SOLICITUDES - 1})
@@ -0,0 +1,70 @@
+"""
+Proceso diario de reservas: expira las activas no retiradas y activa en orden
+de cola las pendientes cuya fecha llegó, con un ejemplar disponible cada una.
+"""
+
+from datetime import date, timedelta
+
+from app.models.correo_saliente import CorreoSaliente
+from app.models.historial_ejemplar import HistorialEjemplar
+from app.models.reserva import Reserva
+from app.services.reservas_service import MOTIVO_ACTIVACION, MOTIVO_NO_RETIRADA, procesar_reservas_diarias
+from app.utils.dates import calcular_fecha_limite_retiro
+
+HOY = date.today()
+
+
+def _reserva(db, usuario, documento, **valores) -> Reserva:
+    reserva = Reserva(usuario_id=usuario.id, documento_id=documento.id, **{"fecha_reserva": HOY, **valores})
+    db.add(reserva)
+    db.commit()
+    return reserva
+
+
+def test_expira_y_activa_en_orden_de_cola(db, crear_usuario, crear_ejemplares, documento):
+    usuarios = [crear_usuario()[0] for _ in range(5)]
+    retenido, *libres = crear_ejemplares(3)
+    retenido.estado = "reservado"
+    vencida = _reserva(
+        db, usuarios[0], documento, fecha_reserva=HOY - timedelta(days=5), estado="activa",
+        ejemplar_id=retenido.id, fecha_limite_retiro=HOY - timedelta(days=1)
+    )
+    primera = _reserva(db, usuarios[1], documento, fecha_reserva=HOY - timedelta(days=1))
+    adelantada = _reserva(db, usuarios[2], documento, prioridad=3)
+    ultima = _reserva(db, usuarios[3], documento)
+    manana = _reserva(db, usuarios[4], documento, fecha_reserva=HOY + timedelta(days=1), prioridad=9)
+
+    resultado = procesar_reservas_diarias(db, HOY)
+
+    assert resultado["expiradas"] >= 1 and resultado["activadas"] >= 3
+    db.expire_all()
+    assert (vencida.estado, vencida.motivo_cancelacion) == ("cancelada", MOTIVO_NO_RETIRADA)
+    # El ejemplar que soltó la vencida alcanza para una tercera reserva
+    assert [r.estado for r in (adelantada, primera, ultima, manana)] == ["activa", "activa", "activa", "pendiente"]
+    # La n-ésima de la cola recibe el n-ésimo ejemplar disponible
+    asignados = [adelantada.ejemplar_id, primera.ejemplar_id, ultima.ejemplar_id]
+    assert asignados == [retenido.id, libres[0].id, libres[1].id]
+    assert all(e.estado == "reservado" for e in [retenido] + libres)
+    assert all(r.fecha_limite_retiro == calcular_fecha_limite_retiro(HOY) for r in (adelantada, primera, ultima))
+
+    historial = db.query(HistorialEjemplar.ejemplar_id, HistorialEjemplar.motivo).filter(
+        HistorialEjemplar.ejemplar_id.in_(asignados)
+    ).all()
+    assert sorted(historial) == sorted(
+        [(retenido.id, MOTIVO_NO_RETIRADA)] + [(e, MOTIVO_ACTIVACION) for e in asignados]
+    )
+    avisados = db.query(CorreoSaliente.usuario_id).filter(
+        CorreoSaliente.usuario_id.in_([u.id for u in usuarios]), CorreoSaliente.tipo == "reserva_disponible"
+    ).all()
+    assert sorted(u for (u,) in avisados) == sorted([usuarios[1].id, usuarios[2].id, usuarios[3].id])
+
+
+def test_sin_ejemplares_la_reserva_sigue_en_cola(db, crear_usuario, crear_ejemplares, documento):
+    usuario, _ = crear_usuario()
+    crear_ejemplares(1, "prestado")
+    reserva = _reserva(db, usuario, documento)
+
+    procesar_reservas_diarias(db, HOY)
+
+    db.refresh(reserva)
+    assert (reserva.estado, reserva.ejemplar_id) == ("pendiente", None)
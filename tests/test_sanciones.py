@@ -0,0 +1,62 @@
+"""
+Sanciones por atraso: al devolver (una por préstamo, también en lote) y en el
+proceso nocturno, que no renueva cada noche una sanción todavía vigente.
+"""
+
+from datetime import datetime, timedelta
+
+from app.models.sancion import Sancion
+from app.services.sanciones_service import calcular_dias_sancion, procesar_sanciones_atrasos
+
+
+def _sanciones(db, usuario) -> list:
+    return db.query(Sancion).filter(Sancion.usuario_id == usuario.id).order_by(Sancion.id).all()
+
+
+def test_dias_de_sancion():
+    assert [calcular_dias_sancion(d) for d in (0, 1, 2, 5, 15, 40)] == [0, 3, 4, 10, 30, 30]
+
+
+def test_devolucion_atrasada_sanciona_una_vez_por_prestamo(cliente, db, crear_usuario, crear_ejemplares, prestar):
+    usuario, _ = crear_usuario()
+    ejemplares = crear_ejemplares(2)
+    prestamo = prestar(usuario, ejemplares, dias=-5)
+
+    respuesta = cliente.post("/api/v1/devoluciones/lote", json={"ejemplares_codigos": [e.codigo for e in ejemplares]})
+
+    assert [r["dias_atraso"] for r in respuesta.json()["resultados"]] == [5, 5]
+    (sancion,) = _sanciones(db, usuario)
+    assert (sancion.prestamo_id, sancion.dias_atraso, sancion.dias_sancion, sancion.origen) == (prestamo.id, 5, 10, "devolucion")
+    db.refresh(usuario)
+    assert usuario.fecha_sancion_hasta == sancion.fecha_hasta
+    assert usuario.esta_sancionado()
+
+
+def test_sancion_solo_se_extiende(cliente, db, crear_usuario, crear_ejemplares, prestar):
+    usuario, _ = crear_usuario()
+    vigente = datetime.utcnow() + timedelta(days=20)
+    usuario.fecha_sancion_hasta = vigente
+    db.commit()
+    (ejemplar,) = crear_ejemplares(1)
+    prestar(usuario, [ejemplar], dias=-2)
+
+    assert cliente.post("/api/v1/devoluciones/", json={"ejemplar_codigo": ejemplar.codigo}).json()["dias_atraso"] == 2
+
+    # 4 días de sanción no acortan la vigente, ni quedan en la auditoría
+    db.refresh(usuario)
+    assert usuario.fecha_sancion_hasta == vigente
+    assert _sanciones(db, usuario) == []
+
+
+def test_proceso_nocturno_no_renueva_la_sancion_vigente(db, crear_usuario, crear_ejemplares, prestar):
+    usuario, _ = crear_usuario()
+    al_dia, _ = crear_usuario()
+    prestar(usuario, crear_ejemplares(1), dias=-3)
+    prestar(al_dia, crear_ejemplares(1), dias=3)
+
+    procesar_sanciones_atrasos(db)
+    procesar_sanciones_atrasos(db)
+
+    (sancion,) = _sanciones(db, usuario)
+    assert (sancion.dias_atraso, sancion.dias_sancion, sancion.origen) == (3, 6, "automatica")
+    assert _sanciones(db, al_dia) == []
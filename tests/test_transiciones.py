@@ -0,0 +1,47 @@
+"""Transiciones diferidas: se aplican y se borran en la misma transacción"""
+
+from datetime import datetime, timedelta
+
+from app.models.ejemplar import Ejemplar
+from app.models.historial_ejemplar import HistorialEjemplar
+from app.models.transicion_programada import TransicionProgramada
+from app.services.transiciones_service import procesar_transiciones_vencidas, programar_reubicacion
+
+
+def _ejemplar(db, documento, codigo: str, estado: str) -> Ejemplar:
+    ejemplar = Ejemplar(documento_id=documento.id, codigo=codigo, estado=estado)
+    db.add(ejemplar)
+    db.commit()
+    return ejemplar
+
+
+def _transiciones(db, *ejemplares) -> int:
+    return db.query(TransicionProgramada).filter(
+        TransicionProgramada.ejemplar_id.in_([e.id for e in ejemplares])
+    ).count()
+
+
+def test_transiciones_vencidas_se_aplican_y_se_borran(db, documento):
+    devuelto = _ejemplar(db, documento, f"TR-{documento.id}-1", "devuelto")
+    movido = _ejemplar(db, documento, f"TR-{documento.id}-2", "devuelto")
+    futuro = _ejemplar(db, documento, f"TR-{documento.id}-3", "devuelto")
+    antes = datetime.now() - timedelta(days=1)
+    programar_reubicacion(db, [devuelto.id, movido.id], ahora=antes)
+    programar_reubicacion(db, [futuro.id])
+    # Marcada como procesada por una versión anterior
+    db.add(TransicionProgramada(
+        ejemplar_id=futuro.id, estado_origen="devuelto", estado_destino="disponible",
+        ejecutar_en=antes, procesada=True
+    ))
+    movido.estado = "mantenimiento"
+    db.commit()
+
+    resultado = procesar_transiciones_vencidas(db)
+
+    assert resultado["aplicadas"] >= 1 and resultado["descartadas"] >= 1
+    db.expire_all()
+    assert (devuelto.estado, movido.estado, futuro.estado) == ("disponible", "mantenimiento", "devuelto")
+    assert db.query(HistorialEjemplar).filter(HistorialEjemplar.ejemplar_id == devuelto.id).count() == 1
+    # Solo queda la que todavía no vence
+    assert _transiciones(db, devuelto, movido) == 0
+    assert _transiciones(db, futuro) == 1